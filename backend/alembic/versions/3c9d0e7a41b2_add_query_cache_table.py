@@ -0,0 +1,40 @@
+"""Add query_cache table
+
+Revision ID: 3c9d0e7a41b2
+Revises: afc952b5d320
+Create Date: 2026-10-17 09:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9d0e7a41b2'
+down_revision = 'afc952b5d320'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('query_cache',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('cache_key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('chain', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_query_cache_cache_key'), 'query_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_query_cache_expires_at'), 'query_cache', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_query_cache_id'), 'query_cache', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_query_cache_id'), table_name='query_cache')
+    op.drop_index(op.f('ix_query_cache_expires_at'), table_name='query_cache')
+    op.drop_index(op.f('ix_query_cache_cache_key'), table_name='query_cache')
+    op.drop_table('query_cache')
@@ -0,0 +1,26 @@
+"""Add original_sql to user_queries (model output before the rewrite pass)
+
+Revision ID: 5d2a8c61f0b3
+Revises: 7e5b2f9c8d14
+Create Date: 2026-10-17 16:42:08.513970
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a8c61f0b3'
+down_revision = '7e5b2f9c8d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable without a default: a catalog-only change, no table rewrite
+    op.add_column('user_queries', sa.Column('original_sql', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('user_queries', 'original_sql')
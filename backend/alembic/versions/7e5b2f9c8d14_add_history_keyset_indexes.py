@@ -0,0 +1,47 @@
+"""Add composite history indexes for keyset pagination
+
+Revision ID: 7e5b2f9c8d14
+Revises: 3c9d0e7a41b2
+Create Date: 2026-10-17 14:03:21.907112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '7e5b2f9c8d14'
+down_revision = '3c9d0e7a41b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY: don't lock user_queries for writes while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_queries_session_created', 'user_queries',
+            ['session_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False, if_not_exists=True, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_user_queries_user_created', 'user_queries',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False, if_not_exists=True, postgresql_concurrently=True,
+        )
+        # Superseded by ix_user_queries_session_created (same leading column)
+        op.drop_index(
+            'ix_user_queries_session_id', table_name='user_queries',
+            if_exists=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_queries_session_id', 'user_queries', ['session_id'],
+            unique=False, if_not_exists=True, postgresql_concurrently=True,
+        )
+        op.drop_index('ix_user_queries_user_created', table_name='user_queries', if_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_user_queries_session_created', table_name='user_queries', if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,264 @@
+"""
+Exact-match response cache for the agent.
+
+Two tiers sit in front of `agent_app.ainvoke`:
+1. In-process LRU with TTL (per worker, no I/O).
+2. Postgres table `query_cache` (shared by all workers, survives restarts).
+
+The key is the normalized user_input + chain + a fingerprint of that
+chain's compiled prompt pack, the model name and the settings that change
+generation (retrieval, prompt budget, rewrites, token resolution), so
+editing a pack, a setting or switching models invalidates the old entries
+of the affected chains without a manual flush.
+"""
+import hashlib
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.agent.chains import UnknownChain, chain_packs
+from app.agent.providers import provider_registry
+from app.core.config import settings
+from app.models.sql import CachedResponse
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Cache outcomes reported back to the client
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_DISABLED = "disabled"
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Canonical form of a user question:
+    lowercase, collapsed whitespace, no trailing punctuation.
+    "Top 10  SOL holders?" and "top 10 sol holders" share one entry.
+    """
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return text.rstrip(" ?!.;")
+
+
+# Settings that change the SQL generated for the same question and prompt pack
+GENERATION_SETTINGS = (
+    "PROMPT_SCHEMA_RETRIEVAL", "PROMPT_MAX_TABLES", "PROMPT_TOKEN_BUDGET",
+    "SQL_VALIDATION_ENABLED", "SQL_REPAIR_MAX_ATTEMPTS", "SQL_REWRITE_ENABLED", "SQL_DEFAULT_LIMIT",
+    "TOKEN_INDEX_ENABLED", "TOKEN_INDEX_LOOSE_RANK", "TOKEN_INDEX_MAX_MATCHES",
+)
+
+
+def prompt_fingerprint(system_prompt: str, model: str) -> str:
+    """Short hash identifying the prompt + model that produced an answer."""
+    return hashlib.sha256(f"{model}\x00{system_prompt}".encode()).hexdigest()[:16]
+
+
+def chain_fingerprint(chain: str, model: str) -> str:
+    """Fingerprint of a chain's compiled prompt pack, the model and the generation settings."""
+    options = [f"{name}={getattr(settings, name)}" for name in GENERATION_SETTINGS]
+    if settings.TOKEN_INDEX_ENABLED and os.path.exists(settings.TOKEN_INDEX_PATH):
+        index = os.stat(settings.TOKEN_INDEX_PATH)  # A rebuilt token registry resolves mints differently
+        options.append(f"token_index={index.st_size}:{index.st_mtime_ns}")
+    return prompt_fingerprint("\x00".join([chain_packs.get(chain).full_prompt, *options]), model)
+
+
+class ResponseCache:
+    """
+    Two-tier cache of agent results (dicts like {"sql_output": ...}).
+
+    The DB tier uses the caller's session and never commits:
+    `put` is flushed together with the UserQuery history row.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        max_entries: int = 2048,
+        ttl_seconds: int = 3600,
+        db_ttl_seconds: int = 60 * 60 * 24 * 7,
+        enabled: bool = True,
+        chain_fingerprint: Optional[Callable[[str], str]] = None,
+    ):
+        self.fingerprint = fingerprint  # Used for every chain unless chain_fingerprint is given
+        self._chain_fingerprint = chain_fingerprint
+        self._chain_fingerprints: Dict[str, str] = {}
+        self.enabled = enabled
+        self.db_ttl = timedelta(seconds=db_ttl_seconds)
+        self._memory: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+
+        # Counters for hit-rate measurement
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def fingerprint_for(self, chain: str) -> str:
+        """The chain's fingerprint (computed on its first request, then reused)."""
+        chain = chain.lower()
+        if self._chain_fingerprint is None:
+            return self.fingerprint
+        fingerprint = self._chain_fingerprints.get(chain)
+        if fingerprint is None:
+            try:
+                fingerprint = self._chain_fingerprint(chain)
+            except UnknownChain:
+                return self.fingerprint  # Rejected before generation anyway
+            self._chain_fingerprints[chain] = fingerprint
+        return fingerprint
+
+    def make_key(self, user_input: str, chain: str) -> str:
+        raw = f"{self.fingerprint_for(chain)}\x00{chain.lower()}\x00{normalize_prompt(user_input)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, db: AsyncSession, key: str) -> Tuple[Optional[dict], str]:
+        """
+        Returns (payload, status). payload is None on a miss.
+        """
+        if not self.enabled:
+            return None, CACHE_DISABLED
+
+        # 1. In-process tier
+        payload = self._memory.get(key)
+        if payload is not None:
+            self.memory_hits += 1
+            return payload, CACHE_HIT
+
+        # 2. Postgres tier
+        try:
+            result = await db.execute(
+                select(CachedResponse.payload)
+                .where(CachedResponse.cache_key == key)
+                .where(CachedResponse.expires_at > datetime.utcnow())
+            )
+            payload = result.scalars().first()
+        except SQLAlchemyError as e:
+            # A broken cache must never break /generate
+            logger.warning("Response cache lookup failed: %s", e)
+            await db.rollback()
+            payload = None
+
+        if payload is not None:
+            self.db_hits += 1
+            self._memory[key] = payload
+            return payload, CACHE_HIT
+
+        self.misses += 1
+        return None, CACHE_MISS
+
+    async def get_many(self, db: AsyncSession, keys: List[str]) -> Dict[str, Tuple[Optional[dict], str]]:
+        """
+        Bulk `get`: memory first, then ONE query for everything else.
+        Returns {key: (payload, status)}.
+        """
+        if not self.enabled:
+            return {key: (None, CACHE_DISABLED) for key in keys}
+
+        found: Dict[str, Tuple[Optional[dict], str]] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            payload = self._memory.get(key)
+            if payload is not None:
+                self.memory_hits += 1
+                found[key] = (payload, CACHE_HIT)
+            else:
+                missing.append(key)
+
+        rows = {}
+        if missing:
+            try:
+                result = await db.execute(
+                    select(CachedResponse.cache_key, CachedResponse.payload)
+                    .where(CachedResponse.cache_key.in_(missing))
+                    .where(CachedResponse.expires_at > datetime.utcnow())
+                )
+                rows = {row.cache_key: row.payload for row in result.all()}
+            except SQLAlchemyError as e:
+                logger.warning("Response cache lookup failed: %s", e)
+                await db.rollback()
+
+        for key in missing:
+            payload = rows.get(key)
+            if payload is not None:
+                self.db_hits += 1
+                self._memory[key] = payload
+                found[key] = (payload, CACHE_HIT)
+            else:
+                self.misses += 1
+                found[key] = (None, CACHE_MISS)
+        return found
+
+    async def put(self, db: AsyncSession, key: str, chain: str, payload: dict) -> None:
+        """
+        Stores a successful result in both tiers.
+        The DB upsert is added to the session; the caller commits.
+        """
+        await self.put_many(db, [(key, chain, payload)])
+
+    async def put_many(self, db: AsyncSession, entries: List[Tuple[str, str, dict]]) -> None:
+        """Bulk `put` of (key, chain, payload): one multi-row upsert."""
+        if not self.enabled or not entries:
+            return
+
+        now = datetime.utcnow()
+        rows = {}
+        for key, chain, payload in entries:
+            self._memory[key] = payload
+            # One row per key: ON CONFLICT can't touch the same row twice
+            rows[key] = {
+                "id": uuid.uuid4(),
+                "cache_key": key,
+                "chain": chain,
+                "payload": payload,
+                "created_at": now,
+                "updated_at": now,
+                "expires_at": now + self.db_ttl,
+            }
+
+        statement = insert(CachedResponse.__table__).values(list(rows.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=["cache_key"],
+            set_={
+                "payload": statement.excluded.payload,
+                "updated_at": statement.excluded.updated_at,
+                "expires_at": statement.excluded.expires_at,
+            },
+        )
+        await db.execute(statement)
+
+    def clear(self) -> None:
+        """Drops the in-process tier (the DB tier expires on its own)."""
+        self._memory.clear()
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "fingerprint": self.fingerprint,
+            "chain_fingerprints": dict(self._chain_fingerprints),
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Initialize the cache once (one in-process tier per worker)
+response_cache = ResponseCache(
+    fingerprint=provider_registry.model_id(),
+    chain_fingerprint=lambda chain: chain_fingerprint(chain, provider_registry.model_id()),
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    db_ttl_seconds=settings.RESPONSE_CACHE_DB_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
@@ -0,0 +1,216 @@
+"""
+Chain packs: the schema, known tokens, examples and prompt texts of one chain.
+
+A pack module (app/agent/packs/) declares a chain as a ChainPackSpec. The
+first request for a chain imports its module and compiles the pack once:
+- every table, token line and example is rendered once, with its token count;
+- the full prompt is a ready SystemMessage with its token count;
+- the prompt is checked against PROMPT_TOKEN_BUDGET.
+
+A request then only ranks tables and joins precompiled strings (no
+rendering, no token counting), and chains nobody asks for are never
+imported or compiled, so adding chains costs neither startup time nor
+per-request time.
+
+Budget: a pack whose rules and example alone exceed the budget fails to
+load. If the full prompt doesn't fit, the pack always uses retrieval; a
+retrieved prompt over the budget drops its least relevant tables.
+"""
+import importlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.agent.prompts import (
+    SOLANA_GUIDELINES, SOLANA_RULES, SOLANA_TOKENS_HEADER, TABLE_LETTERS,
+    assemble_prompt, count_tokens, select_examples, select_table_indexes, select_tokens, table_index, table_scores,
+)
+from app.agent.schema import SchemaRegistry, TokenSpec
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAIN = "solana"
+
+# chain -> module defining its pack (imported on first use)
+PACK_MODULES = {
+    "solana": "app.agent.packs.solana",
+    "ethereum": "app.agent.packs.evm",
+    "base": "app.agent.packs.evm",
+    "arbitrum": "app.agent.packs.evm",
+}
+
+
+class UnknownChain(ValueError):
+    pass
+
+
+class PromptBudgetExceeded(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ChainPackSpec:
+    chain: str
+    registry: SchemaRegistry
+    rules: str = SOLANA_RULES
+    guidelines: str = SOLANA_GUIDELINES
+    tokens_header: str = SOLANA_TOKENS_HEADER
+
+
+class ChainPack:
+    """A compiled pack: prompt pieces rendered and counted once."""
+
+    def __init__(self, spec: ChainPackSpec, budget: int = 0):
+        started = time.perf_counter()
+        self.chain = spec.chain
+        self.registry = spec.registry
+        self.budget = budget or None
+        self._texts = dict(rules=spec.rules, guidelines=spec.guidelines, tokens_header=spec.tokens_header)
+        self._index = table_index(spec.registry)
+
+        # Tables are rendered with letter A; the letter is swapped in when the prompt is assembled
+        rendered = [t.render("A") for t in spec.registry.tables]
+        self._table_tails = [text[len("-- A"):] for text in rendered]
+        self._table_tokens = [count_tokens(text) for text in rendered]
+        self._token_lines = {t.symbol: t.render() for t in spec.registry.tokens}
+        self._token_tokens = {symbol: count_tokens(line) for symbol, line in self._token_lines.items()}
+        self._token_mints = {t.mint: t.symbol for t in spec.registry.tokens}
+        self._examples = {e: e.render() for e in spec.registry.examples}
+        self._example_tokens = {e: count_tokens(text) for e, text in self._examples.items()}
+        # Rules, headers and guidelines (a blank token line keeps out the "no tokens" line)
+        self._base_tokens = count_tokens(assemble_prompt([], [" "], [], **self._texts))
+        self._no_tokens = count_tokens(assemble_prompt([], [], [], **self._texts)) - self._base_tokens
+
+        self.full_prompt = assemble_prompt(
+            self._tables(range(len(rendered))), list(self._token_lines.values()),
+            list(self._examples.values()), **self._texts,
+        )
+        self.full_tokens = count_tokens(self.full_prompt)
+        self.full_messages: Tuple[BaseMessage, ...] = (SystemMessage(content=self.full_prompt),)
+
+        minimum = self._base_tokens + self._no_tokens + min(self._example_tokens.values(), default=0)
+        if self.budget and minimum > self.budget:
+            raise PromptBudgetExceeded(
+                f"{self.chain} pack needs at least {minimum} prompt tokens (PROMPT_TOKEN_BUDGET={self.budget})"
+            )
+        self.fits = not self.budget or self.full_tokens <= self.budget
+        if not self.fits:
+            logger.warning(
+                "%s full prompt is %d tokens, over PROMPT_TOKEN_BUDGET=%d: using schema retrieval only",
+                self.chain, self.full_tokens, self.budget,
+            )
+        self.compile_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _tables(self, positions: Sequence[int]) -> List[str]:
+        return [f"-- {TABLE_LETTERS[i]}{self._table_tails[p]}" for i, p in enumerate(positions)]
+
+    def _token_line(self, token: TokenSpec) -> Tuple[str, int]:
+        if self._token_mints.get(token.mint) == token.symbol:
+            return self._token_lines[token.symbol], self._token_tokens[token.symbol]
+        line = token.render()  # Resolved from the token registry: rendered per request
+        return line, count_tokens(line)
+
+    def system_prompt(
+        self, question: str, retrieval: bool = True, max_tables: int = 3, tokens: Optional[Sequence[TokenSpec]] = None,
+    ) -> Tuple[str, int]:
+        """
+        (system prompt, its token count) for the question. `tokens` (resolved
+        before the call, see app/agent/tokens.py) replace the known tokens
+        the question mentions.
+        """
+        if not retrieval and self.fits and tokens is None:
+            return self.full_prompt, self.full_tokens
+
+        scores = table_scores(question, self._index)
+        if not retrieval and self.fits:
+            # Full prompt with the resolved tokens
+            positions, examples = list(range(len(self.registry.tables))), list(self._examples)
+        else:
+            positions = select_table_indexes(scores, max_tables)
+            examples = select_examples([self.registry.tables[p] for p in positions], self.registry)
+        if tokens is None:
+            tokens = select_tokens(question, self.registry)
+        token_lines = [self._token_line(t) for t in tokens]
+
+        fixed = self._base_tokens + sum(self._example_tokens[e] for e in examples)
+        fixed += sum(n for _, n in token_lines) if token_lines else self._no_tokens
+        size = fixed + sum(self._table_tokens[p] for p in positions)
+        if self.budget:
+            # Least relevant tables go first; one always stays
+            for p in sorted(positions, key=lambda p: scores[p]):
+                if size <= self.budget or len(positions) == 1:
+                    break
+                positions.remove(p)
+                size -= self._table_tokens[p]
+
+        prompt = assemble_prompt(
+            self._tables(positions), [line for line, _ in token_lines],
+            [self._examples[e] for e in examples], **self._texts,
+        )
+        return prompt, size
+
+    def messages(
+        self, question: str, retrieval: bool = True, max_tables: int = 3, tokens: Optional[Sequence[TokenSpec]] = None,
+    ) -> Tuple[List[BaseMessage], int]:
+        """([system, user] messages, system prompt tokens) ready for the model."""
+        if not retrieval and self.fits and tokens is None:
+            return [*self.full_messages, HumanMessage(content=question)], self.full_tokens
+        prompt, size = self.system_prompt(question, retrieval=retrieval, max_tables=max_tables, tokens=tokens)
+        return [SystemMessage(content=prompt), HumanMessage(content=question)], size
+
+    def stats(self) -> dict:
+        return {
+            "tables": len(self.registry.tables),
+            "tokens": len(self.registry.tokens),
+            "examples": len(self.registry.examples),
+            "full_prompt_tokens": self.full_tokens,
+            "fits_budget": self.fits,
+            "compile_ms": self.compile_ms,
+        }
+
+
+class ChainPacks:
+    """Packs by chain name, imported and compiled on first use (per worker)."""
+
+    def __init__(self, modules: Dict[str, str], budget: int = 0):
+        self.modules = {chain.lower(): module for chain, module in modules.items()}
+        self.budget = budget
+        self._packs: Dict[str, ChainPack] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self.modules)
+
+    def get(self, chain: Optional[str] = None) -> ChainPack:
+        """Raises UnknownChain, or PromptBudgetExceeded for a pack too big for the budget."""
+        chain = (chain or DEFAULT_CHAIN).lower()
+        pack = self._packs.get(chain)
+        if pack is not None:
+            return pack
+        module = self.modules.get(chain)
+        if module is None:
+            raise UnknownChain(f"Unknown chain {chain!r} (supported: {', '.join(self.names)})")
+        with self._lock:
+            pack = self._packs.get(chain)
+            if pack is None:
+                spec = importlib.import_module(module).pack(chain)
+                pack = self._packs[chain] = ChainPack(spec, budget=self.budget)
+                logger.info("Compiled %s prompt pack in %.1fms", chain, pack.compile_ms)
+        return pack
+
+    def stats(self) -> dict:
+        return {
+            "available": list(self.names),
+            "budget": self.budget,
+            "loaded": {chain: pack.stats() for chain, pack in self._packs.items()},
+        }
+
+
+# Initialize the registry once (packs compile on their first request)
+chain_packs = ChainPacks(PACK_MODULES, budget=settings.PROMPT_TOKEN_BUDGET)
@@ -0,0 +1,359 @@
+"""
+Static scan-cost estimate for generated SQL (no warehouse round trip).
+
+For every table the query reads: the daily partitions its partition-key
+filters select (`block_time` / `block_date` / `day` ranges, intersected over
+AND and merged over OR, in the query block reading the table or one wrapping
+it), times the table's bytes per day from SCAN_TABLE_STATS, times the share
+of its columns the query references (storage is columnar). Tables without
+partitions cost their full size. An equality join on partition keys lets
+Trino prune both sides with the tighter range (dynamic filtering).
+
+Bounds that can't be evaluated statically (subqueries, column arithmetic)
+count as unbounded, so the estimate errs high. Queries over SCAN_BUDGET_BYTES
+are flagged, or sent back for repair by the validator node
+(SCAN_BUDGET_ACTION=reject).
+"""
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlglot import exp
+from sqlglot.errors import ParseError
+from sqlglot.optimizer.scope import Scope, traverse_scope
+
+from app.agent.chains import UnknownChain, chain_packs
+from app.agent.schema import SOLANA_SCHEMA, SchemaRegistry
+from app.agent.validation import conditions, enclosing_scopes, parse_sql, table_name
+from app.core.config import settings
+
+Range = Tuple[Optional[datetime], Optional[datetime]]  # (lower, upper), None = unbounded
+_UNBOUNDED: Range = (None, None)
+
+_UNITS = {
+    "SECOND": timedelta(seconds=1),
+    "MINUTE": timedelta(minutes=1),
+    "HOUR": timedelta(hours=1),
+    "DAY": timedelta(days=1),
+    "WEEK": timedelta(weeks=1),
+    "MONTH": timedelta(days=30),
+    "QUARTER": timedelta(days=91),
+    "YEAR": timedelta(days=365),
+}
+
+
+@dataclass(frozen=True)
+class TableScan:
+    table: str
+    bytes: int
+    partitions: Optional[int]   # Daily partitions read (None: table isn't partitioned)
+    bounded: bool               # A lower bound on the partition key limits the scan
+    column_share: float         # Referenced columns / declared columns
+
+
+@dataclass(frozen=True)
+class ScanEstimate:
+    tables: Tuple[TableScan, ...]
+    budget_bytes: Optional[int] = None
+    warnings: Tuple[str, ...] = ()
+
+    @property
+    def bytes(self) -> int:
+        return sum(scan.bytes for scan in self.tables)
+
+    @property
+    def partitions(self) -> int:
+        return sum(scan.partitions or 0 for scan in self.tables)
+
+    @property
+    def over_budget(self) -> bool:
+        return bool(self.budget_bytes) and self.bytes > self.budget_bytes
+
+    def budget_message(self) -> str:
+        return (
+            f"Estimated scan of {format_bytes(self.bytes)} exceeds the budget of "
+            f"{format_bytes(self.budget_bytes)}: narrow the block_time range or select fewer columns"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "bytes": self.bytes,
+            "partitions": self.partitions,
+            "budget_bytes": self.budget_bytes,
+            "over_budget": self.over_budget,
+            "tables": [asdict(scan) for scan in self.tables],
+            "warnings": list(self.warnings),
+        }
+
+
+def format_bytes(n: Optional[float]) -> str:
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1000 or unit == "TB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1000
+
+
+# --- Constant folding of time bounds ---------------------------------------------
+
+def _midnight(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _number(node: exp.Expression) -> Optional[float]:
+    if isinstance(node, exp.Neg):
+        value = _number(node.this)
+        return -value if value is not None else None
+    if isinstance(node, exp.Literal):
+        try:
+            return float(node.this)
+        except ValueError:
+            return None
+    return None
+
+
+def _unit(node: Optional[exp.Expression]) -> Optional[timedelta]:
+    name = node.name.upper() if node is not None else "DAY"
+    return _UNITS.get(name[:-1] if name.endswith("S") else name)
+
+
+def _interval(node: exp.Expression) -> Optional[timedelta]:
+    """INTERVAL '7' DAY (or '7 days')."""
+    if not isinstance(node, exp.Interval) or not isinstance(node.this, exp.Literal):
+        return None
+    value, _, unit_text = str(node.this.this).strip().partition(" ")
+    unit = _unit(node.args.get("unit") or (exp.var(unit_text) if unit_text else None))
+    try:
+        return float(value) * unit if unit is not None else None
+    except ValueError:
+        return None
+
+
+def _instant(node: exp.Expression, now: datetime) -> Optional[datetime]:
+    """Evaluates now()/current_date/literals +- intervals, date_add and date_trunc."""
+    try:
+        return _evaluate_instant(node, now)
+    except (OverflowError, ValueError):
+        return None  # Outside datetime's range ("interval '3000' year"): an unknown bound
+
+
+def _evaluate_instant(node: exp.Expression, now: datetime) -> Optional[datetime]:
+    if isinstance(node, exp.Paren):
+        return _instant(node.this, now)
+    if isinstance(node, exp.CurrentTimestamp):
+        return now
+    if isinstance(node, exp.CurrentDate):
+        return _midnight(now)
+    if isinstance(node, exp.Literal) and node.is_string:
+        try:
+            return datetime.fromisoformat(node.this.strip()).replace(tzinfo=None)
+        except ValueError:
+            return None
+    if isinstance(node, (exp.Cast, exp.TryCast)):
+        value = _instant(node.this, now)
+        return _midnight(value) if value is not None and node.to.is_type("date") else value
+    if isinstance(node, (exp.Add, exp.Sub)):
+        base, delta = _instant(node.this, now), _interval(node.expression)
+        if base is None or delta is None:
+            return None
+        return base + delta if isinstance(node, exp.Add) else base - delta
+    if isinstance(node, exp.DateAdd):
+        base, count, unit = _instant(node.this, now), _number(node.expression), _unit(node.args.get("unit"))
+        return base + count * unit if None not in (base, count, unit) else None
+    if isinstance(node, (exp.TimestampTrunc, exp.DateTrunc)):
+        base = _instant(node.this, now)
+        unit = node.args.get("unit")
+        name = unit.name.upper() if unit is not None else ""
+        if base is None or name in ("SECOND", "MINUTE"):
+            return base
+        if name == "HOUR":
+            return base.replace(minute=0, second=0, microsecond=0)
+        if name in ("MONTH", "YEAR"):
+            return _midnight(base).replace(day=1, month=1 if name == "YEAR" else base.month)
+        return _midnight(base)
+    return None
+
+
+# --- Partition ranges --------------------------------------------------------------
+
+def _intersect(a: Range, b: Range) -> Range:
+    lows = [x for x in (a[0], b[0]) if x is not None]
+    highs = [x for x in (a[1], b[1]) if x is not None]
+    return (max(lows) if lows else None, min(highs) if highs else None)
+
+
+def _union(a: Range, b: Range) -> Range:
+    low = min(a[0], b[0]) if a[0] is not None and b[0] is not None else None
+    high = max(a[1], b[1]) if a[1] is not None and b[1] is not None else None
+    return (low, high)
+
+
+def _is_key(node: exp.Expression, alias: str, keys: Tuple[str, ...]) -> bool:
+    return isinstance(node, exp.Column) and node.name.lower() in keys and node.table in ("", alias)
+
+
+_FLIPPED = {exp.GT: exp.LT, exp.GTE: exp.LTE, exp.LT: exp.GT, exp.LTE: exp.GTE, exp.EQ: exp.EQ}
+
+
+def _range(node: exp.Expression, alias: str, keys: Tuple[str, ...], now: datetime) -> Range:
+    """Partition-key range a condition guarantees for `alias`."""
+    if isinstance(node, exp.Paren):
+        return _range(node.this, alias, keys, now)
+    if isinstance(node, exp.And):
+        return _intersect(_range(node.this, alias, keys, now), _range(node.expression, alias, keys, now))
+    if isinstance(node, exp.Or):
+        return _union(_range(node.this, alias, keys, now), _range(node.expression, alias, keys, now))
+    if isinstance(node, exp.Between) and _is_key(node.this, alias, keys):
+        return (_instant(node.args["low"], now), _instant(node.args["high"], now))
+    if isinstance(node, exp.In) and _is_key(node.this, alias, keys) and node.expressions:
+        values = [_instant(value, now) for value in node.expressions]
+        return (min(values), max(values)) if None not in values else _UNBOUNDED
+    kind = type(node)
+    if kind in _FLIPPED:
+        column, value = node.this, node.expression
+        if not _is_key(column, alias, keys):
+            column, value, kind = value, column, _FLIPPED[kind]
+            if not _is_key(column, alias, keys):
+                return _UNBOUNDED
+        instant = _instant(value, now)
+        if instant is None:
+            return _UNBOUNDED
+        if kind in (exp.GT, exp.GTE):
+            return (instant, None)
+        if kind in (exp.LT, exp.LTE):
+            return (None, instant)
+        return (instant, instant)
+    return _UNBOUNDED
+
+
+def _source_range(scope: Scope, alias: str, keys: Tuple[str, ...], now: datetime) -> Range:
+    bounds = _UNBOUNDED
+    for block, name in enclosing_scopes(scope, alias):
+        for condition in conditions(block.expression):
+            bounds = _intersect(bounds, _range(condition, name, keys, now))
+    return bounds
+
+
+def _key_joins(scope: Scope, partitioned: Dict[str, Tuple[str, ...]]) -> List[Tuple[str, str]]:
+    """Pairs of aliases joined on equal partition keys (a.block_time = b.block_time)."""
+    pairs = []
+    for condition in conditions(scope.expression):
+        for eq in condition.find_all(exp.EQ):
+            left, right = eq.this, eq.expression
+            if not (isinstance(left, exp.Column) and isinstance(right, exp.Column)):
+                continue
+            if left.table in partitioned and right.table in partitioned and left.table != right.table \
+                    and _is_key(left, left.table, partitioned[left.table]) \
+                    and _is_key(right, right.table, partitioned[right.table]):
+                pairs.append((left.table, right.table))
+    return pairs
+
+
+def _column_share(scope: Scope, alias: str, declared: Tuple[str, ...]) -> float:
+    """Referenced / declared columns of `alias` in its query block (SELECT * reads them all)."""
+    if not declared or any(isinstance(e, exp.Star) for e in scope.expression.expressions):
+        return 1.0
+    only_source = len(scope.sources) == 1
+    used = set()
+    for node in scope.expression.find_all(exp.Column):
+        if isinstance(node.this, exp.Star) and node.table == alias:
+            return 1.0
+        if node.table == alias or (not node.table and only_source):
+            used.add(node.name.lower())
+    return max(len(used & set(declared)), 1) / len(declared)
+
+
+class ScanEstimator:
+    """Estimates bytes scanned from the table statistics in configuration."""
+
+    def __init__(
+        self,
+        stats: Dict[str, Dict[str, float]],
+        budget_bytes: float = 0,
+        history_start: date = date(2020, 3, 16),
+        registry: SchemaRegistry = SOLANA_SCHEMA,
+    ):
+        self.stats = {name.lower(): values for name, values in stats.items()}
+        self.budget_bytes = int(budget_bytes) or None
+        self.history_start = datetime.combine(history_start, datetime.min.time())
+        self.registry = registry
+
+    def estimate(
+        self, sql: Union[str, exp.Expression], now: Optional[datetime] = None, registry: Optional[SchemaRegistry] = None,
+    ) -> ScanEstimate:
+        """Raises ParseError for SQL that doesn't parse. `registry`: another chain's tables."""
+        tree = parse_sql(sql) if isinstance(sql, str) else sql
+        registry = registry or self.registry
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        scans: List[TableScan] = []
+        warnings: List[str] = []
+
+        for scope in traverse_scope(tree):
+            tables = {
+                alias: (table_name(source), registry.table(table_name(source)))
+                for alias, source in scope.sources.items() if isinstance(source, exp.Table)
+            }
+            if not tables:
+                continue
+            partitioned = {alias: spec.partition_keys for alias, (_, spec) in tables.items() if spec and spec.partition_keys}
+            ranges = {alias: _source_range(scope, alias, keys, now) for alias, keys in partitioned.items()}
+            for a, b in _key_joins(scope, partitioned):
+                ranges[a] = ranges[b] = _intersect(ranges[a], ranges[b])
+
+            joins = scope.expression.args.get("joins") or []
+            if any(not (join.args.get("on") or join.args.get("using")) for join in joins):
+                warnings.append("Join without a condition (cartesian product)")
+
+            for alias, (name, spec) in tables.items():
+                scans.append(self._scan(name, spec, ranges.get(alias), scope, alias, now, warnings))
+
+        return ScanEstimate(tables=tuple(scans), budget_bytes=self.budget_bytes, warnings=tuple(dict.fromkeys(warnings)))
+
+    def _scan(self, name, spec, bounds: Optional[Range], scope: Scope, alias: str, now: datetime, warnings: List[str]) -> TableScan:
+        stats = self.stats.get(name)
+        share = _column_share(scope, alias, spec.column_names if spec else ())
+        if stats is None:
+            warnings.append(f"No size statistics for {name}")
+            return TableScan(table=name, bytes=0, partitions=None, bounded=False, column_share=round(share, 3))
+
+        if bounds is None or "bytes_per_day" not in stats:
+            # Snapshot table (bounded by definition), or no per-day size for a partitioned one
+            size = stats.get("bytes", 0) * share
+            return TableScan(table=name, bytes=int(size), partitions=None, bounded=bounds is None, column_share=round(share, 3))
+
+        low, high = bounds
+        bounded = low is not None
+        if low is None:
+            warnings.append(f"Full scan of {name}: no lower bound on {' or '.join(spec.partition_keys)}")
+        low = max(low or self.history_start, self.history_start)
+        high = min(high or now, now)
+        partitions = (high.date() - low.date()).days + 1 if high >= low else 0
+        size = partitions * stats["bytes_per_day"] * share
+        return TableScan(table=name, bytes=int(size), partitions=partitions, bounded=bounded, column_share=round(share, 3))
+
+    def for_result(self, result: dict, chain: Optional[str] = None) -> Optional[dict]:
+        """
+        The agent's estimate, or one computed now (cache hits) over the tables
+        of the result's chain; None without usable SQL.
+        """
+        if result.get("scan_estimate") is not None:
+            return result["scan_estimate"]
+        sql = result.get("sql_output")
+        if not settings.SCAN_ESTIMATE_ENABLED or not sql:
+            return None
+        try:
+            registry = chain_packs.get(chain or result.get("chain")).registry
+        except UnknownChain:
+            return None
+        try:
+            return self.estimate(sql, registry=registry).to_dict()
+        except (ParseError, OverflowError, ValueError):
+            return None
+
+
+# Initialize the estimator once
+scan_estimator = ScanEstimator(
+    stats=settings.SCAN_TABLE_STATS,
+    budget_bytes=settings.SCAN_BUDGET_BYTES,
+    history_start=settings.SCAN_HISTORY_START,
+)
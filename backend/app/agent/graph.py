@@ -1,17 +1,5 @@
-from langgraph.graph import StateGraph, END
-from app.agent.state import AgentState
-from app.agent.nodes import generate_sql
-
-# 1. Initialize the Graph
-workflow = StateGraph(AgentState)
-
-# 2. Add Nodes
-workflow.add_node("generator", generate_sql)
-
-# 3. Define Edges (The Flow)
-# Start -> Generator -> End
-workflow.set_entry_point("generator")
-workflow.add_edge("generator", END)
-
-# 4. Compile the Graph
-agent_app = workflow.compile()
+"""
+Old import path of the agent graph. The graph is built once, in workflow.py;
+this module only re-exports it (it used to compile a second copy).
+"""
+from app.agent.workflow import agent_app, build_agent  # noqa: F401
@@ -1,33 +1,214 @@
-from langchain_groq import ChatGroq
-from langchain_core.messages import SystemMessage, HumanMessage
+import logging
+import time
+from typing import List, Optional
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from app.core.config import settings
 from app.agent.state import AgentState
-from app.agent.prompts import SYSTEM_PROMPT
+from langgraph.graph import END
+from app.agent.prompts import REPAIR_PROMPT, prompt_stats, select_tokens
+from app.agent.chains import DEFAULT_CHAIN, UnknownChain, chain_packs
+from app.agent.semantic_cache import semantic_cache
+from app.agent.tokens import TokenMatch, token_index
+from app.agent.providers import LazyChatModel, provider_registry
+from app.agent.resilience import llm_invoker
+from app.agent.validation import validate_sql
+from app.agent.rewrite import rewrite_sql
+from app.agent.cost import scan_estimator
+from app.execution.dry_run import dry_run_executor
+from app.core.metrics import ERRORS, SQL_REWRITES, cache_outcome, observe_llm
+from app.core.tracing import tracer
 
-# Initialize the LLM once
-llm = ChatGroq(
-    model="meta-llama/llama-4-maverick-17b-128e-instruct", 
-    api_key=settings.GROQ_API_KEY,
-    temperature=0
-)
+logger = logging.getLogger(__name__)
 
-async def generate_sql(state: AgentState) -> dict:
+# Initialize the LLM once (configured provider, on its pooled HTTP client);
+# with LAZY_INIT it is built on the first request instead of at import
+llm = LazyChatModel(provider_registry) if settings.LAZY_INIT else provider_registry.chat_model()
+
+def mentioned_tokens(question: str, chain: str) -> List[TokenMatch]:
+    """
+    The chain's known tokens the question mentions, then the token registry's
+    matches (raises OSError/ValueError if the index file is unusable).
+    """
+    pack = chain_packs.get(chain)
+    found = token_index.find_mentions(question, pack.chain)
+
+    # Curated tokens first; a registry match never shadows one with the same symbol
+    tokens = [
+        TokenMatch(pack.chain, t.symbol, t.note or t.symbol, t.mint, decimals=-1, rank=0)
+        for t in select_tokens(question, pack.registry)
+    ]
+    seen = {t.mint for t in tokens} | {t.symbol.lower() for t in tokens}
+    for match in found:
+        if match.mint not in seen and match.symbol.lower() not in seen:
+            tokens.append(match)
+            seen |= {match.mint, match.symbol.lower()}
+    return tokens[:settings.TOKEN_INDEX_MAX_MATCHES]
+
+def resolved_mints(question: str) -> List[str]:
+    """
+    Mints resolve_tokens puts in the state for a Solana question, i.e. what
+    semantic cache lookups are guarded with (for rows loaded at startup).
+    """
+    if not settings.TOKEN_INDEX_ENABLED or not token_index.available:
+        return []
+    try:
+        return [t.mint for t in mentioned_tokens(question, DEFAULT_CHAIN)]
+    except (OSError, ValueError):
+        return []
+
+async def resolve_tokens(state: AgentState) -> dict:
+    """
+    Node 0 (TOKEN_INDEX_ENABLED): Resolves the tokens the question mentions
+    to mints, from the chain's known tokens and the token registry
+    (app/agent/tokens.py), so the prompt carries exactly those instead of
+    the model guessing (or leaving a placeholder for) unknown addresses.
+    Without an index file the generator falls back to the known tokens.
+    """
+    if not token_index.available:
+        return {}
+    try:
+        tokens = mentioned_tokens(state["user_input"], state.get("chain"))
+    except UnknownChain:
+        return {}  # Reported by the generator
+    except (OSError, ValueError) as e:
+        ERRORS.labels("token_index").inc()
+        logger.warning("Token index unusable, using the known tokens only: %s", e)
+        return {}
+    return {"tokens": [t.to_dict() for t in tokens]}
+
+async def generate_sql(state: AgentState, config: Optional[RunnableConfig] = None) -> dict:
     """
     Node 1: Calls the LLM to convert User Input -> SQL
+    Pass configurable {"hedge": False} to never send a second (hedged) request,
+    e.g. when the tokens are streamed to the client.
+    Called again by the validator (or dry run) with `validation_error` set to repair its SQL.
     """
     try:
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=state["user_input"])
-        ]
+        repair = state.get("validation_error") if state.get("sql_output") else None
+        pack = chain_packs.get(state.get("chain"))
+
+        # Paraphrase of a past question? Answer from the semantic cache (Solana questions only)
+        mints = [t["mint"] for t in state.get("tokens") or ()]
+        if repair is None and pack.chain == DEFAULT_CHAIN:
+            cached_sql = await semantic_cache.alookup(state["user_input"], mints)
+            if semantic_cache.enabled:
+                cache_outcome("semantic", "hit" if cached_sql is not None else "miss")
+            if cached_sql is not None:
+                return {"sql_output": cached_sql, "error": None, "sql_source": "semantic_cache"}
+
+        # Only the tables/tokens relevant to the question (or the full prompt), precompiled per chain;
+        # tokens resolved by resolve_tokens replace the pack's known tokens
+        resolved = state.get("tokens")
+        messages, prompt_tokens = pack.messages(
+            state["user_input"], retrieval=settings.PROMPT_SCHEMA_RETRIEVAL, max_tables=settings.PROMPT_MAX_TABLES,
+            tokens=None if resolved is None else [TokenMatch(**t).to_spec() for t in resolved],
+        )
+        prompt_stats.record(prompt_tokens)
+
+        if repair:
+            # Self-repair: the rejected SQL and why it was rejected
+            rejected = state.get("original_sql") or state["sql_output"]  # What the model wrote, before rewrites
+            messages += [AIMessage(content=rejected), HumanMessage(content=REPAIR_PROMPT.format(errors=repair))]
         
-        # Call the model asynchronously
-        response = await llm.ainvoke(messages)
+        # Call the model asynchronously (hedged / circuit-broken when enabled)
+        if llm_invoker.enabled:
+            hedge = ((config or {}).get("configurable") or {}).get("hedge", True)
+            response = await llm_invoker.ainvoke(messages, hedge=hedge)
+        else:
+            start = time.perf_counter()
+            try:
+                with tracer.span("llm.chat", **{"llm.provider": provider_registry.primary}):
+                    response = await llm.ainvoke(messages)
+            except Exception:
+                observe_llm(provider_registry.primary, time.perf_counter() - start)
+                raise
+            observe_llm(provider_registry.primary, time.perf_counter() - start, response)
         
         # Clean up the output (remove markdown backticks if the model ignores instructions)
         clean_sql = response.content.replace("```sql", "").replace("```", "").strip()
-        
-        return {"sql_output": clean_sql, "error": None}
+
+        # Added to the semantic cache by the route, once every node accepted it (SemanticCache.add_result)
+        return {"sql_output": clean_sql, "error": None, "sql_source": "llm"}
         
     except Exception as e:
         return {"sql_output": None, "error": str(e)}
+
+async def rewrite_generated_sql(state: AgentState) -> dict:
+    """
+    Node 2: Enforces the prompt's performance guidelines on the SQL (block_time
+    on tx joins, block_date next to block_time ranges, narrower SELECT * on
+    wide tables, a default LIMIT). If that changed anything, the model's own
+    SQL is kept as original_sql.
+    """
+    sql = state.get("sql_output")
+    if state.get("error") or not sql:
+        return {}
+
+    registry = chain_packs.get(state.get("chain")).registry
+    result = rewrite_sql(sql, registry, default_limit=settings.SQL_DEFAULT_LIMIT)
+    for rule in result.applied:
+        SQL_REWRITES.labels(rule).inc()
+    return {"sql_output": result.sql, "original_sql": sql if result.changed else None}
+
+async def validate_generated_sql(state: AgentState) -> dict:
+    """
+    Node 3: Checks the SQL locally (Trino parse, declared tables, time filter)
+    and estimates its scan cost before it costs warehouse time. Rejected SQL
+    (or SQL over the scan budget with SCAN_BUDGET_ACTION=reject) goes back to
+    the generator with the errors, at most SQL_REPAIR_MAX_ATTEMPTS times; then
+    the run fails.
+    """
+    sql = state.get("sql_output")
+    if state.get("error") or not sql:
+        return {}  # Generation failed, nothing to check
+
+    registry = chain_packs.get(state.get("chain")).registry
+    result = validate_sql(sql, registry)
+    message = result.message()
+    estimate = None
+    if result.ok and settings.SCAN_ESTIMATE_ENABLED:
+        try:
+            estimate = scan_estimator.estimate(result.tree, registry=registry)
+        except (OverflowError, ValueError) as e:
+            logger.warning("Scan estimate failed, skipping it: %s", e)
+        if estimate is not None and estimate.over_budget and settings.SCAN_BUDGET_ACTION == "reject":
+            message = estimate.budget_message()
+    update = {"scan_estimate": estimate.to_dict() if estimate else None}
+    if not message:
+        return {**update, "validation_error": None}
+    ERRORS.labels("validation").inc()
+    return _reject(state, update, message, "failed validation")
+
+async def dry_run_sql(state: AgentState) -> dict:
+    """
+    Node 4 (DRY_RUN_NODE_ENABLED): Runs the validated SQL on DuckDB over the
+    Parquet fixtures. SQL errors (unknown columns, bad types, missing
+    functions) go through the same repair loop as validation errors; missing
+    fixtures, timeouts and Trino-only syntax are reported, not repaired.
+    """
+    sql = state.get("sql_output")
+    if state.get("error") or state.get("validation_error") or not sql:
+        return {}  # Failed or waiting for a repair: nothing to run
+    if chain_packs.get(state.get("chain")).chain != DEFAULT_CHAIN:
+        return {}  # The fixtures only cover the Solana tables
+
+    result = await dry_run_executor.arun(sql)
+    update = {"dry_run": result.to_dict()}
+    if result.error_kind != "sql":
+        return {**update, "validation_error": None}
+    ERRORS.labels("dry_run").inc()
+    return _reject(state, update, f"Dry run on sample data failed: {result.error}", "failed the dry run")
+
+def _reject(state: AgentState, update: dict, message: str, failure: str) -> dict:
+    """Requests a repair from the generator, or fails the run once the attempts are used up."""
+    repairs = state.get("repairs") or 0
+    if repairs < settings.SQL_REPAIR_MAX_ATTEMPTS:
+        return {**update, "validation_error": message, "repairs": repairs + 1}
+    return {**update, "validation_error": message, "error": f"Generated SQL {failure}: {message}"}
+
+def route_after_validation(state: AgentState) -> str:
+    """Back to the generator while a repair is pending, otherwise done."""
+    if state.get("validation_error") and not state.get("error"):
+        return "generator"
+    return END
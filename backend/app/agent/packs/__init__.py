@@ -0,0 +1,6 @@
+"""
+Chain packs (see app/agent/chains.py).
+
+Each module defines `pack(chain) -> ChainPackSpec` and is only imported the
+first time one of its chains is requested (PACK_MODULES in chains.py).
+"""
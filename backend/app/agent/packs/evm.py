@@ -0,0 +1,210 @@
+"""
+EVM packs (Ethereum, Base, Arbitrum): the chain's raw tables plus Dune's
+cross-chain spells (tokens.transfers, dex.trades, tokens.erc20, prices.usd),
+which are filtered to the chain with `blockchain = '<chain>'`.
+"""
+from app.agent.chains import ChainPackSpec
+from app.agent.schema import ColumnSpec as C, ExampleSpec, SchemaRegistry, TableSpec, TokenSpec
+
+TITLES = {"ethereum": "Ethereum", "base": "Base", "arbitrum": "Arbitrum One"}
+
+TOKENS = {
+    "ethereum": (
+        TokenSpec("WETH", "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2", "Wrapped ETH", aliases=("eth", "ether")),
+        TokenSpec("USDC", "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48", aliases=("usd coin",)),
+        TokenSpec("USDT", "0xdac17f958d2ee523a2206206994597c13d831ec7", aliases=("tether",)),
+        TokenSpec("DAI", "0x6b175474e89094c44da98b954eedeac495271d0f"),
+        TokenSpec("WBTC", "0x2260fac5e5542a773aa44fbcfedf7c193bc2c599", aliases=("bitcoin", "btc")),
+        TokenSpec("UNI", "0x1f9840a85d5af5bf1d1762f925bdaddc4201f984", aliases=("uniswap",)),
+        TokenSpec("LINK", "0x514910771af9ca656af840dff83e8264ecf986ca", aliases=("chainlink",)),
+    ),
+    "base": (
+        TokenSpec("WETH", "0x4200000000000000000000000000000000000006", "Wrapped ETH", aliases=("eth", "ether")),
+        TokenSpec("USDC", "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913", aliases=("usd coin",)),
+        TokenSpec("DAI", "0x50c5725949a6f0c72e6c4a641f24049a917db0cb"),
+        TokenSpec("cbBTC", "0xcbb7c0000ab88b473b1f5afd9ef808440eed33bf", "Coinbase Wrapped BTC", aliases=("bitcoin", "btc")),
+    ),
+    "arbitrum": (
+        TokenSpec("WETH", "0x82af49447d8a07e3bd95bd0d56f35241523fbab1", "Wrapped ETH", aliases=("eth", "ether")),
+        TokenSpec("USDC", "0xaf88d065e77c8cc2239327c5edb3a432268e5831", "Native USDC", aliases=("usd coin",)),
+        TokenSpec("USDT", "0xfd086bc7cd5c481dcc9c85ebe478a1c0b69fcbb9", aliases=("tether",)),
+        TokenSpec("ARB", "0x912ce59144191c1204e64559fe8253a0e49e6548", aliases=("arbitrum token",)),
+    ),
+}
+
+RULES = """
+You are an elite Blockchain Data Engineer specializing in {title} analytics on Dune (DuneSQL/Trino).
+Your goal is to translate natural language user questions into highly optimized, syntactically correct DuneSQL queries.
+
+### 1. DIALECT & SYNTAX RULES
+- Use **Trino SQL** syntax (DuneSQL).
+- **CRITICAL:** You MUST include a time filter (e.g., `WHERE block_time > now() - interval '7' day`) in every query. Queries without time filters will fail.
+- **CHAIN:** Query `{chain}.*` tables for raw data. `tokens.transfers`, `dex.trades`, `tokens.erc20` and `prices.usd` cover every chain: ALWAYS filter `blockchain = '{chain}'` on them.
+- **DECIMALS:** - `value` and `gas_price` are in wei (1e18 per ETH).
+  - `tokens.transfers.amount` and the `amount_usd` columns already have the token decimals applied.
+- **ADDRESSES:** - Addresses and hashes are VARBINARY: write them as unquoted hex literals (`0xa0b8...`), never as strings.
+  - `from` is a reserved word: always quote the column as `"from"` (and `"to"` alongside it).
+  - If the user asks for a token NOT in your "Known Tokens" list, look it up by symbol in `tokens.erc20` (with `blockchain = '{chain}'`) instead of guessing an address.
+- **OUTPUT FORMAT:**
+  - **STRICTLY CODE ONLY.** Do not start with "Here is the query" or "Sure".
+  - Do not use markdown backticks (```sql).
+  - Start directly with `SELECT`.
+  - End with a semicolon `;`.
+"""
+
+TOKENS_HEADER = """### 2. KNOWN TOKENS (Hardcoded Knowledge)
+If the user mentions these tokens, use EXACTLY these contract addresses (as unquoted hex literals):"""
+
+GUIDELINES = """### 4. GUIDELINES FOR QUERY GENERATION
+1. **Token Volume:** Use `tokens.transfers` (or `dex.trades` for trading volume) rather than decoding `{chain}.logs`.
+2. **Active Users:** Count `DISTINCT "from"` from `{chain}.transactions`.
+3. **Join Logic:** Join `{chain}.transactions` and `{chain}.logs` on `hash = tx_hash` AND `block_time`.
+4. **USD Values:** Prefer the `amount_usd` columns; otherwise join `prices.usd` on `contract_address`, `blockchain` and `minute = date_trunc('minute', block_time)`."""
+
+
+def tables(chain: str) -> tuple:
+    return (
+        TableSpec(
+            name=f"{chain}.transactions",
+            title="CORE TRANSACTIONS",
+            best_for=("Gas Fees", "Active Addresses", "ETH Transfers", "Success Rates"),
+            partition_keys=("block_time", "block_date"),
+            keywords=("transaction", "tx", "txs", "gas", "fee", "fees", "wallet", "active", "users", "sender", "failed"),
+            default_columns=("block_time", "block_date", "block_number", "hash", "from", "to", "value", "gas_used", "gas_price", "success"),
+            columns=(
+                C("block_time", "TIMESTAMP", "Partition Key (Filter by this!)"),
+                C("block_date", "DATE", "Secondary Partition Key"),
+                C("block_number", "BIGINT"),
+                C("hash", "VARBINARY", "Transaction Hash"),
+                C("from", "VARBINARY", "Sender (quote as \"from\")"),
+                C("to", "VARBINARY", "Recipient or contract called (quote as \"to\")"),
+                C("value", "UINT256", "Native ETH sent, in wei"),
+                C("gas_used", "BIGINT"),
+                C("gas_price", "UINT256", "In wei"),
+                C("success", "BOOLEAN"),
+                C("nonce", "BIGINT"),
+                C("type", "VARCHAR"),
+                C("data", "VARBINARY", "Calldata (first 4 bytes = function selector)"),
+            ),
+        ),
+        TableSpec(
+            name=f"{chain}.logs",
+            title="EVENT LOGS",
+            best_for=("Raw Contract Events", "Events Without a Decoded Table"),
+            partition_keys=("block_time", "block_date"),
+            keywords=("event", "events", "log", "logs", "emitted", "topic", "contract"),
+            columns=(
+                C("block_time", "TIMESTAMP"),
+                C("block_date", "DATE"),
+                C("block_number", "BIGINT"),
+                C("tx_hash", "VARBINARY", "Join with transactions.hash"),
+                C("index", "INTEGER"),
+                C("contract_address", "VARBINARY", "Contract that emitted the event"),
+                C("topic0", "VARBINARY", "Event signature hash"),
+                C("topic1", "VARBINARY"),
+                C("topic2", "VARBINARY"),
+                C("topic3", "VARBINARY"),
+                C("data", "VARBINARY"),
+            ),
+        ),
+        TableSpec(
+            name="tokens.transfers",
+            title="TOKEN TRANSFERS",
+            best_for=("Token Volume", "Money Flow", "ERC20 and Native Transfers"),
+            partition_keys=("block_time", "block_date"),
+            keywords=("transfer", "transfers", "volume", "flow", "inflow", "outflow", "sent", "received", "token", "moved", "erc20"),
+            columns=(
+                C("blockchain", "VARCHAR", f"Filter blockchain = '{chain}'"),
+                C("block_time", "TIMESTAMP"),
+                C("block_date", "DATE"),
+                C("tx_hash", "VARBINARY"),
+                C("contract_address", "VARBINARY", "The token"),
+                C("symbol", "VARCHAR"),
+                C("from", "VARBINARY"),
+                C("to", "VARBINARY"),
+                C("amount", "DOUBLE", "Decimals applied"),
+                C("amount_usd", "DOUBLE"),
+            ),
+        ),
+        TableSpec(
+            name="dex.trades",
+            title="DEX TRADES",
+            best_for=("Swaps", "Trading Volume", "DEX Market Share"),
+            partition_keys=("block_time", "block_date"),
+            keywords=("dex", "swap", "swaps", "trade", "trades", "trading", "uniswap", "aerodrome", "curve", "exchange", "pair"),
+            columns=(
+                C("blockchain", "VARCHAR", f"Filter blockchain = '{chain}'"),
+                C("project", "VARCHAR", "e.g., 'uniswap'"),
+                C("version", "VARCHAR"),
+                C("block_time", "TIMESTAMP"),
+                C("block_date", "DATE"),
+                C("token_bought_symbol", "VARCHAR"),
+                C("token_sold_symbol", "VARCHAR"),
+                C("token_bought_address", "VARBINARY"),
+                C("token_sold_address", "VARBINARY"),
+                C("token_bought_amount", "DOUBLE"),
+                C("token_sold_amount", "DOUBLE"),
+                C("amount_usd", "DOUBLE"),
+                C("taker", "VARBINARY", "Trader"),
+                C("tx_hash", "VARBINARY"),
+            ),
+        ),
+        TableSpec(
+            name="tokens.erc20",
+            title="TOKEN METADATA",
+            best_for=("Token Addresses by Symbol", "Decimals"),
+            keywords=("symbol", "decimals", "metadata", "address", "contract"),
+            columns=(
+                C("blockchain", "VARCHAR", f"Filter blockchain = '{chain}'"),
+                C("contract_address", "VARBINARY"),
+                C("symbol", "VARCHAR"),
+                C("decimals", "INTEGER"),
+            ),
+        ),
+        TableSpec(
+            name="prices.usd",
+            title="TOKEN PRICES",
+            best_for=("USD Prices", "Price History"),
+            partition_keys=("minute",),
+            keywords=("price", "prices", "usd", "dollar", "worth", "value", "chart"),
+            columns=(
+                C("minute", "TIMESTAMP", "Partition Key (Filter by this!)"),
+                C("blockchain", "VARCHAR", f"Filter blockchain = '{chain}'"),
+                C("contract_address", "VARBINARY"),
+                C("symbol", "VARCHAR"),
+                C("price", "DOUBLE"),
+            ),
+        ),
+    )
+
+
+def examples(chain: str) -> tuple:
+    usdc = next(t for t in TOKENS[chain] if t.symbol == "USDC")
+    return (
+        ExampleSpec(
+            question="Show me the daily transfer volume of USDC for the last 7 days.",
+            thought="USDC is in my list. I should sum tokens.transfers amounts for that contract on this chain.",
+            tables=("tokens.transfers",),
+            sql=f"""SELECT
+    date_trunc('day', block_time) as day,
+    SUM(amount) as daily_volume
+FROM tokens.transfers
+WHERE blockchain = '{chain}'
+AND contract_address = {usdc.mint} -- USDC
+AND block_time > now() - interval '7' day
+GROUP BY 1
+ORDER BY 1 DESC;""",
+        ),
+    )
+
+
+def pack(chain: str) -> ChainPackSpec:
+    return ChainPackSpec(
+        chain=chain,
+        registry=SchemaRegistry(
+            tables=tables(chain), tokens=TOKENS[chain], examples=examples(chain), tx_keys=("hash", "tx_hash"),
+        ),
+        rules=RULES.format(title=TITLES[chain], chain=chain),
+        guidelines=GUIDELINES.format(chain=chain),
+        tokens_header=TOKENS_HEADER,
+    )
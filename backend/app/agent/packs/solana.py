@@ -0,0 +1,14 @@
+"""Solana pack: the schema registry and prompt texts the agent started with."""
+from app.agent.chains import ChainPackSpec
+from app.agent.prompts import SOLANA_GUIDELINES, SOLANA_RULES, SOLANA_TOKENS_HEADER
+from app.agent.schema import SOLANA_SCHEMA
+
+
+def pack(chain: str) -> ChainPackSpec:
+    return ChainPackSpec(
+        chain=chain,
+        registry=SOLANA_SCHEMA,
+        rules=SOLANA_RULES,
+        guidelines=SOLANA_GUIDELINES,
+        tokens_header=SOLANA_TOKENS_HEADER,
+    )
@@ -1,4 +1,23 @@
-SYSTEM_PROMPT = """
+"""
+System prompt for the SQL generator.
+
+The prompt is rendered from the schema registry (app/agent/schema.py):
+- SYSTEM_PROMPT: every table, token and example (the full reference prompt).
+- build_system_prompt(question): only the tables/tokens/examples relevant to
+  the question, picked by a cheap local keyword ranker.
+
+The texts below are Solana's; other chains bring their own (app/agent/packs/),
+and the generator uses the compiled packs of app/agent/chains.py.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from app.agent.schema import SchemaRegistry, TableSpec, TokenSpec, ExampleSpec, SOLANA_SCHEMA
+
+SOLANA_RULES = """
 You are an elite Blockchain Data Engineer specializing in Solana analytics on Dune (DuneSQL/Trino).
 Your goal is to translate natural language user questions into highly optimized, syntactically correct DuneSQL queries.
 
@@ -14,127 +33,193 @@ Your goal is to translate natural language user questions into highly optimized,
   - Do not use markdown backticks (```sql).
   - Start directly with `SELECT`.
   - End with a semicolon `;`.
+"""
+
+SOLANA_TOKENS_HEADER = """### 2. KNOWN TOKENS (Hardcoded Knowledge)
+If the user mentions these tokens, use EXACTLY these Mint Addresses:"""
+
+_NO_TOKENS = "- (None of the known tokens are mentioned in this question.)"
 
-### 2. KNOWN TOKENS (Hardcoded Knowledge)
-If the user mentions these tokens, use EXACTLY these Mint Addresses:
-- **SOL:** `So11111111111111111111111111111111111111111` (Wrapped SOL / Native)
-- **USDC:** `EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v`
-- **USDT:** `Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB`
-- **JUP:** `JUPyiwrYJFskUPiHa7hkeR8VUtAeFoSYbKedZNsDvCN`
-- **BONK:** `DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263`
-- **PENGU:** `2zMMhcVQEXDtdE6vsFS7S7D5oUodfJHE8vd1gnBouauv`
-- **RAY:** `4k3Dyjzvzp8eMZWUXbBCjEvwSkkk59S5iCNLY3QrkX6R`
-- **GRASS:** `Grass7B4RdKfBCjTKgSqnXkqjwiGvQyFbuSCUJr3XXjs`
-
-### 3. DATABASE SCHEMA (Use ONLY these tables)
-
--- A. CORE TRANSACTIONS (Best for: Volume, Fees, Signer Activity, Success Rates)
-TABLE solana.transactions (
-    block_slot      BIGINT,
-    block_height    BIGINT,
-    block_time      TIMESTAMP,      -- Partition Key (Filter by this!)
-    block_date      DATE,           -- Secondary Partition Key
-    index           INTEGER,
-    fee             BIGINT,         -- In Lamports (divide by 1e9 for SOL)
-    compute_units_consumed BIGINT,
-    cost_units      BIGINT,
-    version         VARCHAR,
-    required_signatures INTEGER,
-    readonly_signed_accounts INTEGER,
-    readonly_unsigned_accounts INTEGER,
-    block_hash      VARCHAR,
-    id              VARCHAR,
-    signature       VARCHAR,        -- Transaction Hash (Unique ID)
-    success         BOOLEAN,        -- Filter `success = true` usually
-    error           VARCHAR,
-    recent_block_hash VARCHAR,
-    instructions    ARRAY(JSON),    -- Raw instruction data
-    account_keys    ARRAY(JSON),
-    log_messages    ARRAY(VARCHAR), -- Useful for text search within logs
-    pre_balances    ARRAY(BIGINT),
-    post_balances   ARRAY(BIGINT),
-    pre_token_balances ARRAY(JSON),
-    post_token_balances ARRAY(JSON),
-    signatures      ARRAY(VARCHAR),
-    signer          VARCHAR,        -- Wallet paying the fee
-    signers         ARRAY(VARCHAR),
-    return_data_program_id VARCHAR,
-    return_data     VARCHAR,        -- Often hex or base64
-    address_table_lookups ARRAY(JSON),
-    loaded_addresses ARRAY(JSON)
-);
-
--- B. INSTRUCTION CALLS (Best for: Protocol Interactions, Mints, Swaps, Specific Program Usage)
-TABLE solana.instruction_calls (
-    block_time      TIMESTAMP,
-    tx_id           VARCHAR,        -- Join with transactions.signature
-    executing_account VARCHAR,      -- Program ID being called (e.g., Jupiter Contract)
-    account_arguments ARRAY(VARCHAR), -- List of accounts involved in this instruction
-    data            VARBINARY,      -- Raw data (hard to read, prefer filtering executing_account)
-    tx_success      BOOLEAN
-);
-
--- C. ACCOUNT ACTIVITY (Best for: Tracking balance changes per Tx, Money Flow)
-TABLE solana.account_activity (
-    block_time      TIMESTAMP,
-    tx_id           VARCHAR,
-    address         VARCHAR,        -- The wallet/account affected
-    token_mint_address VARCHAR,     -- The token being moved (or null for SOL)
-    balance_change  BIGINT,         -- Change in SOL (Lamports)
-    token_balance_change DECIMAL(38,17), -- Change in Token Amount
-    token_balance_owner VARCHAR     -- The actual owner if 'address' is a token account
-);
-
--- D. REWARDS (Best for: Staking rewards, Validator income)
-TABLE solana.rewards (
-    block_time      TIMESTAMP,
-    reward_type     VARCHAR,        -- e.g., 'Fee', 'Rent', 'Staking'
-    recipient       VARCHAR,        -- Address receiving reward
-    lamports        BIGINT          -- Amount in Lamports
-);
-
--- E. BALANCE SNAPSHOTS (Best for: "How much does X hold?", Rich Lists)
--- Note: 'latest_balances' is the most recent snapshot. 'daily_balances' is historical.
-TABLE solana_utils.latest_balances (
-    address         VARCHAR,
-    token_mint_address VARCHAR,     -- Null for Native SOL
-    sol_balance     DOUBLE,         -- Native SOL balance
-    token_balance   DECIMAL(38,18), -- Token balance
-    updated_at      TIMESTAMP
-);
-
-TABLE solana_utils.daily_balances (
-    day             TIMESTAMP,
-    address         VARCHAR,
-    token_mint_address VARCHAR,     -- Null for Native SOL
-    sol_balance     DOUBLE,         -- Native SOL balance
-    token_balance   DECIMAL(38,18)
-);
-
-TABLE solana_utils.token_accounts (
-    address         VARCHAR,        -- The Token Account Address
-    token_mint_address VARCHAR,     -- The Token itself
-    token_balance_owner VARCHAR     -- The Wallet Activity Owner
-);
-
-### 4. GUIDELINES FOR QUERY GENERATION
+_SCHEMA_HEADER = "### 3. DATABASE SCHEMA (Use ONLY these tables)"
+
+SOLANA_GUIDELINES = """### 4. GUIDELINES FOR QUERY GENERATION
 1. **Join Logic:** If joining `transactions` and `instruction_calls`, join on `tx_id` (or `signature`) AND `block_time`. Joining on string ID alone is slow.
 2. **Volume:** To calculate token volume, prefer `solana.account_activity` where `token_balance_change` > 0.
 3. **Active Users:** Count `DISTINCT signer` from `solana.transactions` or `token_balance_owner` from `solana.account_activity`.
-4. **Program Usage:** Filter `solana.instruction_calls` by `executing_account = 'PROGRAM_ID'`.
-
-### 5. FEW-SHOT EXAMPLES
-
-**User:** "Show me the daily transfer volume of USDC for the last 7 days."
-**Thought:** USDC is in my list. I should use account_activity to sum positive balance changes for that mint.
-**SQL:**
-SELECT 
-    block_date, 
-    SUM(token_balance_change) as daily_volume
-FROM solana.account_activity
-WHERE token_mint_address = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v' -- USDC
-AND block_time > now() - interval '7' day
-AND token_balance_change > 0
-GROUP BY 1
-ORDER BY 1 DESC;
-"""
+4. **Program Usage:** Filter `solana.instruction_calls` by `executing_account = 'PROGRAM_ID'`."""
+
+_EXAMPLES_HEADER = "### 5. FEW-SHOT EXAMPLES"
+
+# Sent after the rejected SQL when the validator sends it back to the generator
+REPAIR_PROMPT = """The query above was rejected before running it:
+{errors}
+
+Return the corrected query only (same rules: code only, no markdown)."""
+
+TABLE_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+_WORD = re.compile(r"[a-z0-9$]+")
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def assemble_prompt(
+    table_blocks: Sequence[str],
+    token_lines: Sequence[str],
+    example_blocks: Sequence[str],
+    rules: str = SOLANA_RULES,
+    guidelines: str = SOLANA_GUIDELINES,
+    tokens_header: str = SOLANA_TOKENS_HEADER,
+) -> str:
+    """Joins already rendered tables, token lines and examples into the system prompt."""
+    token_text = "\n".join(token_lines) or _NO_TOKENS
+    schema = "\n\n".join(table_blocks)
+    sections = [
+        rules,
+        f"{tokens_header}\n{token_text}\n",
+        f"{_SCHEMA_HEADER}\n\n{schema}\n",
+        f"{guidelines}\n",
+        f"{_EXAMPLES_HEADER}\n\n" + "\n\n".join(example_blocks) + "\n",
+    ]
+    return "\n".join(sections)
+
+
+def render_prompt(
+    tables: Sequence[TableSpec],
+    tokens: Sequence[TokenSpec],
+    examples: Sequence[ExampleSpec],
+    **texts: str,
+) -> str:
+    """Assembles the system prompt from registry entries (`texts`: rules/guidelines/tokens_header)."""
+    return assemble_prompt(
+        [t.render(TABLE_LETTERS[i]) for i, t in enumerate(tables)],
+        [t.render() for t in tokens],
+        [e.render() for e in examples],
+        **texts,
+    )
+
+
+def count_tokens(text: str) -> int:
+    """
+    Local token estimate (words + punctuation marks).
+    Close enough to BPE counts on SQL/schema text to compare prompt sizes,
+    and needs no tokenizer download.
+    """
+    return len(_TOKEN_PIECE.findall(text))
+
+
+# --- Ranking ---------------------------------------------------------------
+
+def _terms(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    # Cheap stemming: "holders" -> "holder", "transfers" -> "transfer"
+    return words + [w[:-1] for w in words if len(w) > 3 and w.endswith("s")]
+
+
+@lru_cache(maxsize=8)
+def table_index(registry: SchemaRegistry) -> List[Dict[str, float]]:
+    """Per-table term weights, IDF-scaled so shared columns (block_time) count little."""
+    bags = []
+    for table in registry.tables:
+        bag: Dict[str, float] = Counter()
+        for term in _terms(table.name.replace("_", " ").replace(".", " ")):
+            bag[term] = max(bag[term], 2.0)
+        for term in _terms(" ".join(table.keywords)):
+            bag[term] = max(bag[term], 2.0)
+        for term in _terms(" ".join(table.best_for) + " " + table.title):
+            bag[term] = max(bag[term], 1.5)
+        for term in _terms(" ".join(c.name.replace("_", " ") for c in table.columns)):
+            bag[term] = max(bag[term], 0.5)
+        bags.append(bag)
+
+    document_frequency = Counter(term for bag in bags for term in bag)
+    n = len(bags)
+    return [
+        {term: weight * math.log(1 + n / document_frequency[term]) for term, weight in bag.items()}
+        for bag in bags
+    ]
+
+
+def table_scores(question: str, index: Sequence[Dict[str, float]]) -> List[float]:
+    """Relevance of each table (registry order) to the question."""
+    terms = set(_terms(question))
+    return [sum(w for t, w in bag.items() if t in terms) for bag in index]
+
+
+def select_table_indexes(scores: Sequence[float], max_tables: int) -> List[int]:
+    """Positions of the best-scoring tables (at most max_tables), or of all tables if none scores."""
+    best = max(scores, default=0.0)
+    if best <= 0:
+        return list(range(len(scores)))
+    ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    chosen = {i for i in ranked[:max_tables] if scores[i] >= 0.35 * best}
+    return sorted(chosen)
+
+
+def select_tables(question: str, registry: SchemaRegistry, max_tables: int) -> List[TableSpec]:
+    """
+    Tables relevant to the question, in registry order.
+    Falls back to every table when nothing matches (no guessing).
+    """
+    scores = table_scores(question, table_index(registry))
+    return [registry.tables[i] for i in select_table_indexes(scores, max_tables)]
+
+
+def select_tokens(question: str, registry: SchemaRegistry) -> List[TokenSpec]:
+    """Known tokens mentioned by symbol ("$BONK", "bonk") or alias ("jupiter")."""
+    text = f" {' '.join(_WORD.findall(question.lower()))} "
+    text = text.replace("$", "")
+    return [
+        token for token in registry.tokens
+        if f" {token.symbol.lower()} " in text or any(f" {alias} " in text for alias in token.aliases)
+    ]
+
+
+def select_examples(tables: Sequence[TableSpec], registry: SchemaRegistry, limit: int = 1) -> List[ExampleSpec]:
+    """Examples over the selected tables first; always at least one for the output format."""
+    names = {t.name for t in tables}
+    ranked = sorted(registry.examples, key=lambda e: -len(names.intersection(e.tables)))
+    return ranked[:limit]
+
+
+def build_system_prompt(
+    question: str,
+    registry: SchemaRegistry = SOLANA_SCHEMA,
+    max_tables: int = 3,
+    tokens: Optional[Sequence[TokenSpec]] = None,
+) -> str:
+    """System prompt restricted to what the question needs."""
+    tables = select_tables(question, registry, max_tables)
+    if tokens is None:
+        tokens = select_tokens(question, registry)
+    return render_prompt(tables, tokens, select_examples(tables, registry))
+
+
+class PromptStats:
+    """Prompt size before (full prompt) and after retrieval, per worker."""
+
+    def __init__(self, full_tokens: int):
+        self.full_tokens = full_tokens
+        self.requests = 0
+        self.sent_tokens = 0
+        self.last_tokens = 0
+
+    def record(self, tokens: int) -> None:
+        self.requests += 1
+        self.sent_tokens += tokens
+        self.last_tokens = tokens
+
+    def stats(self) -> dict:
+        avg = self.sent_tokens / self.requests if self.requests else 0.0
+        return {
+            "full_prompt_tokens": self.full_tokens,
+            "requests": self.requests,
+            "avg_prompt_tokens": round(avg, 1),
+            "last_prompt_tokens": self.last_tokens,
+            "avg_reduction": round(1 - avg / self.full_tokens, 4) if self.requests else 0.0,
+        }
+
+
+# The full reference prompt (every table, token and example)
+SYSTEM_PROMPT = render_prompt(SOLANA_SCHEMA.tables, SOLANA_SCHEMA.tokens, SOLANA_SCHEMA.examples)
+
+prompt_stats = PromptStats(full_tokens=count_tokens(SYSTEM_PROMPT))
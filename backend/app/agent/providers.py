@@ -0,0 +1,224 @@
+"""
+LLM provider registry.
+
+Each provider (Groq, any OpenAI-compatible API, the local stub server)
+gets its own explicitly sized keep-alive connection pool and timeout.
+Providers are built on first use; `startup()` warms the connections of the
+configured providers and `shutdown()` closes them (wired into `lifespan`).
+`LazyChatModel` defers even that (and the provider SDK import) until the
+first call, for fast cold starts (LAZY_INIT).
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GROQ_BASE_URL = "https://api.groq.com"
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    name: str
+    kind: str                      # "groq" or "openai" (any OpenAI-compatible API)
+    model: str
+    api_key: Optional[str]
+    base_url: Optional[str] = None
+    timeout: float = 30.0          # Per-request timeout (seconds)
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 30.0
+    max_retries: int = 2
+
+    @property
+    def models_url(self) -> str:
+        """Cheap authenticated GET used to open (warm) a pooled connection."""
+        if self.kind == "groq":
+            return f"{(self.base_url or GROQ_BASE_URL).rstrip('/')}/openai/v1/models"
+        return f"{(self.base_url or 'https://api.openai.com/v1').rstrip('/')}/models"
+
+
+class LLMProvider:
+    """One provider: a pooled HTTP client plus the LangChain chat model using it."""
+
+    def __init__(self, config: ProviderConfig, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.config = config
+        self._transport = transport  # Test hook (e.g. httpx.ASGITransport to a fake server)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._chat_model: Optional[BaseChatModel] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            c = self.config
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=c.max_connections,
+                    max_keepalive_connections=c.max_keepalive,
+                    keepalive_expiry=c.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(c.timeout, connect=min(5.0, c.timeout)),
+                transport=self._transport,
+            )
+            self._chat_model = None  # Rebuild the model on top of the new client
+        return self._http_client
+
+    @property
+    def chat_model(self) -> BaseChatModel:
+        if self._chat_model is None:
+            self._chat_model = self._build_chat_model()
+        return self._chat_model
+
+    def _build_chat_model(self) -> BaseChatModel:
+        c = self.config
+        client = self.http_client
+        if c.kind == "groq":
+            from langchain_groq import ChatGroq
+
+            return ChatGroq(
+                model=c.model,
+                api_key=c.api_key,
+                base_url=c.base_url,
+                temperature=0,
+                request_timeout=c.timeout,
+                max_retries=c.max_retries,
+                http_async_client=client,
+            )
+        if c.kind == "openai":
+            from langchain_openai import ChatOpenAI
+
+            return ChatOpenAI(
+                model=c.model,
+                api_key=c.api_key,
+                base_url=c.base_url,
+                temperature=0,
+                timeout=c.timeout,
+                max_retries=c.max_retries,
+                http_async_client=client,
+            )
+        raise ValueError(f"Unknown LLM provider kind: {c.kind}")
+
+    async def warm(self) -> bool:
+        """Opens a keep-alive connection (DNS + TCP + TLS) before the first request."""
+        try:
+            headers = {"Authorization": f"Bearer {self.config.api_key}"} if self.config.api_key else {}
+            response = await self.http_client.get(self.config.models_url, headers=headers)
+            return response.status_code < 500
+        except httpx.HTTPError as e:
+            logger.warning("Warm-up of LLM provider %s failed: %s", self.config.name, e)
+            return False
+
+    async def aclose(self) -> None:
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._chat_model = None
+
+
+class ProviderRegistry:
+    def __init__(self, configs: Dict[str, ProviderConfig], primary: str, fallback: Optional[str] = None):
+        unknown = {primary, fallback} - set(configs) - {None}
+        if unknown:
+            raise ValueError(f"Unknown LLM provider(s): {', '.join(sorted(unknown))}")
+        self.configs = configs
+        self.primary = primary
+        self.fallback = fallback
+        self._providers: Dict[str, LLMProvider] = {}
+
+    def get(self, name: Optional[str] = None) -> LLMProvider:
+        name = name or self.primary
+        if name not in self._providers:
+            self._providers[name] = LLMProvider(self.configs[name])
+        return self._providers[name]
+
+    def register(self, provider: LLMProvider) -> None:
+        """Adds/replaces a provider instance (tests, custom transports)."""
+        self.configs[provider.config.name] = provider.config
+        self._providers[provider.config.name] = provider
+
+    def model_id(self, name: Optional[str] = None) -> str:
+        """"provider:model", e.g. for cache fingerprints."""
+        config = self.configs[name or self.primary]
+        return f"{config.name}:{config.model}"
+
+    def chat_model(self, name: Optional[str] = None) -> BaseChatModel:
+        return self.get(name).chat_model
+
+    @property
+    def active(self) -> list:
+        return [name for name in (self.primary, self.fallback) if name]
+
+    async def startup(self, warm: bool = True) -> None:
+        for name in self.active:
+            provider = self.get(name)
+            if warm:
+                provider.chat_model  # Build the client now rather than on the first request
+                await provider.warm()
+
+    async def shutdown(self) -> None:
+        for provider in self._providers.values():
+            await provider.aclose()
+
+
+class LazyChatModel:
+    """
+    Stands in for a provider's chat model and resolves it on every attribute
+    access, so nothing is built (or imported) until the first call.
+    """
+
+    def __init__(self, registry: ProviderRegistry, name: Optional[str] = None):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.chat_model(self._name), attr)
+
+
+def configs_from_settings() -> Dict[str, ProviderConfig]:
+    pool = dict(
+        max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive=settings.LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+    return {
+        "groq": ProviderConfig(
+            name="groq",
+            kind="groq",
+            model=settings.GROQ_MODEL,
+            api_key=settings.GROQ_API_KEY,
+            timeout=settings.GROQ_TIMEOUT_SECONDS,
+            **pool,
+        ),
+        "openai": ProviderConfig(
+            name="openai",
+            kind="openai",
+            model=settings.OPENAI_MODEL,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            **pool,
+        ),
+        "stub": ProviderConfig(
+            name="stub",
+            kind="openai",
+            model="fake-model",
+            api_key="stub",
+            base_url=settings.LLM_STUB_URL,
+            timeout=settings.LLM_STUB_TIMEOUT_SECONDS,
+            max_retries=0,
+            **pool,
+        ),
+    }
+
+
+# Initialize the registry once (providers are built on first use)
+provider_registry = ProviderRegistry(
+    configs_from_settings(),
+    primary=settings.LLM_PROVIDER,
+    fallback=settings.LLM_FALLBACK_PROVIDER,
+)
@@ -0,0 +1,320 @@
+"""
+Tail-latency protection for LLM calls.
+
+- LatencyTracker: rolling latency window per provider (hedge delay = a percentile of it).
+- CircuitBreaker: stops traffic to a provider whose recent error/slow-call rate
+  is over a threshold; after a cooldown one probe call decides whether it closes.
+- HedgedInvoker: sends the request, and if it has not answered after the hedge
+  delay sends a second one to the fallback provider and keeps whichever
+  finishes first. The loser is cancelled. Without a fallback that accepts
+  traffic there is no hedge: a second request to the same provider would
+  double the load on it, or add a probe while its circuit is half-open.
+
+Hedges are capped at a fraction of calls so a slow provider can't double our load.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+from app.core.config import settings
+from app.agent.providers import ProviderRegistry, provider_registry
+from app.core.metrics import observe_llm
+from app.core.tracing import tracer
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """No provider is accepting traffic."""
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        window: int = 20,
+        min_calls: int = 5,
+        cooldown_seconds: float = 30.0,
+        clock=time.monotonic,
+    ):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failed or slow
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now (half-open lets a single probe through)."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool, seconds: float = 0.0) -> None:
+        bad = not ok or seconds >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self._probing = False
+            if bad:
+                self._trip()
+            else:
+                self._state = CLOSED
+                self._outcomes.clear()
+            return
+
+        self._outcomes.append(bad)
+        if len(self._outcomes) >= self.min_calls and self.error_rate >= self.failure_rate:
+            self._trip()
+
+    def release(self) -> None:
+        """A call that was let through ended without an outcome (cancelled)."""
+        self._probing = False
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate, 4),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class HedgedInvoker:
+    def __init__(
+        self,
+        registry: ProviderRegistry,
+        hedge: bool = True,
+        breaker: bool = True,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.25,
+        hedge_default_delay: float = 2.0,
+        hedge_min_samples: int = 20,
+        max_hedge_rate: float = 0.1,
+        breaker_options: Optional[dict] = None,
+    ):
+        self.registry = registry
+        self.hedge_enabled = hedge
+        self.breaker_enabled = breaker
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self._breaker_options = breaker_options or {}
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0   # Over the hedge budget, or no other provider to hedge to
+        self.failovers = 0        # Primary breaker open, served by the fallback
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.hedge_enabled or self.breaker_enabled
+
+    def _tracker(self, name: str) -> LatencyTracker:
+        if name not in self.latency:
+            self.latency[name] = LatencyTracker()
+        return self.latency[name]
+
+    def _breaker(self, name: str) -> CircuitBreaker:
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(**self._breaker_options)
+        return self.breakers[name]
+
+    def _allow(self, name: str) -> bool:
+        return not self.breaker_enabled or self._breaker(name).allow()
+
+    def hedge_delay(self, name: str) -> float:
+        tracker = self._tracker(name)
+        if len(tracker) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, tracker.percentile(self.hedge_percentile))
+
+    async def _call(self, name: str, messages: Sequence[BaseMessage]):
+        start = time.perf_counter()
+        try:
+            with tracer.span("llm.chat", **{"llm.provider": name}):
+                response = await self.registry.chat_model(name).ainvoke(messages)
+        except asyncio.CancelledError:
+            if self.breaker_enabled:
+                # A hedge loser that ran past the slow threshold still counts as slow
+                elapsed = time.perf_counter() - start
+                if elapsed >= self._breaker(name).slow_call_seconds:
+                    self._breaker(name).record(True, elapsed)
+                else:
+                    self._breaker(name).release()
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - start
+            observe_llm(name, elapsed)
+            if self.breaker_enabled:
+                self._breaker(name).record(False, elapsed)
+            raise
+        elapsed = time.perf_counter() - start
+        observe_llm(name, elapsed, response)
+        self._tracker(name).record(elapsed)
+        if self.breaker_enabled:
+            self._breaker(name).record(True, elapsed)
+        return response
+
+    def _candidates(self) -> List[str]:
+        names = [self.registry.primary]
+        if self.registry.fallback and self.registry.fallback != self.registry.primary:
+            names.append(self.registry.fallback)
+        return names
+
+    async def ainvoke(self, messages: Sequence[BaseMessage], hedge: bool = True):
+        """Calls the first provider whose breaker allows it, hedging if enabled."""
+        self.calls += 1
+        first = next((name for name in self._candidates() if self._allow(name)), None)
+        if first is None:
+            self.errors += 1
+            raise CircuitOpenError(f"LLM provider {self.registry.primary} unavailable (circuit open)")
+        if first != self.registry.primary:
+            self.failovers += 1
+
+        try:
+            if hedge and self.hedge_enabled:
+                return await self._hedged(first, messages)
+            return await self._call(first, messages)
+        except Exception:
+            self.errors += 1
+            raise
+
+    def _hedge_target(self, first: str) -> Optional[str]:
+        """The other provider if it accepts traffic (never the same one)."""
+        for name in self._candidates():
+            if name != first and self._allow(name):
+                return name
+        return None
+
+    async def _hedged(self, first: str, messages: Sequence[BaseMessage]):
+        primary = asyncio.ensure_future(self._call(first, messages))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(first))
+            if not done:
+                target = self._hedge_target(first) if self.hedged < self.max_hedge_rate * self.calls else None
+                if target is not None:
+                    self.hedged += 1
+                    tasks.append(asyncio.ensure_future(self._call(target, messages)))
+                else:
+                    self.hedges_skipped += 1
+
+            # First successful answer wins; fail only when every request failed
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task in done:
+                        if task.exception() is None:
+                            if task is not primary:
+                                self.hedge_wins += 1
+                            return task.result()
+                        error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        providers = {}
+        for name in self._candidates():
+            tracker = self._tracker(name)
+            p50, p95, p99 = (tracker.percentile(p) for p in (50, 95, 99))
+            providers[name] = {
+                "samples": len(tracker),
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+                "hedge_delay_ms": round(self.hedge_delay(name) * 1000, 1),
+                "breaker": self._breaker(name).stats() if self.breaker_enabled else None,
+            }
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "breaker_enabled": self.breaker_enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            "hedges_skipped": self.hedges_skipped,
+            "failovers": self.failovers,
+            "errors": self.errors,
+            "providers": providers,
+        }
+
+
+# Initialize the invoker once (used by generate_sql when hedging or breaking is enabled)
+llm_invoker = HedgedInvoker(
+    provider_registry,
+    hedge=settings.LLM_HEDGE_ENABLED,
+    breaker=settings.LLM_BREAKER_ENABLED,
+    hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+    hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_MS / 1000,
+    hedge_default_delay=settings.LLM_HEDGE_DEFAULT_DELAY_MS / 1000,
+    max_hedge_rate=settings.LLM_HEDGE_MAX_RATE,
+    breaker_options=dict(
+        failure_rate=settings.LLM_BREAKER_FAILURE_RATE,
+        slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_MS / 1000,
+        window=settings.LLM_BREAKER_WINDOW,
+        min_calls=settings.LLM_BREAKER_MIN_CALLS,
+        cooldown_seconds=settings.LLM_BREAKER_COOLDOWN_SECONDS,
+    ),
+)
@@ -0,0 +1,202 @@
+"""
+Deterministic performance rewrites of generated SQL (on the sqlglot tree).
+
+The prompt's performance guidelines, enforced instead of hoped for:
+- `join_block_time`: tables partitioned on block_time joined on the
+  transaction id (the registry's `tx_keys`: `id` / `tx_id` / `signature` on
+  Solana, `hash` / `tx_hash` on EVM chains) also get
+  `a.block_time = b.block_time`, so the join prunes partitions on both sides.
+- `block_date`: a constant `block_time` range on a table that also has
+  `block_date` gets the matching `block_date` predicate (date partitions).
+- `narrow_star`: `SELECT *` on a wide table (one with `default_columns`)
+  becomes the columns the enclosing queries use, or the default columns for
+  the final result.
+- `limit`: the final result gets `LIMIT SQL_DEFAULT_LIMIT` unless it has a
+  limit or is a single aggregate row.
+
+Each rule only adds what is provably missing; SQL that doesn't parse (or
+isn't a SELECT) is returned unchanged for the validator to report.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlglot import exp
+from sqlglot.errors import ParseError
+from sqlglot.optimizer.scope import Scope, traverse_scope
+
+from app.agent.schema import SOLANA_SCHEMA, SchemaRegistry, TableSpec
+from app.agent.validation import DIALECT, READ_ONLY, parse_sql, table_name
+
+_COMPARISONS = (exp.GT, exp.GTE, exp.LT, exp.LTE)
+
+
+@dataclass(frozen=True)
+class RewriteResult:
+    sql: str
+    applied: Tuple[str, ...] = ()   # Rules that changed the SQL
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.applied)
+
+
+def _tables(scope: Scope, registry: SchemaRegistry) -> Dict[str, TableSpec]:
+    """alias -> spec of the declared tables this query block reads directly."""
+    tables = {}
+    for alias, source in scope.sources.items():
+        if isinstance(source, exp.Table):
+            spec = registry.table(table_name(source))
+            if spec is not None:
+                tables[alias] = spec
+    return tables
+
+
+def _conjuncts(condition: Optional[exp.Expression]) -> List[exp.Expression]:
+    if condition is None:
+        return []
+    return list(condition.flatten()) if isinstance(condition, exp.And) else [condition]
+
+
+def _unparen(node: exp.Expression) -> exp.Expression:
+    return node.unnest() if isinstance(node, exp.Paren) else node
+
+
+# --- Rules -------------------------------------------------------------------------
+
+def _join_block_time(scope: Scope, tables: Dict[str, TableSpec], tx_keys: Tuple[str, ...]) -> bool:
+    on_block_time = {alias for alias, spec in tables.items() if "block_time" in spec.partition_keys}
+    changed = False
+    for join in scope.expression.args.get("joins") or []:
+        equalities = [
+            (c.this, c.expression) for c in map(_unparen, _conjuncts(join.args.get("on")))
+            if isinstance(c, exp.EQ) and isinstance(c.this, exp.Column) and isinstance(c.expression, exp.Column)
+            and c.this.table in on_block_time and c.expression.table in on_block_time and c.this.table != c.expression.table
+        ]
+        on_block = {frozenset((l.table, r.table)) for l, r in equalities if l.name.lower() == r.name.lower() == "block_time"}
+        on_tx = {frozenset((l.table, r.table)) for l, r in equalities if l.name.lower() in tx_keys and r.name.lower() in tx_keys}
+        for a, b in sorted(sorted(pair) for pair in on_tx - on_block):
+            condition = exp.EQ(this=exp.column("block_time", table=a), expression=exp.column("block_time", table=b))
+            join.set("on", exp.and_(join.args["on"], condition))
+            changed = True
+    return changed
+
+
+def _is_column(node: exp.Expression, name: str, alias: str, scope: Scope) -> bool:
+    """`node` is column `name` of `alias` (qualified, or the block's only source)."""
+    return isinstance(node, exp.Column) and node.name.lower() == name and (
+        node.table == alias or (not node.table and len(scope.sources) == 1)
+    )
+
+
+def _block_date(scope: Scope, tables: Dict[str, TableSpec]) -> bool:
+    select = scope.expression
+    where = select.args.get("where")
+    if where is None:
+        return False
+    conjuncts = [_unparen(c) for c in _conjuncts(where.this)]
+    changed = False
+    for alias, spec in tables.items():
+        if not {"block_time", "block_date"} <= set(spec.column_names):
+            continue
+        if any(_is_column(column, "block_date", alias, scope) for c in conjuncts for column in c.find_all(exp.Column)):
+            continue  # Already filtered on block_date
+
+        for condition in conjuncts:
+            if isinstance(condition, exp.Between):
+                column, bounds = condition.this, [condition.args["low"], condition.args["high"]]
+            elif isinstance(condition, _COMPARISONS):
+                column, bounds = condition.this, [condition.expression]
+            else:
+                continue
+            if not _is_column(column, "block_time", alias, scope) or any(b.find(exp.Column, exp.Subquery) for b in bounds):
+                continue  # Only constant bounds translate to partitions
+            block_date = exp.column("block_date", table=column.table or None)
+            dates = [exp.cast(bound.copy(), "date") for bound in bounds]
+            if isinstance(condition, exp.Between):
+                predicate = exp.Between(this=block_date, low=dates[0], high=dates[1])
+            elif isinstance(condition, (exp.GT, exp.GTE)):
+                predicate = exp.GTE(this=block_date, expression=dates[0])
+            else:
+                predicate = exp.LTE(this=block_date, expression=dates[0])
+            select.where(predicate, copy=False)
+            changed = True
+    return changed
+
+
+def _needed_columns(scope: Scope, scopes: List[Scope], spec: TableSpec) -> Optional[List[str]]:
+    """Columns the blocks reading `scope` (a CTE / derived table) use; None if any selects it whole."""
+    needed = set()
+    for outer in scopes:
+        aliases = [alias for alias, source in outer.sources.items() if source is scope]
+        if not aliases:
+            continue
+        for projection in outer.expression.expressions:
+            if isinstance(projection, exp.Star) or (isinstance(projection, exp.Column) and isinstance(projection.this, exp.Star)):
+                return None
+        for column in outer.columns:
+            if column.table in aliases or (not column.table and column.name.lower() in spec.column_names):
+                needed.add(column.name.lower())
+    return [name for name in spec.column_names if name in needed]
+
+
+def _narrow_star(scope: Scope, scopes: List[Scope], tables: Dict[str, TableSpec]) -> bool:
+    select = scope.expression
+    projections = select.expressions
+    if len(projections) != 1 or len(scope.sources) != 1 or len(tables) != 1:
+        return False
+    star = projections[0]
+    if not (isinstance(star, exp.Star) or (isinstance(star, exp.Column) and isinstance(star.this, exp.Star))):
+        return False
+    (spec,) = tables.values()
+    if not spec.default_columns:
+        return False  # Not a wide table
+    if not (scope.is_root or scope.is_cte or scope.is_derived_table):
+        return False  # Union branches and scalar subqueries must keep their shape
+
+    needed = None if scope.is_root else _needed_columns(scope, scopes, spec)
+    columns = needed if needed else list(spec.default_columns)
+    table = star.table if isinstance(star, exp.Column) else None
+    select.set("expressions", [exp.column(name, table=table or None) for name in columns])
+    return True
+
+
+def _limit(tree: exp.Expression, default_limit: int) -> bool:
+    if default_limit <= 0 or tree.args.get("limit") or tree.args.get("fetch"):
+        return False
+    if isinstance(tree, exp.Select) and not tree.args.get("group") \
+            and any(projection.find(exp.AggFunc) for projection in tree.expressions) \
+            and not any(projection.find(exp.Window) for projection in tree.expressions):
+        return False  # One aggregate row
+    tree.limit(default_limit, copy=False)
+    return True
+
+
+def rewrite_sql(sql: str, registry: SchemaRegistry = SOLANA_SCHEMA, default_limit: int = 1000) -> RewriteResult:
+    """Applies the rules; the SQL text is only re-rendered if one of them changed something."""
+    try:
+        tree = parse_sql(sql)
+    except ParseError:
+        return RewriteResult(sql=sql)
+    if not isinstance(tree, READ_ONLY):
+        return RewriteResult(sql=sql)
+
+    applied: List[str] = []
+    scopes = traverse_scope(tree)
+    for scope in scopes:
+        if not isinstance(scope.expression, exp.Select):
+            continue
+        tables = _tables(scope, registry)
+        if not tables:
+            continue
+        if _join_block_time(scope, tables, registry.tx_keys):
+            applied.append("join_block_time")
+        if _block_date(scope, tables):
+            applied.append("block_date")
+        if _narrow_star(scope, scopes, tables):
+            applied.append("narrow_star")
+    if _limit(tree, default_limit):
+        applied.append("limit")
+
+    if not applied:
+        return RewriteResult(sql=sql)
+    return RewriteResult(sql=tree.sql(dialect=DIALECT, pretty=True), applied=tuple(dict.fromkeys(applied)))
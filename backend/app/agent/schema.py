@@ -0,0 +1,246 @@
+"""
+Schema registry: the tables, known tokens and few-shot examples the agent
+may use, kept as data so the prompt builder can pick only what a question
+needs (and so other stages can reason about tables and partition keys).
+"""
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    type: str
+    comment: str = ""
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str                              # Fully qualified, e.g. "solana.transactions"
+    title: str                             # Section heading in the prompt
+    best_for: Tuple[str, ...]              # "Best for" hints (also used for ranking)
+    columns: Tuple[ColumnSpec, ...]
+    partition_keys: Tuple[str, ...] = ()   # Filter on these to prune partitions
+    notes: Tuple[str, ...] = ()            # Extra lines rendered above the table
+    keywords: Tuple[str, ...] = ()         # Extra ranking terms not visible in the prompt
+    default_columns: Tuple[str, ...] = ()  # What `SELECT *` is narrowed to on wide tables (rewrite pass)
+
+    @property
+    def column_names(self) -> Tuple[str, ...]:
+        return tuple(c.name for c in self.columns)
+
+    def render(self, letter: str) -> str:
+        lines = [f"-- {letter}. {self.title} (Best for: {', '.join(self.best_for)})"]
+        lines += [f"-- {note}" for note in self.notes]
+        lines.append(f"TABLE {self.name} (")
+        for i, column in enumerate(self.columns):
+            comma = "," if i < len(self.columns) - 1 else ""
+            line = f"    {column.name:<15} {column.type}{comma}"
+            if column.comment:
+                line = f"{line:<35} -- {column.comment}"
+            lines.append(line)
+        lines.append(");")
+        return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class TokenSpec:
+    symbol: str
+    mint: str
+    note: str = ""
+    aliases: Tuple[str, ...] = ()
+
+    def render(self) -> str:
+        note = f" ({self.note})" if self.note else ""
+        return f"- **{self.symbol}:** `{self.mint}`{note}"
+
+
+@dataclass(frozen=True)
+class ExampleSpec:
+    question: str
+    thought: str
+    sql: str
+    tables: Tuple[str, ...] = field(default_factory=tuple)
+
+    def render(self) -> str:
+        return f'**User:** "{self.question}"\n**Thought:** {self.thought}\n**SQL:**\n{self.sql}'
+
+
+@dataclass(frozen=True)
+class SchemaRegistry:
+    tables: Tuple[TableSpec, ...]
+    tokens: Tuple[TokenSpec, ...]
+    examples: Tuple[ExampleSpec, ...]
+    tx_keys: Tuple[str, ...] = ("id", "tx_id", "signature")  # Transaction id columns (rewrite pass: join on these)
+
+    def table(self, name: str) -> Optional[TableSpec]:
+        name = name.lower()
+        for table in self.tables:
+            if table.name == name:
+                return table
+        return None
+
+    @property
+    def table_names(self) -> Tuple[str, ...]:
+        return tuple(t.name for t in self.tables)
+
+
+C = ColumnSpec
+
+SOLANA_TABLES = (
+    TableSpec(
+        name="solana.transactions",
+        title="CORE TRANSACTIONS",
+        best_for=("Volume", "Fees", "Signer Activity", "Success Rates"),
+        partition_keys=("block_time", "block_date"),
+        keywords=("transaction", "tx", "txs", "signature", "hash", "wallet", "active", "users", "compute", "failed", "logs"),
+        default_columns=("block_time", "block_date", "block_slot", "signature", "signer", "fee", "compute_units_consumed", "success"),
+        columns=(
+            C("block_slot", "BIGINT"),
+            C("block_height", "BIGINT"),
+            C("block_time", "TIMESTAMP", "Partition Key (Filter by this!)"),
+            C("block_date", "DATE", "Secondary Partition Key"),
+            C("index", "INTEGER"),
+            C("fee", "BIGINT", "In Lamports (divide by 1e9 for SOL)"),
+            C("compute_units_consumed", "BIGINT"),
+            C("cost_units", "BIGINT"),
+            C("version", "VARCHAR"),
+            C("required_signatures", "INTEGER"),
+            C("readonly_signed_accounts", "INTEGER"),
+            C("readonly_unsigned_accounts", "INTEGER"),
+            C("block_hash", "VARCHAR"),
+            C("id", "VARCHAR"),
+            C("signature", "VARCHAR", "Transaction Hash (Unique ID)"),
+            C("success", "BOOLEAN", "Filter `success = true` usually"),
+            C("error", "VARCHAR"),
+            C("recent_block_hash", "VARCHAR"),
+            C("instructions", "ARRAY(JSON)", "Raw instruction data"),
+            C("account_keys", "ARRAY(JSON)"),
+            C("log_messages", "ARRAY(VARCHAR)", "Useful for text search within logs"),
+            C("pre_balances", "ARRAY(BIGINT)"),
+            C("post_balances", "ARRAY(BIGINT)"),
+            C("pre_token_balances", "ARRAY(JSON)"),
+            C("post_token_balances", "ARRAY(JSON)"),
+            C("signatures", "ARRAY(VARCHAR)"),
+            C("signer", "VARCHAR", "Wallet paying the fee"),
+            C("signers", "ARRAY(VARCHAR)"),
+            C("return_data_program_id", "VARCHAR"),
+            C("return_data", "VARCHAR", "Often hex or base64"),
+            C("address_table_lookups", "ARRAY(JSON)"),
+            C("loaded_addresses", "ARRAY(JSON)"),
+        ),
+    ),
+    TableSpec(
+        name="solana.instruction_calls",
+        title="INSTRUCTION CALLS",
+        best_for=("Protocol Interactions", "Mints", "Swaps", "Specific Program Usage"),
+        partition_keys=("block_time",),
+        keywords=("program", "instruction", "jupiter", "raydium", "orca", "dex", "swap", "contract", "calls", "mint"),
+        columns=(
+            C("block_time", "TIMESTAMP"),
+            C("tx_id", "VARCHAR", "Join with transactions.signature"),
+            C("executing_account", "VARCHAR", "Program ID being called (e.g., Jupiter Contract)"),
+            C("account_arguments", "ARRAY(VARCHAR)", "List of accounts involved in this instruction"),
+            C("data", "VARBINARY", "Raw data (hard to read, prefer filtering executing_account)"),
+            C("tx_success", "BOOLEAN"),
+        ),
+    ),
+    TableSpec(
+        name="solana.account_activity",
+        title="ACCOUNT ACTIVITY",
+        best_for=("Tracking balance changes per Tx", "Money Flow"),
+        partition_keys=("block_time",),
+        keywords=("transfer", "transfers", "volume", "flow", "inflow", "outflow", "sent", "received", "token", "moved", "change"),
+        columns=(
+            C("block_time", "TIMESTAMP"),
+            C("tx_id", "VARCHAR"),
+            C("address", "VARCHAR", "The wallet/account affected"),
+            C("token_mint_address", "VARCHAR", "The token being moved (or null for SOL)"),
+            C("balance_change", "BIGINT", "Change in SOL (Lamports)"),
+            C("token_balance_change", "DECIMAL(38,17)", "Change in Token Amount"),
+            C("token_balance_owner", "VARCHAR", "The actual owner if 'address' is a token account"),
+        ),
+    ),
+    TableSpec(
+        name="solana.rewards",
+        title="REWARDS",
+        best_for=("Staking rewards", "Validator income"),
+        partition_keys=("block_time",),
+        keywords=("reward", "staking", "stake", "validator", "validators", "rent", "yield", "epoch"),
+        columns=(
+            C("block_time", "TIMESTAMP"),
+            C("reward_type", "VARCHAR", "e.g., 'Fee', 'Rent', 'Staking'"),
+            C("recipient", "VARCHAR", "Address receiving reward"),
+            C("lamports", "BIGINT", "Amount in Lamports"),
+        ),
+    ),
+    TableSpec(
+        name="solana_utils.latest_balances",
+        title="BALANCE SNAPSHOTS",
+        best_for=('"How much does X hold?"', "Rich Lists"),
+        notes=("Note: 'latest_balances' is the most recent snapshot. 'daily_balances' is historical.",),
+        keywords=("holders", "holder", "hold", "holds", "holding", "balance", "balances", "rich", "top", "whales", "richest", "biggest", "largest", "current"),
+        columns=(
+            C("address", "VARCHAR"),
+            C("token_mint_address", "VARCHAR", "Null for Native SOL"),
+            C("sol_balance", "DOUBLE", "Native SOL balance"),
+            C("token_balance", "DECIMAL(38,18)", "Token balance"),
+            C("updated_at", "TIMESTAMP"),
+        ),
+    ),
+    TableSpec(
+        name="solana_utils.daily_balances",
+        title="HISTORICAL BALANCES",
+        best_for=("Balance history", "Holder counts over time"),
+        partition_keys=("day",),
+        keywords=("history", "historical", "over", "time", "trend", "growth", "daily", "holders", "balance", "balances"),
+        columns=(
+            C("day", "TIMESTAMP"),
+            C("address", "VARCHAR"),
+            C("token_mint_address", "VARCHAR", "Null for Native SOL"),
+            C("sol_balance", "DOUBLE", "Native SOL balance"),
+            C("token_balance", "DECIMAL(38,18)"),
+        ),
+    ),
+    TableSpec(
+        name="solana_utils.token_accounts",
+        title="TOKEN ACCOUNTS",
+        best_for=("Mapping token accounts to owner wallets",),
+        keywords=("owner", "owners", "ata", "associated", "account", "accounts"),
+        columns=(
+            C("address", "VARCHAR", "The Token Account Address"),
+            C("token_mint_address", "VARCHAR", "The Token itself"),
+            C("token_balance_owner", "VARCHAR", "The Wallet Activity Owner"),
+        ),
+    ),
+)
+
+SOLANA_TOKENS = (
+    TokenSpec("SOL", "So11111111111111111111111111111111111111111", "Wrapped SOL / Native", aliases=("solana", "wsol")),
+    TokenSpec("USDC", "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", aliases=("usd coin",)),
+    TokenSpec("USDT", "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB", aliases=("tether",)),
+    TokenSpec("JUP", "JUPyiwrYJFskUPiHa7hkeR8VUtAeFoSYbKedZNsDvCN", aliases=("jupiter",)),
+    TokenSpec("BONK", "DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263"),
+    TokenSpec("PENGU", "2zMMhcVQEXDtdE6vsFS7S7D5oUodfJHE8vd1gnBouauv", aliases=("pudgy penguins",)),
+    TokenSpec("RAY", "4k3Dyjzvzp8eMZWUXbBCjEvwSkkk59S5iCNLY3QrkX6R", aliases=("raydium",)),
+    TokenSpec("GRASS", "Grass7B4RdKfBCjTKgSqnXkqjwiGvQyFbuSCUJr3XXjs"),
+)
+
+SOLANA_EXAMPLES = (
+    ExampleSpec(
+        question="Show me the daily transfer volume of USDC for the last 7 days.",
+        thought="USDC is in my list. I should use account_activity to sum positive balance changes for that mint.",
+        tables=("solana.account_activity",),
+        sql="""SELECT
+    date_trunc('day', block_time) as day,
+    SUM(token_balance_change) as daily_volume
+FROM solana.account_activity
+WHERE token_mint_address = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v' -- USDC
+AND block_time > now() - interval '7' day
+AND token_balance_change > 0
+GROUP BY 1
+ORDER BY 1 DESC;""",
+    ),
+)
+
+SOLANA_SCHEMA = SchemaRegistry(tables=SOLANA_TABLES, tokens=SOLANA_TOKENS, examples=SOLANA_EXAMPLES)
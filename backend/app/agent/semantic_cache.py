@@ -0,0 +1,384 @@
+"""
+Semantic similarity cache for generate_sql.
+
+Answers paraphrases ("biggest BONK holders" vs "top BONK wallets") from the
+nearest past question instead of calling the LLM.
+
+- Embeddings come from a local hashing embedder (NumPy only, no network).
+- The index is a preallocated float32 matrix; a lookup is one mat-vec product.
+- Entries are evicted least-recently-used once the index is full.
+- Questions are added by the routes once the whole agent run accepted the
+  SQL (rewrite, validation, scan budget, dry run), never SQL a later node
+  rejected.
+- The index is filled at startup from successful UserQuery rows, in batches,
+  so the server starts accepting requests immediately. Only answers the
+  response cache still holds under the current prompt/model fingerprint are
+  loaded, so editing the prompt or switching models never serves old SQL.
+- Tokens must match exactly, like numbers: the guard holds the symbols
+  written in capitals or as $CASHTAGs, addresses and the mints resolve_tokens
+  found, so "USDC volume" never answers "USDT volume".
+- Lookups on large indexes rank rows in a worker thread, but the winning row
+  is re-scored, checked and read on the event loop (see `alookup`).
+"""
+import asyncio
+import logging
+import re
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import and_, or_
+from sqlalchemy.future import select
+
+from app.agent.cache import normalize_prompt
+from app.agent.chains import DEFAULT_CHAIN
+from app.core.config import settings
+from app.models.sql import CachedResponse, UserQuery
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9_$]+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_SYMBOL = re.compile(r"\$[A-Za-z0-9]+|\b[A-Z][A-Z0-9]+\b")  # $bonk, BONK
+_ADDRESS = re.compile(r"\b(?:0x[0-9a-fA-F]{40}|[1-9A-HJ-NP-Za-km-z]{32,44})\b")  # EVM hex / Solana base58
+
+# Words that carry no meaning for the question (prepositions stay: "by signer" != "to signer")
+_STOPWORDS = frozenset(
+    "a an the of for me show give get find list please what which who is are was "
+    "do does i we my our and that this those these can you".split()
+)
+
+# Direction, status and negation words must match exactly, like numbers:
+# "transfers to X" never answers "transfers from X", "failed txs" never "txs"
+_QUALIFIERS = frozenset(
+    "to from into out inflow inflows outflow outflows sent received incoming outgoing buy buys bought "
+    "sell sells sold failed failing successful success succeeded not without excluding except non".split()
+)
+
+# Common paraphrases collapsed onto one term before hashing
+_SYNONYMS = {
+    "biggest": "top", "largest": "top", "richest": "top", "highest": "top", "most": "top",
+    "wallets": "holders", "wallet": "holders", "addresses": "holders", "address": "holders",
+    "owners": "holders", "owner": "holders", "holder": "holders", "accounts": "holders",
+    "txs": "transactions", "tx": "transactions", "transaction": "transactions", "txns": "transactions",
+    "volumes": "volume", "daily": "day", "per": "by", "users": "signers", "user": "signers",
+}
+
+# Queries above this size are searched off the event loop (NumPy releases the GIL)
+_OFFLOAD_ROWS = 50_000
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-features embedder (the "hashing trick").
+    Features: words, word bigrams and character trigrams, hashed into `dim`
+    signed buckets and L2-normalized, so cosine similarity is a dot product.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[tuple[str, float]]:
+        words = [
+            _SYNONYMS.get(w, w)
+            for w in _WORD.findall(normalize_prompt(text))
+            if w not in _STOPWORDS
+        ]
+        features = [(w, 1.0) for w in words]
+        features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"#{w}#"
+            features += [(padded[i:i + 3], 0.2) for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode())
+            vector[h % self.dim] += weight if (h >> 31) & 1 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _guard(text: str, mints: Iterable[str] = ()) -> frozenset:
+    """
+    Numbers, qualifiers and tokens must match exactly: "top 10" must never
+    answer "top 100", nor "failed transactions" answer "transactions", nor
+    "BONK holders" answer "WIF holders". `mints` are the question's resolved tokens.
+    """
+    words = _WORD.findall(normalize_prompt(text))
+    return (
+        frozenset(_NUMBER.findall(text))
+        | frozenset(w for w in words if w in _QUALIFIERS)
+        | frozenset(f"${s.lstrip('$').lower()}" for s in _SYMBOL.findall(text))
+        | frozenset(_ADDRESS.findall(text))
+        | frozenset(mints)
+    )
+
+
+class SemanticCache:
+    """
+    Fixed-capacity nearest-neighbour index of (question -> SQL).
+    All mutation, and every read of an entry, happens on the event loop
+    thread; worker threads only compute scores.
+    """
+
+    def __init__(
+        self,
+        embedder: HashingEmbedder,
+        capacity: int = 100_000,
+        threshold: float = 0.92,
+        enabled: bool = False,
+    ):
+        self.embedder = embedder
+        self.capacity = capacity
+        self.threshold = threshold
+        self.enabled = enabled
+
+        initial = min(capacity, 1024)
+        self._vectors = np.zeros((initial, embedder.dim), dtype=np.float32)
+        self._last_used = np.zeros(initial, dtype=np.int64)
+        self._sql: list[Optional[str]] = [None] * initial
+        self._guards: list[frozenset] = [frozenset()] * initial
+        self._texts: list[Optional[str]] = [None] * initial
+        self._slots: dict[str, int] = {}   # normalized question -> row
+        self._size = 0
+        self._tick = 0
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loaded_rows = 0
+        self._latencies = deque(maxlen=1024)  # seconds, most recent lookups
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- Lookup -----------------------------------------------------------
+
+    def lookup(self, text: str, mints: Iterable[str] = ()) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            if self._size == 0:
+                self.misses += 1
+                return None
+            query = self.embedder.embed(text)
+            return self._pick(_guard(text, mints), query, self._nearest(query, self._vectors, self._size))
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+
+    async def alookup(self, text: str, mints: Iterable[str] = ()) -> Optional[str]:
+        """
+        Async wrapper: large indexes are ranked in a worker thread. The thread
+        only scores a snapshot (the current matrix and size); meanwhile `add`
+        may evict and reuse rows or `_grow` may swap the matrix, so the
+        candidates are re-scored against what the rows hold now, on the loop,
+        before their SQL is read and stats/LRU are updated.
+        """
+        if not self.enabled or self._size == 0:
+            return None
+        if self._size < _OFFLOAD_ROWS:
+            return self.lookup(text, mints)
+        started = time.perf_counter()
+        try:
+            query = self.embedder.embed(text)
+            candidates = await asyncio.to_thread(self._nearest, query, self._vectors, self._size)
+            return self._pick(_guard(text, mints), query, candidates)
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+
+    @staticmethod
+    def _nearest(query: np.ndarray, vectors: np.ndarray, size: int, k: int = 5) -> list[int]:
+        """Rows of the k best scores, best first (pure computation, safe off the loop)."""
+        scores = vectors[:size] @ query
+        k = min(k, size)
+        candidates = np.argpartition(scores, -k)[-k:]
+        return [int(row) for row in candidates[np.argsort(scores[candidates])[::-1]]]
+
+    def _pick(self, guard: frozenset, query: np.ndarray, candidates: list[int]) -> Optional[str]:
+        """First candidate whose current entry is close enough and passes the guard (a few: the top one may not)."""
+        for row in candidates:
+            if row >= self._size or self._sql[row] is None:
+                continue
+            if float(self._vectors[row] @ query) >= self.threshold and self._guards[row] == guard:
+                self.hits += 1
+                self._tick += 1
+                self._last_used[row] = self._tick
+                return self._sql[row]
+
+        self.misses += 1
+        return None
+
+    # --- Insert / evict ---------------------------------------------------
+
+    def add(
+        self, text: str, sql: str, vector: Optional[np.ndarray] = None, recent: bool = True, mints: Iterable[str] = (),
+    ) -> None:
+        """
+        Inserts or refreshes a question (`mints`: its resolved tokens).
+        `recent=False` is used by the startup load: those rows start cold so
+        live traffic wins eviction ties, and never overwrite a newer answer
+        for the same question.
+        """
+        key = normalize_prompt(text)
+        row = self._slots.get(key)
+        if row is not None and not recent:
+            return
+
+        if row is None:
+            row = self._allocate()
+            self._slots[key] = row
+            self._vectors[row] = vector if vector is not None else self.embedder.embed(text)
+            self._guards[row] = _guard(text, mints)
+            self._texts[row] = key
+
+        self._sql[row] = sql
+        if recent:
+            self._tick += 1
+            self._last_used[row] = self._tick
+        else:
+            self._last_used[row] = 0
+
+    def add_result(self, text: str, chain: Optional[str], result: dict) -> None:
+        """
+        Adds an agent run's final SQL, if the LLM wrote it and the run ended
+        without an error or a pending repair (Solana questions only).
+        """
+        if (
+            not self.enabled or (chain or DEFAULT_CHAIN) != DEFAULT_CHAIN or result.get("sql_source") != "llm"
+            or not result.get("sql_output") or result.get("error") or result.get("validation_error")
+        ):
+            return
+        self.add(text, result["sql_output"], mints=[t["mint"] for t in result.get("tokens") or ()])
+
+    def _allocate(self) -> int:
+        if self._size < len(self._sql):
+            self._size += 1
+            return self._size - 1
+
+        if self._size < self.capacity:
+            self._grow(min(self.capacity, len(self._sql) * 2))
+            self._size += 1
+            return self._size - 1
+
+        # Full: reuse the least recently used row
+        row = int(np.argmin(self._last_used[: self._size]))
+        del self._slots[self._texts[row]]
+        self.evictions += 1
+        return row
+
+    def _grow(self, new_capacity: int) -> None:
+        extra = new_capacity - len(self._sql)
+        self._vectors = np.vstack([self._vectors, np.zeros((extra, self.embedder.dim), dtype=np.float32)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(extra, dtype=np.int64)])
+        self._sql.extend([None] * extra)
+        self._guards.extend([frozenset()] * extra)
+        self._texts.extend([None] * extra)
+
+    # --- Startup load -----------------------------------------------------
+
+    async def load_from_db(
+        self,
+        session_factory,
+        batch_size: int = 1000,
+        response_cache=None,
+        resolve_mints: Optional[Callable[[str], Iterable[str]]] = None,
+    ) -> int:
+        """
+        Fills the index from successful UserQuery rows, newest first,
+        one keyset-paginated batch at a time (stops at capacity).
+        A row is only loaded if `response_cache` still holds its answer under
+        the current fingerprint (history rows don't record the prompt or
+        model that produced them); without an enabled response cache nothing
+        is loaded. `resolve_mints` gives each question the mints live lookups
+        will be guarded with (what resolve_tokens finds). Embedding runs in a
+        worker thread; inserts happen on the loop.
+        """
+        if response_cache is None or not response_cache.enabled:
+            logger.info("Semantic cache not loaded from history: no response cache to match fingerprints against")
+            return 0
+        cursor = None
+        while self._size < self.capacity:
+            statement = (
+                select(UserQuery.user_input, UserQuery.sql_output, UserQuery.created_at, UserQuery.id)
+                .where(UserQuery.error_message.is_(None))
+                .where(UserQuery.chain == DEFAULT_CHAIN)  # Lookups are only made for this chain
+                .where(UserQuery.sql_output != "")
+                .order_by(UserQuery.created_at.desc(), UserQuery.id.desc())
+                .limit(batch_size)
+            )
+            if cursor is not None:
+                created_at, row_id = cursor
+                statement = statement.where(
+                    or_(
+                        UserQuery.created_at < created_at,
+                        and_(UserQuery.created_at == created_at, UserQuery.id < row_id),
+                    )
+                )
+
+            async with session_factory() as session:
+                rows = (await session.execute(statement)).all()
+            if not rows:
+                break
+
+            fresh = [r for r in rows if normalize_prompt(r.user_input) not in self._slots]
+            # Answered under the current prompt + model? (its response cache entry exists)
+            keys = [response_cache.make_key(r.user_input, DEFAULT_CHAIN) for r in fresh]
+            current = set()
+            if keys:
+                async with session_factory() as session:
+                    current = set((await session.execute(
+                        select(CachedResponse.cache_key)
+                        .where(CachedResponse.cache_key.in_(keys))
+                        .where(CachedResponse.expires_at > datetime.utcnow())
+                    )).scalars().all())
+            fresh = [r for r, key in zip(fresh, keys) if key in current]
+            embedded = await asyncio.to_thread(
+                lambda: [
+                    (self.embedder.embed(r.user_input), tuple(resolve_mints(r.user_input)) if resolve_mints else ())
+                    for r in fresh
+                ]
+            )
+            for r, (vector, mints) in zip(fresh, embedded):
+                if self._size >= self.capacity:
+                    break
+                self.add(r.user_input, r.sql_output, vector=vector, recent=False, mints=mints)
+                self.loaded_rows += 1
+
+            cursor = (rows[-1].created_at, rows[-1].id)
+
+        logger.info("Semantic cache loaded %d rows", self.loaded_rows)
+        return self.loaded_rows
+
+    # --- Stats ------------------------------------------------------------
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": self._size,
+            "capacity": self.capacity,
+            "loaded_rows": self.loaded_rows,
+            "evictions": self.evictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "lookup_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+            "lookup_ms_p99": round(float(np.percentile(latencies, 99)), 3),
+            "memory_bytes": int(self._vectors.nbytes),
+        }
+
+
+# Initialize the index once (per worker)
+semantic_cache = SemanticCache(
+    embedder=HashingEmbedder(dim=settings.SEMANTIC_CACHE_DIM),
+    capacity=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    enabled=settings.SEMANTIC_CACHE_ENABLED,
+)
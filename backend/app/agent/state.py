@@ -1,9 +1,17 @@
-from typing import TypedDict, Optional
+from typing import List, TypedDict, Optional
 
 class AgentState(TypedDict):
     """
     Defines the input/output structure for our graph.
     """
     user_input: str          # What the user asked
+    chain: Optional[str]     # Chain pack to use (app/agent/chains.py), default solana
+    tokens: Optional[List[dict]]     # TokenMatch.to_dict() of the mentioned tokens (resolve_tokens)
     sql_output: Optional[str] # The generated SQL
+    original_sql: Optional[str]      # The model's SQL before the rewrite pass
     error: Optional[str]      # If something goes wrong
+    sql_source: Optional[str]        # "llm" or "semantic_cache"
+    validation_error: Optional[str]  # Validator feedback for the next generator attempt
+    repairs: Optional[int]           # Repair attempts so far
+    scan_estimate: Optional[dict]    # ScanEstimate.to_dict() of the validated SQL
+    dry_run: Optional[dict]          # DryRunResult.to_dict() (DRY_RUN_NODE_ENABLED)
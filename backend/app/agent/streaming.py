@@ -0,0 +1,76 @@
+"""
+Helpers for streaming the generator's tokens to the client.
+"""
+import json
+
+
+class _Remover:
+    """Streaming `text.replace(pattern, "")`: holds back only what may still start a match."""
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._buffer + chunk
+        out, start = [], 0
+        while (i := text.find(self.pattern, start)) != -1:
+            out.append(text[start:i])
+            start = i + len(self.pattern)
+        rest = text[start:]
+        # The longest tail that is a prefix of the pattern may still become a match
+        longest = min(len(rest), len(self.pattern) - 1)
+        keep = next((k for k in range(longest, 0, -1) if rest.endswith(self.pattern[:k])), 0)
+        out.append(rest[:len(rest) - keep])
+        self._buffer = rest[len(rest) - keep:]
+        return "".join(out)
+
+    def finish(self) -> str:
+        rest, self._buffer = self._buffer, ""
+        return rest
+
+
+class FenceStripper:
+    """
+    Incremental version of the clean-up in generate_sql:
+        content.replace("```sql", "").replace("```", "").strip()
+
+    Tokens are fed as they arrive through the same two passes in the same
+    order ("```sql" first, then "```" in what is left); text is released as
+    soon as it can no longer be part of a fence, and surrounding whitespace
+    is dropped. Joining every `feed()` output plus `finish()` gives the same
+    string as the batch clean-up.
+    """
+
+    def __init__(self):
+        self._sql_fences = _Remover("```sql")
+        self._fences = _Remover("```")
+        self._held_ws = ""     # Trailing whitespace, released only if more text follows
+        self._started = False  # Leading whitespace is dropped until first real char
+
+    def feed(self, chunk: str) -> str:
+        return self._emit(self._fences.feed(self._sql_fences.feed(chunk)))
+
+    def finish(self) -> str:
+        """Flushes what is left; trailing whitespace is dropped."""
+        rest = self._fences.feed(self._sql_fences.finish()) + self._fences.finish()
+        return self._emit(rest)
+
+    def _emit(self, text: str) -> str:
+        if not text:
+            return ""
+        text = self._held_ws + text
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                self._held_ws = ""
+                return ""
+            self._started = True
+        body = text.rstrip()
+        self._held_ws = text[len(body):]
+        return body
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
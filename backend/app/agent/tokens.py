@@ -0,0 +1,399 @@
+"""
+Token registry: symbols, names and aliases of tens of thousands of tokens,
+resolved to mint / contract addresses before the LLM call.
+
+The registry is one binary file written by scripts/build_token_index.py
+(TOKEN_INDEX_PATH) and opened read-only with mmap: every worker maps the
+same file, so the OS page cache holds one copy however many workers run,
+and opening it reads nothing up front. Sections (little endian, 8-byte
+aligned), read in place as NumPy views:
+- chains:   names of the chains, by chain id
+- records:  one per token (chain id, rank, decimals, symbol/name/mint strings)
+- keys:     normalized symbols, names and aliases, sorted (prefix lookups by
+            binary search), each with its postings range
+- postings: record ids per key, best rank first
+- slots:    open-addressing hash table (CRC32 of the key) -> key id, for
+            O(1) exact lookups
+- strings:  UTF-8 blob the other sections point into
+
+Resolution is deterministic: among the tokens sharing a key on the chain,
+the best rank (lowest number; curated pack tokens are rank 0) wins.
+"""
+import heapq
+import logging
+import mmap
+import re
+import struct
+import threading
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.agent.schema import TokenSpec
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CQTOKIDX"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIIIIIIQQQQQQQ")  # magic, version, counts x6, section offsets x7
+
+_CHAIN = np.dtype([("off", "<u4"), ("len", "<u2")])
+_RECORD = np.dtype([
+    ("chain", "<u2"), ("decimals", "<i2"), ("rank", "<u4"),
+    ("symbol_off", "<u4"), ("symbol_len", "<u2"),
+    ("name_off", "<u4"), ("name_len", "<u2"),
+    ("mint_off", "<u4"), ("mint_len", "<u2"),
+])
+_KEY = np.dtype([("off", "<u4"), ("len", "<u2"), ("first", "<u4"), ("count", "<u4")])
+
+_MENTION = re.compile(r"\$?[A-Za-z0-9]+(?:[.\-][A-Za-z0-9]+)*")  # "." / "-" only inside a word, not a sentence end
+_SPACES = re.compile(r"\s+")
+_MAX_NGRAM = 3
+_PREFIX_MAX_KEYS = 50_000  # Keys ranked per autocomplete lookup (short prefixes on huge indexes)
+
+# Question words that are also token symbols/names; only matched as $CASHTAG or in capitals
+COMMON_WORDS = frozenset(
+    "a all an and any are as at be best big biggest by can coin coins count daily day days did do does each for "
+    "from gas get give go has have how i in is it last list me month most my new not now of on one or our out "
+    "over pay per price query sell show some swap swaps than that the this time to token tokens top total trade "
+    "trades up us usd users volume wallet wallets was we week what when where which who why will with year you".split()
+)
+
+
+def normalize_key(text: str) -> str:
+    return _SPACES.sub(" ", text.strip().lstrip("$").lower())
+
+
+@dataclass(frozen=True)
+class TokenRecord:
+    chain: str
+    symbol: str
+    name: str
+    mint: str
+    decimals: int = -1                 # -1 = unknown
+    rank: int = 1_000_000              # Lower wins ties; curated pack tokens are 0
+    aliases: Tuple[str, ...] = ()
+
+    def keys(self) -> List[str]:
+        return list(dict.fromkeys(k for k in map(normalize_key, (self.symbol, self.name, *self.aliases)) if k))
+
+
+@dataclass(frozen=True)
+class TokenMatch:
+    chain: str
+    symbol: str
+    name: str
+    mint: str
+    decimals: int
+    rank: int
+    mention: str = ""                  # Text in the question it was resolved from
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_spec(self) -> TokenSpec:
+        """The prompt's "known token" entry."""
+        notes = [self.name] if self.name.lower() != self.symbol.lower() else []
+        if self.decimals >= 0:
+            notes.append(f"{self.decimals} decimals")
+        return TokenSpec(self.symbol, self.mint, ", ".join(notes))
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def build_token_index(records: Iterable[TokenRecord], path) -> dict:
+    """Writes the index file (atomically: a temp file renamed over `path`); returns counts."""
+    records = sorted(records, key=lambda r: (r.rank, r.chain, r.symbol.lower(), r.mint))
+    strings = bytearray()
+    interned: Dict[str, Tuple[int, int]] = {}
+
+    def intern(text: str) -> Tuple[int, int]:
+        if text not in interned:
+            raw = text.encode()[:0xFFFF]
+            interned[text] = (len(strings), len(raw))
+            strings.extend(raw)
+        return interned[text]
+
+    chains: List[str] = sorted({r.chain.lower() for r in records})
+    chain_ids = {name: i for i, name in enumerate(chains)}
+    chain_table = np.array([intern(name) for name in chains], dtype=_CHAIN)
+
+    record_table = np.zeros(len(records), dtype=_RECORD)
+    postings_by_key: Dict[str, List[int]] = {}
+    for i, record in enumerate(records):
+        symbol, name, mint = intern(record.symbol), intern(record.name), intern(record.mint)
+        record_table[i] = (chain_ids[record.chain.lower()], record.decimals, record.rank, *symbol, *name, *mint)
+        for key in record.keys():
+            postings_by_key.setdefault(key, []).append(i)  # Records are in rank order already
+
+    keys = sorted(postings_by_key, key=lambda k: k.encode())
+    key_table = np.zeros(len(keys), dtype=_KEY)
+    postings = np.zeros(sum(len(v) for v in postings_by_key.values()), dtype="<u4")
+    n_slots = 1 << max(3, (2 * len(keys) - 1).bit_length())  # Load factor <= 0.5
+    slots = np.zeros(n_slots, dtype="<u4")
+    position = 0
+    for key_id, key in enumerate(keys):
+        ids = postings_by_key[key]
+        key_table[key_id] = (*intern(key), position, len(ids))
+        postings[position:position + len(ids)] = ids
+        position += len(ids)
+        slot = zlib.crc32(key.encode()) & (n_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (n_slots - 1)
+        slots[slot] = key_id + 1
+
+    sections = [chain_table.tobytes(), record_table.tobytes(), key_table.tobytes(), postings.tobytes(),
+                slots.tobytes(), bytes(strings)]
+    offsets, offset = [], _align(_HEADER.size)
+    for data in sections:
+        offsets.append(offset)
+        offset = _align(offset + len(data))
+    header = _HEADER.pack(MAGIC, VERSION, len(chains), len(records), len(keys), len(postings), n_slots,
+                          len(strings), *offsets, offset)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for start, data in zip(offsets, sections):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(data)
+        f.write(b"\0" * (offset - f.tell()))
+    tmp.replace(path)
+    return {"chains": len(chains), "records": len(records), "keys": len(keys), "bytes": offset}
+
+
+class TokenIndex:
+    """Read-only view of an index file, mapped on first use."""
+
+    def __init__(self, path, loose_rank: int = 1000, max_matches: int = 8):
+        self.path = Path(path)
+        self.loose_rank = loose_rank     # Lowercase, non-cashtag mentions only match tokens ranked this well
+        self.max_matches = max_matches
+        self._lock = threading.Lock()
+        self._mmap: Optional[mmap.mmap] = None
+        self._chain_ids: Dict[str, int] = {}
+
+        # Stats
+        self.lookups = 0
+        self.resolved = 0
+
+    @property
+    def available(self) -> bool:
+        return self._mmap is not None or self.path.exists()
+
+    def _open(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                return
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, n_chains, n_records, n_keys, n_postings, n_slots, n_strings, *offsets = \
+                _HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != VERSION:
+                mapped.close()
+                raise ValueError(f"{self.path} is not a version {VERSION} token index")
+            chains_at, records_at, keys_at, postings_at, slots_at, strings_at, _ = offsets
+            self._chains = np.frombuffer(mapped, _CHAIN, n_chains, chains_at)
+            self._records = np.frombuffer(mapped, _RECORD, n_records, records_at)
+            self._keys = np.frombuffer(mapped, _KEY, n_keys, keys_at)
+            self._postings = np.frombuffer(mapped, "<u4", n_postings, postings_at)
+            self._slots = np.frombuffer(mapped, "<u4", n_slots, slots_at)
+            self._strings = memoryview(mapped)[strings_at:strings_at + n_strings]
+            self._chain_ids = {self._string(c["off"], c["len"]): i for i, c in enumerate(self._chains)}
+            self._mmap = mapped
+
+    def _ensure_open(self) -> None:
+        if self._mmap is None:
+            self._open()
+
+    def _string(self, off, length) -> str:
+        return bytes(self._strings[int(off):int(off) + int(length)]).decode()
+
+    def _key_bytes(self, key_id: int) -> bytes:
+        key = self._keys[key_id]
+        return bytes(self._strings[int(key["off"]):int(key["off"]) + int(key["len"])])
+
+    def _match(self, record_id: int, mention: str = "") -> TokenMatch:
+        r = self._records[record_id]
+        return TokenMatch(
+            chain=self._string(self._chains[r["chain"]]["off"], self._chains[r["chain"]]["len"]),
+            symbol=self._string(r["symbol_off"], r["symbol_len"]),
+            name=self._string(r["name_off"], r["name_len"]),
+            mint=self._string(r["mint_off"], r["mint_len"]),
+            decimals=int(r["decimals"]),
+            rank=int(r["rank"]),
+            mention=mention,
+        )
+
+    def _key_id(self, key: str) -> Optional[int]:
+        raw = key.encode()
+        mask = len(self._slots) - 1
+        slot = zlib.crc32(raw) & mask
+        while True:
+            entry = int(self._slots[slot])
+            if entry == 0:
+                return None
+            if self._key_bytes(entry - 1) == raw:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def _record_ids(self, key_id: int, chain: Optional[str]) -> List[int]:
+        key = self._keys[key_id]
+        ids = self._postings[int(key["first"]):int(key["first"]) + int(key["count"])]
+        if chain is None:
+            return [int(i) for i in ids]
+        chain_id = self._chain_ids.get(chain.lower())
+        return [int(i) for i in ids if self._records[i]["chain"] == chain_id]
+
+    def lookup(self, text: str, chain: Optional[str] = None) -> List[TokenMatch]:
+        """Tokens whose symbol, name or alias is exactly `text` (best rank first)."""
+        self._ensure_open()
+        key_id = self._key_id(normalize_key(text))
+        return [] if key_id is None else [self._match(i, text) for i in self._record_ids(key_id, chain)]
+
+    def _bisect(self, raw: bytes, after_prefix: bool = False) -> int:
+        """First key >= `raw` or, with `after_prefix`, the first key past those starting with `raw`."""
+        low, high = 0, len(self._keys)
+        while low < high:
+            mid = (low + high) // 2
+            key = self._key_bytes(mid)
+            if (key[:len(raw)] <= raw) if after_prefix else (key < raw):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def prefix(self, text: str, chain: Optional[str] = None, limit: int = 10) -> List[TokenMatch]:
+        """Tokens with a symbol, name or alias starting with `text` (autocomplete), best rank first."""
+        self._ensure_open()
+        if limit <= 0:
+            return []
+        raw = normalize_key(text).encode()
+        low, high = self._bisect(raw), self._bisect(raw, after_prefix=True)
+        # Record ids are in rank order, so a key's first posting is its best token: visit the
+        # matching keys best first and stop once no remaining key can beat the current top `limit`
+        best = self._postings[self._keys["first"][low:high]]
+        found: set = set()
+        cutoff = None
+        for position in np.argsort(best, kind="stable")[:_PREFIX_MAX_KEYS]:
+            if cutoff is not None and cutoff <= best[position]:
+                break
+            found.update(self._record_ids(low + int(position), chain))
+            if len(found) >= limit:
+                cutoff = heapq.nsmallest(limit, found)[-1]
+        return [self._match(i) for i in sorted(found)[:limit]]
+
+    def find_mentions(self, text: str, chain: str) -> List[TokenMatch]:
+        """
+        Tokens mentioned in a question, one per mention, in question order.
+        `$BONK` and `BONK` match any token on the chain; lowercase words
+        ("bonk", "usd coin") only tokens ranked within `loose_rank`, and
+        never common question words ("top", "volume").
+        """
+        self._ensure_open()
+        self.lookups += 1
+        words = [(m.group(), m.group().startswith("$")) for m in _MENTION.finditer(text)]
+        found: Dict[str, TokenMatch] = {}
+        i = 0
+        while i < len(words) and len(found) < self.max_matches:
+            for size in range(min(_MAX_NGRAM, len(words) - i), 0, -1):
+                mention = " ".join(w for w, _ in words[i:i + size])
+                match = self._resolve(mention, chain, strict=size == 1 and self._strict(*words[i]))
+                if match is not None:
+                    found.setdefault(match.mint, match)
+                    i += size
+                    break
+            else:
+                i += 1
+        self.resolved += len(found)
+        return list(found.values())
+
+    @staticmethod
+    def _strict(word: str, cashtag: bool) -> bool:
+        bare = word.lstrip("$")
+        return cashtag or (len(bare) >= 2 and bare.isupper())
+
+    def _resolve(self, mention: str, chain: str, strict: bool) -> Optional[TokenMatch]:
+        key = normalize_key(mention)
+        if not strict and (len(key) < 3 or key in COMMON_WORDS):
+            return None
+        key_id = self._key_id(key)
+        if key_id is None:
+            return None
+        ids = self._record_ids(key_id, chain)
+        if not ids or (not strict and int(self._records[ids[0]]["rank"]) > self.loose_rank):
+            return None
+        return self._match(ids[0], mention)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mmap is None:
+                return
+            mapped, self._mmap = self._mmap, None
+            self._strings.release()
+            self._chains = self._records = self._keys = self._postings = self._slots = self._strings = None
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # A caller still holds a view; the mapping goes when it is released
+
+    def stats(self) -> dict:
+        stats = {"available": self.available, "path": str(self.path), "lookups": self.lookups, "resolved": self.resolved}
+        if self._mmap is not None:
+            stats.update(
+                chains=sorted(self._chain_ids), tokens=len(self._records), keys=len(self._keys), bytes=len(self._mmap),
+            )
+        return stats
+
+
+def load_token_source(path, chain: Optional[str] = None) -> List[TokenRecord]:
+    """
+    Token records from a CSV (chain,symbol,name,mint[,decimals,rank,aliases]
+    with `;`-separated aliases) or a JSON token list (Jupiter/Uniswap style:
+    a list, or {"tokens": [...]}, of objects with address/symbol/name/decimals).
+    Without a rank column the file order is the rank.
+    """
+    import csv
+    import json
+
+    path = Path(path)
+    records = []
+    if path.suffix.lower() == ".json":
+        data = json.loads(path.read_text())
+        for i, item in enumerate(data.get("tokens", []) if isinstance(data, dict) else data):
+            item_chain = item.get("chain") or item.get("blockchain") or chain
+            if not item_chain or not item.get("address") or not item.get("symbol"):
+                continue
+            records.append(TokenRecord(
+                chain=str(item_chain).lower(), symbol=item["symbol"], name=item.get("name") or item["symbol"],
+                mint=item["address"], decimals=int(item.get("decimals", -1)), rank=int(item.get("rank", i + 1)),
+                aliases=tuple(item.get("aliases") or ()),
+            ))
+        return records
+    with open(path, newline="") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            row_chain = row.get("chain") or chain
+            if not row_chain or not row.get("mint") or not row.get("symbol"):
+                continue
+            records.append(TokenRecord(
+                chain=row_chain.lower(), symbol=row["symbol"], name=row.get("name") or row["symbol"], mint=row["mint"],
+                decimals=int(row.get("decimals") or -1), rank=int(row.get("rank") or i + 1),
+                aliases=tuple(a.strip() for a in (row.get("aliases") or "").split(";") if a.strip()),
+            ))
+    return records
+
+
+# Initialize the index once (the file is mapped on the first lookup)
+token_index = TokenIndex(
+    path=settings.TOKEN_INDEX_PATH,
+    loose_rank=settings.TOKEN_INDEX_LOOSE_RANK,
+    max_matches=settings.TOKEN_INDEX_MAX_MATCHES,
+)
@@ -0,0 +1,127 @@
+"""
+Local SQL validation (Trino dialect, CPU only, ~1 ms per query).
+
+Catches what would otherwise fail (or scan everything) on the warehouse:
+- the text must parse as exactly one read-only query,
+- only tables declared in the schema registry (the prompt's tables) may be
+  used (CTE names are fine),
+- every partitioned table must be filtered on one of its partition keys
+  (`block_time`, `block_date`, `day`) in a WHERE or JOIN condition of the
+  query block that reads it or of one wrapping it (the prompt's "time
+  filter" rule).
+
+The validator node in the agent graph sends the errors back to the generator
+for a bounded number of repair attempts.
+"""
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, TokenError
+from sqlglot.optimizer.scope import Scope, traverse_scope
+
+from app.agent.schema import SOLANA_SCHEMA, SchemaRegistry
+
+DIALECT = "trino"
+
+# Top-level statements that only read
+READ_ONLY = (exp.Select, exp.Union, exp.Intersect, exp.Except)
+
+
+@dataclass(frozen=True)
+class ValidationResult:
+    errors: Tuple[str, ...] = ()
+    tables: Tuple[str, ...] = ()           # Declared tables the query reads
+    tree: Optional[exp.Expression] = field(default=None, compare=False, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def message(self) -> str:
+        return "; ".join(self.errors)
+
+
+def parse_sql(sql: str) -> exp.Expression:
+    """Exactly one Trino statement, or ParseError with a short description."""
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=DIALECT) if s is not None]
+    except ParseError as e:
+        first = e.errors[0] if e.errors else {}
+        where = f" (line {first['line']}, col {first['col']})" if "line" in first else ""
+        raise ParseError(f"Syntax error: {first.get('description', str(e))}{where}") from None
+    except TokenError as e:
+        raise ParseError(f"Syntax error: {e}") from None
+    if len(statements) != 1:
+        raise ParseError(f"Expected exactly one SQL statement, got {len(statements)}")
+    return statements[0]
+
+
+def table_name(table: exp.Table) -> str:
+    return ".".join(part for part in (table.catalog, table.db, table.name) if part).lower()
+
+
+def conditions(select: exp.Expression) -> List[exp.Expression]:
+    """The WHERE and JOIN ... ON conditions of one query block."""
+    found = [select.args.get("where")]
+    found += [join.args.get("on") for join in select.args.get("joins") or []]
+    return [condition.this if isinstance(condition, exp.Where) else condition for condition in found if condition is not None]
+
+
+def enclosing_scopes(scope, alias: str) -> Iterator[Tuple[Scope, str]]:
+    """
+    (scope, alias) for the query block reading `alias`, then for each block
+    wrapping it through a CTE / derived table (with the name it has there);
+    Trino pushes predicates of the outer blocks down to the scan.
+    """
+    while scope is not None:
+        yield scope, alias
+        parent = scope.parent
+        alias = next((name for name, source in (parent.sources.items() if parent else ()) if source is scope), None)
+        if alias is None:
+            return
+        scope = parent
+
+
+def _has_partition_filter(scope: Scope, alias: str, keys: Tuple[str, ...]) -> bool:
+    """A partition key of `alias` is filtered in its query block or an enclosing one."""
+    return any(
+        column.name.lower() in keys and column.table in ("", name)
+        for block, name in enclosing_scopes(scope, alias)
+        for condition in conditions(block.expression)
+        for column in condition.find_all(exp.Column)
+    )
+
+
+def validate_sql(sql: Optional[str], registry: SchemaRegistry = SOLANA_SCHEMA) -> ValidationResult:
+    if not sql or not sql.strip():
+        return ValidationResult(errors=("Empty SQL",))
+    try:
+        tree = parse_sql(sql)
+    except ParseError as e:
+        return ValidationResult(errors=(str(e),))
+
+    errors: List[str] = []
+    if not isinstance(tree, READ_ONLY):
+        errors.append(f"Only SELECT queries are allowed, got {tree.key.upper()}")
+        return ValidationResult(errors=tuple(errors), tree=tree)
+
+    used: List[str] = []
+    for scope in traverse_scope(tree):
+        for alias, source in scope.sources.items():
+            if not isinstance(source, exp.Table):
+                continue  # CTE or subquery: checked in its own scope
+            name = table_name(source)
+            spec = registry.table(name)
+            if spec is None:
+                errors.append(f"Unknown table {name} (use only: {', '.join(registry.table_names)})")
+                continue
+            if name not in used:
+                used.append(name)
+            if spec.partition_keys and not _has_partition_filter(scope, alias, spec.partition_keys):
+                errors.append(
+                    f"Missing time filter on {name}: add a WHERE condition on "
+                    f"{' or '.join(spec.partition_keys)} (e.g. block_time > now() - interval '7' day)"
+                )
+    return ValidationResult(errors=tuple(dict.fromkeys(errors)), tables=tuple(used), tree=tree)
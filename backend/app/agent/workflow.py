@@ -1,20 +1,55 @@
 """
-Agent workflow module - exports the compiled LangGraph agent
+Agent workflow module - exports the compiled LangGraph agent (built once per process)
 """
 from langgraph.graph import StateGraph, END
 from app.agent.state import AgentState
-from app.agent.nodes import generate_sql
+from app.core.config import settings
+from app.agent.nodes import (
+    dry_run_sql, generate_sql, resolve_tokens, rewrite_generated_sql, route_after_validation, validate_generated_sql,
+)
+from app.core.metrics import timed_node
+from app.core.tracing import traced_node, tracer
 
-# 1. Initialize the Graph
-workflow = StateGraph(AgentState)
 
-# 2. Add Nodes
-workflow.add_node("generator", generate_sql)
+def build_agent():
+    # 1. Initialize the Graph
+    workflow = StateGraph(AgentState)
 
-# 3. Define Edges (The Flow)
-# Start -> Generator -> End
-workflow.set_entry_point("generator")
-workflow.add_edge("generator", END)
+    # 2. Add Nodes
+    if settings.TOKEN_INDEX_ENABLED:
+        workflow.add_node("tokens", timed_node("tokens", traced_node("tokens", resolve_tokens, tracer)))
+    workflow.add_node("generator", timed_node("generator", traced_node("generator", generate_sql, tracer)))
+    if settings.SQL_REWRITE_ENABLED:
+        workflow.add_node("rewriter", timed_node("rewriter", traced_node("rewriter", rewrite_generated_sql, tracer)))
+    if settings.SQL_VALIDATION_ENABLED:
+        workflow.add_node("validator", timed_node("validator", traced_node("validator", validate_generated_sql, tracer)))
+    if settings.DRY_RUN_NODE_ENABLED:
+        workflow.add_node("dry_run", timed_node("dry_run", traced_node("dry_run", dry_run_sql, tracer)))
 
-# 4. Compile the Graph
-agent_app = workflow.compile()
+    # 3. Define Edges (The Flow)
+    # Start -> Tokens -> Generator -> Rewriter -> Validator -> Dry run -> End
+    # (the validator and dry run can send the SQL back to the Generator to repair;
+    # tokens are resolved once, before the first generation)
+    if settings.TOKEN_INDEX_ENABLED:
+        workflow.set_entry_point("tokens")
+        workflow.add_edge("tokens", "generator")
+    else:
+        workflow.set_entry_point("generator")
+    last = "generator"
+    if settings.SQL_REWRITE_ENABLED:
+        workflow.add_edge(last, "rewriter")
+        last = "rewriter"
+    done = "dry_run" if settings.DRY_RUN_NODE_ENABLED else END
+    if settings.SQL_VALIDATION_ENABLED:
+        workflow.add_edge(last, "validator")
+        workflow.add_conditional_edges("validator", route_after_validation, {"generator": "generator", END: done})
+    else:
+        workflow.add_edge(last, done)
+    if settings.DRY_RUN_NODE_ENABLED:
+        workflow.add_conditional_edges("dry_run", route_after_validation, {"generator": "generator", END: END})
+
+    # 4. Compile the Graph
+    return workflow.compile()
+
+
+agent_app = build_agent()
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.core.database import get_db
 from app.models.sql import User
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import password_hasher, HasherBusy, create_access_token
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -19,6 +19,14 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+def auth_busy() -> HTTPException:
+    """Password hashing pool saturated (login storm): shed load instead of queueing."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/signup", response_model=Token)
 async def signup(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     # 1. Check if email exists
@@ -29,10 +37,14 @@ async def signup(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
             detail="Email already registered"
         )
     
-    # 2. Create User
+    # 2. Create User (bcrypt runs in the hashing pool, not on the event loop)
+    try:
+        hashed_password = await password_hasher.hash(user_in.password)
+    except HasherBusy:
+        raise auth_busy()
     new_user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         full_name=user_in.full_name
     )
     db.add(new_user)
@@ -51,7 +63,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        valid = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
+    except HasherBusy:
+        raise auth_busy()
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -1,3 +1,4 @@
+import uuid
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -7,36 +8,69 @@ from sqlalchemy.future import select
 from app.core.database import get_db
 from app.core.config import settings
 from app.core.security import ALGORITHM
+from app.core.user_cache import user_cache
+from app.core.tracing import tracer
 from app.models.sql import User
 
 # This tells FastAPI where to look for the token (Authorization: Bearer <token>)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
+def decode_token_subject(token: Optional[str]) -> Optional[str]:
+    """The verified `sub` claim (user id), or None for a missing/invalid/expired token."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        subject = payload.get("sub")
+        uuid.UUID(str(subject))
+        return str(subject)
+    except (JWTError, ValueError):
+        return None  # Invalid token, treat as guest
+
 async def get_current_user_optional(
     token: Optional[str] = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db),
 ) -> Optional[User]:
     """
     HYBRID AUTH:
-    - If Token exists & is valid -> Return User object.
+    - If Token exists & is valid -> Return User object (cached, read-only).
     - If Token is missing/invalid -> Return None (Treat as Guest).
     """
-    if not token:
-        return None
-
-    try:
+    with tracer.span("auth.resolve_user") as span:
         # 1. Decode the Token
-        payload = jwt.decode(token, settings.OPENAI_API_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        user_id = decode_token_subject(token)
         if user_id is None:
             return None
-    except JWTError:
-        return None  # Invalid token, treat as guest
 
-    # 2. Fetch User from DB
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalars().first()
-    return user
+        # 2. Resolved recently? (no DB round trip)
+        user = user_cache.get(user_id)
+        if span is not None:
+            span.set("auth.cache_hit", user is not None)
+        if user is not None:
+            return user
+
+        # 3. Fetch User from DB
+        result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
+        user = result.scalars().first()
+        if user is not None:
+            user_cache.put(user)
+        return user
+
+async def get_current_user_id_optional(
+    token: Optional[str] = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> Optional[uuid.UUID]:
+    """
+    HYBRID AUTH for routes that only need the user id (e.g. /generate).
+    With AUTH_TRUST_TOKEN_CLAIMS the signed token is enough (no lookup at all);
+    otherwise the user must still exist (cached lookup).
+    """
+    if settings.AUTH_TRUST_TOKEN_CLAIMS:
+        with tracer.span("auth.token_claims"):
+            user_id = decode_token_subject(token)
+        return uuid.UUID(user_id) if user_id else None
+    user = await get_current_user_optional(token, db)
+    return user.id if user else None
 
 async def get_current_user(
     user: Optional[User] = Depends(get_current_user_optional)
@@ -0,0 +1,85 @@
+from typing import Tuple
+
+import pyarrow as pa
+from fastapi import APIRouter, Depends, HTTPException
+from app.agent.cache import CACHE_DISABLED, CACHE_HIT, CACHE_MISS
+from app.agent.schema import SOLANA_SCHEMA, SchemaRegistry
+from app.agent.validation import READ_ONLY, validate_sql
+from app.api.deps import get_current_user
+from app.core.metrics import ERRORS, cache_outcome
+from app.core.singleflight import SingleFlight
+from app.execution.dry_run import dry_run_executor, to_json_value
+from app.execution.dune import DuneError, DuneTimeout, dune_client
+from app.execution.result_cache import result_cache
+from app.models.sql import User
+from app.schemas.requests import DryRunRequest, DryRunResponse, DuneExecuteRequest, DuneExecuteResponse
+
+router = APIRouter()
+
+# Identical SQL submitted at the same time runs once on Dune
+inflight_executions = SingleFlight()
+
+
+async def run_on_dune(sql: str, registry: SchemaRegistry = SOLANA_SCHEMA) -> Tuple[pa.Table, dict, str]:
+    """
+    (table, execution meta, cache status) of `sql` on Dune: from the result
+    cache, else executed (once for concurrent identical SQL) and cached.
+    Shared by POST /execute/dune and GET /queries/{id}/results.
+    """
+    validation = validate_sql(sql, registry)
+    if not validation.ok:
+        raise HTTPException(status_code=400, detail=validation.message())
+    if not dune_client.configured:
+        raise HTTPException(status_code=503, detail="Dune execution is not configured (DUNE_API_KEY)")
+
+    key = result_cache.make_key(sql)
+    cached = result_cache.get(key)
+    if cached is not None:
+        table, meta = cached
+        cache_status = CACHE_HIT
+    else:
+        try:
+            result = await inflight_executions.do(key, lambda: dune_client.execute(sql))
+        except DuneTimeout as e:
+            ERRORS.labels("dune").inc()
+            raise HTTPException(status_code=504, detail=str(e))
+        except DuneError as e:
+            ERRORS.labels("dune").inc()
+            raise HTTPException(status_code=502, detail=str(e))
+        table, meta = result.table, result.meta()
+        cache_status = CACHE_MISS if result_cache.enabled else CACHE_DISABLED
+        result_cache.put(key, table, meta)
+    cache_outcome("dune", cache_status)
+    return table, meta, cache_status
+
+
+@router.post("/dry-run", response_model=DryRunResponse)
+async def dry_run(request: DryRunRequest):
+    """
+    Runs Trino SQL on DuckDB over the synthetic Parquet fixtures (never on Dune).
+    Returns the row count, a sample of rows and the runtime. Validation problems
+    (e.g. a missing time filter) are returned as warnings; only SQL that doesn't
+    parse or isn't a SELECT is refused.
+    """
+    validation = validate_sql(request.sql)
+    if validation.tree is None or not isinstance(validation.tree, READ_ONLY):
+        raise HTTPException(status_code=400, detail=validation.message())
+
+    result = await dry_run_executor.arun(request.sql)
+    if result.error_kind == "unavailable":
+        raise HTTPException(status_code=503, detail=result.error)
+    return DryRunResponse(**result.to_dict(), warnings=list(validation.errors))
+
+
+@router.post("/dune", response_model=DuneExecuteResponse)
+async def execute_on_dune(request: DuneExecuteRequest, current_user: User = Depends(get_current_user)):
+    """
+    Executes SQL on Dune (login required: it spends the API key's credits).
+    Only SQL that passes validation is submitted. Results are cached per worker
+    by normalized SQL + time bucket, so repeated runs within
+    DUNE_CACHE_BUCKET_SECONDS are answered without Dune.
+    """
+    table, meta, cache_status = await run_on_dune(request.sql)
+    columns = table.column_names
+    rows = [[to_json_value(value) for value in row.values()] for row in table.to_pylist()]
+    return DuneExecuteResponse(**meta, columns=columns, rows=rows, row_count=table.num_rows, cache_status=cache_status)
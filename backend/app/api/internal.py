@@ -0,0 +1,84 @@
+from fastapi import APIRouter
+from app.agent.cache import response_cache
+from app.agent.semantic_cache import semantic_cache
+from app.agent.prompts import prompt_stats
+from app.agent.chains import chain_packs
+from app.agent.tokens import token_index
+from app.agent.resilience import llm_invoker
+from app.api.routes import inflight_generations, history_writer
+from app.core.user_cache import user_cache
+from app.core.security import password_hasher
+from app.core.database import pool_stats
+from app.core.tracing import tracer
+from app.execution.dry_run import dry_run_executor
+from app.execution.dune import dune_client
+from app.execution.result_cache import result_cache
+
+router = APIRouter()
+
+# Operational endpoints (stats for sizing caches/pools). Not used by the frontend.
+
+@router.get("/cache")
+async def cache_stats():
+    """Response cache hit/miss counters for this worker."""
+    return response_cache.stats()
+
+@router.get("/semantic-cache")
+async def semantic_cache_stats():
+    """Semantic cache size, hit rate and lookup latency for this worker."""
+    return semantic_cache.stats()
+
+@router.get("/singleflight")
+async def singleflight_stats():
+    """Coalescing of concurrent identical /generate requests for this worker."""
+    return inflight_generations.stats()
+
+@router.get("/history-writer")
+async def history_writer_stats():
+    """Write-behind queue depth, batch sizes, overflows and dropped rows for this worker."""
+    return history_writer.stats()
+
+@router.get("/user-cache")
+async def user_cache_stats():
+    """JWT subject -> user cache hit rate for this worker."""
+    return user_cache.stats()
+
+@router.get("/password-hasher")
+async def password_hasher_stats():
+    """Password hashing pool load and 503 rejections for this worker."""
+    return password_hasher.stats()
+
+@router.get("/db-pool")
+async def db_pool_stats():
+    """DB connections checked out / idle / overflow and checkout wait times for this worker."""
+    return pool_stats()
+
+@router.get("/prompt")
+async def prompt_size_stats():
+    """System prompt tokens: full prompt vs. what retrieval actually sent, and the compiled chain packs."""
+    return {**prompt_stats.stats(), "chains": chain_packs.stats()}
+
+@router.get("/tokens")
+async def token_index_stats():
+    """Token registry: index file, tokens/keys mapped, mention lookups and tokens resolved for this worker."""
+    return token_index.stats()
+
+@router.get("/llm")
+async def llm_stats():
+    """LLM latency percentiles, hedge rate/win rate and circuit breaker state per provider."""
+    return llm_invoker.stats()
+
+@router.get("/tracing")
+async def tracing_stats():
+    """Sampling ratio and span export counters (exported/dropped/failed) for this worker."""
+    return tracer.stats()
+
+@router.get("/dry-run")
+async def dry_run_stats():
+    """DuckDB dry runs: fixtures available, runs, failures, timeouts and runtimes for this worker."""
+    return dry_run_executor.stats()
+
+@router.get("/dune")
+async def dune_stats():
+    """Dune executions (submitted/completed/failed/timeouts, polls, retries) and result cache usage for this worker."""
+    return {"client": dune_client.stats(), "cache": result_cache.stats()}
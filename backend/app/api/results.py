@@ -0,0 +1,128 @@
+import hashlib
+import hmac
+import uuid
+from typing import Optional, Tuple
+
+import pyarrow as pa
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.agent.chains import UnknownChain, chain_packs
+from app.api.deps import get_current_user
+from app.api.execute import run_on_dune
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import ERRORS
+from app.core.pagination import InvalidCursor, decode_offset_cursor, encode_offset_cursor
+from app.execution.dune import DuneError, dune_client
+from app.execution.result_cache import result_cache
+from app.execution.result_stream import ARROW_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE, arrow_ipc_chunks, ndjson_chunks
+from app.models.sql import User, UserQuery
+
+router = APIRouter()
+
+
+def _signature(query_id: uuid.UUID, execution_id: str) -> str:
+    # Cursors name a Dune execution; the signature stops them being pointed at another query's results
+    message = f"{query_id}:{execution_id}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:16]
+
+
+def make_results_cursor(query_id: uuid.UUID, execution_id: str, offset: int) -> str:
+    return encode_offset_cursor(f"{execution_id}.{_signature(query_id, execution_id)}", offset)
+
+
+def read_results_cursor(query_id: uuid.UUID, cursor: str) -> Tuple[str, int]:
+    """(execution id, row offset) of a cursor issued for this query."""
+    token, offset = decode_offset_cursor(cursor)
+    execution_id, _, signature = token.rpartition(".")
+    if not execution_id or not hmac.compare_digest(signature, _signature(query_id, execution_id)):
+        raise InvalidCursor("Invalid cursor")
+    return execution_id, offset
+
+
+async def result_page(
+    execution_id: str, table: Optional[pa.Table], total_rows: int, offset: int, limit: int
+) -> Tuple[pa.Table, int]:
+    """
+    (rows [offset, offset + limit), total rows). A window inside the fetched
+    table is a zero-copy slice of it; beyond it (results truncated at
+    DUNE_MAX_RESULT_ROWS, or the cache entry is gone) it is fetched from Dune.
+    """
+    if table is not None and min(offset + limit, total_rows) <= table.num_rows:
+        return table.slice(offset, limit), total_rows
+    if not dune_client.configured:
+        raise HTTPException(status_code=503, detail="Dune execution is not configured (DUNE_API_KEY)")
+    try:
+        page, _, total_rows = await dune_client.results(execution_id, offset=offset, limit=limit)
+    except DuneError as e:
+        ERRORS.labels("dune").inc()
+        if e.status_code == 404:
+            raise HTTPException(status_code=410, detail="Results expired on Dune; request the first page again")
+        raise HTTPException(status_code=502, detail=str(e))
+    return page, max(total_rows, offset + page.num_rows)
+
+
+@router.get("/queries/{query_id}/results")
+async def get_query_results(
+    query_id: uuid.UUID,
+    format: str = Query("ndjson", pattern="^(ndjson|arrow)$"),
+    limit: int = Query(settings.RESULTS_PAGE_DEFAULT_ROWS, ge=1, le=settings.RESULTS_PAGE_MAX_ROWS),
+    cursor: Optional[str] = None,
+    session_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Runs a saved query's SQL on Dune and streams one page of its rows,
+    as NDJSON (one object per row, `format=ndjson`) or an Arrow IPC stream
+    (`format=arrow`). Login required; queries made as a guest are readable
+    with their `session_id`.
+    Next page: pass the X-Next-Cursor response header back as `cursor`
+    (absent on the last page).
+    """
+    query = await db.get(UserQuery, query_id)
+    if query is None or not (
+        query.user_id == current_user.id or (session_id is not None and query.session_id == session_id)
+    ):
+        raise HTTPException(status_code=404, detail="Query not found")
+    if not query.sql_output:
+        raise HTTPException(status_code=409, detail="Query has no SQL to run")
+
+    headers = {}
+    if cursor:
+        try:
+            execution_id, offset = read_results_cursor(query_id, cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Later pages come from the cached table while it holds this execution, else from Dune
+        table, total_rows = None, offset
+        cached = result_cache.get(result_cache.make_key(query.sql_output))
+        if cached is not None and cached[1].get("execution_id") == execution_id:
+            table = cached[0]
+            total_rows = cached[1].get("total_rows", table.num_rows)
+    else:
+        offset = 0
+        try:
+            registry = chain_packs.get(query.chain).registry
+        except UnknownChain as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        table, meta, cache_status = await run_on_dune(query.sql_output, registry)
+        execution_id = meta["execution_id"]
+        total_rows = meta.get("total_rows", table.num_rows)
+        headers["X-Cache-Status"] = cache_status
+        headers["X-Executed-At"] = meta["executed_at"]
+
+    page, total_rows = await result_page(execution_id, table, total_rows, offset, limit)
+    next_offset = offset + page.num_rows
+    if page.num_rows and next_offset < total_rows:
+        headers["X-Next-Cursor"] = make_results_cursor(query_id, execution_id, next_offset)
+    headers["X-Execution-Id"] = execution_id
+    headers["X-Total-Rows"] = str(total_rows)
+
+    if format == "arrow":
+        chunks, media_type = arrow_ipc_chunks(page, settings.RESULTS_CHUNK_ROWS), ARROW_STREAM_MEDIA_TYPE
+    else:
+        chunks, media_type = ndjson_chunks(page, settings.RESULTS_CHUNK_ROWS), NDJSON_MEDIA_TYPE
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
@@ -1,73 +1,369 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import logging
+import uuid
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.metrics import ERRORS, cache_outcome
+from app.core.tracing import tracer
+from app.core.database import get_db, async_session_factory
 from app.agent.workflow import agent_app
+from app.agent.cache import response_cache, CACHE_MISS
+from app.agent.cost import scan_estimator
+from app.agent.semantic_cache import semantic_cache
+from app.agent.streaming import FenceStripper, sse_event
+from app.core.singleflight import SingleFlight
+from app.core.write_behind import WriteBehindQueue
 from app.models.sql import UserQuery, User
-from app.schemas.requests import QueryRequest, QueryResponse
-from app.api.deps import get_current_user_optional
+from app.schemas.requests import (
+    QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, BatchItemResult
+)
+from app.core.pagination import InvalidCursor, keyset_page, split_page
+from app.api.deps import get_current_user_id_optional, get_current_user
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Identical questions in flight at the same time share one agent run
+inflight_generations = SingleFlight()
+
+# History rows (+ new cache entries) written in batches off the request path
+history_writer = WriteBehindQueue(
+    async_session_factory,
+    UserQuery,
+    cache=response_cache,
+    enabled=settings.HISTORY_WRITE_BEHIND,
+    max_rows=settings.HISTORY_QUEUE_MAX_ROWS,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    linger=settings.HISTORY_FLUSH_LINGER_MS / 1000,
+    enqueue_timeout=settings.HISTORY_ENQUEUE_TIMEOUT_MS / 1000,
+    max_retries=settings.HISTORY_FLUSH_MAX_RETRIES,
+)
+
+
+async def run_agent(request: QueryRequest, cache_key: str) -> dict:
+    """
+    Runs the Agent (only pass fields in AgentState).
+    Concurrent callers with the same key await the leader's run.
+    """
+    inputs = {"user_input": request.user_input, "chain": request.chain}
+    with tracer.span("agent.graph"):
+        return await inflight_generations.do(cache_key, lambda: agent_app.ainvoke(inputs))
+
+
+async def save_query(db: AsyncSession, db_query: UserQuery, cache_key: str, cache_status: str) -> None:
+    """
+    Persists a history row, plus its cache entry if it is a new successful result.
+    Queued for the write-behind writer when enabled, otherwise committed now.
+    """
+    cache_entry = None
+    # Only successful generations are cached
+    if cache_status == CACHE_MISS and db_query.sql_output and not db_query.error_message:
+        cache_entry = (cache_key, db_query.chain, {"sql_output": db_query.sql_output, "original_sql": db_query.original_sql})
+
+    with tracer.span("db.save_query") as span:
+        if await history_writer.submit(db_query, cache_entry):
+            if span is not None:
+                span.set("db.write_behind", True)
+            return
+
+        db.add(db_query)
+        if cache_entry:
+            await response_cache.put(db, *cache_entry)
+        await db.commit()
+        await db.refresh(db_query)
+
 @router.post("/generate", response_model=QueryResponse)
 async def generate_query(
     request: QueryRequest, 
     db: AsyncSession = Depends(get_db),
-    # Inject the user (if logged in) or None (if guest)
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    # Inject the user id (if logged in) or None (if guest)
+    current_user_id: Optional[uuid.UUID] = Depends(get_current_user_id_optional)
 ):
     """
     HYBRID ENDPOINT:
     1. Receives natural language from user.
-    2. Runs the LangGraph Agent.
-    3. Saves the result with session_id (always) and user_id (if authenticated).
-    4. Returns the SQL.
+    2. Checks the response cache, runs the LangGraph Agent on a miss.
+    3. Saves the result with session_id (always) and user_id (if authenticated),
+       or queues it for the background writer (HISTORY_WRITE_BEHIND).
+    4. Returns the SQL (with cache_status hit/miss).
     """
-    # 1. Run the Agent (only pass fields in AgentState)
-    inputs = {"user_input": request.user_input}
-    result = await agent_app.ainvoke(inputs)
+    # 1. Cache lookup (a hit skips the LLM entirely)
+    cache_key = response_cache.make_key(request.user_input, request.chain)
+    with tracer.span("cache.lookup"):
+        result, cache_status = await response_cache.get(db, cache_key)
+    cache_outcome("response", cache_status)
+
+    if result is None:
+        result = await run_agent(request, cache_key)
+        semantic_cache.add_result(request.user_input, request.chain, result)
     
     sql_result = result.get("sql_output")
     error_msg = result.get("error")
+    if error_msg:
+        ERRORS.labels("agent").inc()
 
-    # Debug logging
-    print(f"Agent Result: sql_output={sql_result[:100] if sql_result else None}, error={error_msg}")
+    logger.debug("Agent result: sql_output=%.100s error=%s cache=%s", sql_result, error_msg, cache_status)
 
     # 2. Save to DB (Hybrid Logic)
     db_query = UserQuery(
         user_input=request.user_input,
         sql_output=sql_result or "",
+        original_sql=result.get("original_sql"),
         error_message=error_msg,
         chain=request.chain,
         session_id=request.session_id,  # Always save session_id (for device history)
         
         # LINK USER IF LOGGED IN
-        user_id=current_user.id if current_user else None
+        user_id=current_user_id
     )
     
-    db.add(db_query)
+    # 3. Commit (or queue) the row, with the new cache entry
+    await save_query(db, db_query, cache_key, cache_status)
+
+    response = QueryResponse.model_validate(db_query)
+    response.cache_status = cache_status
+    response.scan_estimate = scan_estimator.for_result(result, request.chain)
+    response.dry_run = result.get("dry_run")
+    return response
+
+@router.post("/generate/stream")
+async def generate_query_stream(
+    request: QueryRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: Optional[uuid.UUID] = Depends(get_current_user_id_optional)
+):
+    """
+    STREAMING ENDPOINT (Server-Sent Events):
+    - `start`: sent immediately, carries the query id.
+    - `token`: SQL text as the model produces it (markdown fences stripped on the fly).
+    - `reset`: the SQL streamed so far failed validation and is being
+      regenerated; discard the tokens received since `start`.
+    - `error`: generation failed (the row is still saved).
+    - `done`: the saved QueryResponse (final SQL after all graph nodes).
+    The UserQuery row is persisted once the stream completes, fails or is dropped.
+    """
+    # Don't hold a pool connection for the whole stream; the session is reused at the end
+    await db.close()
+
+    async def event_stream():
+        query_id = uuid.uuid4()
+        yield sse_event("start", {"id": query_id})
+
+        sql_result, error_msg, result = None, None, {}
+        cache_status, streamed = CACHE_MISS, False
+        graph_span = None
+        cache_key = response_cache.make_key(request.user_input, request.chain)
+        try:
+            with tracer.span("cache.lookup"):
+                result, cache_status = await response_cache.get(db, cache_key)
+            cache_outcome("response", cache_status)
+            await db.close()
+
+            if result is None:
+                # Not made current: the span would straddle the yields below
+                graph_span = tracer.start_span("agent.graph")
+                stripper = FenceStripper()
+                result, repairs = {}, 0
+                inputs = {"user_input": request.user_input, "chain": request.chain}
+                async for mode, payload in agent_app.astream(
+                    inputs,
+                    {"configurable": {"hedge": False}},  # A hedge would interleave two token streams
+                    stream_mode=["messages", "values"],
+                ):
+                    if mode == "values":
+                        result = payload
+                        if (payload.get("repairs") or 0) > repairs:
+                            # The validator sent the SQL back: the client drops the tokens so far
+                            repairs = payload["repairs"]
+                            stripper, streamed = FenceStripper(), False
+                            yield sse_event("reset", {"reason": payload.get("validation_error")})
+                        continue
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") != "generator" or not isinstance(chunk.content, str):
+                        continue
+                    text = stripper.feed(chunk.content)
+                    if text:
+                        streamed = True
+                        yield sse_event("token", {"text": text})
+                tail = stripper.finish()
+                tracer.end_span(graph_span)
+                graph_span = None
+                semantic_cache.add_result(request.user_input, request.chain, result)
+                if tail:
+                    streamed = True
+                    yield sse_event("token", {"text": tail})
+
+            sql_result = result.get("sql_output")
+            error_msg = result.get("error")
+            # Cache hits and semantic-cache answers have no token stream
+            if sql_result and not streamed:
+                yield sse_event("token", {"text": sql_result})
+        except Exception as e:
+            error_msg = str(e)
+            tracer.end_span(graph_span, e)
+        except BaseException as e:
+            error_msg = "Stream cancelled by client"
+            tracer.end_span(graph_span, e)
+            raise
+        finally:
+            if error_msg:
+                ERRORS.labels("agent").inc()
+            # Persist even if the client disconnected mid-stream
+            with anyio.CancelScope(shield=True):
+                db_query = UserQuery(
+                    id=query_id,
+                    user_input=request.user_input,
+                    sql_output=sql_result or "",
+                    original_sql=result.get("original_sql"),
+                    error_message=error_msg,
+                    chain=request.chain,
+                    session_id=request.session_id,
+                    user_id=current_user_id
+                )
+                await save_query(db, db_query, cache_key, cache_status)
+
+        if error_msg:
+            yield sse_event("error", {"detail": error_msg})
+        response = QueryResponse.model_validate(db_query)
+        response.cache_status = cache_status
+        response.scan_estimate = scan_estimator.for_result(result, request.chain)
+        response.dry_run = result.get("dry_run")
+        yield sse_event("done", response.model_dump(mode="json"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/generate/batch", response_model=BatchQueryResponse)
+async def generate_query_batch(
+    batch: BatchQueryRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: Optional[uuid.UUID] = Depends(get_current_user_id_optional)
+):
+    """
+    BATCH ENDPOINT (dashboards, up to BATCH_MAX_ITEMS questions):
+    1. One cache lookup for the whole batch.
+    2. Agent runs for the misses, at most BATCH_CONCURRENCY at a time.
+    3. One bulk INSERT for all history rows + one upsert for new cache entries.
+    Results keep input order; a failing item doesn't fail the batch.
+    The DB connection is only used at the start and the end, never during LLM calls.
+    """
+    items = batch.items
+    keys = [response_cache.make_key(item.user_input, item.chain) for item in items]
+
+    # 1. Cache lookup, then release the connection while the agent runs
+    cached = await response_cache.get_many(db, keys)
+    for key in keys:
+        cache_outcome("response", cached[key][1])
+    await db.close()
+
+    # 2. Run the misses with bounded concurrency
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def run_item(item: QueryRequest, key: str) -> dict:
+        result, _ = cached[key]
+        if result is not None:
+            return result
+        async with semaphore:
+            try:
+                result = await run_agent(item, key)
+                semantic_cache.add_result(item.user_input, item.chain, result)
+                return result
+            except Exception as e:
+                return {"sql_output": None, "error": str(e)}
+
+    results = await asyncio.gather(*[run_item(item, key) for item, key in zip(items, keys)])
+
+    # 3. Bulk persistence
+    rows, new_cache_entries = [], []
+    for item, key, result in zip(items, keys, results):
+        sql_result = result.get("sql_output")
+        error_msg = result.get("error")
+        if error_msg:
+            ERRORS.labels("agent").inc()
+        rows.append(UserQuery(
+            user_input=item.user_input,
+            sql_output=sql_result or "",
+            original_sql=result.get("original_sql"),
+            error_message=error_msg,
+            chain=item.chain,
+            session_id=item.session_id,
+            user_id=current_user_id
+        ))
+        if cached[key][1] == CACHE_MISS and sql_result and not error_msg:
+            new_cache_entries.append((key, item.chain, {"sql_output": sql_result, "original_sql": result.get("original_sql")}))
+
+    await db.execute(insert(UserQuery), [row.model_dump() for row in rows])
+    await response_cache.put_many(db, new_cache_entries)
     await db.commit()
-    await db.refresh(db_query)
 
-    return db_query
+    # 4. Per-item report, in input order
+    report = []
+    for index, (row, key, result) in enumerate(zip(rows, keys, results)):
+        response = QueryResponse.model_validate(row)
+        response.cache_status = cached[key][1]
+        response.scan_estimate = scan_estimator.for_result(result, row.chain)
+        response.dry_run = result.get("dry_run")
+        ok = bool(row.sql_output) and not row.error_message
+        report.append(BatchItemResult(
+            index=index,
+            ok=ok,
+            result=response,
+            error=None if ok else (row.error_message or "Empty SQL output")
+        ))
+
+    succeeded = sum(1 for item in report if item.ok)
+    return BatchQueryResponse(results=report, succeeded=succeeded, failed=len(report) - succeeded)
+
+async def history_page(db: AsyncSession, statement, cursor: Optional[str], limit: int, response: Response) -> list:
+    """Runs a keyset page query; the next page's cursor goes in the X-Next-Cursor header."""
+    try:
+        statement = keyset_page(statement, UserQuery, cursor, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    result = await db.execute(statement)
+    rows, next_cursor = split_page(result.scalars().all(), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 @router.get("/history", response_model=list[QueryResponse])
 async def get_history(
+    response: Response,
     session_id: str,  # <--- Require session_id as a query param
-    limit: int = 10, 
+    limit: int = Query(10, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Fetch history for a specific Guest Session.
+    Fetch history for a specific Guest Session, newest first.
     Usage: GET /api/v1/history?session_id=123-abc
+    Next page: pass the X-Next-Cursor response header back as `cursor`
+    (absent on the last page).
     """
-    statement = (
-        select(UserQuery)
-        .where(UserQuery.session_id == session_id)  # <--- Filter by ID
-        .order_by(UserQuery.created_at.desc())
-        .limit(limit)
-    )
-    result = await db.execute(statement)
-    return result.scalars().all()
+    statement = select(UserQuery).where(UserQuery.session_id == session_id)  # <--- Filter by ID
+    return await history_page(db, statement, cursor, limit, response)
 
+@router.get("/history/me", response_model=list[QueryResponse])
+async def get_my_history(
+    response: Response,
+    limit: int = Query(10, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Fetch history of the logged-in user (across devices), newest first.
+    Same cursor paging as /history.
+    """
+    statement = select(UserQuery).where(UserQuery.user_id == current_user.id)
+    return await history_page(db, statement, cursor, limit, response)
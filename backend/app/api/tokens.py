@@ -0,0 +1,28 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.agent.chains import DEFAULT_CHAIN
+from app.agent.tokens import token_index
+from app.schemas.requests import CHAIN_PATTERN, TokenInfo
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=List[TokenInfo])
+async def search_tokens(
+    q: str = Query(..., min_length=1, max_length=64),
+    chain: str = Query(DEFAULT_CHAIN, pattern=CHAIN_PATTERN),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Tokens whose symbol, name or alias starts with `q` on the chain, most
+    prominent first (autocomplete). 503 until the token index is built
+    (scripts/build_token_index.py).
+    """
+    if not token_index.available:
+        raise HTTPException(status_code=503, detail="Token index not built (scripts/build_token_index.py)")
+    return [
+        TokenInfo(**{**match.to_dict(), "decimals": match.decimals if match.decimals >= 0 else None})
+        for match in token_index.prefix(q, chain=chain, limit=limit)
+    ]
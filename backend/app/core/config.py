@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn, computed_field, field_validator, model_validator
-from typing import Literal, Optional
+from datetime import date
+from typing import Dict, Literal, Optional
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
@@ -14,13 +15,177 @@ class Settings(BaseSettings):
     POSTGRES_SERVER: Optional[str] = None
     POSTGRES_PORT: Optional[int] = None
     POSTGRES_DB: Optional[str] = None
+
+    # DB Engine Pool (per worker: total connections = workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW))
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0                     # Seconds to wait for a connection before erroring
+    DB_POOL_RECYCLE: int = 1800                       # Reconnect connections older than this (seconds)
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100                # asyncpg prepared statements cached per connection
+    DB_PGBOUNCER: bool = False                        # Transaction pooling: disables the statement cache
+    DB_ECHO: bool = False                             # Log every SQL statement (slow; debugging only)
+    DB_CREATE_ALL: Literal["auto", "always", "never"] = "auto"  # auto: only if alembic isn't at head
+    DB_WARMUP_CONNECTIONS: int = 0                    # Pool connections opened at startup (0 = on demand)
+
+    # Startup
+    LAZY_INIT: bool = False                           # Build LLM clients on first use (faster cold start)
     
     # AI - Make at least one required
     OPENAI_API_KEY: Optional[str] = None
     GROQ_API_KEY: Optional[str] = None
+
+    # LLM Providers: "groq", "openai" (any OpenAI-compatible API) or "stub" (scripts/fake_llm_server.py)
+    LLM_PROVIDER: str = "groq"
+    LLM_FALLBACK_PROVIDER: Optional[str] = None
+    GROQ_MODEL: str = "meta-llama/llama-4-maverick-17b-128e-instruct"
+    GROQ_TIMEOUT_SECONDS: float = 30.0
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_BASE_URL: Optional[str] = None             # None = api.openai.com
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    LLM_STUB_URL: str = "http://127.0.0.1:8099/v1"
+    LLM_STUB_TIMEOUT_SECONDS: float = 10.0
+    # Keep-alive pool per provider (size it to expected concurrent LLM calls per worker)
+    LLM_POOL_MAX_CONNECTIONS: int = 20
+    LLM_POOL_MAX_KEEPALIVE: int = 10
+    LLM_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_WARMUP: bool = False                          # Open provider connections (and build clients) at startup
+
+    # LLM Tail Latency: hedged requests + circuit breaker (app/agent/resilience.py)
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 95.0                # Hedge after this percentile of recent latency
+    LLM_HEDGE_MIN_DELAY_MS: float = 250.0
+    LLM_HEDGE_DEFAULT_DELAY_MS: float = 2000.0        # Until enough latency samples exist
+    LLM_HEDGE_MAX_RATE: float = 0.1                   # At most 10% of calls get a second request
+    LLM_BREAKER_ENABLED: bool = False
+    LLM_BREAKER_FAILURE_RATE: float = 0.5             # Errors + slow calls over the window
+    LLM_BREAKER_SLOW_CALL_MS: float = 10000.0
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_MIN_CALLS: int = 5
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+
+    # Response Cache (exact match on normalized user_input + chain + prompt version)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048            # In-process LRU size (per worker)
+    RESPONSE_CACHE_TTL_SECONDS: int = 60 * 60         # In-process tier: 1 hour
+    RESPONSE_CACHE_DB_TTL_SECONDS: int = 60 * 60 * 24 * 7  # Postgres tier: 7 days
+
+    # Semantic Cache (nearest past question by cosine similarity, inside generate_sql)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 100_000         # float32 x DIM per entry (~100MB at defaults)
+    SEMANTIC_CACHE_DIM: int = 256
+    SEMANTIC_CACHE_LOAD_BATCH: int = 1000
+
+    # Prompt building (send only the schema the question needs)
+    PROMPT_SCHEMA_RETRIEVAL: bool = True
+    PROMPT_MAX_TABLES: int = 3
+    PROMPT_TOKEN_BUDGET: int = 3000                   # Max system prompt tokens per chain pack (0 = no limit)
+
+    # Token registry (app/agent/tokens.py): mentioned tokens resolved to mints before the LLM call
+    TOKEN_INDEX_ENABLED: bool = True                  # Missing index file = the pack's known tokens only
+    TOKEN_INDEX_PATH: str = "data/tokens.idx"         # Written by scripts/build_token_index.py (mmap, shared by workers)
+    TOKEN_INDEX_LOOSE_RANK: int = 1000                # Lowercase mentions ("bonk") only match tokens ranked this well
+    TOKEN_INDEX_MAX_MATCHES: int = 8                  # Tokens injected into the prompt per question
+
+    # Batch generation (/generate/batch)
+    BATCH_MAX_ITEMS: int = 500
+    BATCH_CONCURRENCY: int = 8                        # Agent runs in flight per batch request
+
+    # History Write-Behind: /generate returns before its UserQuery row is committed
+    HISTORY_WRITE_BEHIND: bool = False
+    HISTORY_QUEUE_MAX_ROWS: int = 10_000              # Bounded memory; full queue = caller writes inline
+    HISTORY_BATCH_SIZE: int = 500                     # Rows per multi-row INSERT
+    HISTORY_FLUSH_LINGER_MS: float = 20.0
+    HISTORY_ENQUEUE_TIMEOUT_MS: float = 50.0
+    HISTORY_FLUSH_MAX_RETRIES: int = 5
+    HISTORY_MAX_PAGE_SIZE: int = 100                  # Max `limit` of /history pages
     
+    # Local SQL validation (Trino parse, declared tables, time filter) with self-repair
+    SQL_VALIDATION_ENABLED: bool = True
+    SQL_REPAIR_MAX_ATTEMPTS: int = 2                  # Extra generator calls per question
+    # Deterministic performance rewrites of the generated SQL (app/agent/rewrite.py)
+    SQL_REWRITE_ENABLED: bool = True
+    SQL_DEFAULT_LIMIT: int = 1000                     # Added to results without a LIMIT (0 = never)
+
+    # Static scan-cost estimate (app/agent/cost.py), attached to QueryResponse.scan_estimate
+    SCAN_ESTIMATE_ENABLED: bool = True
+    SCAN_BUDGET_BYTES: float = 5e12                   # 0 = no budget
+    SCAN_BUDGET_ACTION: Literal["flag", "reject"] = "flag"  # reject: over-budget SQL goes through the repair loop
+    SCAN_HISTORY_START: date = date(2020, 3, 16)      # First daily partition (an unbounded scan starts here)
+    # Per-table sizes: {"bytes_per_day": n} for partitioned tables, {"bytes": n} for snapshots.
+    # Rough figures for the tables of every chain pack on Dune; override with a JSON object to match
+    # your warehouse. Cross-chain spells (tokens.*, dex.trades, prices.usd) are sized for all chains:
+    # the `blockchain` filter doesn't prune their partitions.
+    SCAN_TABLE_STATS: Dict[str, Dict[str, float]] = {
+        "solana.transactions": {"bytes_per_day": 600e9},
+        "solana.instruction_calls": {"bytes_per_day": 900e9},
+        "solana.account_activity": {"bytes_per_day": 400e9},
+        "solana.rewards": {"bytes_per_day": 0.5e9},
+        "solana_utils.daily_balances": {"bytes_per_day": 25e9},
+        "solana_utils.latest_balances": {"bytes": 60e9},
+        "solana_utils.token_accounts": {"bytes": 40e9},
+        "ethereum.transactions": {"bytes_per_day": 8e9},
+        "ethereum.logs": {"bytes_per_day": 20e9},
+        "base.transactions": {"bytes_per_day": 60e9},
+        "base.logs": {"bytes_per_day": 120e9},
+        "arbitrum.transactions": {"bytes_per_day": 15e9},
+        "arbitrum.logs": {"bytes_per_day": 35e9},
+        "tokens.transfers": {"bytes_per_day": 150e9},
+        "dex.trades": {"bytes_per_day": 15e9},
+        "tokens.erc20": {"bytes": 2e9},
+        "prices.usd": {"bytes_per_day": 3e9},
+    }
+
+    # DuckDB dry runs over Parquet fixtures (app/execution/, POST /execute/dry-run)
+    DRY_RUN_FIXTURES_DIR: str = "fixtures"            # Written by scripts/generate_fixtures.py
+    DRY_RUN_TIMEOUT_SECONDS: float = 5.0              # Queries are interrupted after this
+    DRY_RUN_SAMPLE_ROWS: int = 20
+    DRY_RUN_THREADS: int = 2                          # DuckDB threads per query
+    DRY_RUN_MAX_CONCURRENT: int = 4                   # Dry runs at once per worker (others wait)
+    DRY_RUN_NODE_ENABLED: bool = False                # Dry-run in the graph; failures go through the repair loop
+
+    # Dune execution API (app/execution/dune.py, POST /execute/dune)
+    DUNE_API_KEY: Optional[str] = None                # Unset = /execute/dune answers 503
+    DUNE_API_URL: str = "https://api.dune.com/api/v1" # scripts/fake_dune_server.py: http://127.0.0.1:8098/api/v1
+    DUNE_PERFORMANCE: str = "medium"                  # "medium" | "large" engine
+    DUNE_TIMEOUT_SECONDS: float = 30.0                # Per HTTP call
+    DUNE_MAX_CONNECTIONS: int = 10
+    DUNE_POLL_INITIAL_SECONDS: float = 0.5            # Status poll delay, doubled after every poll...
+    DUNE_POLL_MAX_SECONDS: float = 10.0               # ...up to this
+    DUNE_MAX_WAIT_SECONDS: float = 300.0              # Executions still running after this are cancelled
+    DUNE_MAX_RESULT_ROWS: int = 10000                 # Rows fetched per execution (larger results are truncated)
+    # Result cache (per worker): normalized SQL + time bucket -> zstd Arrow IPC
+    DUNE_CACHE_ENABLED: bool = True
+    DUNE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024     # Total compressed size; LRU eviction beyond it
+    DUNE_CACHE_BUCKET_SECONDS: int = 900              # Results are reused for at most this long
+    # Streamed result pages (GET /queries/{id}/results)
+    RESULTS_PAGE_DEFAULT_ROWS: int = 10000
+    RESULTS_PAGE_MAX_ROWS: int = 100000
+    RESULTS_CHUNK_ROWS: int = 2048                    # Rows per Arrow record batch / NDJSON write
+
+    # Tracing: spans per stage, trace id in X-Trace-Id (see app/core/tracing.py)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.01                # Traces exported (others only get an id)
+    TRACING_EXPORTER: str = "file"                    # "file" | "http" | "none"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_COLLECTOR_URL: str = "http://127.0.0.1:4319/v1/traces"
+    TRACING_QUEUE_SIZE: int = 4096                    # Spans waiting for export; more are dropped
+    TRACING_FLUSH_INTERVAL_MS: int = 1000
+
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"  # Override in .env for production
+    # Resolved users cached per worker (JWT subject -> User); TTL bounds staleness across workers
+    AUTH_USER_CACHE_ENABLED: bool = True
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10_000
+    AUTH_USER_CACHE_TTL_SECONDS: int = 300
+    # Routes that only need the user id trust the signed token alone (no user lookup at all).
+    # A deleted user's token then keeps working until it expires.
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    # Password hashing (signup/login) off the event loop
+    BCRYPT_ROUNDS: int = 12                           # Cost factor: each +1 doubles hash/verify time
+    PASSWORD_HASH_WORKERS: int = 2                    # Dedicated threads (bcrypt releases the GIL)
+    PASSWORD_HASH_MAX_PENDING: int = 32               # Queued + running; beyond that auth returns 503
 
     @model_validator(mode='after')
     def assemble_db_connection(self) -> "Settings":
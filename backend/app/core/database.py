@@ -1,17 +1,111 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from typing import AsyncGenerator, Optional
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.tracing import trace_engine, tracer
 from app.models.sql import UUIDModel
 
-# 1. Create Async Engine
-# echo=True logs SQL queries to console (Good for debugging, turn off in Prod)
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=(settings.ENVIRONMENT == "dev"),
-    future=True,
-    pool_pre_ping=True  # Handles lost connections automatically
-)
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    The default async queue pool, plus checkout wait times and timeouts
+    (reported by /internal/db-pool for pool sizing).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waits = deque(maxlen=1000)  # Recent checkout waits (seconds)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.total_wait += waited
+            self._waits.append(waited)
+
+    def recreate(self):
+        # Keep counters when the engine recreates the pool (e.g. after dispose)
+        new = super().recreate()
+        new._waits, new.checkouts, new.timeouts, new.total_wait = self._waits, self.checkouts, self.timeouts, self.total_wait
+        return new
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> float:
+            return round(waits[int(p * (len(waits) - 1))] * 1000, 3) if waits else 0.0
+
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout_s": self._timeout,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            # Connections open beyond pool_size (negative while the pool is still filling)
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "p50_wait_ms": pct(0.50),
+            "p99_wait_ms": pct(0.99),
+            "max_wait_ms": round(waits[-1] * 1000, 3) if waits else 0.0,
+        }
+
+
+def engine_options() -> dict:
+    """create_async_engine kwargs from Settings."""
+    connect_args = {}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer (transaction pooling) can't keep prepared statements per
+        # connection: disable both caches and use unique statement names
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    else:
+        connect_args = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+
+    return dict(
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,  # Handles lost connections automatically
+        connect_args=connect_args,
+    )
+
+
+# 1. Create Async Engine (pool sized from Settings, see DB_* in config.py)
+engine = create_async_engine(settings.DATABASE_URL, **engine_options())
+instrument_engine(engine.sync_engine)  # Per-statement latency histograms
+trace_engine(engine.sync_engine, tracer)  # Per-statement spans (sampled requests only)
 
 # 2. Session Factory
 # This creates new sessions for each request
@@ -23,10 +117,66 @@ async_session_factory = sessionmaker(
 )
 
 
-async def init_db():
-    """Initialize database - create all tables"""
-    async with engine.begin() as conn:
+def pool_stats() -> dict:
+    """Live pool state for this worker."""
+    pool = engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedPool) else {"status": pool.status()}
+
+
+def migrations_current(sync_conn) -> bool:
+    """True if the database is at the head revision(s) of alembic/versions."""
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    if not ALEMBIC_DIR.is_dir():
+        return False
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    current = set(MigrationContext.configure(sync_conn).get_current_heads())
+    return bool(heads) and current == heads
+
+
+async def init_db(mode: Optional[str] = None, db_engine: Optional[AsyncEngine] = None) -> bool:
+    """
+    Initialize database - create missing tables (returns whether create_all ran).
+    "auto" skips it when migrations are current (the Docker CMD runs
+    `alembic upgrade head` before starting), saving metadata reflection on
+    every cold start; "always"/"never" force it.
+    """
+    mode = mode or settings.DB_CREATE_ALL
+    if mode == "never":
+        return False
+    async with (db_engine or engine).begin() as conn:
+        if mode == "auto" and await conn.run_sync(migrations_current):
+            return False
         await conn.run_sync(UUIDModel.metadata.create_all)
+    return True
+
+
+async def warm_pool(connections: int, db_engine: Optional[AsyncEngine] = None) -> int:
+    """Opens `connections` pool connections up front (opt-in pre-warm); returns how many opened."""
+    db_engine = db_engine or engine
+
+    async def open_one():
+        conn = await db_engine.connect()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    # All checked out at once, so each is a distinct connection; closing returns them to the pool
+    results = await asyncio.gather(*[open_one() for _ in range(connections)], return_exceptions=True)
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        await conn.close()
+    if len(opened) < connections:
+        error = next(r for r in results if isinstance(r, BaseException))
+        logger.warning("DB pool warm-up: %d of %d connections failed (%s)", connections - len(opened), connections, error)
+    return len(opened)
 
 
 # 3. Dependency for FastAPI
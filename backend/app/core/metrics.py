@@ -0,0 +1,187 @@
+"""
+Prometheus metrics (scraped from GET /metrics).
+
+Recording is a few float adds under a lock per observation: no string
+formatting, no I/O on the request path. Label values are small fixed sets
+(route templates, node names, statement groups) so series don't explode.
+
+Multiple uvicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty directory
+and /metrics aggregates every worker (prometheus_client multiprocess mode).
+"""
+import inspect
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; LLM calls are slow, DB statements fast
+_FAST = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_SLOW = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    "chainquery_http_request_duration_seconds",
+    "Whole request, until the last body byte (streams included)",
+    ["method", "route", "status"],
+    buckets=_SLOW,
+)
+NODE_LATENCY = Histogram(
+    "chainquery_agent_node_duration_seconds",
+    "LangGraph node execution",
+    ["node"],
+    buckets=_SLOW,
+)
+LLM_LATENCY = Histogram(
+    "chainquery_llm_request_duration_seconds",
+    "One chat completion call",
+    ["provider", "outcome"],
+    buckets=_SLOW,
+)
+DB_LATENCY = Histogram(
+    "chainquery_db_statement_duration_seconds",
+    "One SQL statement, grouped by verb and table",
+    ["group"],
+    buckets=_FAST,
+)
+ERRORS = Counter(
+    "chainquery_errors_total",
+    "Failures by stage (agent, llm, db)",
+    ["stage"],
+)
+CACHE_LOOKUPS = Counter(
+    "chainquery_cache_lookups_total",
+    "Cache lookups by cache and outcome (hit/miss/disabled)",
+    ["cache", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "chainquery_llm_tokens_total",
+    "Tokens reported by the provider",
+    ["provider", "kind"],
+)
+SQL_REWRITES = Counter(
+    "chainquery_sql_rewrites_total",
+    "Generated SQL changed by the rewrite pass, by rule",
+    ["rule"],
+)
+
+
+# --- LLM --------------------------------------------------------------------
+
+def observe_llm(provider: str, seconds: float, response: Any = None) -> None:
+    """Records one LLM call; `response` None means it failed."""
+    if response is None:
+        LLM_LATENCY.labels(provider, "error").observe(seconds)
+        ERRORS.labels("llm").inc()
+        return
+    LLM_LATENCY.labels(provider, "ok").observe(seconds)
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict):  # langchain's UsageMetadata; absent on some providers
+        LLM_TOKENS.labels(provider, "prompt").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(provider, "completion").inc(usage.get("output_tokens", 0))
+
+
+# --- LangGraph nodes ---------------------------------------------------------
+
+def timed_node(name: str, fn):
+    """Wraps an async node function with a latency histogram (keeps its signature for LangGraph)."""
+    observe = NODE_LATENCY.labels(name).observe
+    wants_config = "config" in inspect.signature(fn).parameters
+
+    async def node(state, config=None):
+        start = time.perf_counter()
+        try:
+            return await (fn(state, config) if wants_config else fn(state))
+        finally:
+            observe(time.perf_counter() - start)
+
+    node.__name__ = getattr(fn, "__name__", name)
+    node.__doc__ = fn.__doc__
+    return node
+
+
+# --- DB statements -----------------------------------------------------------
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def statement_group(statement: str) -> str:
+    """'select user_queries', 'insert query_cache', ... (cached: SQL strings repeat)."""
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    match = _TABLE.search(statement)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Times every statement of a (sync or async's .sync_engine) engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["_metrics_start"].pop()
+        DB_LATENCY.labels(statement_group(statement)).observe(time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("_metrics_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        ERRORS.labels("db").inc()
+
+
+# --- HTTP --------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware overhead, streams untouched).
+    Labels requests by route template ("/api/v1/history"), never the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], path, status[0]).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> tuple:
+    """(body, content type) for /metrics; aggregates workers in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def cache_outcome(cache: str, outcome: Optional[str]) -> None:
+    CACHE_LOOKUPS.labels(cache, outcome or "miss").inc()
@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+The cursor is the position of the last row of a page; the next page is
+`WHERE (created_at, id) < (cursor)`, which the composite
+(owner, created_at DESC, id DESC) indexes answer with an index range scan.
+Cost stays the same on page 1 and page 1000, unlike OFFSET.
+
+Query results (GET /queries/{id}/results) are pages of a finished Dune
+execution instead: their cursor is (execution id, row offset), which Dune's
+results API and a cached Arrow table both answer directly.
+"""
+import base64
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def encode_offset_cursor(token: str, offset: int) -> str:
+    raw = f"{token}|{offset}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        token, offset = raw.rsplit("|", 1)
+        if not token or int(offset) < 0:
+            raise ValueError(raw)
+        return token, int(offset)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def keyset_page(statement: Select, model, cursor: Optional[str], limit: int) -> Select:
+    """Orders newest first, starts after `cursor` and fetches one extra row (to detect a next page)."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int) -> Tuple[List, Optional[str]]:
+    """(rows of this page, cursor of the next page or None)."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
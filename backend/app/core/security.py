@@ -1,11 +1,12 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Callable, TypeVar, Union
+import bcrypt
 from jose import jwt
-from passlib.context import CryptContext
 from app.core.config import settings
 
-# Password Hashing Config
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
 
 # JWT Config
 ALGORITHM = "HS256"
@@ -18,8 +19,92 @@ def create_access_token(subject: Union[str, Any]) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Password Hashing (bcrypt; each call takes tens of ms of CPU at the default cost)
+
+def _secret(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes (bcrypt>=5 raises instead of truncating)
+    return password.encode("utf-8")[:72]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    """Blocking: use `password_hasher.verify` in async code."""
+    try:
+        return bcrypt.checkpw(_secret(plain_password), hashed_password.encode("utf-8"))
+    except ValueError:
+        return False  # Not a bcrypt hash
+
+def get_password_hash(password: str, rounds: int = settings.BCRYPT_ROUNDS) -> str:
+    """Blocking: use `password_hasher.hash` in async code."""
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+class HasherBusy(Exception):
+    """Too many hash/verify calls queued (the auth route answers 503)."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small dedicated thread pool so it never blocks the event
+    loop (bcrypt releases the GIL). At most `max_pending` calls may be queued
+    or running; beyond that callers get HasherBusy right away instead of
+    waiting behind a login storm.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, rounds: int = 12):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor = None
+        self.pending = 0
+
+        # Stats
+        self.completed = 0
+        self.rejected = 0
+        self.max_seen_pending = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy()
+        self.pending += 1
+        self.max_seen_pending = max(self.max_seen_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_seen_pending": self.max_seen_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+# Initialize the pool once (threads start on first use)
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.BCRYPT_ROUNDS,
+)
@@ -0,0 +1,64 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers with the same key share one execution: the first caller
+(the leader) starts the work, later callers await the same future.
+The work runs as its own task, so a leader whose client disconnects does
+not cancel the result the other callers are waiting for.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # Stats
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+        self.waiters = 0       # Callers currently waiting on someone else's call
+        self.max_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `fn()` once per key at a time and returns its result
+        (or raises its exception) to every concurrent caller.
+        Callers must treat the shared result as read-only.
+        """
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            self.waiters += 1
+            self.max_waiters = max(self.max_waiters, self.waiters)
+            try:
+                return await asyncio.shield(task)
+            finally:
+                self.waiters -= 1
+
+        self.leaders += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Nobody may be left to read it: mark the exception as retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesce_ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._inflight),
+            "waiters": self.waiters,
+            "max_waiters": self.max_waiters,
+        }
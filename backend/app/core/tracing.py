@@ -0,0 +1,350 @@
+"""
+Request-scoped tracing (OpenTelemetry-style spans, without the SDK).
+
+Each HTTP request gets a trace id, taken from an incoming W3C `traceparent`
+header or freshly generated, and returned in the `X-Trace-Id` response header.
+Stages open child spans with `tracer.span("name")`. The current span lives in
+a contextvar, so it follows the request through dependencies, graph nodes,
+the LLM call and SQLAlchemy's greenlets (statement spans).
+
+Sampling is decided once per trace: the caller's sampled flag if a
+traceparent came in, otherwise TRACING_SAMPLE_RATIO applied to the trace id
+(like OTel's TraceIdRatioBased). An unsampled request only pays a contextvar
+lookup per stage (no child spans are created). Sampled spans go to a bounded queue that a background thread
+writes in batches, either to a JSON-lines file or POSTed to a collector
+(scripts/trace_collector.py is a local stand-in). If the exporter falls
+behind, spans are dropped and counted; requests never wait.
+"""
+import inspect
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import statement_group
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes if sampled else {}
+        self.status = "ok"
+
+    def set(self, key: str, value) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# --- Export ------------------------------------------------------------------
+
+Sink = Callable[[List[dict]], None]
+
+
+def file_sink(path: str) -> Sink:
+    """Appends spans as JSON lines."""
+    lock = threading.Lock()
+
+    def write(spans: List[dict]) -> None:
+        data = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with lock, open(path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    return write
+
+
+def http_sink(url: str, timeout: float = 5.0) -> Sink:
+    """POSTs {"spans": [...]} batches to a collector."""
+    client = httpx.Client(timeout=timeout)
+
+    def post(spans: List[dict]) -> None:
+        client.post(url, json={"spans": spans}).raise_for_status()
+
+    return post
+
+
+class SpanExporter:
+    """Bounded queue + background thread writing batches to a sink."""
+
+    def __init__(self, sink: Sink, max_queue: int = 2048, batch_size: int = 256, flush_interval: float = 1.0):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Stats
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        """Stops the thread and writes what is still queued."""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        while True:
+            with self._lock:
+                batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            if not batch:
+                return
+            try:
+                self.sink([span.to_dict() for span in batch])
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning("Span export failed (%d spans): %s", len(batch), e)
+                return
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# --- Tracer --------------------------------------------------------------------
+
+class Tracer:
+    def __init__(self, enabled: bool = False, sample_ratio: float = 1.0, exporter: Optional[SpanExporter] = None):
+        self.enabled = enabled
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+        self._threshold = int(max(0.0, min(1.0, sample_ratio)) * (1 << 64))
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current.get()
+
+    def start_trace(self, traceparent: Optional[str] = None, name: str = "request", **attributes) -> Span:
+        """Root span of a request, continuing the caller's trace if it sent a traceparent."""
+        match = _TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        else:
+            trace_id, parent_id = "%032x" % random.getrandbits(128), None
+            sampled = int(trace_id[16:], 16) < self._threshold
+        return Span(name, trace_id, parent_id, sampled, attributes)
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+        """Child of `parent` (default: the current span), not made current. None outside a sampled trace."""
+        parent = parent or _current.get()
+        if parent is None or not parent.sampled:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+
+    def end_span(self, span: Optional[Span], error: Optional[BaseException] = None) -> None:
+        if span is None:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = "error"
+            span.set("error.type", type(error).__name__)
+        if span.sampled and self.exporter is not None:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Child span made current for the block (no-op outside a trace)."""
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current.reset(token)
+
+    def start(self) -> None:
+        if self.enabled and self.exporter is not None:
+            self.exporter.start()
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_ratio": self.sample_ratio,
+            "exporter": self.exporter.stats() if self.exporter else None,
+        }
+
+
+class TracingMiddleware:
+    """
+    Plain ASGI middleware: root span per HTTP request (named after the route
+    template), made current for the whole request including streamed bodies.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        tracer = self.tracer
+        if scope["type"] != "http" or not tracer.enabled:
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        span = tracer.start_trace(traceparent, name=scope["method"], **{"http.method": scope["method"]})
+        trace_header = (b"x-trace-id", span.trace_id.encode())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set("http.status_code", message["status"])
+                message["headers"] = [*message.get("headers", []), trace_header]
+            await send(message)
+
+        token = _current.set(span)
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            span.name = f"{scope['method']} {route}"
+            span.set("http.route", route)
+            tracer.end_span(span, error)
+            _current.reset(token)
+
+
+def traced_node(name: str, fn, tracer: Tracer):
+    """Wraps an async LangGraph node in a `node.<name>` span (keeps its config parameter)."""
+    wants_config = "config" in inspect.signature(fn).parameters
+
+    async def node(state, config=None):
+        with tracer.span(f"node.{name}"):
+            return await (fn(state, config) if wants_config else fn(state))
+
+    node.__name__ = getattr(fn, "__name__", name)
+    node.__doc__ = fn.__doc__
+    return node
+
+
+def trace_engine(engine: Engine, tracer: Tracer) -> None:
+    """A span per SQL statement, child of whatever span is current (sync or async's .sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span("db.statement")
+        if span is not None:
+            span.set("db.statement_group", statement_group(statement))
+        conn.info.setdefault("_trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        tracer.end_span(conn.info["_trace_spans"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("_trace_spans") if context.connection is not None else None
+        if spans:
+            tracer.end_span(spans.pop(), context.original_exception)
+
+
+def _exporter_from_settings() -> Optional[SpanExporter]:
+    if settings.TRACING_EXPORTER == "file":
+        sink = file_sink(settings.TRACING_FILE)
+    elif settings.TRACING_EXPORTER == "http":
+        sink = http_sink(settings.TRACING_COLLECTOR_URL)
+    else:
+        return None
+    return SpanExporter(
+        sink,
+        max_queue=settings.TRACING_QUEUE_SIZE,
+        flush_interval=settings.TRACING_FLUSH_INTERVAL_MS / 1000,
+    )
+
+
+# Initialize the tracer once
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    sample_ratio=settings.TRACING_SAMPLE_RATIO,
+    exporter=_exporter_from_settings() if settings.TRACING_ENABLED else None,
+)
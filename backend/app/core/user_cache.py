@@ -0,0 +1,82 @@
+"""
+In-process cache of resolved users (JWT subject -> User).
+
+Authenticated requests resolve their user from here instead of a SELECT on
+`users` (one round trip and one pool checkout less per request).
+
+Invalidation:
+- ORM updates/deletes of a User (flush of a changed/deleted instance) evict it
+  automatically through the mapper events below.
+- Bulk `update(User)` / `delete(User)` statements bypass those events: call
+  `user_cache.invalidate(user_id)` (or `clear()`) after them.
+- Other workers only see a change once their entry expires, so the TTL is the
+  bound on staleness across processes.
+
+Cached users are detached, shared between requests: treat them as read-only
+and load the user in your session before changing it.
+"""
+import uuid
+from typing import Optional, Union
+
+from cachetools import TTLCache
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models.sql import User
+
+
+class UserCache:
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: int = 300, enabled: bool = True):
+        self.enabled = enabled
+        self._users: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+        user = self._users.get(subject)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    def put(self, user: User) -> None:
+        if self.enabled:
+            self._users[str(user.id)] = user
+
+    def invalidate(self, user_id: Union[str, uuid.UUID]) -> None:
+        if self._users.pop(str(user_id), None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._users.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Initialize the cache once
+user_cache = UserCache(
+    max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS,
+    enabled=settings.AUTH_USER_CACHE_ENABLED,
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_changed_user(mapper, connection, target: User) -> None:
+    user_cache.invalidate(target.id)
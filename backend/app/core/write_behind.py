@@ -0,0 +1,197 @@
+"""
+Write-behind persistence.
+
+Rows are built in memory (client-side UUID and timestamps), queued, and
+written by one background task in multi-row INSERTs, so requests don't wait
+for the commit round trips.
+
+- Bounded queue: at most `max_rows` rows are held in memory.
+- Backpressure: when the queue is full (Postgres slower than traffic) `submit`
+  waits up to `enqueue_timeout` for space, then returns False and the caller
+  writes the row itself. Callers then slow down to the database's pace
+  instead of losing rows or growing memory.
+- A failing flush is retried with backoff (the queue fills meanwhile, which
+  triggers the backpressure above); after `max_retries` the batch is dropped
+  and logged.
+- A batch rejected by the database itself (IntegrityError/DataError, e.g. a
+  row pointing at a deleted user) is not retried: it is split in halves
+  until the bad rows are isolated, and only those are dropped and logged.
+- `stop()` flushes everything still queued (called from `lifespan`).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional, Tuple, Type
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlmodel import SQLModel
+
+logger = logging.getLogger(__name__)
+
+# (row values, optional response cache entry (key, chain, payload))
+QueuedRow = Tuple[dict, Optional[Tuple[str, str, dict]]]
+
+_STOP = object()  # Queue sentinel: flush what came before, then exit
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        session_factory,
+        model: Type[SQLModel],
+        cache: Any = None,              # ResponseCache-like (put_many) for entries stored with the rows
+        enabled: bool = True,
+        max_rows: int = 10_000,
+        batch_size: int = 500,
+        linger: float = 0.02,           # Wait this long for more rows before a small flush
+        enqueue_timeout: float = 0.05,
+        max_retries: int = 5,
+        retry_max_delay: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.model = model
+        self.cache = cache
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.linger = linger
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_max_delay = retry_max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Stats
+        self.queued = 0
+        self.written = 0
+        self.flushes = 0
+        self.overflows = 0       # Rows the caller had to write itself (queue full)
+        self.dropped = 0         # Rows lost (after max_retries, or rejected)
+        self.rejected = 0        # Rows the database refused (constraint / bad data)
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_rows)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the writer after flushing every queued row."""
+        if self._task is None:
+            return
+        self._stopping = True  # New rows are written by their callers from now on
+        if not self._task.done():
+            # Rows queued before the sentinel are flushed by the writer itself
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+
+        # Rows submitted while stopping
+        batch: List[QueuedRow] = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        for i in range(0, len(batch), self.batch_size):
+            await self._flush_with_retry(batch[i:i + self.batch_size], retries=1)
+
+    async def submit(self, row: SQLModel, cache_entry: Optional[Tuple[str, str, dict]] = None) -> bool:
+        """
+        Queues a row (and the cache entry to store with it).
+        Returns False if the caller must write it itself (disabled or backpressure).
+        """
+        if not self.running or self._stopping:
+            return False
+        item = (row.model_dump(), cache_entry)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.overflows += 1
+                return False
+        self.queued += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            if self.linger and self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.linger)  # Let concurrent requests join this batch
+            stopping = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush_with_retry(batch, retries=self.max_retries)
+            if stopping:
+                return
+
+    async def _flush_with_retry(self, batch: List[QueuedRow], retries: int) -> None:
+        for attempt in range(retries):
+            try:
+                await self._flush(batch)
+                return
+            except (IntegrityError, DataError) as e:
+                await self._isolate_bad_rows(batch, retries, e)
+                return
+            except Exception as e:
+                if attempt == retries - 1:
+                    self.dropped += len(batch)
+                    logger.error("Write-behind flush failed, dropping %d rows: %s", len(batch), e)
+                    return
+                delay = min(self.retry_max_delay, 0.1 * 2 ** attempt)
+                logger.warning("Write-behind flush failed (retry in %.1fs): %s", delay, e)
+                await asyncio.sleep(delay)
+
+    async def _isolate_bad_rows(self, batch: List[QueuedRow], retries: int, error: Exception) -> None:
+        """Bisects a batch the database rejected; only the rows that fail alone are dropped."""
+        if len(batch) == 1:
+            self.dropped += 1
+            self.rejected += 1
+            logger.error("Write-behind dropped row %s rejected by the database: %s", batch[0][0].get("id"), error)
+            return
+        middle = len(batch) // 2
+        await self._flush_with_retry(batch[:middle], retries)
+        await self._flush_with_retry(batch[middle:], retries)
+
+    async def _flush(self, batch: List[QueuedRow]) -> None:
+        start = time.perf_counter()
+        rows = [values for values, _ in batch]
+        entries = [entry for _, entry in batch if entry is not None]
+        async with self.session_factory() as session:
+            await session.execute(insert(self.model), rows)
+            if entries and self.cache is not None:
+                await self.cache.put_many(session, entries)
+            await session.commit()
+        self.flushes += 1
+        self.written += len(rows)
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_rows": self.max_rows,
+            "queued": self.queued,
+            "written": self.written,
+            "flushes": self.flushes,
+            "avg_batch": round(self.written / self.flushes, 1) if self.flushes else 0.0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "overflows": self.overflows,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,211 @@
+"""
+Dry runs of generated SQL on DuckDB, over the Parquet fixtures
+(app/execution/fixtures.py) instead of Dune.
+
+The Trino SQL is transpiled to DuckDB with sqlglot and run against views
+named like the Dune tables (`solana.transactions` -> fixtures/solana/
+transactions.parquet). A dry run catches what static validation can't:
+unknown columns, type errors, functions DuckDB/Trino don't have, queries
+that return nothing, and queries too slow even on a few MB of data.
+
+Isolation: one in-memory database per worker, read-only views, file access
+limited to the fixtures directory, configuration locked, only single
+SELECT statements, a per-run time limit (the query is interrupted) and a
+small thread pool so dry runs never block the event loop.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, List, Optional
+
+import duckdb
+import sqlglot
+from sqlglot.errors import ParseError, UnsupportedError
+
+from app.agent.schema import SOLANA_SCHEMA, SchemaRegistry
+from app.agent.validation import READ_ONLY, parse_sql
+from app.core.config import settings
+from app.core.tracing import tracer
+from app.execution.fixtures import fixture_path
+
+_BATCH_ROWS = 2048
+
+
+@dataclass
+class DryRunResult:
+    ok: bool
+    row_count: int = 0
+    columns: List[str] = field(default_factory=list)
+    sample: List[list] = field(default_factory=list)  # First `sample_rows` rows, JSON-safe
+    runtime_ms: float = 0.0
+    duckdb_sql: Optional[str] = None
+    error: Optional[str] = None
+    error_kind: Optional[str] = None  # "transpile" | "sql" | "timeout" | "unavailable"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def to_json_value(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): to_json_value(v) for k, v in value.items()}
+    return value
+
+
+class DryRunExecutor:
+    def __init__(
+        self,
+        fixtures_dir: str,
+        timeout: float = 5.0,
+        sample_rows: int = 20,
+        threads: int = 2,
+        max_concurrent: int = 4,
+        registry: SchemaRegistry = SOLANA_SCHEMA,
+    ):
+        self.fixtures_dir = Path(fixtures_dir).resolve()
+        self.timeout = timeout
+        self.sample_rows = sample_rows
+        self.threads = threads
+        self.max_concurrent = max_concurrent
+        self.registry = registry
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._lock = threading.Lock()
+        self._executor = None
+
+        # Stats
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def available(self) -> bool:
+        return (self.fixtures_dir / "manifest.json").exists()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="dry-run")
+        return self._executor
+
+    def _connection(self) -> duckdb.DuckDBPyConnection:
+        """Database with one view per table, built on first use and then locked down."""
+        with self._lock:
+            if self._conn is None:
+                conn = duckdb.connect(":memory:")
+                conn.execute(f"SET threads = {int(self.threads)}")
+                conn.execute("SET TimeZone = 'UTC'")
+                for schema in sorted({t.name.partition(".")[0] for t in self.registry.tables}):
+                    conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+                for spec in self.registry.tables:
+                    schema, _, table = spec.name.partition(".")
+                    path = fixture_path(self.fixtures_dir, spec.name)
+                    conn.execute(f"CREATE VIEW \"{schema}\".\"{table}\" AS SELECT * FROM read_parquet('{path}')")
+                conn.execute(f"SET allowed_directories = ['{self.fixtures_dir}/']")
+                conn.execute("SET enable_external_access = false")
+                conn.execute("SET lock_configuration = true")
+                self._conn = conn
+            return self._conn
+
+    def transpile(self, sql: str) -> str:
+        """Trino -> DuckDB; raises ValueError for anything but one read-only statement."""
+        tree = parse_sql(sql)
+        if not isinstance(tree, READ_ONLY):
+            raise ValueError("Only SELECT queries can be dry-run")
+        return tree.sql(dialect="duckdb", unsupported_level=sqlglot.ErrorLevel.RAISE)
+
+    def run(self, sql: str) -> DryRunResult:
+        if not self.available:
+            return DryRunResult(
+                ok=False, error_kind="unavailable",
+                error=f"No fixtures in {self.fixtures_dir} (run scripts/generate_fixtures.py)",
+            )
+        try:
+            duckdb_sql = self.transpile(sql)
+        except (ParseError, UnsupportedError, ValueError) as e:
+            return DryRunResult(ok=False, error_kind="transpile", error=str(e))
+
+        cursor = self._connection().cursor()
+        timer = threading.Timer(self.timeout, cursor.interrupt)
+        started = time.perf_counter()
+        timer.start()
+        try:
+            reader = cursor.execute(duckdb_sql).to_arrow_reader(_BATCH_ROWS)
+            columns = list(reader.schema.names)
+            sample, row_count = [], 0
+            for batch in reader:
+                if len(sample) < self.sample_rows:
+                    head = batch.slice(0, self.sample_rows - len(sample)).to_pylist()
+                    sample += [[to_json_value(row[c]) for c in columns] for row in head]
+                row_count += batch.num_rows
+            result = DryRunResult(ok=True, row_count=row_count, columns=columns, sample=sample, duckdb_sql=duckdb_sql)
+        except duckdb.InterruptException:
+            result = DryRunResult(
+                ok=False, duckdb_sql=duckdb_sql, error_kind="timeout",
+                error=f"Query did not finish within {self.timeout:g}s on the fixture data",
+            )
+        except duckdb.Error as e:
+            result = DryRunResult(ok=False, duckdb_sql=duckdb_sql, error_kind="sql", error=str(e))
+        finally:
+            timer.cancel()
+            cursor.close()
+        result.runtime_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        self.runs += 1
+        self.failures += not result.ok
+        self.timeouts += result.error_kind == "timeout"
+        self.total_ms += result.runtime_ms
+        self.max_ms = max(self.max_ms, result.runtime_ms)
+        return result
+
+    async def arun(self, sql: str) -> DryRunResult:
+        with tracer.span("dry_run.execute") as span:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, self.run, sql)
+            if span is not None:
+                span.set("dry_run.ok", result.ok)
+                span.set("dry_run.rows", result.row_count)
+            return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "fixtures_dir": str(self.fixtures_dir),
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / self.runs, 2) if self.runs else 0.0,
+            "max_ms": self.max_ms,
+        }
+
+
+# One database per worker (opened on first dry run)
+dry_run_executor = DryRunExecutor(
+    fixtures_dir=settings.DRY_RUN_FIXTURES_DIR,
+    timeout=settings.DRY_RUN_TIMEOUT_SECONDS,
+    sample_rows=settings.DRY_RUN_SAMPLE_ROWS,
+    threads=settings.DRY_RUN_THREADS,
+    max_concurrent=settings.DRY_RUN_MAX_CONCURRENT,
+)
@@ -0,0 +1,309 @@
+"""
+Async client for Dune's SQL execution API.
+
+`execute(sql)` submits the SQL (POST /sql/execute), polls the execution
+status with exponential backoff (DUNE_POLL_INITIAL_SECONDS, doubling up to
+DUNE_POLL_MAX_SECONDS) and pages through the results into an Arrow table
+(page by page; `results(id, offset, limit)` also fetches later windows of a
+result truncated at DUNE_MAX_RESULT_ROWS).
+Executions still running after DUNE_MAX_WAIT_SECONDS are cancelled. All
+calls share one keep-alive connection pool; 429 and 5xx answers to status
+and result requests are retried with the same backoff (a submit only on
+429 or a failed connect, so a query never runs twice).
+
+Point DUNE_API_URL at scripts/fake_dune_server.py to run without an API key.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import httpx
+import pyarrow as pa
+
+from app.core.config import settings
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = "QUERY_STATE_COMPLETED"
+TERMINAL_STATES = {
+    COMPLETED,
+    "QUERY_STATE_FAILED",
+    "QUERY_STATE_CANCELLED",
+    "QUERY_STATE_EXPIRED",
+    "QUERY_STATE_COMPLETED_PARTIAL",
+}
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class DuneError(Exception):
+    def __init__(self, message: str, state: Optional[str] = None, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.state = state
+        self.status_code = status_code
+
+
+class DuneTimeout(DuneError):
+    pass
+
+
+@dataclass
+class DuneResult:
+    execution_id: str
+    state: str
+    table: pa.Table
+    truncated: bool = False      # More rows than max_rows; only the first max_rows were fetched
+    total_rows: int = 0          # Rows of the whole result (Dune's total_row_count)
+    executed_at: str = ""        # ISO timestamp of submission
+    runtime_ms: float = 0.0      # Submit -> last result page
+
+    def meta(self) -> dict:
+        return {
+            "execution_id": self.execution_id,
+            "state": self.state,
+            "truncated": self.truncated,
+            "total_rows": self.total_rows,
+            "executed_at": self.executed_at,
+            "runtime_ms": self.runtime_ms,
+        }
+
+
+def rows_to_table(rows: List[dict], columns: List[str]) -> pa.Table:
+    """Dune's JSON rows as an Arrow table; columns with mixed JSON types become strings."""
+    columns = columns or (list(rows[0]) if rows else [])
+    arrays = {}
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        try:
+            arrays[name] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays[name] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    return pa.table(arrays) if columns else pa.table({})
+
+
+def concat_tables(tables: List[pa.Table], columns: List[str]) -> pa.Table:
+    """Result pages as one table; a column typed differently across pages is rebuilt as in rows_to_table."""
+    tables = [t for t in tables if t.num_rows] or tables[:1]
+    if len(tables) == 1:
+        return tables[0]
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return rows_to_table([row for t in tables for row in t.to_pylist()], columns)
+
+
+class DuneClient:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = "https://api.dune.com/api/v1",
+        performance: str = "medium",
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        poll_initial: float = 0.5,
+        poll_max: float = 10.0,
+        max_wait: float = 300.0,
+        max_rows: int = 10_000,
+        page_size: int = 5_000,
+        max_retries: int = 3,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.performance = performance
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self._transport = transport  # Test hook (e.g. httpx.ASGITransport to the fake server)
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+        # Stats
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.polls = 0
+        self.retries = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"X-Dune-API-Key": self.api_key or ""},
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout, connect=min(5.0, self.timeout)),
+                transport=self._transport,
+            )
+        return self._http_client
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before poll/retry number `attempt` (0-based): initial * 2^attempt, capped."""
+        return min(self.poll_initial * (2 ** attempt), self.poll_max)
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        # A POST that may have reached Dune is not repeated (it could start a second execution)
+        idempotent = method == "GET"
+        retry_errors = httpx.TransportError if idempotent else (httpx.ConnectError, httpx.ConnectTimeout)
+        retry_status = _RETRY_STATUS if idempotent else {429}
+        attempt = 0
+        while True:
+            try:
+                response = await self.http_client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if not isinstance(e, retry_errors) or attempt >= self.max_retries:
+                    raise DuneError(f"Dune API unreachable: {e}") from e
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in retry_status or attempt >= self.max_retries:
+                    raise DuneError(_error_message(response), status_code=response.status_code)
+            self.retries += 1
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    async def submit(self, sql: str) -> str:
+        body = await self._request("POST", "/sql/execute", json={"sql": sql, "performance": self.performance})
+        self.submitted += 1
+        return body["execution_id"]
+
+    async def wait(self, execution_id: str) -> str:
+        """Polls until the execution finishes; returns its final state."""
+        deadline = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            status = await self._request("GET", f"/execution/{execution_id}/status")
+            self.polls += 1
+            state = status.get("state", "")
+            if state in TERMINAL_STATES or status.get("is_execution_finished"):
+                if state not in (COMPLETED, "QUERY_STATE_COMPLETED_PARTIAL"):
+                    raise DuneError(_execution_error(status), state=state)
+                return state
+            delay = self.backoff(attempt)
+            if time.monotonic() + delay > deadline:
+                await self.cancel(execution_id)
+                raise DuneTimeout(f"Dune execution {execution_id} still {state} after {self.max_wait:g}s", state=state)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def results(self, execution_id: str, offset: int = 0, limit: Optional[int] = None) -> tuple:
+        """Result rows [offset, offset + limit) (limit defaults to max_rows) as (table, truncated, total rows).
+
+        Each page is converted to Arrow as it arrives, so the JSON of at most one
+        page is held in memory at a time.
+        """
+        limit = self.max_rows if limit is None else limit
+        tables: List[pa.Table] = []
+        columns: List[str] = []
+        fetched, total = 0, 0
+        while True:
+            page = await self._request(
+                "GET", f"/execution/{execution_id}/results",
+                params={"limit": min(self.page_size, limit - fetched), "offset": offset},
+            )
+            result = page.get("result") or {}
+            metadata = result.get("metadata") or {}
+            columns = columns or metadata.get("column_names") or []
+            rows = result.get("rows") or []
+            tables.append(rows_to_table(rows, columns))
+            fetched += len(rows)
+            total = max(total, metadata.get("total_row_count") or 0, offset + len(rows))
+            next_offset = page.get("next_offset")
+            if next_offset is None:
+                return concat_tables(tables, columns), False, total
+            if fetched >= limit:
+                return concat_tables(tables, columns), True, total
+            offset = next_offset
+
+    async def cancel(self, execution_id: str) -> None:
+        try:
+            await self._request("POST", f"/execution/{execution_id}/cancel")
+        except DuneError as e:
+            logger.warning("Cancelling Dune execution %s failed: %s", execution_id, e)
+
+    async def execute(self, sql: str) -> DuneResult:
+        if not self.configured:
+            raise DuneError("DUNE_API_KEY is not set")
+        started = time.perf_counter()
+        executed_at = datetime.now(timezone.utc).isoformat()
+        with tracer.span("dune.execute") as span:
+            try:
+                execution_id = await self.submit(sql)
+                if span is not None:
+                    span.set("dune.execution_id", execution_id)
+                state = await self.wait(execution_id)
+                table, truncated, total_rows = await self.results(execution_id)
+            except DuneTimeout:
+                self.timeouts += 1
+                raise
+            except DuneError:
+                self.failed += 1
+                raise
+            self.completed += 1
+            if span is not None:
+                span.set("dune.rows", table.num_rows)
+        return DuneResult(
+            execution_id=execution_id,
+            state=state,
+            table=table,
+            truncated=truncated,
+            total_rows=total_rows,
+            executed_at=executed_at,
+            runtime_ms=round((time.perf_counter() - started) * 1000, 2),
+        )
+
+    async def aclose(self) -> None:
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.configured,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "polls": self.polls,
+            "retries": self.retries,
+        }
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        detail = response.json().get("error")
+    except ValueError:
+        detail = None
+    return f"Dune API returned {response.status_code}: {detail or response.text[:200]}"
+
+
+def _execution_error(status: dict) -> str:
+    error = status.get("error") or {}
+    message = error.get("message") if isinstance(error, dict) else str(error)
+    return f"Dune execution {status.get('state', 'failed')}: {message or 'no details'}"
+
+
+# One pooled client per worker (connections opened on first use)
+dune_client = DuneClient(
+    api_key=settings.DUNE_API_KEY,
+    base_url=settings.DUNE_API_URL,
+    performance=settings.DUNE_PERFORMANCE,
+    timeout=settings.DUNE_TIMEOUT_SECONDS,
+    max_connections=settings.DUNE_MAX_CONNECTIONS,
+    poll_initial=settings.DUNE_POLL_INITIAL_SECONDS,
+    poll_max=settings.DUNE_POLL_MAX_SECONDS,
+    max_wait=settings.DUNE_MAX_WAIT_SECONDS,
+    max_rows=settings.DUNE_MAX_RESULT_ROWS,
+)
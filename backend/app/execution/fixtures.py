@@ -0,0 +1,181 @@
+"""
+Seeded synthetic Parquet fixtures for the tables in the schema registry.
+
+Every declared table becomes `<dir>/<schema>/<table>.parquet` with the
+declared columns (Trino types mapped to DuckDB). Values are derived from
+`hash(seed, column, row)`, so the same seed and scale give the same files.
+They are shaped so the prompt's queries return rows:
+- the time-partitioned tables cover the last `days` days up to `now`;
+- instruction_calls / account_activity rows point at existing transactions
+  (same `tx_id` and `block_time`);
+- token mints come from the known token list, and addresses from a bounded
+  wallet pool (so GROUP BYs and holder rankings aggregate).
+
+`scale` multiplies every row count (scale=1 is ~120k rows, a few MB), for
+performance tests on larger data:
+    python scripts/generate_fixtures.py --scale 50
+"""
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb
+from sqlglot import exp
+
+from app.agent.schema import SOLANA_SCHEMA, ColumnSpec, SchemaRegistry, TableSpec
+
+# Rows per table at scale=1
+BASE_ROWS = {
+    "solana.transactions": 20_000,
+    "solana.instruction_calls": 40_000,
+    "solana.account_activity": 40_000,
+    "solana.rewards": 2_000,
+    "solana_utils.latest_balances": 5_000,
+    "solana_utils.daily_balances": 10_000,
+    "solana_utils.token_accounts": 5_000,
+}
+DEFAULT_ROWS = 5_000
+
+_TX_TABLE = "solana.transactions"
+_PROGRAMS = (
+    "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4",   # Jupiter v6
+    "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8",  # Raydium AMM
+    "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc",   # Orca Whirlpools
+    "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA",   # SPL Token
+    "11111111111111111111111111111111",              # System program
+)
+_ADDRESS_COLUMNS = ("address", "signer", "token_balance_owner", "recipient", "owner")
+_TX_COLUMNS = ("id", "signature", "tx_id")
+
+
+def duckdb_type(trino_type: str) -> str:
+    return exp.DataType.build(trino_type, dialect="trino").sql(dialect="duckdb")
+
+
+def _sql_list(values) -> str:
+    return "[" + ", ".join(f"'{value}'" for value in values) + "]"
+
+
+class _TableBuilder:
+    """SELECT producing one fixture table from `range(rows)`."""
+
+    def __init__(self, spec: TableSpec, rows: int, tx_rows: int, seed: int, days: int, now: datetime, mints: List[str]):
+        self.spec = spec
+        self.rows = rows
+        self.tx_rows = tx_rows
+        self.seed = seed
+        self.days = days
+        self.now_us = int(now.replace(tzinfo=timezone.utc).timestamp() * 1_000_000)
+        self.mints = mints
+        self.wallets = max(100, rows // 10)
+
+    def h(self, column: str, key: str = "i", table: Optional[str] = None) -> str:
+        """Deterministic non-negative BIGINT for (seed, column, row)."""
+        return f"CAST(hash({self.seed}, '{table or self.spec.name}.{column}', {key}) >> 1 AS BIGINT)"
+
+    def select(self) -> str:
+        span_us = self.days * 86_400 * 1_000_000
+        if self.spec.name == _TX_TABLE:
+            k = "i"
+        else:
+            k = f"{self.h('_tx')} % {self.tx_rows}"
+        if "day" in self.spec.partition_keys:
+            # One row per (wallet, day)
+            midnight = self.now_us - self.now_us % 86_400_000_000
+            ts = f"make_timestamp({midnight} - (i % {self.days}) * 86400000000)"
+        else:
+            # Transaction k at a fixed point of the window, oldest first
+            ts = f"make_timestamp({self.now_us - span_us} + (k * {span_us // max(self.tx_rows, 1)}))"
+        columns = ",\n    ".join(f'{self._column(c)} AS "{c.name}"' for c in self.spec.columns)
+        return (
+            f"SELECT\n    {columns}\n"
+            f"FROM (SELECT i, k, {ts} AS ts FROM (SELECT range AS i, {k} AS k FROM range({self.rows})))"
+        )
+
+    def _column(self, column: ColumnSpec) -> str:
+        name, h = column.name, self.h(column.name)
+        kind = duckdb_type(column.type)
+        if name in ("block_time", "day"):
+            return "ts"
+        if name == "block_date":
+            return "CAST(ts AS DATE)"
+        if name in _TX_COLUMNS:
+            return "printf('tx%010d', k)"
+        if name == "block_slot":
+            return "250000000 + k * 2"
+        if name == "block_height":
+            return "230000000 + k"
+        if name == "executing_account":
+            return f"{_sql_list(_PROGRAMS)}[1 + {h} % {len(_PROGRAMS)}]"
+        if name == "token_mint_address":
+            null_share = 0 if self.spec.name == "solana_utils.token_accounts" else 20
+            pick = f"{_sql_list(self.mints)}[1 + {h} % {len(self.mints)}]"
+            return f"CASE WHEN {h} % 100 < {null_share} THEN NULL ELSE {pick} END"
+        if name in _ADDRESS_COLUMNS or name.endswith("_owner"):
+            # The signer is a property of the transaction, the same in every table
+            wallet = self.h("signer", "k", _TX_TABLE) if name == "signer" else self.h("wallet")
+            return f"printf('Wallet%06d', {wallet} % {self.wallets})"
+        if name in ("success", "tx_success"):
+            return f"{h} % 100 < 95"
+        if name == "fee":
+            return f"5000 + {h} % 100000"
+        signed = name.endswith("_change")
+        if kind in ("BIGINT", "INT", "INTEGER", "SMALLINT"):
+            return f"CAST({h} % 2000000 AS BIGINT) - 1000000" if signed else f"CAST({h} % 1000000 AS {kind})"
+        if kind == "DOUBLE":
+            return f"CAST({h} % 1000000000 AS DOUBLE) / 1000"
+        if kind.startswith("DECIMAL"):
+            value = f"CAST({h} % 2000000000 AS DOUBLE) / 1000 - 1000000" if signed else f"CAST({h} % 1000000000 AS DOUBLE) / 1000"
+            return f"CAST({value} AS {kind})"
+        if kind == "BOOLEAN":
+            return f"{h} % 2 = 0"
+        if kind in ("TIMESTAMP", "DATE"):
+            return f"CAST(ts AS {kind})"
+        if kind == "BLOB":
+            return f"unhex(printf('%016x', {h}))"
+        if kind == "JSON":
+            return "'{}'::JSON"
+        if kind.endswith("[]"):
+            inner = kind[:-2]
+            if inner == "JSON":
+                return "[]::JSON[]"
+            if inner == "VARCHAR":
+                return f"[printf('{name}_%d', {h} % 1000)]"
+            return f"[CAST({h} % 1000 AS {inner})]"
+        return f"printf('{name}_%d', {h} % 1000)"
+
+
+def fixture_path(directory: Path, table: str) -> Path:
+    schema, _, name = table.partition(".")
+    return Path(directory) / schema / f"{name}.parquet"
+
+
+def generate_fixtures(
+    directory,
+    scale: float = 1.0,
+    seed: int = 42,
+    days: int = 30,
+    now: Optional[datetime] = None,
+    registry: SchemaRegistry = SOLANA_SCHEMA,
+) -> Dict[str, int]:
+    """Writes one Parquet file per table (+ manifest.json); returns rows per table."""
+    directory = Path(directory)
+    now = (now or datetime.now(timezone.utc)).replace(tzinfo=None, microsecond=0)
+    rows = {spec.name: max(1, int(BASE_ROWS.get(spec.name, DEFAULT_ROWS) * scale)) for spec in registry.tables}
+    tx_rows = rows.get(_TX_TABLE, DEFAULT_ROWS)
+    mints = [token.mint for token in registry.tokens]
+
+    conn = duckdb.connect()
+    try:
+        for spec in registry.tables:
+            path = fixture_path(directory, spec.name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            builder = _TableBuilder(spec, rows[spec.name], tx_rows, seed, days, now, mints)
+            conn.execute(f"COPY ({builder.select()}) TO '{path}' (FORMAT parquet, COMPRESSION zstd)")
+    finally:
+        conn.close()
+
+    manifest = {"seed": seed, "scale": scale, "days": days, "now": now.isoformat(), "rows": rows}
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return rows
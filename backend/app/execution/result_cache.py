@@ -0,0 +1,148 @@
+"""
+Cache of Dune query results (per worker, in memory).
+
+Key: hash of the normalized SQL + a time bucket. The same query text means
+different rows over time (`now() - interval '7' day` moves, new blocks
+arrive), so an entry is only served within the bucket it was executed in
+(at most DUNE_CACHE_BUCKET_SECONDS old); entries of past buckets are
+dropped on the next write.
+
+Values: the result table as an Arrow IPC stream with zstd compression,
+typically 5-20x smaller than the JSON Dune returns. The cache is bounded by
+the total size of those buffers; least recently used entries are evicted
+first, and a result bigger than a quarter of the budget is not cached.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import pyarrow as pa
+from sqlglot.errors import ParseError
+
+from app.agent.validation import DIALECT, parse_sql
+from app.core.config import settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical text: sqlglot's rendering (no comments, one keyword case), else collapsed whitespace."""
+    try:
+        return parse_sql(sql).sql(dialect=DIALECT, comments=False)
+    except ParseError:
+        return _WHITESPACE.sub(" ", sql).strip().rstrip("; ")
+
+
+def encode_table(table: pa.Table) -> pa.Buffer:
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def decode_table(buffer: pa.Buffer) -> pa.Table:
+    return pa.ipc.open_stream(buffer).read_all()
+
+
+@dataclass(frozen=True)
+class _Entry:
+    bucket: int
+    buffer: pa.Buffer
+    meta: dict  # Execution details returned with a hit (execution id, executed_at, ...)
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, bucket_seconds: int = 900, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.bucket_seconds = bucket_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.too_large = 0
+
+    def bucket(self, now: Optional[float] = None) -> int:
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def make_key(self, sql: str, now: Optional[float] = None) -> str:
+        digest = hashlib.sha256(normalize_sql(sql).encode()).hexdigest()[:32]
+        return f"{digest}:{self.bucket(now)}"
+
+    def get(self, key: str) -> Optional[Tuple[pa.Table, dict]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return decode_table(entry.buffer), entry.meta
+
+    def put(self, key: str, table: pa.Table, meta: dict) -> bool:
+        """Stores the table; False if it is too big to cache (or caching is off)."""
+        if not self.enabled:
+            return False
+        buffer = encode_table(table)
+        if buffer.size > self.max_bytes // 4:
+            self.too_large += 1
+            return False
+        bucket = int(key.rsplit(":", 1)[1])
+        with self._lock:
+            self._drop_expired(bucket)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.buffer.size
+            self._entries[key] = _Entry(bucket=bucket, buffer=buffer, meta=meta)
+            self._bytes += buffer.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.buffer.size
+                self.evictions += 1
+        return True
+
+    def _drop_expired(self, bucket: int) -> None:
+        for key in [k for k, e in self._entries.items() if e.bucket < bucket]:
+            self._bytes -= self._entries.pop(key).buffer.size
+            self.expired += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "bucket_seconds": self.bucket_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "too_large": self.too_large,
+        }
+
+
+# Initialize the cache once (per worker)
+result_cache = ResultCache(
+    max_bytes=settings.DUNE_CACHE_MAX_BYTES,
+    bucket_seconds=settings.DUNE_CACHE_BUCKET_SECONDS,
+    enabled=settings.DUNE_CACHE_ENABLED,
+)
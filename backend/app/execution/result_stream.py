@@ -0,0 +1,46 @@
+"""
+Chunked serialization of result tables for streaming responses.
+
+Arrow IPC stream (notebooks: `pyarrow.ipc.open_stream`, `pl.read_ipc_stream`):
+the schema message, one record batch message per chunk and the end-of-stream
+marker. Each message is serialized from the table's own buffers and handed to
+the response as a memoryview, so rows are never converted to Python objects
+and a slice of a cached table is sent without copying it first.
+Dictionary-encoded columns are the exception: a stream needs their
+dictionaries as separate messages, so they are decoded to plain values first.
+
+NDJSON (the web UI): one JSON object per row, built one chunk at a time, so
+at most `chunk_rows` rows exist as Python objects at once.
+"""
+import json
+from typing import Iterator
+
+import pyarrow as pa
+
+from app.execution.dry_run import to_json_value
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_END_OF_STREAM = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def _decode_dictionaries(table: pa.Table) -> pa.Table:
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table
+
+
+def arrow_ipc_chunks(table: pa.Table, chunk_rows: int = 2048) -> Iterator[memoryview]:
+    table = _decode_dictionaries(table)
+    yield memoryview(table.schema.serialize())
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        yield memoryview(batch.serialize())
+    yield memoryview(_END_OF_STREAM)
+
+
+def ndjson_chunks(table: pa.Table, chunk_rows: int = 2048) -> Iterator[bytes]:
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        lines = [json.dumps(to_json_value(row), default=str) for row in batch.to_pylist()]
+        yield ("\n".join(lines) + "\n").encode()
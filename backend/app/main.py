@@ -1,17 +1,74 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.api.routes import router
+from app.api.routes import router, history_writer
 from app.api.auth import router as auth_router
-from app.core.database import init_db
+from app.api.internal import router as internal_router
+from app.api.execute import router as execute_router
+from app.api.results import router as results_router
+from app.api.tokens import router as tokens_router
+from app.core.database import init_db, warm_pool, async_session_factory
+from app.agent.cache import response_cache
+from app.agent.semantic_cache import semantic_cache
+from app.agent.tokens import token_index
+from app.agent.nodes import resolved_mints
+from app.agent.providers import provider_registry
+from app.core.security import password_hasher
+from app.execution.dry_run import dry_run_executor
+from app.execution.dune import dune_client
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.tracing import TracingMiddleware, tracer
+
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup (simplest for MVP)
-    await init_db()
+    started = time.perf_counter()
+    # Create missing tables, unless alembic already migrated them (DB_CREATE_ALL)
+    created = await init_db()
+
+    # Opt-in pre-warm (DB_WARMUP_CONNECTIONS, LLM_WARMUP): open DB and LLM
+    # provider connections before the first request, concurrently
+    warmed, _ = await asyncio.gather(
+        warm_pool(min(settings.DB_WARMUP_CONNECTIONS, settings.DB_POOL_SIZE)),
+        provider_registry.startup(warm=settings.LLM_WARMUP),
+    )
+    logger.info(
+        "Startup in %.0f ms (create_all: %s, DB connections warmed: %d, LLM warm-up: %s)",
+        (time.perf_counter() - started) * 1000, created, warmed, settings.LLM_WARMUP,
+    )
+
+    # Background writer for history rows (no-op unless HISTORY_WRITE_BEHIND)
+    history_writer.start()
+
+    # Span export thread (no-op unless TRACING_ENABLED)
+    tracer.start()
+
+    # Fill the semantic cache in the background (requests are served meanwhile)
+    loader = None
+    if semantic_cache.enabled:
+        loader = asyncio.create_task(
+            semantic_cache.load_from_db(
+                async_session_factory, settings.SEMANTIC_CACHE_LOAD_BATCH, response_cache, resolved_mints,
+            )
+        )
     yield
 
+    if loader and not loader.done():
+        loader.cancel()
+    await provider_registry.shutdown()
+    # Flush queued history rows before the process exits
+    await history_writer.stop()
+    password_hasher.shutdown()
+    dry_run_executor.shutdown()
+    token_index.close()
+    await dune_client.aclose()
+    tracer.shutdown()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
@@ -35,6 +92,12 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Request spans + X-Trace-Id header (no-op unless TRACING_ENABLED)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Request latency histograms (outermost, so CORS and streaming are included)
+app.add_middleware(MetricsMiddleware)
+
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
@@ -44,12 +107,22 @@ import os
 # 2. Include Routes
 app.include_router(router, prefix=settings.API_V1_STR)
 app.include_router(auth_router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
+app.include_router(internal_router, prefix=f"{settings.API_V1_STR}/internal", tags=["internal"])
+app.include_router(execute_router, prefix=f"{settings.API_V1_STR}/execute", tags=["execute"])
+app.include_router(results_router, prefix=settings.API_V1_STR, tags=["results"])
+app.include_router(tokens_router, prefix=f"{settings.API_V1_STR}/tokens", tags=["tokens"])
 
 # Health Check for Railway/Render
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": settings.PROJECT_NAME}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 
 # 3. Serve React Static Files (Modular Monolith)
 # We check if the folder exists (it will in Docker, might not locally)
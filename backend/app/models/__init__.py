@@ -1 +1 @@
-from .sql import UserQuery
+from .sql import UserQuery, CachedResponse
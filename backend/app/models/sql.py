@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, Index, JSON, text
 from typing import Optional, List
 from datetime import datetime
 import uuid
@@ -28,15 +29,21 @@ class User(UUIDModel, table=True):
 # 2. UPDATED: The Query Table
 class UserQuery(UUIDModel, table=True):
     __tablename__ = "user_queries"
+    # History pages are keyset scans over (created_at, id), newest first
+    __table_args__ = (
+        Index("ix_user_queries_session_created", "session_id", text("created_at DESC"), text("id DESC")),
+        Index("ix_user_queries_user_created", "user_id", text("created_at DESC"), text("id DESC")),
+    )
 
     user_input: str = Field(nullable=False)
     sql_output: Optional[str] = Field(default=None, nullable=True)  # Can be null if error occurs
+    original_sql: Optional[str] = Field(default=None, nullable=True)  # Model output before the rewrite pass
     chain: str = Field(default="solana")
     
     # Auth Logic:
     # If Guest -> session_id is set, user_id is None
     # If Logged In -> user_id is set
-    session_id: Optional[str] = Field(default=None, index=True)
+    session_id: Optional[str] = Field(default=None)
     user_id: Optional[uuid.UUID] = Field(default=None, foreign_key="users.id")
     
     error_message: Optional[str] = Field(default=None)
@@ -45,3 +52,13 @@ class UserQuery(UUIDModel, table=True):
     user: Optional[User] = Relationship(back_populates="queries")
 
 
+# 3. The Response Cache Table (shared tier of the /generate cache)
+class CachedResponse(UUIDModel, table=True):
+    __tablename__ = "query_cache"
+
+    # sha256(normalized user_input + chain + prompt fingerprint)
+    cache_key: str = Field(unique=True, index=True, nullable=False)
+    chain: str = Field(default="solana")
+    # The agent result fields we replay on a hit (e.g. sql_output)
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    expires_at: datetime = Field(nullable=False, index=True)
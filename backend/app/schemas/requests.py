@@ -1,23 +1,110 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
 from datetime import datetime
 import uuid
+from app.core.config import settings
+from app.agent.chains import DEFAULT_CHAIN, PACK_MODULES
+
+# Chains with a prompt pack (app/agent/packs/); others are rejected with 422
+CHAIN_PATTERN = f"^({'|'.join(PACK_MODULES)})$"
 
 # INPUT: What the frontend sends
 class QueryRequest(BaseModel):
     user_input: str
-    chain: str = "solana"
+    chain: str = Field(DEFAULT_CHAIN, pattern=CHAIN_PATTERN)
     session_id: str  # <--- NEW: The Guest ID
 
+    @field_validator("chain", mode="before")
+    @classmethod
+    def lowercase_chain(cls, value):
+        # "Solana" / "ETHEREUM" are accepted (stored and cached lower-case)
+        return value.strip().lower() if isinstance(value, str) else value
+
 # OUTPUT: What we send back
+class TableScanEstimate(BaseModel):
+    table: str
+    bytes: int
+    partitions: Optional[int] = None        # Daily partitions read (None: not partitioned)
+    bounded: bool                           # Partition key has a lower bound
+    column_share: float
+
+class ScanEstimate(BaseModel):
+    bytes: int                              # Estimated bytes scanned (all tables)
+    partitions: int
+    budget_bytes: Optional[int] = None
+    over_budget: bool = False
+    tables: List[TableScanEstimate] = []
+    warnings: List[str] = []
+
+class DryRunResult(BaseModel):
+    ok: bool
+    row_count: int = 0
+    columns: List[str] = []
+    sample: List[list] = []                 # First DRY_RUN_SAMPLE_ROWS rows
+    runtime_ms: float = 0.0
+    duckdb_sql: Optional[str] = None        # The query as run on DuckDB
+    error: Optional[str] = None
+    error_kind: Optional[str] = None        # "transpile" / "sql" / "timeout" / "unavailable"
+
 class QueryResponse(BaseModel):
     id: uuid.UUID
     user_input: str
     sql_output: Optional[str] = None  # Can be None if generation fails
+    original_sql: Optional[str] = None  # The model's SQL if the rewrite pass changed it
     error_message: Optional[str] = None  # Match database field name
     chain: str = "solana"
     created_at: datetime
+    cache_status: Optional[str] = None  # "hit" / "miss" / "disabled" (only set by /generate)
+    scan_estimate: Optional[ScanEstimate] = None  # Static cost estimate (only set by /generate)
+    dry_run: Optional[DryRunResult] = None  # DuckDB run on fixtures (DRY_RUN_NODE_ENABLED, not on cache hits)
     
     class Config:
         from_attributes = True
+        validate_assignment = True  # scan_estimate / dry_run are assigned as dicts
+
+# DRY RUN: Execute SQL on DuckDB over the Parquet fixtures
+class DryRunRequest(BaseModel):
+    sql: str = Field(..., min_length=1)
+
+class DryRunResponse(DryRunResult):
+    warnings: List[str] = []                # Validation problems that did not stop the run
+
+# DUNE: Execute SQL on Dune (results cached per normalized SQL + time bucket)
+class DuneExecuteRequest(BaseModel):
+    sql: str = Field(..., min_length=1)
+
+class DuneExecuteResponse(BaseModel):
+    execution_id: str
+    state: str
+    columns: List[str]
+    rows: List[list]
+    row_count: int
+    truncated: bool = False                 # Result had more than DUNE_MAX_RESULT_ROWS rows
+    total_rows: int = 0                     # Rows of the whole result (page through GET /queries/{id}/results)
+    executed_at: str                        # When Dune ran it (older than now on a cache hit)
+    runtime_ms: float                       # Of that execution
+    cache_status: str                       # "hit" / "miss" / "disabled"
+
+# BATCH: Many questions in one request (results come back in input order)
+class BatchQueryRequest(BaseModel):
+    items: List[QueryRequest] = Field(..., min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+
+class BatchItemResult(BaseModel):
+    index: int                              # Position in the request
+    ok: bool
+    result: Optional[QueryResponse] = None  # Saved history row (also set when generation failed)
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
 
+# TOKENS: Token registry search (autocomplete)
+class TokenInfo(BaseModel):
+    chain: str
+    symbol: str
+    name: str
+    mint: str                               # Mint (Solana) or contract address (EVM)
+    decimals: Optional[int] = None
+    rank: int                               # Lower = more prominent; curated tokens are 0
@@ -0,0 +1,94 @@
+"""
+Event-loop lag under a login storm: bcrypt inline vs. the hashing pool.
+
+A probe task sleeps 5 ms in a loop and records how late it wakes up (that's
+the delay every other coroutine, e.g. a /generate SSE stream, would see),
+while N concurrent logins verify a password either inline on the event loop
+(the old behavior) or through `password_hasher` (with 503 shedding).
+
+Run from backend/:
+    python scripts/bench_password_hashing.py --logins 200 --concurrency 50 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.security import HasherBusy, PasswordHasher, get_password_hash, verify_password  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(lags: list, stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - start - PROBE_INTERVAL))
+
+
+async def storm(mode: str, hashed: str, logins: int, concurrency: int, hasher: PasswordHasher) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+    outcome = {"ok": 0, "busy": 0}
+
+    async def login():
+        async with semaphore:
+            if mode == "inline":
+                verify_password("password123", hashed)  # Blocks the loop (old behavior)
+                outcome["ok"] += 1
+                await asyncio.sleep(0)
+            else:
+                try:
+                    await hasher.verify("password123", hashed)
+                    outcome["ok"] += 1
+                except HasherBusy:
+                    outcome["busy"] += 1
+
+    await asyncio.sleep(0.05)  # Probe baseline
+    start = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "mode": mode,
+        "logins_ok": outcome["ok"],
+        "logins_503": outcome["busy"],
+        "seconds": round(elapsed, 2),
+        "logins_per_s": round(outcome["ok"] / elapsed, 1),
+        "probe_wakeups": len(lags_ms),  # Few wakeups = the loop was starved
+        "lag_p50_ms": round(statistics.median(lags_ms), 2),
+        "lag_p99_ms": round(lags_ms[int(0.99 * (len(lags_ms) - 1))], 2),
+        "lag_max_ms": round(lags_ms[-1], 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=32)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("password123", rounds=args.rounds)
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.max_pending, rounds=args.rounds)
+    try:
+        for mode in ("inline", "pool"):
+            print(await storm(mode, hashed, args.logins, args.concurrency, hasher))
+    finally:
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
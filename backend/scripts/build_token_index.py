@@ -0,0 +1,87 @@
+"""
+Builds the token registry the agent resolves token mentions with
+(TOKEN_INDEX_PATH, memory-mapped by every worker).
+
+The chains' known tokens (app/agent/packs/) are always included, ranked
+first; --source adds a token list:
+- CSV with columns chain,symbol,name,mint[,decimals,rank,aliases]
+  (aliases separated by ";"), or
+- a JSON token list (Jupiter / Uniswap style) of objects with
+  address, symbol, name, decimals (use --chain when they have no chain).
+Without a rank, the order of the list is the rank.
+
+Run from backend/:
+    python scripts/build_token_index.py --source tokens.csv
+    python scripts/build_token_index.py --source jupiter.json --chain solana
+    python scripts/build_token_index.py --synthetic 50000   # for performance tests
+
+The workers map the file on their first lookup; restart them after a rebuild.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.agent.chains import chain_packs  # noqa: E402
+from app.agent.tokens import TokenRecord, build_token_index, load_token_source  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+_BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def pack_records() -> list:
+    records = []
+    for chain in chain_packs.names:
+        for token in chain_packs.get(chain).registry.tokens:
+            records.append(TokenRecord(
+                chain=chain, symbol=token.symbol, name=token.note or token.symbol, mint=token.mint, rank=0,
+                aliases=token.aliases,
+            ))
+    return records
+
+
+def synthetic_records(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        chain = "solana" if i % 4 else rng.choice(("ethereum", "base", "arbitrum"))
+        if chain == "solana":
+            mint = "".join(rng.choice(_BASE58) for _ in range(44))
+        else:
+            mint = "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+        records.append(TokenRecord(
+            chain=chain, symbol=f"SYN{i}", name=f"Synthetic Token {i}", mint=mint, decimals=rng.choice((6, 8, 9, 18)),
+            rank=1000 + i,
+        ))
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=settings.TOKEN_INDEX_PATH, help="Output file (default: %(default)s)")
+    parser.add_argument("--source", action="append", default=[], help="CSV or JSON token list (repeatable)")
+    parser.add_argument("--chain", help="Chain of the --source tokens that don't name one")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N synthetic tokens")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = pack_records()
+    for source in args.source:
+        loaded = load_token_source(source, chain=args.chain)
+        print(f"{source:<40} {len(loaded):>10,} tokens")
+        records += loaded
+    records += synthetic_records(args.synthetic, args.seed)
+
+    counts = build_token_index(records, args.out)
+    print(
+        f"Wrote {counts['records']:,} tokens ({counts['keys']:,} keys, {counts['chains']} chains, "
+        f"{counts['bytes'] / 1e6:.1f}MB) to {args.out} in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
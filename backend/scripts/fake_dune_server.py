@@ -0,0 +1,198 @@
+"""
+Fake Dune execution API (the endpoints app/execution/dune.py uses).
+
+No API key, no credits: executions stay QUERY_STATE_EXECUTING for a
+configurable number of status polls, then complete with canned rows or,
+with --fixtures, with the query's actual result on DuckDB over the Parquet
+fixtures (scripts/generate_fixtures.py). Failures and HTTP errors can be
+injected for tests.
+
+Run standalone:
+    python scripts/fake_dune_server.py --port 8098 --polls 3 --fixtures fixtures
+
+Then point the backend at it:
+    DUNE_API_URL=http://127.0.0.1:8098/api/v1 DUNE_API_KEY=fake
+"""
+import argparse
+import itertools
+import random
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@dataclass
+class FakeDuneConfig:
+    polls_until_done: int = 1          # Status polls answered with QUERY_STATE_EXECUTING
+    rows: int = 3                      # Canned result size (without fixtures)
+    fail_with: Optional[str] = None    # Executions end QUERY_STATE_FAILED with this message
+    error_rate: float = 0.0            # Fraction of status/result requests answered with HTTP 500
+    fixtures: Optional[str] = None     # Run the SQL on DuckDB over these Parquet fixtures
+    api_key: Optional[str] = None      # Require this X-Dune-API-Key
+    seed: Optional[int] = None
+
+
+def canned_rows(count: int) -> list:
+    return [
+        {"day": f"2024-01-{i % 28 + 1:02d} 00:00:00.000 UTC", "volume": round(1000.5 * (i + 1), 2), "token": "USDC"}
+        for i in range(count)
+    ]
+
+
+def create_app(config: Optional[FakeDuneConfig] = None) -> FastAPI:
+    config = config or FakeDuneConfig()
+    rng = random.Random(config.seed)
+    ids = itertools.count(1)
+    app = FastAPI(title="Fake Dune")
+    app.state.config = config
+    app.state.executions = {}
+    app.state.requests = {"submit": 0, "status": 0, "results": 0, "cancel": 0}
+    executor = None
+
+    def check(request: Request, kind: str) -> None:
+        app.state.requests[kind] += 1
+        if config.api_key and request.headers.get("X-Dune-API-Key") != config.api_key:
+            raise HTTPException(status_code=401, detail="invalid API Key")
+        if kind in ("status", "results") and config.error_rate and rng.random() < config.error_rate:
+            raise HTTPException(status_code=500, detail="Injected failure")
+
+    def execution(execution_id: str) -> dict:
+        found = app.state.executions.get(execution_id)
+        if found is None:
+            raise HTTPException(status_code=404, detail="execution not found")
+        return found
+
+    def run(sql: str) -> tuple:
+        """(rows, columns, error) of the finished execution."""
+        nonlocal executor
+        if config.fail_with:
+            return [], [], config.fail_with
+        if not config.fixtures:
+            rows = canned_rows(config.rows)
+            return rows, list(rows[0]) if rows else [], None
+        if executor is None:
+            from app.execution.dry_run import DryRunExecutor
+
+            executor = DryRunExecutor(config.fixtures, timeout=30.0, sample_rows=1_000_000)
+        result = executor.run(sql)
+        if not result.ok:
+            return [], [], result.error
+        return [dict(zip(result.columns, row)) for row in result.sample], result.columns, None
+
+    def status_body(e: dict) -> dict:
+        body = {
+            "execution_id": e["id"],
+            "query_id": 0,
+            "state": e["state"],
+            "is_execution_finished": e["state"] not in ("QUERY_STATE_PENDING", "QUERY_STATE_EXECUTING"),
+            "submitted_at": e["submitted_at"],
+        }
+        if e["error"]:
+            body["error"] = {"type": "FAILED_TYPE_EXECUTION_FAILED", "message": e["error"]}
+        return body
+
+    @app.post("/_config")
+    async def update_config(changes: dict):
+        """Changes the settings of a running server (tests, benchmarks)."""
+        for key, value in changes.items():
+            if hasattr(config, key):
+                setattr(config, key, value)
+        return asdict(config)
+
+    @app.post("/api/v1/sql/execute")
+    async def execute(request: Request):
+        check(request, "submit")
+        body = await request.json()
+        if not body.get("sql"):
+            raise HTTPException(status_code=400, detail="sql is required")
+        execution_id = f"01FAKE{next(ids):020d}"
+        app.state.executions[execution_id] = {
+            "id": execution_id,
+            "sql": body["sql"],
+            "state": "QUERY_STATE_PENDING",
+            "polls": 0,
+            "error": None,
+            "rows": [],
+            "columns": [],
+            "submitted_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return {"execution_id": execution_id, "state": "QUERY_STATE_PENDING"}
+
+    @app.get("/api/v1/execution/{execution_id}/status")
+    async def status(execution_id: str, request: Request):
+        check(request, "status")
+        e = execution(execution_id)
+        if e["state"] in ("QUERY_STATE_PENDING", "QUERY_STATE_EXECUTING"):
+            e["polls"] += 1
+            if e["polls"] <= config.polls_until_done:
+                e["state"] = "QUERY_STATE_EXECUTING"
+            else:
+                e["rows"], e["columns"], e["error"] = run(e["sql"])
+                e["state"] = "QUERY_STATE_FAILED" if e["error"] else "QUERY_STATE_COMPLETED"
+        return status_body(e)
+
+    @app.get("/api/v1/execution/{execution_id}/results")
+    async def results(execution_id: str, request: Request, limit: int = 1000, offset: int = 0):
+        check(request, "results")
+        e = execution(execution_id)
+        if e["state"] != "QUERY_STATE_COMPLETED":
+            return status_body(e)
+        page = e["rows"][offset:offset + limit]
+        body = {
+            **status_body(e),
+            "result": {
+                "rows": page,
+                "metadata": {
+                    "column_names": e["columns"],
+                    "row_count": len(page),
+                    "total_row_count": len(e["rows"]),
+                },
+            },
+        }
+        if offset + limit < len(e["rows"]):
+            body["next_offset"] = offset + limit
+            body["next_uri"] = f"/api/v1/execution/{execution_id}/results?limit={limit}&offset={offset + limit}"
+        return body
+
+    @app.post("/api/v1/execution/{execution_id}/cancel")
+    async def cancel(execution_id: str, request: Request):
+        check(request, "cancel")
+        e = execution(execution_id)
+        if e["state"] in ("QUERY_STATE_PENDING", "QUERY_STATE_EXECUTING"):
+            e["state"] = "QUERY_STATE_CANCELLED"
+        return {"success": True}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--polls", type=int, default=1, help="Status polls before an execution completes")
+    parser.add_argument("--rows", type=int, default=3, help="Canned result rows (without --fixtures)")
+    parser.add_argument("--fixtures", default=None, help="Answer with DuckDB results over these Parquet fixtures")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeDuneConfig(
+        polls_until_done=args.polls,
+        rows=args.rows,
+        fixtures=args.fixtures,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Fake OpenAI/Groq-compatible chat completion server.
+
+Used as the "stub" LLM provider in tests and benchmarks: no API key, no
+network, deterministic output, with configurable latency and token rate.
+
+Run standalone:
+    python scripts/fake_llm_server.py --port 8099 --latency-ms 300 --tokens-per-second 200
+
+Then point the backend at it:
+    LLM_PROVIDER=stub LLM_STUB_URL=http://127.0.0.1:8099/v1
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_SQL = (
+    "SELECT block_date, SUM(token_balance_change) AS daily_volume\n"
+    "FROM solana.account_activity\n"
+    "WHERE token_mint_address = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v'\n"
+    "AND block_time > now() - interval '7' day\n"
+    "AND token_balance_change > 0\n"
+    "GROUP BY 1\n"
+    "ORDER BY 1 DESC;"
+)
+
+_PIECE = re.compile(r"\s*\S+")
+
+
+@dataclass
+class FakeLLMConfig:
+    latency_ms: float = 0.0            # Time to first token
+    jitter_ms: float = 0.0             # Uniform extra latency in [0, jitter_ms]
+    tokens_per_second: float = 0.0     # 0 = whole completion at once
+    error_rate: float = 0.0            # Fraction of requests answered with HTTP 500
+    response: str = DEFAULT_SQL
+    seed: Optional[int] = None
+
+
+def _count_tokens(text: str) -> int:
+    return len(_PIECE.findall(text))
+
+
+def create_app(config: Optional[FakeLLMConfig] = None) -> FastAPI:
+    config = config or FakeLLMConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Fake LLM")
+    app.state.config = config
+    app.state.requests = 0
+
+    async def first_token_delay():
+        delay = config.latency_ms + rng.uniform(0, config.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "fake"}]}
+
+    @app.post("/_config")
+    async def update_config(changes: dict):
+        """Changes latency/error settings of a running server (benchmarks)."""
+        for key, value in changes.items():
+            if hasattr(config, key):
+                setattr(config, key, value)
+        return asdict(config)
+
+    @app.post("/v1/chat/completions")
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if config.error_rate and rng.random() < config.error_rate:
+            raise HTTPException(status_code=500, detail="Injected failure")
+
+        model = body.get("model", "fake-model")
+        prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in body.get("messages", []))
+        pieces = _PIECE.findall(config.response)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces),
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await first_token_delay()
+            if config.tokens_per_second:
+                await asyncio.sleep(len(pieces) / config.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": config.response},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def stream():
+            def chunk(delta, finish_reason=None, **extra):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            await first_token_delay()
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in pieces:
+                if config.tokens_per_second:
+                    await asyncio.sleep(1 / config.tokens_per_second)
+                yield chunk({"content": piece})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Writes the synthetic Parquet fixtures used by the DuckDB dry runs
+(POST /api/v1/execute/dry-run and the DRY_RUN_NODE_ENABLED graph node).
+
+Run from backend/:
+    python scripts/generate_fixtures.py                      # ./fixtures, ~120k rows
+    python scripts/generate_fixtures.py --scale 50 --days 90 # bigger, for performance tests
+
+The output only depends on --seed, --scale and --days (plus the time it is
+generated: the data covers the last --days days).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.execution.fixtures import generate_fixtures  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=settings.DRY_RUN_FIXTURES_DIR, help="Output directory (default: %(default)s)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Row count multiplier")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=30, help="Days of history in the time-partitioned tables")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = generate_fixtures(args.out, scale=args.scale, seed=args.seed, days=args.days)
+    for table, count in rows.items():
+        print(f"{table:<32} {count:>12,} rows")
+    print(f"Wrote {sum(rows.values()):,} rows to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Import-time profile of the backend (what a cold start pays before serving).
+
+Imports `app.main` in fresh interpreters under `python -X importtime` and
+reports the wall time of the import plus the slowest modules, both
+cumulative (module + everything it pulled in) and self-only. Each run is a
+new process, so the numbers are cold-cache imports just like a new worker.
+
+Run from backend/:
+    python scripts/profile_startup.py                    # current settings
+    python scripts/profile_startup.py --env LAZY_INIT=true --runs 5 --output startup.json
+
+Pass --output to get a JSON file that can be diffed between commits.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+_PROBE = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """[{"module", "self_us", "cumulative_us", "depth"}] from `-X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return modules
+
+
+def profile_once(module: str, env: Dict[str, str]) -> tuple:
+    """(wall seconds, parsed importtime rows) for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def summarize(walls: List[float], rows: List[dict], top: int) -> dict:
+    by_cumulative = sorted(rows, key=lambda row: row["cumulative_us"], reverse=True)
+    by_self = sorted(rows, key=lambda row: row["self_us"], reverse=True)
+    ms = lambda us: round(us / 1000, 1)  # noqa: E731
+    return {
+        "import_wall_ms": {
+            "median": round(statistics.median(walls) * 1000, 1),
+            "min": round(min(walls) * 1000, 1),
+            "max": round(max(walls) * 1000, 1),
+        },
+        "modules_imported": len(rows),
+        # app.* modules: where our own import-time work happens
+        "app_modules": {
+            row["module"]: {"self_ms": ms(row["self_us"]), "cumulative_ms": ms(row["cumulative_us"])}
+            for row in by_cumulative if row["module"].split(".")[0] == "app"
+        },
+        "top_cumulative": [
+            {"module": row["module"], "ms": ms(row["cumulative_us"])} for row in by_cumulative[:top]
+        ],
+        "top_self": [{"module": row["module"], "ms": ms(row["self_us"])} for row in by_self[:top]],
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters (the median wall time is reported)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra settings, repeatable")
+    parser.add_argument("--output", help="Write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    env = dict(item.split("=", 1) for item in args.env)
+    walls, last_rows = [], []
+    for _ in range(args.runs):
+        wall, last_rows = profile_once(args.module, env)
+        walls.append(wall)
+
+    report = {"module": args.module, "env": env, "runs": args.runs, **summarize(walls, last_rows, args.top)}
+
+    print(f"import {args.module}: median {report['import_wall_ms']['median']} ms over {args.runs} runs "
+          f"({report['modules_imported']} modules)")
+    print("\nOur modules (cumulative / self ms):")
+    for module, times in report["app_modules"].items():
+        print(f"  {times['cumulative_ms']:>8.1f} {times['self_ms']:>8.1f}  {module}")
+    print("\nSlowest modules, self time:")
+    for row in report["top_self"]:
+        print(f"  {row['ms']:>8.1f}  {row['module']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
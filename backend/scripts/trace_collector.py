@@ -0,0 +1,68 @@
+"""
+Collector stand-in for the span exporter (TRACING_EXPORTER=http).
+
+Keeps the last traces in memory and prints one line per finished root span,
+so a slow request can be broken down by stage without a tracing backend.
+
+Run standalone:
+    python scripts/trace_collector.py --port 4319
+
+Then point the backend at it:
+    TRACING_ENABLED=true TRACING_SAMPLE_RATIO=1.0 TRACING_EXPORTER=http \\
+    TRACING_COLLECTOR_URL=http://127.0.0.1:4319/v1/traces
+
+Inspect a trace (id from the X-Trace-Id response header):
+    curl http://127.0.0.1:4319/v1/traces/<trace_id>
+"""
+import argparse
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+
+
+def create_app(max_traces: int = 1000, echo: bool = False) -> FastAPI:
+    app = FastAPI(title="Trace collector")
+    traces: "OrderedDict[str, list]" = OrderedDict()
+    app.state.traces = traces
+
+    @app.post("/v1/traces")
+    async def receive(body: dict):
+        spans = body.get("spans", [])
+        for span in spans:
+            trace = traces.setdefault(span["trace_id"], [])
+            traces.move_to_end(span["trace_id"])
+            trace.append(span)
+            if echo and span.get("parent_span_id") is None:
+                print(f"{span['trace_id']} {span['name']} {span['duration_ms']:.1f} ms {span['status']}", flush=True)
+        while len(traces) > max_traces:
+            traces.popitem(last=False)
+        return {"accepted": len(spans)}
+
+    @app.get("/v1/traces/{trace_id}")
+    async def get_trace(trace_id: str, min_ms: Optional[float] = None):
+        """Spans of one trace, in start order (optionally only those slower than min_ms)."""
+        spans = traces.get(trace_id)
+        if spans is None:
+            raise HTTPException(status_code=404, detail="Unknown trace")
+        spans = sorted(spans, key=lambda span: span["start_time_unix_nano"])
+        if min_ms is not None:
+            spans = [span for span in spans if span["duration_ms"] >= min_ms]
+        return {"trace_id": trace_id, "spans": spans}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4319)
+    parser.add_argument("--max-traces", type=int, default=1000)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.max_traces, echo=True), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
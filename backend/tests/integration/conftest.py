@@ -12,7 +12,7 @@ from unittest.mock import AsyncMock, MagicMock
 import sys
 
 # Mock the agent workflow before importing app
-sys.modules['app.agent'] = MagicMock()
+# (only the compiled graph; the rest of app.agent is plain Python)
 sys.modules['app.agent.workflow'] = MagicMock()
 
 # Create a mock agent_app
@@ -171,6 +171,71 @@ class TestGuestQueryGeneration:
         assert data_2[0]["user_input"] == "Query from guest 2"
 
 
+class TestHistoryPagination:
+    """Test keyset (cursor) paging of history"""
+    
+    @pytest.mark.asyncio
+    async def test_history_pages_with_cursor(self, client: AsyncClient):
+        """Pages don't overlap and the last page has no X-Next-Cursor"""
+        session_id = str(uuid.uuid4())
+        for i in range(5):
+            await client.post(
+                "/api/v1/generate",
+                json={"user_input": f"Paged query {i}", "chain": "solana", "session_id": session_id}
+            )
+        
+        seen = []
+        cursor = None
+        for _ in range(3):
+            params = {"session_id": session_id, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/api/v1/history", params=params)
+            assert response.status_code == 200
+            seen += [item["id"] for item in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        
+        assert len(seen) == 5
+        assert len(set(seen)) == 5
+        assert cursor is None
+    
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, client: AsyncClient):
+        response = await client.get("/api/v1/history", params={"session_id": "s", "cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+
+class TestResponseCache:
+    """Test exact-match response cache in front of the agent"""
+    
+    @pytest.mark.asyncio
+    async def test_repeat_question_is_cache_hit(self, client: AsyncClient):
+        """Second identical question is served from cache and still saved to history"""
+        question = f"Top 10 SOL holders {uuid.uuid4()}"
+        session_id = str(uuid.uuid4())
+        
+        first = await client.post(
+            "/api/v1/generate",
+            json={"user_input": question, "chain": "solana", "session_id": session_id}
+        )
+        second = await client.post(
+            "/api/v1/generate",
+            json={"user_input": f"  {question.upper()}? ", "chain": "solana", "session_id": session_id}
+        )
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert first.json()["cache_status"] == "miss"
+        assert second.json()["cache_status"] == "hit"
+        assert second.json()["sql_output"] == first.json()["sql_output"]
+        
+        # Both requests are in the history
+        history = await client.get(f"/api/v1/history?session_id={session_id}")
+        assert len(history.json()) == 2
+
+
 class TestAuthenticatedQueryGeneration:
     """Test authenticated user query generation"""
     
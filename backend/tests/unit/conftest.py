@@ -1,7 +1,33 @@
 """
-Unit tests configuration - no mocking needed for unit tests
+Unit tests configuration - shared fixtures
+Unit tests need no database or network; Dune is the in-process fake server
+(scripts/fake_dune_server.py)
 """
 import pytest
+from httpx import ASGITransport
+from app.execution.dune import DuneClient
+from scripts.fake_dune_server import FakeDuneConfig, create_app
 
-# No special configuration needed for unit tests
-# They test individual functions in isolation
+DUNE_SQL = (
+    "SELECT date_trunc('day', block_time) AS day, SUM(token_balance_change) AS volume FROM solana.account_activity "
+    "WHERE block_time > now() - interval '7' day GROUP BY 1"
+)
+
+
+@pytest.fixture
+def dune_sql():
+    """A query the validator accepts (time-filtered, declared tables)"""
+    return DUNE_SQL
+
+
+@pytest.fixture
+def fake_dune_client():
+    """Factory: fake_dune_client(FakeDuneConfig(...), **DuneClient overrides) -> (client, fake server app)"""
+
+    def make(fake=None, **overrides):
+        fake_app = create_app(fake or FakeDuneConfig())
+        values = dict(api_key="test-key", base_url="http://fake/api/v1", poll_initial=0.001, poll_max=0.004, max_wait=5.0)
+        values.update(overrides)
+        return DuneClient(**values, transport=ASGITransport(app=fake_app)), fake_app
+
+    return make
@@ -0,0 +1,116 @@
+"""
+Unit tests for /generate/batch
+Tests ordering, per-item failures, bounded concurrency and bulk persistence
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.agent.cache import ResponseCache
+from app.core.singleflight import SingleFlight
+
+
+class FakeAgent:
+    """Stands in for agent_app; tracks peak concurrency"""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if "boom" in inputs["user_input"]:
+                raise RuntimeError("LLM unavailable")
+            if "bad" in inputs["user_input"]:
+                return {"sql_output": None, "error": "could not generate"}
+            return {"sql_output": f"SELECT '{inputs['user_input']}';", "error": None}
+        finally:
+            self.running -= 1
+
+
+async def post_batch(questions, concurrency=3):
+    from app.main import app
+    from app.core.database import get_db
+
+    db = AsyncMock()
+    db.add = MagicMock()
+
+    async def override_get_db():
+        yield db
+
+    agent = FakeAgent()
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch('app.api.routes.agent_app', agent), \
+             patch('app.api.routes.response_cache', ResponseCache(fingerprint="t", enabled=False)), \
+             patch('app.api.routes.inflight_generations', SingleFlight()), \
+             patch('app.api.routes.settings.BATCH_CONCURRENCY', concurrency):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post(
+                    "/api/v1/generate/batch",
+                    json={"items": [{"user_input": q, "session_id": "s-1"} for q in questions]},
+                )
+    finally:
+        app.dependency_overrides.clear()
+    return response, db, agent
+
+
+class TestBatchEndpoint:
+
+    @pytest.mark.asyncio
+    async def test_results_in_input_order(self):
+        questions = [f"question {i}" for i in range(12)]
+        response, db, agent = await post_batch(questions)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["index"] for r in data["results"]] == list(range(12))
+        assert [r["result"]["user_input"] for r in data["results"]] == questions
+        assert data["succeeded"] == 12
+        assert data["failed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        response, db, agent = await post_batch([f"q {i}" for i in range(20)], concurrency=3)
+
+        assert response.status_code == 200
+        assert agent.calls == 20
+        assert agent.peak <= 3
+
+    @pytest.mark.asyncio
+    async def test_partial_failures_reported_per_item(self):
+        response, db, agent = await post_batch(["good one", "boom", "bad one"])
+
+        results = response.json()["results"]
+        assert results[0]["ok"] is True
+        assert results[1]["ok"] is False
+        assert results[1]["error"] == "LLM unavailable"
+        assert results[2]["ok"] is False
+        assert results[2]["error"] == "could not generate"
+        assert response.json()["failed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_single_bulk_insert_and_commit(self):
+        response, db, agent = await post_batch([f"q {i}" for i in range(5)])
+
+        assert response.status_code == 200
+        # One executemany INSERT with every row, one commit, no per-row add/refresh
+        db.execute.assert_awaited_once()
+        rows = db.execute.call_args[0][1]
+        assert len(rows) == 5
+        assert all(row["session_id"] == "s-1" for row in rows)
+        db.commit.assert_awaited_once()
+        db.add.assert_not_called()
+        db.refresh.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_batch_size_limit(self):
+        from app.core.config import settings
+
+        response, db, agent = await post_batch(["q"] * (settings.BATCH_MAX_ITEMS + 1))
+        assert response.status_code == 422
@@ -0,0 +1,64 @@
+"""
+Unit tests for the load-testing harness (scripts/benchmark.py)
+Tests the statistics, the closed-loop runner and result comparison
+"""
+import httpx
+import pytest
+from scripts.benchmark import Context, compare, parse_args, percentile, run_level, summarize
+from scripts.fake_llm_server import FakeLLMConfig, create_app
+
+
+class TestStatistics:
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile(values, 100) == 100
+        assert percentile([], 50) == 0.0
+
+    def test_summarize(self):
+        summary = summarize([0.1, 0.2, 0.3, 0.4], {"500": 1}, elapsed=2.0)
+        assert summary["requests"] == 4
+        assert summary["rps"] == 2.0
+        assert summary["p50_ms"] == 200.0
+        assert summary["max_ms"] == 400.0
+        assert summary["errors_by_status"] == {"500": 1}
+
+
+class TestRunLevel:
+    @pytest.mark.asyncio
+    async def test_closed_loop_against_fake_llm(self):
+        """Every client keeps one request in flight; failures are counted by status"""
+        app = create_app(FakeLLMConfig(latency_ms=5, error_rate=0.5, seed=1))
+
+        async def chat(client, ctx):
+            return await client.post("/v1/chat/completions", json={"messages": []})
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake") as client:
+            summary = await run_level(client, chat, Context(), concurrency=4, duration=0.2)
+
+        assert summary["requests"] == app.state.requests
+        assert summary["requests"] > 4
+        assert 0 < summary["errors"] < summary["requests"]
+        assert set(summary["errors_by_status"]) == {"500"}
+        assert summary["max_ms"] >= 5  # Injected 500s return before the latency
+
+
+class TestResults:
+    def test_compare(self):
+        base = {"meta": {"git_revision": "a"}, "results": {"login": {"10": {"rps": 100.0, "p95_ms": 50.0, "p99_ms": 80.0}}}}
+        new = {"meta": {"git_revision": "b"}, "results": {"login": {"10": {"rps": 120.0, "p95_ms": 40.0, "p99_ms": 80.0}},
+                                                           "history": {"10": {"rps": 1.0, "p95_ms": 1.0, "p99_ms": 1.0}}}}
+        lines = compare(base, new)
+        assert lines[0] == "base a -> new b"
+        assert len(lines) == 2
+        assert "(+20.0%)" in lines[1] and "p95 -20.0%" in lines[1]
+
+    def test_parse_args(self):
+        args = parse_args(["--scenarios", "login,history", "--concurrency", "1,8"])
+        assert args.scenarios == ["login", "history"]
+        assert args.concurrency == [1, 8]
+        with pytest.raises(SystemExit):
+            parse_args(["--scenarios", "nope"])
@@ -0,0 +1,191 @@
+"""
+Unit tests for the agent response cache
+Tests key normalization and the in-process / DB tiers with a mocked session
+"""
+import pytest
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.agent.cache import (
+    ResponseCache,
+    chain_fingerprint,
+    normalize_prompt,
+    prompt_fingerprint,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_DISABLED,
+)
+from app.core.config import Settings
+
+
+def make_db(payload=None):
+    """Mock AsyncSession whose SELECT returns `payload`"""
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = payload
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+class TestCacheKey:
+    """Test normalization and key derivation"""
+
+    def test_normalize_prompt(self):
+        """Case, whitespace and trailing punctuation are ignored"""
+        assert normalize_prompt("  Top 10   SOL holders?  ") == "top 10 sol holders"
+        assert normalize_prompt("Top 10 SOL holders") == "top 10 sol holders"
+
+    def test_same_question_same_key(self):
+        cache = ResponseCache(fingerprint="abc")
+        assert cache.make_key("Daily USDC volume", "solana") == cache.make_key("daily usdc volume.", "solana")
+
+    def test_chain_changes_key(self):
+        cache = ResponseCache(fingerprint="abc")
+        assert cache.make_key("daily volume", "solana") != cache.make_key("daily volume", "ethereum")
+
+    def test_prompt_edit_changes_key(self):
+        """Editing the prompt or switching model invalidates old entries"""
+        old = ResponseCache(fingerprint=prompt_fingerprint("prompt v1", "model-a"))
+        new_prompt = ResponseCache(fingerprint=prompt_fingerprint("prompt v2", "model-a"))
+        new_model = ResponseCache(fingerprint=prompt_fingerprint("prompt v1", "model-b"))
+
+        key = old.make_key("top holders", "solana")
+        assert key != new_prompt.make_key("top holders", "solana")
+        assert key != new_model.make_key("top holders", "solana")
+
+    def test_chain_fingerprints(self):
+        """Each chain is keyed by its own compiled pack, the model and the generation settings"""
+        cache = ResponseCache(fingerprint="model-a", chain_fingerprint=lambda chain: chain_fingerprint(chain, "model-a"))
+        fingerprints = {chain: cache.fingerprint_for(chain) for chain in ("solana", "ethereum", "base", "arbitrum")}
+        assert len(set(fingerprints.values())) == 4
+        assert cache.fingerprint_for("Base") == fingerprints["base"]  # Computed once, case-insensitive
+        assert cache.fingerprint_for("dogechain") == "model-a"
+
+    def test_pack_edit_changes_only_its_chain(self):
+        from app.agent.chains import chain_packs
+
+        solana, ethereum = chain_fingerprint("solana", "m"), chain_fingerprint("ethereum", "m")
+        pack = chain_packs.get("ethereum")
+        with patch.object(pack, "full_prompt", pack.full_prompt + "\n- Prefer dex.trades for swaps."):
+            assert chain_fingerprint("ethereum", "m") != ethereum
+            assert chain_fingerprint("solana", "m") == solana
+
+    @pytest.mark.parametrize("name, value", [
+        ("PROMPT_TOKEN_BUDGET", 2500), ("PROMPT_SCHEMA_RETRIEVAL", False), ("SQL_DEFAULT_LIMIT", 50),
+    ])
+    def test_generation_settings_change_fingerprint(self, name, value):
+        before = chain_fingerprint("base", "m")
+        with patch(f"app.agent.cache.settings.{name}", value):
+            assert chain_fingerprint("base", "m") != before
+
+
+class TestResponseCache:
+    """Test lookup/store across both tiers"""
+
+    def test_defaults_match_settings(self):
+        cache = ResponseCache(fingerprint="abc")
+        defaults = {name: field.default for name, field in Settings.model_fields.items()}
+        assert cache.db_ttl == timedelta(seconds=defaults["RESPONSE_CACHE_DB_TTL_SECONDS"])
+        assert cache._memory.ttl == defaults["RESPONSE_CACHE_TTL_SECONDS"]
+        assert cache._memory.maxsize == defaults["RESPONSE_CACHE_MAX_ENTRIES"]
+
+    @pytest.mark.asyncio
+    async def test_miss_then_memory_hit(self):
+        cache = ResponseCache(fingerprint="abc")
+        db = make_db(payload=None)
+        key = cache.make_key("top holders", "solana")
+
+        payload, status = await cache.get(db, key)
+        assert payload is None
+        assert status == CACHE_MISS
+
+        await cache.put(db, key, "solana", {"sql_output": "SELECT 1;"})
+
+        db.execute.reset_mock()
+        payload, status = await cache.get(db, key)
+        assert status == CACHE_HIT
+        assert payload["sql_output"] == "SELECT 1;"
+        # Memory tier answered, no DB round trip
+        db.execute.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_db_hit_populates_memory(self):
+        cache = ResponseCache(fingerprint="abc")
+        db = make_db(payload={"sql_output": "SELECT 2;"})
+        key = cache.make_key("top holders", "solana")
+
+        payload, status = await cache.get(db, key)
+        assert status == CACHE_HIT
+        assert payload["sql_output"] == "SELECT 2;"
+
+        db.execute.reset_mock()
+        await cache.get(db, key)
+        db.execute.assert_not_called()
+
+        stats = cache.stats()
+        assert stats["db_hits"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["hit_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_db_error_is_a_miss(self):
+        """A failing cache table must not break generation"""
+        from sqlalchemy.exc import SQLAlchemyError
+
+        cache = ResponseCache(fingerprint="abc")
+        db = make_db()
+        db.execute = AsyncMock(side_effect=SQLAlchemyError("no such table"))
+
+        payload, status = await cache.get(db, cache.make_key("x", "solana"))
+        assert payload is None
+        assert status == CACHE_MISS
+        db.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        cache = ResponseCache(fingerprint="abc", enabled=False)
+        db = make_db()
+        key = cache.make_key("x", "solana")
+
+        await cache.put(db, key, "solana", {"sql_output": "SELECT 1;"})
+        payload, status = await cache.get(db, key)
+
+        assert payload is None
+        assert status == CACHE_DISABLED
+        db.execute.assert_not_called()
+
+
+class TestResponseCacheBulk:
+    """Test bulk lookup/store used by /generate/batch"""
+
+    @pytest.mark.asyncio
+    async def test_get_many_single_query(self):
+        cache = ResponseCache(fingerprint="abc")
+        warm = cache.make_key("warm", "solana")
+        in_db = cache.make_key("in db", "solana")
+        cold = cache.make_key("cold", "solana")
+        await cache.put_many(AsyncMock(), [(warm, "solana", {"sql_output": "SELECT 1;"})])
+
+        db = AsyncMock()
+        result = MagicMock()
+        row = MagicMock(cache_key=in_db, payload={"sql_output": "SELECT 2;"})
+        result.all.return_value = [row]
+        db.execute = AsyncMock(return_value=result)
+
+        found = await cache.get_many(db, [warm, in_db, cold, cold])
+
+        db.execute.assert_awaited_once()
+        assert found[warm] == ({"sql_output": "SELECT 1;"}, CACHE_HIT)
+        assert found[in_db] == ({"sql_output": "SELECT 2;"}, CACHE_HIT)
+        assert found[cold] == (None, CACHE_MISS)
+
+    @pytest.mark.asyncio
+    async def test_put_many_dedupes_keys(self):
+        cache = ResponseCache(fingerprint="abc")
+        db = AsyncMock()
+        key = cache.make_key("q", "solana")
+
+        await cache.put_many(db, [(key, "solana", {"sql_output": "a"}), (key, "solana", {"sql_output": "b"})])
+
+        db.execute.assert_awaited_once()
+        statement = db.execute.call_args[0][0]
+        assert len(statement._multi_values[0]) == 1
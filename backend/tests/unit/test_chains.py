@@ -0,0 +1,141 @@
+"""
+Unit tests for chain packs
+Tests lazy loading, that compiled prompts match the reference builder, the
+prompt budget, the EVM packs and chain routing in the agent nodes
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from pydantic import ValidationError
+from app.agent.chains import (
+    PACK_MODULES, ChainPack, ChainPackSpec, ChainPacks, PromptBudgetExceeded, UnknownChain, chain_packs,
+)
+from app.agent.prompts import SYSTEM_PROMPT, build_system_prompt, count_tokens
+from app.agent.schema import SOLANA_SCHEMA
+from app.agent.validation import validate_sql
+
+QUESTIONS = ["Top 10 BONK holders", "staking rewards by validator", "hello there", "$JUP swaps on jupiter", "USDC volume"]
+
+
+class TestChainPacks:
+    """Test loading and compiling packs"""
+
+    def test_loaded_on_first_use_only(self):
+        packs = ChainPacks(PACK_MODULES)
+        assert packs.stats()["loaded"] == {}
+        pack = packs.get("Ethereum")
+        assert packs.get("ethereum") is pack  # Compiled once
+        assert list(packs.stats()["loaded"]) == ["ethereum"]
+        assert packs.get() is packs.get("solana")
+
+    def test_unknown_chain(self):
+        with pytest.raises(UnknownChain, match="dogechain"):
+            ChainPacks(PACK_MODULES).get("dogechain")
+
+    def test_solana_matches_reference_prompt(self):
+        pack = chain_packs.get("solana")
+        assert pack.full_prompt == SYSTEM_PROMPT
+        assert pack.full_tokens == count_tokens(SYSTEM_PROMPT)
+        for question in QUESTIONS:
+            prompt, tokens = pack.system_prompt(question)
+            assert prompt == build_system_prompt(question)
+            assert tokens == count_tokens(prompt)
+
+    def test_messages(self):
+        pack = chain_packs.get("solana")
+        messages, tokens = pack.messages("Top 10 BONK holders", retrieval=False)
+        assert messages[0] is pack.full_messages[0]  # Prebuilt, not re-rendered
+        assert messages[1].content == "Top 10 BONK holders"
+        assert tokens == pack.full_tokens
+        messages, tokens = pack.messages("Top 10 BONK holders")
+        assert tokens < pack.full_tokens
+        assert "TABLE solana_utils.latest_balances (" in messages[0].content
+
+
+class TestPromptBudget:
+    """Test the per-pack token budget"""
+
+    def spec(self):
+        return ChainPackSpec(chain="solana", registry=SOLANA_SCHEMA)
+
+    def test_over_budget_drops_least_relevant_tables(self):
+        question = "transactions transfers rewards holders programs"
+        unlimited, _ = ChainPack(self.spec()).system_prompt(question, max_tables=3)
+        budget = count_tokens(unlimited) - 50
+        prompt, tokens = ChainPack(self.spec(), budget=budget).system_prompt(question, max_tables=3)
+        assert tokens == count_tokens(prompt) <= budget
+        assert prompt.count("TABLE ") < unlimited.count("TABLE ")
+        assert "-- A. " in prompt  # Letters follow the tables actually sent
+
+    def test_full_prompt_over_budget_uses_retrieval(self):
+        pack = ChainPack(self.spec(), budget=count_tokens(SYSTEM_PROMPT) - 1)
+        assert not pack.fits
+        _, tokens = pack.messages("Top 10 BONK holders", retrieval=False)
+        assert tokens < pack.full_tokens
+
+    def test_budget_below_rules(self):
+        with pytest.raises(PromptBudgetExceeded):
+            ChainPack(self.spec(), budget=100)
+
+
+class TestEvmPacks:
+    """Test the Ethereum / Base / Arbitrum packs"""
+
+    @pytest.mark.parametrize("chain", ["ethereum", "base", "arbitrum"])
+    def test_pack(self, chain):
+        pack = chain_packs.get(chain)
+        assert f"TABLE {chain}.transactions (" in pack.full_prompt
+        assert "solana" not in pack.full_prompt.lower()
+        assert f"blockchain = '{chain}'" in pack.full_prompt
+        for example in pack.registry.examples:
+            assert validate_sql(example.sql, pack.registry).ok
+        assert pack.fits
+
+    def test_retrieval(self):
+        pack = chain_packs.get("base")
+        prompt, _ = pack.system_prompt("daily USDC transfer volume")
+        assert "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913" in prompt  # Base USDC
+        assert "TABLE tokens.transfers (" in prompt
+        assert "TABLE prices.usd (" not in prompt
+
+    def test_validation_uses_the_chain_tables(self):
+        sql = "SELECT count(*) FROM ethereum.transactions WHERE block_time > now() - interval '1' day"
+        assert validate_sql(sql, chain_packs.get("ethereum").registry).ok
+        assert not validate_sql(sql).ok  # Not a Solana table
+
+
+class TestChainRouting:
+    """Test that the request's chain reaches the nodes"""
+
+    @pytest.mark.asyncio
+    async def test_generator_uses_chain_prompt(self):
+        from app.agent.nodes import generate_sql
+
+        response = MagicMock(content="SELECT 1;")
+        with patch("app.agent.nodes.llm") as llm, patch("app.agent.nodes.semantic_cache") as cache:
+            llm.ainvoke = AsyncMock(return_value=response)
+            cache.alookup = AsyncMock(return_value="SELECT 'cached';")
+            result = await generate_sql({"user_input": "daily USDC volume", "chain": "arbitrum"})
+        system = llm.ainvoke.call_args[0][0][0].content
+        assert "Arbitrum One" in system
+        assert "0xaf88d065e77c8cc2239327c5edb3a432268e5831" in system
+        assert result["sql_output"] == "SELECT 1;"
+        cache.alookup.assert_not_called()  # The semantic cache only holds Solana questions
+
+    @pytest.mark.asyncio
+    async def test_validator_uses_chain_registry(self):
+        from app.agent.nodes import validate_generated_sql
+
+        sql = "SELECT hash FROM ethereum.transactions WHERE block_time > now() - interval '1' day"
+        result = await validate_generated_sql({"user_input": "q", "sql_output": sql, "error": None, "chain": "ethereum"})
+        assert result["validation_error"] is None
+        result = await validate_generated_sql({"user_input": "q", "sql_output": sql, "error": None})
+        assert "Unknown table" in result["validation_error"]
+
+    def test_request_rejects_unknown_chain(self):
+        from app.schemas.requests import QueryRequest
+
+        assert QueryRequest(user_input="q", session_id="s", chain="base").chain == "base"
+        assert QueryRequest(user_input="q", session_id="s", chain="Solana").chain == "solana"
+        assert QueryRequest(user_input="q", session_id="s", chain=" ETHEREUM ").chain == "ethereum"
+        with pytest.raises(ValidationError):
+            QueryRequest(user_input="q", session_id="s", chain="dogechain")
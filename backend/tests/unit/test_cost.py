@@ -0,0 +1,243 @@
+"""
+Unit tests for the static scan-cost estimator
+Tests partition ranges, column shares, join shape, the budget and /generate
+"""
+import pytest
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.agent.cache import ResponseCache
+from app.agent.cost import ScanEstimator, format_bytes
+from app.agent.nodes import validate_generated_sql
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+
+NOW = datetime(2025, 6, 15, 12, 0)
+STATS = {
+    "solana.transactions": {"bytes_per_day": 1000},
+    "solana.instruction_calls": {"bytes_per_day": 100},
+    "solana_utils.latest_balances": {"bytes": 5000},
+}
+
+
+def make_estimator(**kwargs):
+    defaults = {"stats": STATS, "budget_bytes": 0, "history_start": date(2025, 1, 1)}
+    defaults.update(kwargs)
+    return ScanEstimator(**defaults)
+
+
+def scan(sql, **kwargs):
+    return make_estimator(**kwargs).estimate(sql, now=NOW)
+
+
+class TestPartitionRanges:
+    """Test which daily partitions a query reads"""
+
+    @pytest.mark.parametrize("condition, partitions", [
+        ("block_time > now() - interval '7' day", 8),
+        ("block_time >= current_date - interval '1' day", 2),
+        ("block_time > now() - interval '48' hour", 3),
+        ("block_time > now() - interval '2 days'", 3),
+        ("block_time > date_add('day', -3, now())", 4),
+        ("block_time > date_trunc('day', now()) - interval '1' day", 2),
+        ("block_date = current_date", 1),
+        ("block_date between date '2025-03-01' and date '2025-03-10'", 10),
+        ("block_time >= timestamp '2025-03-01 00:00:00' and block_time < cast('2025-03-03' as date)", 3),
+        ("block_date in (date '2025-03-01', date '2025-03-05')", 5),
+        ("(block_time > now() - interval '1' day or block_date = date '2025-06-10')", 6),
+    ])
+    def test_bounded(self, condition, partitions):
+        estimate = scan(f"SELECT count(*) FROM solana.transactions WHERE {condition}")
+        assert estimate.partitions == partitions
+        assert estimate.tables[0].bounded
+        assert estimate.warnings == ()
+
+    @pytest.mark.parametrize("condition", [
+        "success = true",
+        "block_time < now() - interval '7' day",
+        "block_time > now() - interval '1' day or success = true",
+        "block_time > (SELECT max(block_time) FROM solana.rewards)",
+        "block_time > now() - interval '3000' year",  # Before datetime's range
+        "block_time > date_add('day', -99999999999, now())",
+    ])
+    def test_unbounded_is_full_history(self, condition):
+        estimate = scan(f"SELECT count(*) FROM solana.transactions WHERE {condition}")
+        # Everything since history_start (up to the upper bound, if any)
+        assert estimate.partitions >= 159
+        assert not estimate.tables[0].bounded
+        assert any(w.startswith("Full scan of solana.transactions") for w in estimate.warnings)
+
+    def test_range_before_history_is_empty(self):
+        estimate = scan("SELECT count(*) FROM solana.transactions WHERE block_date < date '2024-01-01'")
+        assert estimate.partitions == 0
+        assert estimate.bytes == 0
+
+    def test_filter_in_enclosing_query(self):
+        sql = (
+            "WITH tx AS (SELECT * FROM solana.transactions) "
+            "SELECT count(*) FROM tx WHERE tx.block_time > now() - interval '1' day"
+        )
+        assert scan(sql).partitions == 2
+
+
+class TestBytes:
+    """Test sizes, column shares and the join shape"""
+
+    def test_select_star_reads_all_columns(self):
+        estimate = scan("SELECT * FROM solana.transactions WHERE block_date = current_date")
+        assert estimate.tables[0].column_share == 1.0
+        assert estimate.bytes == 1000
+
+    def test_column_share(self):
+        few = scan("SELECT signer FROM solana.transactions WHERE block_date = current_date")
+        more = scan("SELECT signer, fee, success FROM solana.transactions WHERE block_date = current_date")
+        assert 0 < few.bytes < more.bytes < 1000
+
+    def test_snapshot_table(self):
+        estimate = scan("SELECT * FROM solana_utils.latest_balances")
+        assert estimate.tables[0].partitions is None
+        assert estimate.tables[0].bounded
+        assert estimate.bytes == 5000
+
+    def test_partition_key_join_prunes_both_sides(self):
+        sql = (
+            "SELECT * FROM solana.transactions t JOIN solana.instruction_calls i "
+            "ON i.tx_id = t.id AND i.block_time = t.block_time "
+            "WHERE t.block_time > now() - interval '1' day"
+        )
+        estimate = scan(sql)
+        assert [s.partitions for s in estimate.tables] == [2, 2]
+        assert estimate.warnings == ()
+
+    def test_join_without_key_scans_other_side_fully(self):
+        sql = (
+            "SELECT * FROM solana.transactions t JOIN solana.instruction_calls i ON i.tx_id = t.id "
+            "WHERE t.block_time > now() - interval '1' day"
+        )
+        estimate = scan(sql)
+        assert estimate.tables[1].partitions > 100
+        assert "Full scan of solana.instruction_calls" in estimate.warnings[0]
+
+    def test_cartesian_join_warning(self):
+        sql = "SELECT * FROM solana_utils.latest_balances a CROSS JOIN solana_utils.latest_balances b"
+        estimate = scan(sql)
+        assert "Join without a condition (cartesian product)" in estimate.warnings
+        assert estimate.bytes == 10000
+
+    def test_missing_stats(self):
+        estimate = scan("SELECT * FROM solana.rewards WHERE block_time > now() - interval '1' day")
+        assert estimate.bytes == 0
+        assert estimate.warnings == ("No size statistics for solana.rewards",)
+
+    def test_format_bytes(self):
+        assert format_bytes(512) == "512 B"
+        assert format_bytes(1.5e9) == "1.5 GB"
+        assert format_bytes(3e15) == "3000.0 TB"
+
+
+class TestBudget:
+    """Test flagging and rejecting over-budget SQL"""
+
+    FULL_SCAN = "SELECT * FROM solana.account_activity WHERE token_mint_address = 'x' AND block_time < now()"
+
+    def test_over_budget(self):
+        estimate = scan("SELECT * FROM solana.transactions WHERE block_time > now() - interval '7' day", budget_bytes=5000)
+        assert estimate.over_budget
+        assert estimate.to_dict()["over_budget"] is True
+        assert "exceeds the budget of 5.0 KB" in estimate.budget_message()
+        assert not scan("SELECT * FROM solana.transactions WHERE block_date = current_date", budget_bytes=5000).over_budget
+
+    def test_no_budget(self):
+        assert not scan("SELECT * FROM solana.transactions", budget_bytes=0).over_budget
+
+    @pytest.mark.asyncio
+    async def test_flag_keeps_sql(self):
+        with patch.object(settings, "SCAN_BUDGET_ACTION", "flag"):
+            result = await validate_generated_sql({"user_input": "q", "sql_output": self.FULL_SCAN, "error": None})
+        # block_time is filtered (so it validates) but has no lower bound: flagged, not repaired
+        assert result["validation_error"] is None
+        assert result["scan_estimate"]["over_budget"] is True
+
+    @pytest.mark.asyncio
+    async def test_reject_requests_repair(self):
+        with patch.object(settings, "SCAN_BUDGET_ACTION", "reject"):
+            result = await validate_generated_sql({"user_input": "q", "sql_output": self.FULL_SCAN, "error": None})
+        assert result["validation_error"].startswith("Estimated scan of")
+        assert result["repairs"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("chain", ["ethereum", "base", "arbitrum"])
+    async def test_evm_full_scan_rejected(self, chain):
+        """Every EVM pack table has size statistics, so the budget applies on EVM chains too"""
+        from app.agent.chains import chain_packs
+
+        for table in chain_packs.get(chain).registry.tables:
+            assert table.name in settings.SCAN_TABLE_STATS
+        sql = f"SELECT * FROM {chain}.logs WHERE block_time < now()"
+        with patch.object(settings, "SCAN_BUDGET_ACTION", "reject"):
+            result = await validate_generated_sql({"user_input": "q", "sql_output": sql, "error": None, "chain": chain})
+        assert result["scan_estimate"]["over_budget"] is True
+        assert result["validation_error"].startswith("Estimated scan of")
+
+    @pytest.mark.asyncio
+    async def test_out_of_range_dates_do_not_fail_the_node(self):
+        sql = "SELECT * FROM solana.transactions WHERE block_time > now() - interval '3000' year"
+        with patch.object(settings, "SCAN_BUDGET_ACTION", "reject"):
+            result = await validate_generated_sql({"user_input": "q", "sql_output": sql, "error": None})
+        assert result["scan_estimate"]["tables"][0]["bounded"] is False
+        assert result["validation_error"].startswith("Estimated scan of")
+        huge = "SELECT * FROM solana.transactions WHERE block_time > date_add('day', -99999999999, now())"
+        assert make_estimator().for_result({"sql_output": huge})["tables"][0]["bounded"] is False
+
+    def test_for_result(self):
+        estimator = make_estimator()
+        assert estimator.for_result({"sql_output": None}) is None
+        assert estimator.for_result({"sql_output": "SELECT FROM WHERE"}) is None
+        assert estimator.for_result({"scan_estimate": {"bytes": 1}}) == {"bytes": 1}
+        # Cache hits carry only the SQL
+        assert estimator.for_result({"sql_output": "SELECT * FROM solana_utils.latest_balances"})["bytes"] == 5000
+
+    def test_for_result_uses_the_chain_tables(self):
+        """Cache hits are estimated over the result's chain pack, not the Solana tables"""
+        estimator = make_estimator(stats={"ethereum.transactions": {"bytes_per_day": 1300}})
+        result = {"sql_output": "SELECT hash FROM ethereum.transactions WHERE block_time > now() - interval '1' day"}
+        estimate = estimator.for_result(result, "ethereum")
+        assert estimate["tables"][0]["partitions"] is not None  # block_time known as the partition key
+        assert 0 < estimate["tables"][0]["column_share"] < 1
+        assert estimator.for_result({**result, "chain": "ethereum"})["bytes"] == estimate["bytes"] > 0
+        assert estimator.for_result(result, "dogechain") is None
+
+
+class TestGenerateEndpoint:
+    """Test the estimate on /generate responses"""
+
+    @pytest.mark.asyncio
+    async def test_response_has_estimate(self):
+        from app.main import app
+        from app.core.database import get_db
+
+        db = AsyncMock()
+        db.add = MagicMock()
+
+        async def override_get_db():
+            yield db
+
+        agent = MagicMock()
+        agent.ainvoke = AsyncMock(return_value={"sql_output": "SELECT * FROM solana_utils.latest_balances", "error": None})
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch("app.api.routes.agent_app", agent), \
+                 patch("app.api.routes.scan_estimator", make_estimator()), \
+                 patch("app.api.routes.response_cache", ResponseCache(fingerprint="t", enabled=False)), \
+                 patch("app.api.routes.inflight_generations", SingleFlight()):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/generate", json={"user_input": "q", "chain": "solana", "session_id": "s"}
+                    )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        estimate = response.json()["scan_estimate"]
+        assert estimate["bytes"] == 5000
+        assert estimate["tables"][0]["table"] == "solana_utils.latest_balances"
@@ -0,0 +1,158 @@
+"""
+Unit tests for the DB engine configuration and pool statistics
+Drives InstrumentedPool with sqlite3 connections inside a greenlet (like AsyncEngine does)
+"""
+import sqlite3
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from pydantic import ValidationError
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import greenlet_spawn
+from app.core.config import Settings
+from app.core.database import (
+    ALEMBIC_DIR, InstrumentedPool, engine_options, init_db, migrations_current, pool_stats, warm_pool
+)
+
+
+def make_pool(**kwargs):
+    return InstrumentedPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), **kwargs)
+
+
+class TestEngineOptions:
+    def test_pool_settings(self):
+        with patch.multiple(
+            "app.core.database.settings",
+            DB_POOL_SIZE=7, DB_MAX_OVERFLOW=3, DB_POOL_TIMEOUT=2.0, DB_POOL_RECYCLE=60, DB_ECHO=False,
+        ):
+            options = engine_options()
+        assert options["pool_size"] == 7
+        assert options["max_overflow"] == 3
+        assert options["pool_timeout"] == 2.0
+        assert options["pool_recycle"] == 60
+        assert options["echo"] is False
+        assert options["poolclass"] is InstrumentedPool
+
+    def test_statement_cache_size(self):
+        with patch.multiple("app.core.database.settings", DB_PGBOUNCER=False, DB_STATEMENT_CACHE_SIZE=500):
+            assert engine_options()["connect_args"] == {"prepared_statement_cache_size": 500}
+
+    def test_pgbouncer_mode(self):
+        with patch("app.core.database.settings.DB_PGBOUNCER", True):
+            connect_args = engine_options()["connect_args"]
+        assert connect_args["statement_cache_size"] == 0
+        assert connect_args["prepared_statement_cache_size"] == 0
+        name_func = connect_args["prepared_statement_name_func"]
+        assert name_func() != name_func()  # Unique names across PgBouncer backends
+
+
+class TestInstrumentedPool:
+    """Test live pool statistics"""
+
+    @pytest.mark.asyncio
+    async def test_checked_out_and_idle(self):
+        pool = make_pool(pool_size=2, max_overflow=1, timeout=0.05)
+
+        first = await greenlet_spawn(pool.connect)
+        second = await greenlet_spawn(pool.connect)
+        third = await greenlet_spawn(pool.connect)
+        stats = pool.stats()
+        assert stats["checked_out"] == 3
+        assert stats["overflow"] == 1
+        assert stats["checkouts"] == 3
+
+        third.close()
+        second.close()
+        stats = pool.stats()
+        assert stats["checked_out"] == 1
+        assert stats["idle"] == 2
+        first.close()
+        pool.dispose()
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_wait_recorded(self):
+        pool = make_pool(pool_size=1, max_overflow=0, timeout=0.05)
+        held = await greenlet_spawn(pool.connect)
+
+        with pytest.raises(PoolTimeoutError):
+            await greenlet_spawn(pool.connect)
+
+        stats = pool.stats()
+        assert stats["timeouts"] == 1
+        assert stats["max_wait_ms"] >= 40
+        held.close()
+        pool.dispose()
+
+    def test_counters_survive_recreate(self):
+        pool = make_pool(pool_size=1)
+        pool.checkouts = 5
+        assert pool.recreate().stats()["checkouts"] == 5
+
+    def test_engine_uses_instrumented_pool(self):
+        stats = pool_stats()
+        assert {"checked_out", "idle", "overflow", "p99_wait_ms", "timeouts"} <= set(stats)
+
+
+def alembic_head():
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def fake_engine(at_head):
+    conn = MagicMock()
+    conn.run_sync = AsyncMock(side_effect=lambda fn: at_head if fn is migrations_current else None)
+    engine = MagicMock()
+    engine.begin.return_value.__aenter__.return_value = conn
+    return engine, conn
+
+
+class TestStartup:
+    """Test skipping create_all when migrated and the pool pre-warm"""
+
+    def test_migrations_current(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            assert migrations_current(conn) is False
+            conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)"))
+            conn.execute(text("INSERT INTO alembic_version VALUES ('bf65eb265dbf')"))
+            assert migrations_current(conn) is False
+            conn.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": alembic_head()})
+            assert migrations_current(conn) is True
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode, at_head, created", [
+        ("auto", True, False),
+        ("auto", False, True),
+        ("always", True, True),
+        ("never", False, False),
+    ])
+    async def test_init_db_modes(self, mode, at_head, created):
+        engine, conn = fake_engine(at_head)
+        assert await init_db(mode, engine) is created
+        ran = [call.args[0].__name__ for call in conn.run_sync.await_args_list]
+        assert ("create_all" in ran) is created
+
+    def test_unknown_create_all_mode_rejected(self):
+        with pytest.raises(ValidationError):
+            Settings(DB_CREATE_ALL="sometimes")
+        assert Settings(DB_CREATE_ALL="never").DB_CREATE_ALL == "never"
+
+    @pytest.mark.asyncio
+    async def test_warm_pool_opens_distinct_connections(self):
+        connections = [AsyncMock() for _ in range(3)]
+        connections[1].execute.side_effect = OSError("refused")
+        engine = MagicMock()
+        engine.connect = AsyncMock(side_effect=connections)
+
+        assert await warm_pool(3, engine) == 2
+        for conn in connections:
+            conn.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_warm_pool_disabled(self):
+        engine = MagicMock()
+        assert await warm_pool(0, engine) == 0
+        engine.connect.assert_not_called()
@@ -0,0 +1,220 @@
+"""
+Unit tests for the DuckDB dry runs
+Tests the fixtures, the executor (results, errors, timeout, isolation), the endpoint and the graph node
+"""
+import json
+import duckdb
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from httpx import AsyncClient, ASGITransport
+from langchain_core.messages import AIMessage
+from app.agent.schema import SOLANA_SCHEMA
+from app.agent.workflow import build_agent
+from app.core.config import settings
+from app.execution.dry_run import DryRunExecutor
+from app.execution.fixtures import fixture_path, generate_fixtures
+
+NOW = datetime(2025, 6, 15, 12, 0)
+VOLUME_SQL = (
+    "SELECT date_trunc('day', block_time) AS day, SUM(token_balance_change) AS volume FROM solana.account_activity "
+    "WHERE token_mint_address = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v' "
+    "AND block_time > timestamp '2025-06-08 12:00:00' GROUP BY 1 ORDER BY 1"
+)
+BAD_COLUMN_SQL = VOLUME_SQL.replace("SUM(token_balance_change)", "SUM(amount)")
+
+
+@pytest.fixture(scope="module")
+def fixtures_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("fixtures")
+    generate_fixtures(directory, scale=0.05, now=NOW)
+    return directory
+
+
+@pytest.fixture
+def executor(fixtures_dir):
+    executor = DryRunExecutor(fixtures_dir, timeout=2.0, sample_rows=5)
+    yield executor
+    executor.shutdown()
+
+
+class TestFixtures:
+    """Test the generated Parquet files"""
+
+    def test_one_file_per_table(self, fixtures_dir):
+        manifest = json.loads((fixtures_dir / "manifest.json").read_text())
+        assert set(manifest["rows"]) == set(SOLANA_SCHEMA.table_names)
+        for table in SOLANA_SCHEMA.table_names:
+            assert fixture_path(fixtures_dir, table).exists()
+
+    def test_deterministic(self, fixtures_dir, tmp_path):
+        generate_fixtures(tmp_path, scale=0.05, now=NOW)
+        for table in ("solana.transactions", "solana_utils.daily_balances"):
+            assert fixture_path(tmp_path, table).read_bytes() == fixture_path(fixtures_dir, table).read_bytes()
+
+    def test_declared_columns(self, executor):
+        for spec in SOLANA_SCHEMA.tables:
+            result = executor.run(f"SELECT * FROM {spec.name} LIMIT 1")
+            assert result.ok, result.error
+            assert result.columns == list(spec.column_names)
+
+    def test_activity_points_at_transactions(self, executor):
+        result = executor.run(
+            "SELECT count(*) FROM solana.account_activity a LEFT JOIN solana.transactions t "
+            "ON t.id = a.tx_id AND t.block_time = a.block_time WHERE t.id IS NULL"
+        )
+        assert result.sample == [[0]]
+
+
+class TestExecutor:
+    """Test dry runs on the fixtures"""
+
+    def test_rows_and_sample(self, executor):
+        result = executor.run(VOLUME_SQL)
+        assert result.ok, result.error
+        assert result.columns == ["day", "volume"]
+        assert 7 <= result.row_count <= 8  # Last 7 days (partial first day)
+        assert len(result.sample) == 5
+        assert result.sample[0][0].startswith("2025-06-0")
+        assert "CURRENT_TIMESTAMP" not in result.duckdb_sql
+        assert result.runtime_ms > 0
+
+    def test_row_count_beyond_sample(self, executor):
+        result = executor.run("SELECT address FROM solana_utils.latest_balances")
+        assert result.row_count == 250
+        assert len(result.sample) == 5
+
+    def test_trino_functions_transpiled(self, executor):
+        result = executor.run(
+            "SELECT date_add('day', -1, block_time) AS t, from_hex('ff') AS b FROM solana.transactions "
+            "WHERE block_time > now() - interval '1' day LIMIT 1"
+        )
+        assert result.ok, result.error
+
+    def test_sql_error(self, executor):
+        result = executor.run(BAD_COLUMN_SQL)
+        assert not result.ok
+        assert result.error_kind == "sql"
+        assert '"amount" not found' in result.error
+
+    @pytest.mark.parametrize("sql", ["DROP VIEW solana.transactions", "SELECT FROM WHERE", "SELECT 1; SELECT 2"])
+    def test_only_one_select(self, executor, sql):
+        result = executor.run(sql)
+        assert result.error_kind == "transpile"
+        assert executor.run("SELECT count(*) FROM solana.transactions").ok
+
+    def test_timeout(self, fixtures_dir):
+        executor = DryRunExecutor(fixtures_dir, timeout=0.2)
+        try:
+            result = executor.run("SELECT count(*) FROM range(1000000000000) a, solana.transactions")
+        finally:
+            executor.shutdown()
+        assert result.error_kind == "timeout"
+        assert result.runtime_ms < 5000
+        assert executor.stats()["timeouts"] == 1
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM read_csv('/etc/passwd')",
+        "SELECT * FROM read_parquet('/tmp/*.parquet')",
+    ])
+    def test_no_access_outside_fixtures(self, executor, sql):
+        result = executor.run(sql)
+        assert result.error_kind == "sql"
+
+    def test_configuration_locked(self, executor):
+        executor.run("SELECT 1")
+        with pytest.raises(duckdb.Error, match="locked"):
+            executor._connection().cursor().execute("SET enable_external_access = true")
+
+    def test_missing_fixtures(self, tmp_path):
+        result = DryRunExecutor(tmp_path).run(VOLUME_SQL)
+        assert result.error_kind == "unavailable"
+
+    @pytest.mark.asyncio
+    async def test_arun(self, executor):
+        result = await executor.arun(VOLUME_SQL)
+        assert result.ok
+        assert executor.stats()["runs"] == 1
+
+
+class TestEndpoint:
+    """Test POST /execute/dry-run"""
+
+    async def post(self, executor, sql):
+        from app.main import app
+
+        with patch("app.api.execute.dry_run_executor", executor):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                return await client.post("/api/v1/execute/dry-run", json={"sql": sql})
+
+    @pytest.mark.asyncio
+    async def test_ok(self, executor):
+        response = await self.post(executor, VOLUME_SQL)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ok"] is True
+        assert body["columns"] == ["day", "volume"]
+        assert body["warnings"] == []
+
+    @pytest.mark.asyncio
+    async def test_validation_problems_are_warnings(self, executor):
+        response = await self.post(executor, "SELECT count(*) FROM solana.transactions")
+        body = response.json()
+        assert body["ok"] is True
+        assert body["warnings"][0].startswith("Missing time filter")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sql", ["DELETE FROM solana.transactions", "SELECT FROM WHERE"])
+    async def test_rejected(self, executor, sql):
+        assert (await self.post(executor, sql)).status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_no_fixtures(self, tmp_path):
+        response = await self.post(DryRunExecutor(tmp_path), VOLUME_SQL)
+        assert response.status_code == 503
+
+
+class TestDryRunNode:
+    """Test the dry run in the graph (DRY_RUN_NODE_ENABLED)"""
+
+    @pytest.mark.asyncio
+    async def test_repairs_sql_error(self, executor):
+        with patch("app.agent.nodes.llm") as mock_llm, \
+             patch("app.agent.nodes.dry_run_executor", executor), \
+             patch.object(settings, "DRY_RUN_NODE_ENABLED", True):
+            mock_llm.ainvoke = AsyncMock(side_effect=[AIMessage(content=BAD_COLUMN_SQL), AIMessage(content=VOLUME_SQL)])
+            result = await build_agent().ainvoke({"user_input": "daily USDC volume"})
+
+        assert result["error"] is None
+        assert result["repairs"] == 1
+        assert result["dry_run"]["ok"] is True
+        repair_messages = mock_llm.ainvoke.await_args_list[1].args[0]
+        assert repair_messages[-1].content.count("Dry run on sample data failed") == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self, executor):
+        with patch("app.agent.nodes.llm") as mock_llm, \
+             patch("app.agent.nodes.dry_run_executor", executor), \
+             patch.object(settings, "DRY_RUN_NODE_ENABLED", True):
+            mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content=BAD_COLUMN_SQL))
+            result = await build_agent().ainvoke({"user_input": "daily USDC volume"})
+
+        assert result["error"].startswith("Generated SQL failed the dry run")
+        assert result["dry_run"]["error_kind"] == "sql"
+
+    @pytest.mark.asyncio
+    async def test_missing_fixtures_not_repaired(self, tmp_path):
+        with patch("app.agent.nodes.llm") as mock_llm, \
+             patch("app.agent.nodes.dry_run_executor", DryRunExecutor(tmp_path)), \
+             patch.object(settings, "DRY_RUN_NODE_ENABLED", True):
+            mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content=VOLUME_SQL))
+            result = await build_agent().ainvoke({"user_input": "daily USDC volume"})
+
+        assert result["error"] is None
+        assert result["dry_run"]["error_kind"] == "unavailable"
+        assert mock_llm.ainvoke.await_count == 1
+
+    def test_schema_examples_run(self, executor):
+        for example in SOLANA_SCHEMA.examples:
+            result = executor.run(example.sql)
+            assert result.ok, (example.question, result.error)
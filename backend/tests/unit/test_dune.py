@@ -0,0 +1,260 @@
+"""
+Unit tests for Dune execution
+Uses scripts/fake_dune_server.py in-process (no network, no API key): polling,
+paging, failures, retries, the result cache and POST /execute/dune
+"""
+import asyncio
+import json
+import httpx
+import pyarrow as pa
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.execution.dune import DuneClient, DuneError, DuneTimeout, rows_to_table
+from app.execution.fixtures import generate_fixtures
+from app.execution.result_cache import ResultCache, decode_table, encode_table, normalize_sql
+from scripts.fake_dune_server import FakeDuneConfig, canned_rows
+
+
+class TestDuneClient:
+    """Test submit -> poll -> results against the fake server"""
+
+    @pytest.mark.asyncio
+    async def test_execute(self, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(polls_until_done=3, rows=4))
+        result = await client.execute(dune_sql)
+
+        assert result.state == "QUERY_STATE_COMPLETED"
+        assert result.table.num_rows == 4
+        assert result.table.column_names == ["day", "volume", "token"]
+        assert not result.truncated
+        assert fake.state.requests["status"] == 4  # 3 x EXECUTING, then COMPLETED
+        assert client.stats()["completed"] == 1
+        assert fake.state.executions[result.execution_id]["sql"] == dune_sql
+
+    def test_backoff_is_exponential_and_capped(self):
+        client = DuneClient(api_key="k", poll_initial=0.5, poll_max=4.0)
+        assert [client.backoff(i) for i in range(6)] == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+
+    @pytest.mark.asyncio
+    async def test_pages(self, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(rows=12), page_size=5)
+        result = await client.execute(dune_sql)
+        assert result.table.num_rows == 12
+        assert fake.state.requests["results"] == 3
+
+    @pytest.mark.asyncio
+    async def test_truncated_at_max_rows(self, fake_dune_client, dune_sql):
+        client, _ = fake_dune_client(FakeDuneConfig(rows=12), page_size=5, max_rows=7)
+        result = await client.execute(dune_sql)
+        assert result.table.num_rows == 7
+        assert result.truncated
+
+    @pytest.mark.asyncio
+    async def test_failed_execution(self, fake_dune_client, dune_sql):
+        client, _ = fake_dune_client(FakeDuneConfig(fail_with="line 1:8: Column 'amount' cannot be resolved"))
+        with pytest.raises(DuneError, match="cannot be resolved") as error:
+            await client.execute(dune_sql)
+        assert error.value.state == "QUERY_STATE_FAILED"
+        assert client.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_timeout_cancels(self, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(polls_until_done=10_000), max_wait=0.05)
+        with pytest.raises(DuneTimeout):
+            await client.execute(dune_sql)
+        (execution,) = fake.state.executions.values()
+        assert execution["state"] == "QUERY_STATE_CANCELLED"
+        assert client.stats()["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors(self, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(polls_until_done=3, error_rate=0.4, seed=3), max_retries=10)
+        result = await client.execute(dune_sql)
+        assert result.table.num_rows == 3
+        assert client.stats()["retries"] > 0
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_client_errors_not_retried(self, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(api_key="other-key"))
+        with pytest.raises(DuneError) as error:
+            await client.execute(dune_sql)
+        assert error.value.status_code == 401
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_submit_not_repeated_after_server_error(self, dune_sql):
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(502, json={"error": "bad gateway"})
+
+        client = DuneClient(api_key="k", base_url="http://fake/api/v1", poll_initial=0.001,
+                            transport=httpx.MockTransport(handler))
+        with pytest.raises(DuneError, match="502"):
+            await client.execute(dune_sql)
+        assert calls == ["/api/v1/sql/execute"]
+
+    @pytest.mark.asyncio
+    async def test_not_configured(self, dune_sql):
+        with pytest.raises(DuneError, match="DUNE_API_KEY"):
+            await DuneClient(api_key=None).execute(dune_sql)
+
+    @pytest.mark.asyncio
+    async def test_fixture_results(self, tmp_path, fake_dune_client):
+        generate_fixtures(tmp_path, scale=0.05, now=datetime(2025, 6, 15, 12))
+        client, _ = fake_dune_client(FakeDuneConfig(fixtures=str(tmp_path)))
+        result = await client.execute("SELECT address, sol_balance FROM solana_utils.latest_balances")
+        assert result.table.num_rows == 250
+        assert result.table.column_names == ["address", "sol_balance"]
+
+    def test_rows_to_table(self):
+        table = rows_to_table([{"a": 1, "b": "x"}, {"a": None, "b": 2}], ["a", "b"])
+        assert table.column("a").type == pa.int64()
+        assert table.column("b").to_pylist() == ["x", "2"]  # Mixed JSON types -> strings
+        assert rows_to_table([], ["a"]).num_rows == 0
+
+
+class TestResultCache:
+    """Test keys, the Arrow encoding and size-bounded eviction"""
+
+    def test_normalized_sql_shares_a_key(self):
+        cache = ResultCache()
+        key = cache.make_key("SELECT address FROM solana_utils.latest_balances LIMIT 5", now=1000)
+        assert cache.make_key("select  address\nfrom solana_utils.latest_balances -- top\nlimit 5;", now=1000) == key
+        assert cache.make_key("SELECT address FROM solana_utils.latest_balances LIMIT 6", now=1000) != key
+        assert normalize_sql("SELECT FROM  WHERE ;") == "SELECT FROM WHERE"
+
+    def test_time_bucket(self, dune_sql):
+        cache = ResultCache(bucket_seconds=900)
+        assert cache.make_key(dune_sql, now=900) == cache.make_key(dune_sql, now=1799)
+        assert cache.make_key(dune_sql, now=900) != cache.make_key(dune_sql, now=1800)
+
+    def test_roundtrip_is_compact(self):
+        rows = canned_rows(2000)
+        table = rows_to_table(rows, ["day", "volume", "token"])
+        buffer = encode_table(table)
+        assert decode_table(buffer).equals(table)
+        assert buffer.size < len(json.dumps(rows)) / 5
+
+    def test_hit_and_miss(self, dune_sql):
+        cache = ResultCache()
+        key = cache.make_key(dune_sql)
+        assert cache.get(key) is None
+        assert cache.put(key, pa.table({"x": [1, 2]}), {"execution_id": "e1"})
+        table, meta = cache.get(key)
+        assert table.column("x").to_pylist() == [1, 2]
+        assert meta == {"execution_id": "e1"}
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        table = pa.table({"x": list(range(5000))})
+        size = encode_table(table).size
+        cache = ResultCache(max_bytes=size * 4 + 10)
+        keys = [f"k{i}:1" for i in range(4)]
+        for key in keys:
+            cache.put(key, table, {})
+        cache.get(keys[0])
+        cache.put("k4:1", table, {})
+        assert cache.get(keys[1]) is None  # Oldest unused entry went first
+        assert cache.get(keys[0]) is not None
+        assert cache.stats()["bytes"] <= cache.max_bytes
+        assert cache.stats()["evictions"] == 1
+
+    def test_too_large_not_cached(self):
+        cache = ResultCache(max_bytes=1000)
+        assert not cache.put("k:1", pa.table({"x": [str(i) * 20 for i in range(1000)]}), {})
+        assert cache.stats()["too_large"] == 1
+
+    def test_past_buckets_dropped(self):
+        cache = ResultCache()
+        cache.put("a:1", pa.table({"x": [1]}), {})
+        cache.put("b:2", pa.table({"x": [1]}), {})
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["expired"] == 1
+
+    def test_disabled(self):
+        cache = ResultCache(enabled=False)
+        assert not cache.put("k:1", pa.table({"x": [1]}), {})
+        assert cache.get("k:1") is None
+
+
+class TestExecuteEndpoint:
+    """Test POST /execute/dune"""
+
+    @pytest.fixture
+    def app(self):
+        from app.main import app
+        from app.api.deps import get_current_user
+
+        app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user")
+        yield app
+        app.dependency_overrides.clear()
+
+    async def post(self, app, client, cache, sql, count=1):
+        with patch("app.api.execute.dune_client", client), patch("app.api.execute.result_cache", cache):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+                responses = await asyncio.gather(*[
+                    http.post("/api/v1/execute/dune", json={"sql": sql}) for _ in range(count)
+                ])
+        return responses[0] if count == 1 else responses
+
+    @pytest.mark.asyncio
+    async def test_miss_then_hit(self, app, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(polls_until_done=2))
+        cache = ResultCache()
+        first = await self.post(app, client, cache, dune_sql)
+        assert first.status_code == 200
+        body = first.json()
+        assert body["cache_status"] == "miss"
+        assert body["columns"] == ["day", "volume", "token"]
+        assert body["row_count"] == len(body["rows"]) == 3
+
+        # Same query, different formatting: answered from the cache
+        second = await self.post(app, client, cache, sql=dune_sql.lower().replace(" ", "  "))
+        assert second.json()["cache_status"] == "hit"
+        assert second.json()["execution_id"] == body["execution_id"]
+        assert second.json()["rows"] == body["rows"]
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_sql_runs_once(self, app, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(polls_until_done=3))
+        responses = await self.post(app, client, ResultCache(), dune_sql, count=5)
+        assert all(r.status_code == 200 for r in responses)
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalid_sql_not_submitted(self, app, fake_dune_client):
+        client, fake = fake_dune_client()
+        response = await self.post(app, client, ResultCache(), sql="SELECT count(*) FROM solana.transactions")
+        assert response.status_code == 400
+        assert "Missing time filter" in response.json()["detail"]
+        assert fake.state.requests["submit"] == 0
+
+    @pytest.mark.asyncio
+    async def test_errors(self, app, fake_dune_client, dune_sql):
+        client, _ = fake_dune_client(FakeDuneConfig(fail_with="boom"))
+        assert (await self.post(app, client, ResultCache(), dune_sql)).status_code == 502
+        client, _ = fake_dune_client(FakeDuneConfig(polls_until_done=10_000), max_wait=0.02)
+        assert (await self.post(app, client, ResultCache(), dune_sql)).status_code == 504
+        assert (await self.post(app, DuneClient(api_key=None), ResultCache(), dune_sql)).status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_login_required(self, dune_sql):
+        from app.main import app
+        from app.core.database import get_db
+
+        async def override_get_db():
+            yield AsyncMock()
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+                response = await http.post("/api/v1/execute/dune", json={"sql": dune_sql})
+        finally:
+            app.dependency_overrides.clear()
+        assert response.status_code == 401
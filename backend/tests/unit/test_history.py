@@ -0,0 +1,131 @@
+"""
+Unit tests for keyset-paginated history
+Tests cursor encoding, the generated SQL and the X-Next-Cursor header
+"""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.future import select
+from app.core.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page, split_page
+from app.models.sql import UserQuery
+
+
+def make_rows(n, session_id="s-1"):
+    start = datetime(2026, 1, 1)
+    return [
+        UserQuery(
+            id=uuid.uuid4(),
+            user_input=f"q{i}",
+            sql_output="SELECT 1;",
+            session_id=session_id,
+            created_at=start - timedelta(minutes=i),
+        )
+        for i in range(n)
+    ]
+
+
+class TestCursor:
+    """Test cursor encoding and page splitting"""
+
+    def test_round_trip(self):
+        created_at, row_id = datetime(2026, 1, 2, 3, 4, 5, 678901), uuid.uuid4()
+        assert decode_cursor(encode_cursor(created_at, row_id)) == (created_at, row_id)
+
+    @pytest.mark.parametrize("cursor", ["", "not-a-cursor", "Zm9vfGJhcg"])
+    def test_invalid(self, cursor):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor)
+
+    def test_split_page(self):
+        rows = make_rows(3)
+        page, cursor = split_page(rows, 2)
+        assert page == rows[:2]
+        assert decode_cursor(cursor) == (rows[1].created_at, rows[1].id)
+
+        page, cursor = split_page(rows[:2], 2)
+        assert cursor is None
+
+    def test_keyset_sql(self):
+        """Row comparison + (created_at, id) order: served by the composite indexes"""
+        cursor = encode_cursor(datetime(2026, 1, 1), uuid.uuid4())
+        statement = keyset_page(select(UserQuery).where(UserQuery.session_id == "s"), UserQuery, cursor, 10)
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "(user_queries.created_at, user_queries.id) < (" in sql
+        assert "ORDER BY user_queries.created_at DESC, user_queries.id DESC" in sql
+        assert "OFFSET" not in sql
+
+    def test_composite_indexes(self):
+        names = {ix.name for ix in UserQuery.__table__.indexes}
+        assert {"ix_user_queries_session_created", "ix_user_queries_user_created"} <= names
+
+
+async def get(path, rows, user=None, **params):
+    from app.main import app
+    from app.core.database import get_db
+    from app.api.deps import get_current_user
+
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    db.execute = AsyncMock(return_value=result)
+
+    async def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    if user is not None:
+        app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(path, params=params)
+    finally:
+        app.dependency_overrides.clear()
+    return response, db
+
+
+class TestHistoryRoutes:
+    """Test /history and /history/me paging"""
+
+    @pytest.mark.asyncio
+    async def test_next_cursor_header(self):
+        rows = make_rows(3)
+        response, _ = await get("/api/v1/history", rows, session_id="s-1", limit=2)
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()] == [str(r.id) for r in rows[:2]]
+        assert decode_cursor(response.headers["X-Next-Cursor"]) == (rows[1].created_at, rows[1].id)
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_cursor(self):
+        response, _ = await get("/api/v1/history", make_rows(2), session_id="s-1", limit=2)
+        assert "X-Next-Cursor" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self):
+        response, db = await get("/api/v1/history", [], session_id="s-1", cursor="nope")
+        assert response.status_code == 400
+        db.execute.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_limit_is_bounded(self):
+        response, _ = await get("/api/v1/history", [], session_id="s-1", limit=100000)
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_my_history_requires_login(self):
+        response, _ = await get("/api/v1/history/me", [])
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_my_history_filters_by_user(self):
+        user = MagicMock(id=uuid.uuid4())
+        rows = make_rows(1)
+        response, db = await get("/api/v1/history/me", rows, user=user)
+
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        statement = db.execute.call_args[0][0]
+        assert "user_queries.user_id = " in str(statement)
@@ -0,0 +1,94 @@
+"""
+Unit tests for the Prometheus metrics
+Tests statement grouping, node/LLM/DB timing, the route label and /metrics
+"""
+import pytest
+from types import SimpleNamespace
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from app.core.metrics import instrument_engine, observe_llm, statement_group, timed_node
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestStatementGroup:
+    @pytest.mark.parametrize("statement, group", [
+        ("SELECT user_queries.id FROM user_queries WHERE ...", "select user_queries"),
+        ('INSERT INTO "query_cache" (key) VALUES ($1)', "insert query_cache"),
+        ("UPDATE users SET full_name=$1", "update users"),
+        ("SELECT 1", "select"),
+        ("", "other"),
+    ])
+    def test_groups(self, statement, group):
+        assert statement_group(statement) == group
+
+    def test_engine_events(self):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        before = sample("chainquery_db_statement_duration_seconds_count", group="select")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert sample("chainquery_db_statement_duration_seconds_count", group="select") == before + 1
+
+
+class TestTimedNode:
+    @pytest.mark.asyncio
+    async def test_records_and_passes_config(self):
+        async def node(state, config=None):
+            return {"seen": config}
+
+        wrapped = timed_node("test_node", node)
+        before = sample("chainquery_agent_node_duration_seconds_count", node="test_node")
+        assert await wrapped({}, {"configurable": {}}) == {"seen": {"configurable": {}}}
+        assert sample("chainquery_agent_node_duration_seconds_count", node="test_node") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_node_without_config(self):
+        async def node(state):
+            return {"ok": True}
+
+        assert await timed_node("plain_node", node)({}, None) == {"ok": True}
+
+    @pytest.mark.asyncio
+    async def test_failure_still_recorded(self):
+        async def node(state):
+            raise RuntimeError("boom")
+
+        before = sample("chainquery_agent_node_duration_seconds_count", node="failing_node")
+        with pytest.raises(RuntimeError):
+            await timed_node("failing_node", node)({})
+        assert sample("chainquery_agent_node_duration_seconds_count", node="failing_node") == before + 1
+
+
+class TestLLMMetrics:
+    def test_tokens_counted(self):
+        before = sample("chainquery_llm_tokens_total", provider="t", kind="completion")
+        response = SimpleNamespace(usage_metadata={"input_tokens": 120, "output_tokens": 30})
+        observe_llm("t", 0.2, response)
+        assert sample("chainquery_llm_tokens_total", provider="t", kind="completion") == before + 30
+
+    def test_failure(self):
+        before = sample("chainquery_errors_total", stage="llm")
+        observe_llm("t", 0.2)
+        assert sample("chainquery_errors_total", stage="llm") == before + 1
+        assert sample("chainquery_llm_request_duration_seconds_count", provider="t", outcome="error") >= 1
+
+
+class TestEndpoint:
+    @pytest.mark.asyncio
+    async def test_route_template_label_and_scrape(self):
+        from app.main import app
+
+        labels = {"method": "GET", "route": "/health", "status": "200"}
+        before = sample("chainquery_http_request_duration_seconds_count", **labels)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/health")
+            response = await client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "chainquery_http_request_duration_seconds_bucket" in response.text
+        assert sample("chainquery_http_request_duration_seconds_count", **labels) == before + 1
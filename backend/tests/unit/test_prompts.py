@@ -114,3 +114,78 @@ class TestSystemPrompt:
         
         # But not excessively long (under 20000 chars)
         assert len(SYSTEM_PROMPT) < 20000
+
+
+class TestPromptBuilder:
+    """Test schema retrieval: only relevant tables/tokens are sent"""
+    
+    def test_full_prompt_renders_every_table(self):
+        """SYSTEM_PROMPT is rendered from the registry"""
+        from app.agent.schema import SOLANA_SCHEMA
+        
+        for table in SOLANA_SCHEMA.tables:
+            assert f"TABLE {table.name} (" in SYSTEM_PROMPT
+        for token in SOLANA_SCHEMA.tokens:
+            assert token.mint in SYSTEM_PROMPT
+    
+    def test_holders_question_selects_balances(self):
+        from app.agent.prompts import build_system_prompt
+        
+        prompt = build_system_prompt("Top 10 BONK holders")
+        
+        assert "solana_utils.latest_balances" in prompt
+        assert "TABLE solana.transactions (" not in prompt
+        assert "TABLE solana.rewards (" not in prompt
+    
+    def test_only_mentioned_tokens(self):
+        from app.agent.prompts import build_system_prompt
+        
+        prompt = build_system_prompt("Daily USDC transfer volume")
+        
+        assert "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v" in prompt  # USDC
+        assert "DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263" not in prompt  # BONK
+    
+    def test_token_aliases_and_cashtags(self):
+        from app.agent.prompts import select_tokens
+        from app.agent.schema import SOLANA_SCHEMA
+        
+        symbols = [t.symbol for t in select_tokens("$BONK vs jupiter volume", SOLANA_SCHEMA)]
+        assert symbols == ["JUP", "BONK"]
+    
+    def test_unmatched_question_falls_back_to_full_schema(self):
+        from app.agent.prompts import select_tables
+        from app.agent.schema import SOLANA_SCHEMA
+        
+        assert len(select_tables("hello there", SOLANA_SCHEMA, 3)) == len(SOLANA_SCHEMA.tables)
+    
+    def test_max_tables(self):
+        from app.agent.prompts import select_tables
+        from app.agent.schema import SOLANA_SCHEMA
+        
+        tables = select_tables("transactions transfers rewards holders programs", SOLANA_SCHEMA, 2)
+        assert len(tables) == 2
+    
+    def test_retrieval_shrinks_prompt(self):
+        from app.agent.prompts import build_system_prompt, count_tokens
+        
+        full = count_tokens(SYSTEM_PROMPT)
+        for question in ["Top 10 BONK holders", "staking rewards by validator", "swaps on jupiter program"]:
+            assert count_tokens(build_system_prompt(question)) < 0.7 * full
+    
+    def test_rules_and_examples_always_present(self):
+        from app.agent.prompts import build_system_prompt
+        
+        prompt = build_system_prompt("staking rewards by validator")
+        assert "time filter" in prompt
+        assert "FEW-SHOT EXAMPLES" in prompt
+        assert "SELECT" in prompt
+    
+    def test_prompt_stats(self):
+        from app.agent.prompts import PromptStats
+        
+        stats = PromptStats(full_tokens=1000)
+        stats.record(400)
+        stats.record(600)
+        
+        assert stats.stats()["avg_prompt_tokens"] == 500
+        assert stats.stats()["avg_reduction"] == 0.5
@@ -0,0 +1,142 @@
+"""
+Unit tests for the LLM provider registry
+Uses scripts/fake_llm_server.py in-process (no network, no API key)
+"""
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from app.agent.providers import LazyChatModel, LLMProvider, ProviderConfig, ProviderRegistry, configs_from_settings
+from scripts.fake_llm_server import DEFAULT_SQL, FakeLLMConfig, create_app
+
+
+def stub_config(**overrides):
+    values = dict(
+        name="stub",
+        kind="openai",
+        model="fake-model",
+        api_key="stub",
+        base_url="http://fake-llm/v1",
+        timeout=5.0,
+        max_retries=0,
+    )
+    values.update(overrides)
+    return ProviderConfig(**values)
+
+
+def stub_provider(config=None, fake=None):
+    fake_app = create_app(fake or FakeLLMConfig())
+    provider = LLMProvider(config or stub_config(), transport=httpx.ASGITransport(app=fake_app))
+    return provider, fake_app
+
+
+class TestProviderRegistry:
+    """Test provider selection and configuration"""
+
+    def test_settings_configs(self):
+        configs = configs_from_settings()
+        assert {"groq", "openai", "stub"} <= set(configs)
+        assert configs["stub"].kind == "openai"
+
+    def test_unknown_provider_rejected(self):
+        with pytest.raises(ValueError):
+            ProviderRegistry(configs_from_settings(), primary="nope")
+        with pytest.raises(ValueError):
+            ProviderRegistry(configs_from_settings(), primary="groq", fallback="nope")
+
+    def test_provider_reused(self):
+        registry = ProviderRegistry(configs_from_settings(), primary="groq", fallback="openai")
+        assert registry.get() is registry.get("groq")
+        assert registry.chat_model() is registry.chat_model()
+        assert registry.active == ["groq", "openai"]
+        assert registry.model_id().startswith("groq:")
+
+    def test_pool_is_sized_explicitly(self):
+        provider = LLMProvider(stub_config(max_connections=7, max_keepalive=3, timeout=2.0))
+        pool = provider.http_client._transport._pool
+        assert pool._max_connections == 7
+        assert pool._max_keepalive_connections == 3
+        assert provider.http_client.timeout.read == 2.0
+
+
+class TestStubProvider:
+    """Test the chat model against the fake server"""
+
+    @pytest.mark.asyncio
+    async def test_chat_model_uses_pooled_client(self):
+        provider, fake_app = stub_provider()
+        response = await provider.chat_model.ainvoke(
+            [SystemMessage(content="You write SQL."), HumanMessage(content="Daily USDC volume")]
+        )
+        assert response.content == DEFAULT_SQL
+        assert fake_app.state.requests == 1
+        await provider.aclose()
+
+    @pytest.mark.asyncio
+    async def test_warm_and_close(self):
+        provider, _ = stub_provider()
+        assert await provider.warm() is True
+
+        client = provider.http_client
+        await provider.aclose()
+        assert client.is_closed
+        # A new client (and model) is built on next use
+        assert provider.http_client is not client
+        await provider.aclose()
+
+    @pytest.mark.asyncio
+    async def test_warm_failure_is_not_fatal(self):
+        def refuse(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        provider = LLMProvider(stub_config(), transport=httpx.MockTransport(refuse))
+        assert await provider.warm() is False
+        await provider.aclose()
+
+    @pytest.mark.asyncio
+    async def test_registry_startup_shutdown(self):
+        registry = ProviderRegistry({"stub": stub_config()}, primary="stub")
+        provider, fake_app = stub_provider()
+        registry.register(provider)
+
+        await registry.startup(warm=True)
+        assert provider.http_client is not None
+        await registry.shutdown()
+        assert provider._http_client is None
+        assert provider._chat_model is None
+
+
+class TestColdStart:
+    """Test lazy client construction and the single graph build"""
+
+    @pytest.mark.asyncio
+    async def test_lazy_chat_model_builds_on_first_call(self):
+        registry = ProviderRegistry({"stub": stub_config()}, primary="stub")
+        provider, fake_app = stub_provider()
+        registry.register(provider)
+
+        llm = LazyChatModel(registry)
+        assert provider._chat_model is None
+
+        response = await llm.ainvoke([HumanMessage(content="q")])
+        assert response.content == DEFAULT_SQL
+        assert provider._chat_model is not None
+        await registry.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_lazy_chat_model_follows_rebuilt_client(self):
+        """Unlike a model captured at import, the proxy survives a shutdown/startup cycle"""
+        registry = ProviderRegistry({"stub": stub_config()}, primary="stub")
+        provider, fake_app = stub_provider()
+        registry.register(provider)
+        llm = LazyChatModel(registry)
+
+        await llm.ainvoke([HumanMessage(content="q")])
+        await registry.shutdown()
+        response = await llm.ainvoke([HumanMessage(content="q")])
+        assert response.content == DEFAULT_SQL
+        assert fake_app.state.requests == 2
+        await registry.shutdown()
+
+    def test_graph_compiled_once(self):
+        from app.agent import graph, workflow
+        assert graph.agent_app is workflow.agent_app
@@ -0,0 +1,214 @@
+"""
+Unit tests for hedged LLM requests and the circuit breaker
+Providers point at scripts/fake_llm_server.py in-process with injected latency/errors
+"""
+import asyncio
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+from app.agent.providers import LLMProvider, ProviderConfig, ProviderRegistry
+from app.agent.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgedInvoker,
+    LatencyTracker,
+    CLOSED,
+    OPEN,
+    HALF_OPEN,
+)
+from scripts.fake_llm_server import DEFAULT_SQL, FakeLLMConfig, create_app
+
+MESSAGES = [HumanMessage(content="Daily USDC volume")]
+
+
+def make_registry(**fakes):
+    """Registry with one provider per fake server config; the first is primary, the second fallback."""
+    names = list(fakes)
+    configs, apps = {}, {}
+    for name, fake in fakes.items():
+        configs[name] = ProviderConfig(
+            name=name, kind="openai", model="fake-model", api_key="stub",
+            base_url=f"http://{name}/v1", timeout=5.0, max_retries=0,
+        )
+        apps[name] = create_app(fake)
+    registry = ProviderRegistry(configs, primary=names[0], fallback=names[1] if len(names) > 1 else None)
+    for name, app in apps.items():
+        registry.register(LLMProvider(configs[name], transport=httpx.ASGITransport(app=app)))
+    return registry, apps
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyTracker:
+    def test_percentiles(self):
+        tracker = LatencyTracker(window=100)
+        assert tracker.percentile(99) is None
+        for ms in range(1, 101):
+            tracker.record(ms / 1000)
+        assert tracker.percentile(50) == pytest.approx(0.050, abs=0.002)
+        assert tracker.percentile(99) == pytest.approx(0.099, abs=0.002)
+
+
+class TestCircuitBreaker:
+    """Test closed -> open -> half-open -> closed transitions"""
+
+    def test_opens_on_error_rate(self):
+        breaker = CircuitBreaker(failure_rate=0.5, window=10, min_calls=4)
+        for ok in (True, False, True):
+            breaker.record(ok)
+        assert breaker.state == CLOSED  # Below min_calls
+        breaker.record(False)
+        assert breaker.state == OPEN
+        assert breaker.allow() is False
+        assert breaker.stats()["rejected"] == 1
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker(failure_rate=0.5, slow_call_seconds=1.0, min_calls=2)
+        breaker.record(True, 2.0)
+        breaker.record(True, 3.0)
+        assert breaker.state == OPEN
+
+    def test_half_open_probe(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(min_calls=1, cooldown_seconds=30, clock=clock)
+        breaker.record(False)
+        assert breaker.state == OPEN
+
+        clock.now = 31
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is True   # The probe
+        assert breaker.allow() is False  # Only one at a time
+        breaker.record(True)
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(min_calls=1, cooldown_seconds=30, clock=clock)
+        breaker.record(False)
+        clock.now = 31
+        assert breaker.allow() is True
+        breaker.record(False)
+        assert breaker.state == OPEN
+        assert breaker.opened == 2
+
+
+class TestHedgedInvoker:
+    """Test hedging and breaking against fake providers"""
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_no_hedge(self):
+        registry, apps = make_registry(primary=FakeLLMConfig(), fallback=FakeLLMConfig())
+        invoker = HedgedInvoker(registry, hedge_default_delay=10.0)  # First call pays the client's cold start
+
+        response = await invoker.ainvoke(MESSAGES)
+
+        assert response.content == DEFAULT_SQL
+        assert apps["fallback"].state.requests == 0
+        assert invoker.stats()["hedged"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        registry, apps = make_registry(
+            primary=FakeLLMConfig(latency_ms=2000),
+            fallback=FakeLLMConfig(response="SELECT 2;"),
+        )
+        invoker = HedgedInvoker(registry, hedge_default_delay=0.05, max_hedge_rate=1.0)
+
+        start = asyncio.get_running_loop().time()
+        response = await invoker.ainvoke(MESSAGES)
+        elapsed = asyncio.get_running_loop().time() - start
+
+        assert response.content == "SELECT 2;"
+        assert elapsed < 1.0  # Did not wait for the slow primary
+        stats = invoker.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["hedge_win_rate"] == 1.0
+        # The loser was cancelled: its breaker slot is free again
+        assert invoker.breakers["primary"]._probing is False
+
+    @pytest.mark.asyncio
+    async def test_hedge_budget(self):
+        registry, apps = make_registry(primary=FakeLLMConfig(latency_ms=100), fallback=FakeLLMConfig())
+        invoker = HedgedInvoker(registry, hedge_default_delay=0.01, max_hedge_rate=0.0)
+
+        response = await invoker.ainvoke(MESSAGES)
+
+        assert response.content == DEFAULT_SQL
+        assert apps["fallback"].state.requests == 0
+        assert invoker.stats()["hedges_skipped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_to_the_same_provider(self):
+        registry, apps = make_registry(primary=FakeLLMConfig(latency_ms=100))
+        invoker = HedgedInvoker(registry, hedge_default_delay=0.01, max_hedge_rate=1.0)
+
+        response = await invoker.ainvoke(MESSAGES)
+
+        assert response.content == DEFAULT_SQL
+        assert apps["primary"].state.requests == 1
+        assert invoker.stats()["hedged"] == 0
+        assert invoker.stats()["hedges_skipped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_while_half_open(self):
+        clock = FakeClock()
+        registry, apps = make_registry(primary=FakeLLMConfig(latency_ms=100))
+        invoker = HedgedInvoker(
+            registry, hedge_default_delay=0.01, max_hedge_rate=1.0,
+            breaker_options=dict(min_calls=1, cooldown_seconds=10, clock=clock),
+        )
+        invoker._breaker("primary").record(False)
+        clock.now = 10.0
+        assert invoker.breakers["primary"].state == HALF_OPEN
+
+        response = await invoker.ainvoke(MESSAGES)
+
+        assert response.content == DEFAULT_SQL
+        assert apps["primary"].state.requests == 1  # Only the probe
+        assert invoker.breakers["primary"].state == CLOSED
+        assert invoker.stats()["hedges_skipped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hedge_disabled_per_call(self):
+        registry, apps = make_registry(primary=FakeLLMConfig(latency_ms=100), fallback=FakeLLMConfig())
+        invoker = HedgedInvoker(registry, hedge_default_delay=0.01, max_hedge_rate=1.0)
+
+        await invoker.ainvoke(MESSAGES, hedge=False)
+
+        assert apps["fallback"].state.requests == 0
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_fails_over(self):
+        registry, apps = make_registry(
+            primary=FakeLLMConfig(error_rate=1.0),
+            fallback=FakeLLMConfig(response="SELECT 2;"),
+        )
+        invoker = HedgedInvoker(registry, hedge=False, breaker_options=dict(min_calls=2, failure_rate=0.5))
+
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await invoker.ainvoke(MESSAGES)
+        assert invoker.breakers["primary"].state == OPEN
+
+        response = await invoker.ainvoke(MESSAGES)
+        assert response.content == "SELECT 2;"
+        assert apps["primary"].state.requests == 2  # No traffic while open
+        assert invoker.stats()["failovers"] == 1
+
+    @pytest.mark.asyncio
+    async def test_all_breakers_open(self):
+        registry, _ = make_registry(primary=FakeLLMConfig(error_rate=1.0))
+        invoker = HedgedInvoker(registry, hedge=False, breaker_options=dict(min_calls=1))
+
+        with pytest.raises(Exception):
+            await invoker.ainvoke(MESSAGES)
+        with pytest.raises(CircuitOpenError):
+            await invoker.ainvoke(MESSAGES)
+        assert invoker.stats()["errors"] == 2
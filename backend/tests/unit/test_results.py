@@ -0,0 +1,205 @@
+"""
+Unit tests for streamed query results
+GET /queries/{id}/results against scripts/fake_dune_server.py: NDJSON and
+Arrow IPC bodies, cursor paging from the cache and from Dune, access checks
+"""
+import json
+import uuid
+import pyarrow as pa
+import pytest
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.api.results import make_results_cursor
+from app.core.pagination import InvalidCursor, decode_offset_cursor, encode_offset_cursor
+from app.execution.dune import concat_tables
+from app.execution.result_cache import ResultCache
+from app.execution.result_stream import arrow_ipc_chunks, ndjson_chunks
+from app.models.sql import UserQuery
+from scripts.fake_dune_server import FakeDuneConfig
+
+USER_ID = uuid.uuid4()
+
+
+def read_arrow(body: bytes) -> pa.Table:
+    return pa.ipc.open_stream(body).read_all()
+
+
+def read_ndjson(body: bytes) -> list:
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+class TestSerialization:
+    """Test the chunked Arrow IPC and NDJSON encoders"""
+
+    def test_arrow_chunks_form_one_stream(self):
+        table = pa.table({"x": list(range(10)), "y": [str(i) for i in range(10)]})
+        chunks = list(arrow_ipc_chunks(table.slice(2, 7), chunk_rows=3))
+        assert len(chunks) == 1 + 3 + 1  # Schema, 3 batches, end of stream
+        assert all(isinstance(c, memoryview) for c in chunks)
+        assert read_arrow(b"".join(chunks)).equals(table.slice(2, 7))
+
+    def test_arrow_dictionary_columns(self):
+        chunked = pa.chunked_array([pa.array(["a", "b", "a"]).dictionary_encode(), pa.array(["c"]).dictionary_encode()])
+        table = pa.table({"x": [1, 2, 3, 4], "label": chunked})
+        result = read_arrow(b"".join(arrow_ipc_chunks(table, chunk_rows=2)))
+        assert result.schema.field("label").type == pa.string()
+        assert result.column("label").to_pylist() == ["a", "b", "a", "c"]
+
+    def test_arrow_empty_table(self):
+        table = pa.table({"x": pa.array([], pa.int64())})
+        result = read_arrow(b"".join(arrow_ipc_chunks(table)))
+        assert result.num_rows == 0
+        assert result.schema == table.schema
+
+    def test_ndjson_chunks(self):
+        table = pa.table({"x": list(range(5)), "b": [b"\x01"] * 5})
+        chunks = list(ndjson_chunks(table, chunk_rows=2))
+        assert len(chunks) == 3
+        assert read_ndjson(b"".join(chunks))[4] == {"x": 4, "b": "01"}
+
+    def test_offset_cursor(self):
+        assert decode_offset_cursor(encode_offset_cursor("01ABC.sig", 42)) == ("01ABC.sig", 42)
+        for bad in ("%%%", encode_offset_cursor("x", -1), encode_offset_cursor("", 3)):
+            with pytest.raises(InvalidCursor):
+                decode_offset_cursor(bad)
+
+
+class TestDunePaging:
+    """Test windows of a result fetched from Dune"""
+
+    @pytest.mark.asyncio
+    async def test_window(self, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(rows=30), page_size=4)
+        result = await client.execute(dune_sql)
+        page, truncated, total = await client.results(result.execution_id, offset=10, limit=9)
+        assert page.column("volume").to_pylist() == result.table.column("volume").to_pylist()[10:19]
+        assert truncated
+        assert total == 30
+
+    def test_concat_mixed_types(self):
+        pages = [pa.table({"a": [1, 2]}), pa.table({"a": pa.array([None], pa.null())}), pa.table({"a": ["x"]})]
+        assert concat_tables(pages, ["a"]).column("a").to_pylist() == ["1", "2", None, "x"]
+        assert concat_tables(pages[:2], ["a"]).column("a").type == pa.int64()
+
+
+class TestResultsEndpoint:
+    """Test GET /queries/{id}/results"""
+
+    @pytest.fixture
+    def query(self, dune_sql):
+        return UserQuery(id=uuid.uuid4(), user_input="daily volume", sql_output=dune_sql, user_id=USER_ID)
+
+    @pytest.fixture
+    def app(self, query):
+        from app.main import app
+        from app.api.deps import get_current_user
+        from app.core.database import get_db
+
+        async def override_get_db():
+            db = AsyncMock()
+            db.get.side_effect = lambda model, query_id: query if query_id == query.id else None
+            yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_current_user] = lambda: MagicMock(id=USER_ID)
+        yield app
+        app.dependency_overrides.clear()
+
+    async def get(self, app, client, cache, query_id, **params):
+        with ExitStack() as stack:
+            for module in ("app.api.execute", "app.api.results"):
+                stack.enter_context(patch(f"{module}.dune_client", client))
+                stack.enter_context(patch(f"{module}.result_cache", cache))
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+                return await http.get(f"/api/v1/queries/{query_id}/results", params=params)
+
+    async def get_all(self, app, client, cache, query_id, **params) -> list:
+        responses = [await self.get(app, client, cache, query_id, **params)]
+        while "X-Next-Cursor" in responses[-1].headers:
+            responses.append(await self.get(app, client, cache, query_id, cursor=responses[-1].headers["X-Next-Cursor"], **params))
+        return responses
+
+    @pytest.mark.asyncio
+    async def test_ndjson(self, app, query, fake_dune_client, dune_sql):
+        client, fake = fake_dune_client(FakeDuneConfig(rows=3))
+        response = await self.get(app, client, ResultCache(), query.id)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = read_ndjson(response.content)
+        assert len(rows) == 3
+        assert set(rows[0]) == {"day", "volume", "token"}
+        assert response.headers["X-Total-Rows"] == "3"
+        assert response.headers["X-Cache-Status"] == "miss"
+        assert "X-Next-Cursor" not in response.headers
+        assert fake.state.executions[response.headers["X-Execution-Id"]]["sql"] == dune_sql
+
+    @pytest.mark.asyncio
+    async def test_arrow_pages_come_from_the_cache(self, app, query, fake_dune_client):
+        client, fake = fake_dune_client(FakeDuneConfig(rows=25))
+        responses = await self.get_all(app, client, ResultCache(), query.id, format="arrow", limit=10)
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert responses[0].headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = pa.concat_tables([read_arrow(r.content) for r in responses])
+        assert table.num_rows == 25
+        assert table.column("volume").to_pylist() == [round(1000.5 * (i + 1), 2) for i in range(25)]
+        assert fake.state.requests["submit"] == 1
+        assert fake.state.requests["results"] == 1  # Pages 2-3 sliced from the cached table
+
+    @pytest.mark.asyncio
+    async def test_pages_past_max_rows_come_from_dune(self, app, query, fake_dune_client):
+        client, fake = fake_dune_client(FakeDuneConfig(rows=30), max_rows=12)
+        responses = await self.get_all(app, client, ResultCache(), query.id, limit=10)
+        assert len(responses) == 3
+        assert responses[0].headers["X-Total-Rows"] == "30"
+        rows = [row for r in responses for row in read_ndjson(r.content)]
+        assert [row["volume"] for row in rows] == [round(1000.5 * (i + 1), 2) for i in range(30)]
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cursor_outlives_the_cache_entry(self, app, query, fake_dune_client):
+        client, fake = fake_dune_client(FakeDuneConfig(rows=15))
+        cache = ResultCache()
+        first = await self.get(app, client, cache, query.id, limit=10)
+        cache.clear()
+        second = await self.get(app, client, cache, query.id, limit=10, cursor=first.headers["X-Next-Cursor"])
+        assert len(read_ndjson(second.content)) == 5
+        assert second.headers["X-Execution-Id"] == first.headers["X-Execution-Id"]
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_execution(self, app, query, fake_dune_client):
+        client, _ = fake_dune_client()
+        cursor = make_results_cursor(query.id, "01FAKEUNKNOWN", 10)
+        response = await self.get(app, client, ResultCache(), query.id, cursor=cursor)
+        assert response.status_code == 410
+
+    @pytest.mark.asyncio
+    async def test_cursor_bound_to_query(self, app, query, fake_dune_client):
+        client, fake = fake_dune_client()
+        for cursor in ("garbage", make_results_cursor(uuid.uuid4(), "01FAKE1", 10), encode_offset_cursor("01FAKE1.0000", 10)):
+            response = await self.get(app, client, ResultCache(), query.id, cursor=cursor)
+            assert response.status_code == 400
+        assert sum(fake.state.requests.values()) == 0
+
+    @pytest.mark.asyncio
+    async def test_access(self, app, query, fake_dune_client):
+        client, fake = fake_dune_client()
+        assert (await self.get(app, client, ResultCache(), uuid.uuid4())).status_code == 404
+
+        query.user_id, query.session_id = None, "guest-device"
+        assert (await self.get(app, client, ResultCache(), query.id)).status_code == 404
+        assert (await self.get(app, client, ResultCache(), query.id, session_id="other")).status_code == 404
+        assert (await self.get(app, client, ResultCache(), query.id, session_id="guest-device")).status_code == 200
+
+        query.sql_output = None
+        assert (await self.get(app, client, ResultCache(), query.id, session_id="guest-device")).status_code == 409
+        assert fake.state.requests["submit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalid_sql_not_submitted(self, app, query, fake_dune_client):
+        client, fake = fake_dune_client()
+        query.sql_output = "SELECT count(*) FROM solana.transactions"
+        response = await self.get(app, client, ResultCache(), query.id)
+        assert response.status_code == 400
+        assert fake.state.requests["submit"] == 0
@@ -0,0 +1,168 @@
+"""
+Unit tests for the SQL rewrite pass
+Tests each rule, that rewritten SQL still validates, and the rewriter node
+"""
+import pytest
+import sqlglot
+from sqlglot import exp
+from app.agent.nodes import rewrite_generated_sql
+from app.agent.rewrite import rewrite_sql
+from app.agent.schema import SOLANA_SCHEMA
+from app.agent.validation import DIALECT, validate_sql
+
+
+def normalized(sql):
+    return sqlglot.parse_one(sql, read=DIALECT).sql(dialect=DIALECT)
+
+
+class TestJoinBlockTime:
+    """Test the block_time equality on transaction joins"""
+
+    def test_adds_block_time(self):
+        sql = (
+            "SELECT t.signer FROM solana.transactions t JOIN solana.instruction_calls i ON i.tx_id = t.id "
+            "WHERE t.block_time > now() - interval '1' day AND t.block_date >= current_date - interval '1' day LIMIT 10"
+        )
+        result = rewrite_sql(sql)
+        assert result.applied == ("join_block_time",)
+        assert "ON i.tx_id = t.id AND i.block_time = t.block_time" in normalized(result.sql)
+
+    def test_keeps_existing_block_time(self):
+        sql = (
+            "SELECT t.signer FROM solana.transactions t JOIN solana.instruction_calls i "
+            "ON i.tx_id = t.id AND i.block_time = t.block_time "
+            "WHERE t.block_date = current_date LIMIT 10"
+        )
+        assert rewrite_sql(sql).sql == sql
+
+    def test_evm_transaction_hash(self):
+        """EVM packs join transactions and logs on hash = tx_hash"""
+        from app.agent.chains import chain_packs
+
+        sql = (
+            "SELECT t.hash, l.contract_address FROM ethereum.transactions t JOIN ethereum.logs l ON t.hash = l.tx_hash "
+            "WHERE t.block_time > now() - interval '1' day LIMIT 10"
+        )
+        result = rewrite_sql(sql, chain_packs.get("ethereum").registry)
+        assert result.applied == ("join_block_time", "block_date")
+        assert "ON t.hash = l.tx_hash AND l.block_time = t.block_time" in normalized(result.sql)
+
+    def test_other_join_keys_untouched(self):
+        sql = (
+            "SELECT a.address FROM solana.account_activity a JOIN solana_utils.token_accounts ta "
+            "ON ta.address = a.address WHERE a.block_time > now() - interval '1' day LIMIT 10"
+        )
+        assert not rewrite_sql(sql).changed
+
+
+class TestBlockDate:
+    """Test the block_date predicate next to block_time ranges"""
+
+    @pytest.mark.parametrize("condition, added", [
+        ("block_time > now() - interval '7' day", "block_date >= CAST(CURRENT_TIMESTAMP - INTERVAL '7' DAY AS DATE)"),
+        ("block_time < date '2024-02-01'", "block_date <= CAST('2024-02-01' AS DATE)"),
+        ("block_time BETWEEN date '2024-01-01' AND date '2024-01-31'",
+         "block_date BETWEEN CAST('2024-01-01' AS DATE) AND CAST('2024-01-31' AS DATE)"),
+    ])
+    def test_adds_block_date(self, condition, added):
+        result = rewrite_sql(f"SELECT count(*) FROM solana.transactions WHERE {condition}")
+        assert result.applied == ("block_date",)
+        assert added in normalized(result.sql)
+
+    @pytest.mark.parametrize("condition", [
+        "block_time > now() - interval '1' day AND block_date >= current_date - interval '1' day",  # Already there
+        "block_time > now() - interval '1' day OR success = false",                                  # Not a conjunct
+        "block_time > (SELECT max(block_time) FROM solana.rewards)",                                 # Not constant
+    ])
+    def test_left_alone(self, condition):
+        result = rewrite_sql(f"SELECT count(*) FROM solana.transactions WHERE {condition}")
+        assert "block_date" not in result.applied
+
+    def test_only_tables_with_block_date(self):
+        result = rewrite_sql("SELECT count(*) FROM solana.instruction_calls WHERE block_time > now() - interval '1' day")
+        assert not result.changed
+
+
+class TestNarrowStar:
+    """Test SELECT * on wide tables"""
+
+    def test_final_result_gets_default_columns(self):
+        sql = "SELECT * FROM solana.transactions WHERE block_time > now() - interval '1' hour LIMIT 5"
+        result = rewrite_sql(sql)
+        assert "narrow_star" in result.applied
+        columns = [e.alias_or_name for e in sqlglot.parse_one(result.sql, read=DIALECT).expressions]
+        assert columns == list(SOLANA_SCHEMA.table("solana.transactions").default_columns)
+
+    def test_cte_gets_the_columns_used_outside(self):
+        sql = (
+            "WITH tx AS (SELECT * FROM solana.transactions WHERE block_time > now() - interval '1' day "
+            "AND block_date >= current_date - interval '1' day) "
+            "SELECT signer, sum(fee) FROM tx WHERE success GROUP BY 1 LIMIT 10"
+        )
+        result = rewrite_sql(sql)
+        assert result.applied == ("narrow_star",)
+        cte = sqlglot.parse_one(result.sql, read=DIALECT).find(exp.CTE).this
+        assert [e.name for e in cte.expressions] == ["fee", "success", "signer"]
+
+    def test_narrow_tables_untouched(self):
+        sql = "SELECT * FROM solana_utils.latest_balances LIMIT 5"
+        assert not rewrite_sql(sql).changed
+
+    def test_union_branches_untouched(self):
+        sql = (
+            "SELECT * FROM solana.transactions WHERE block_date = current_date "
+            "UNION ALL SELECT * FROM solana.transactions WHERE block_date = current_date - interval '1' day LIMIT 5"
+        )
+        assert not rewrite_sql(sql).changed
+
+
+class TestLimit:
+    """Test the default LIMIT"""
+
+    def test_adds_limit(self):
+        result = rewrite_sql("SELECT address FROM solana_utils.latest_balances ORDER BY sol_balance DESC", default_limit=50)
+        assert result.applied == ("limit",)
+        assert normalized(result.sql).endswith("LIMIT 50")
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT address FROM solana_utils.latest_balances LIMIT 10",
+        "SELECT count(*) FROM solana_utils.latest_balances",
+        "SELECT sum(sol_balance) AS total FROM solana_utils.latest_balances WHERE sol_balance > 1",
+    ])
+    def test_no_limit_needed(self, sql):
+        assert not rewrite_sql(sql).changed
+
+    def test_grouped_aggregate_gets_limit(self):
+        result = rewrite_sql("SELECT token_mint_address, count(*) FROM solana_utils.latest_balances GROUP BY 1")
+        assert result.applied == ("limit",)
+
+    def test_disabled(self):
+        assert not rewrite_sql("SELECT address FROM solana_utils.latest_balances", default_limit=0).changed
+
+
+class TestRewriteSQL:
+    """Test the pass as a whole"""
+
+    @pytest.mark.parametrize("sql", ["SELECT FROM WHERE", "DELETE FROM solana.transactions", ""])
+    def test_unparseable_or_not_select_unchanged(self, sql):
+        assert rewrite_sql(sql).sql == sql
+
+    def test_schema_examples_still_validate(self):
+        for example in SOLANA_SCHEMA.examples:
+            result = rewrite_sql(example.sql)
+            assert validate_sql(result.sql).ok, (example.question, result.sql)
+
+    @pytest.mark.asyncio
+    async def test_node_keeps_original(self):
+        sql = "SELECT address FROM solana_utils.latest_balances"
+        update = await rewrite_generated_sql({"user_input": "q", "sql_output": sql, "error": None})
+        assert update["original_sql"] == sql
+        assert update["sql_output"].endswith("LIMIT 1000")
+
+        unchanged = sql + " LIMIT 5"
+        update = await rewrite_generated_sql({"user_input": "q", "sql_output": unchanged, "error": None, "original_sql": "old"})
+        assert update == {"sql_output": unchanged, "original_sql": None}
+
+    @pytest.mark.asyncio
+    async def test_node_skips_failed_generation(self):
+        assert await rewrite_generated_sql({"user_input": "q", "sql_output": None, "error": "boom"}) == {}
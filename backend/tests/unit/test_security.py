@@ -0,0 +1,105 @@
+"""
+Unit tests for password hashing
+Tests bcrypt helpers, the off-loop hashing pool and 503 admission control
+"""
+import asyncio
+import threading
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.core.security import HasherBusy, PasswordHasher, get_password_hash, verify_password
+
+
+class TestPasswordHelpers:
+    def test_hash_and_verify(self):
+        hashed = get_password_hash("password123", rounds=4)
+        assert hashed.startswith("$2b$04$")
+        assert verify_password("password123", hashed)
+        assert not verify_password("wrong", hashed)
+
+    def test_long_password(self):
+        """bcrypt only reads 72 bytes; longer passwords must not raise"""
+        hashed = get_password_hash("x" * 100, rounds=4)
+        assert verify_password("x" * 100, hashed)
+
+    def test_not_a_bcrypt_hash(self):
+        assert verify_password("password123", "not-a-hash") is False
+
+
+class TestPasswordHasher:
+    """Test the dedicated pool"""
+
+    @pytest.mark.asyncio
+    async def test_runs_off_the_event_loop(self):
+        hasher = PasswordHasher(workers=1, rounds=4)
+        threads = []
+
+        def spy(*args):
+            threads.append(threading.current_thread().name)
+            return True
+
+        with patch("app.core.security.verify_password", spy):
+            assert await hasher.verify("a", "b") is True
+        assert threads[0].startswith("password-hash")
+        hasher.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_hash_uses_configured_rounds(self):
+        hasher = PasswordHasher(rounds=5)
+        hashed = await hasher.hash("password123")
+        assert hashed.startswith("$2b$05$")
+        assert await hasher.verify("password123", hashed)
+        hasher.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_saturated(self):
+        hasher = PasswordHasher(workers=1, max_pending=2, rounds=4)
+        release = threading.Event()
+
+        def slow(*args):
+            release.wait(5)
+            return True
+
+        with patch("app.core.security.verify_password", slow):
+            running = [asyncio.create_task(hasher.verify("a", "b")) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(HasherBusy):
+                await hasher.verify("a", "b")
+            release.set()
+            assert await asyncio.gather(*running) == [True, True]
+
+        stats = hasher.stats()
+        assert stats["rejected"] == 1
+        assert stats["pending"] == 0
+        hasher.shutdown()
+
+
+class TestAuthBusy:
+    @pytest.mark.asyncio
+    async def test_login_returns_503_when_saturated(self):
+        from app.main import app
+        from app.core.database import get_db
+
+        db = AsyncMock()
+        result = MagicMock()
+        result.scalars.return_value.first.return_value = MagicMock(hashed_password="$2b$04$x")
+        db.execute = AsyncMock(return_value=result)
+
+        async def override_get_db():
+            yield db
+
+        busy = MagicMock()
+        busy.verify = AsyncMock(side_effect=HasherBusy())
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch("app.api.auth.password_hasher", busy):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/auth/login",
+                        data={"username": "a@example.com", "password": "password123"},
+                    )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
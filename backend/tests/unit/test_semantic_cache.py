@@ -0,0 +1,367 @@
+"""
+Unit tests for the semantic similarity cache
+Tests the local embedder, nearest-neighbour lookup, eviction and the generate_sql hook
+"""
+import asyncio
+import threading
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.agent.cache import ResponseCache
+from app.agent.semantic_cache import HashingEmbedder, SemanticCache
+from app.agent.nodes import generate_sql
+
+
+def make_cache(**kwargs):
+    defaults = {"embedder": HashingEmbedder(dim=256), "capacity": 100, "threshold": 0.9, "enabled": True}
+    defaults.update(kwargs)
+    return SemanticCache(**defaults)
+
+
+class TestHashingEmbedder:
+    """Test the local NumPy embedder"""
+
+    def test_deterministic_and_normalized(self):
+        embedder = HashingEmbedder(dim=128)
+        a = embedder.embed("Top BONK holders")
+        b = embedder.embed("Top BONK holders")
+
+        assert a.shape == (128,)
+        assert a.dtype == np.float32
+        assert np.allclose(a, b)
+        assert np.isclose(np.linalg.norm(a), 1.0)
+
+    def test_paraphrases_are_close(self):
+        embedder = HashingEmbedder()
+        a = embedder.embed("biggest BONK holders")
+        b = embedder.embed("top BONK wallets")
+        c = embedder.embed("daily USDC transfer volume")
+
+        assert float(a @ b) > 0.9
+        assert float(a @ c) < 0.5
+
+
+class TestSemanticCache:
+    """Test lookup, guards, eviction and stats"""
+
+    def test_paraphrase_hit(self):
+        cache = make_cache()
+        cache.add("biggest BONK holders", "SELECT bonk;")
+
+        assert cache.lookup("top BONK wallets") == "SELECT bonk;"
+        assert cache.hits == 1
+
+    def test_unrelated_question_misses(self):
+        cache = make_cache()
+        cache.add("biggest BONK holders", "SELECT bonk;")
+
+        assert cache.lookup("daily USDC transfer volume") is None
+        assert cache.misses == 1
+
+    def test_numbers_must_match(self):
+        """A "top 10" answer must never be reused for "top 100" """
+        cache = make_cache(threshold=0.5)
+        cache.add("top 10 SOL holders", "SELECT ... LIMIT 10;")
+
+        assert cache.lookup("top 100 SOL holders") is None
+        assert cache.lookup("top 10 SOL wallets") == "SELECT ... LIMIT 10;"
+
+    @pytest.mark.parametrize("cached, asked", [
+        ("SOL transfers by signer last 7 days", "SOL transfers to signer last 7 days"),
+        ("number of transactions by day last week", "number of failed transactions by day last week"),
+        ("USDC sent from this wallet", "USDC sent to this wallet"),
+        ("BONK buys on jupiter today", "BONK sells on jupiter today"),
+    ])
+    def test_near_misses(self, cached, asked):
+        """Questions differing only in direction, status or negation never share SQL"""
+        cache = make_cache(threshold=0.5)
+        cache.add(cached, "SELECT cached;")
+
+        assert cache.lookup(asked) is None
+        assert cache.lookup(cached) == "SELECT cached;"
+
+    @pytest.mark.parametrize("cached, asked", [("USDC", "USDT"), ("BONK", "WIF"), ("JUP", "PYTH"), ("$bonk", "$wif")])
+    def test_tokens_must_match(self, cached, asked):
+        """Questions differing only in the token never share SQL, however close they embed"""
+        template = (
+            "show the daily transfer volume and number of unique senders of {} on solana "
+            "over the last 30 days ordered by day descending"
+        )
+        cache = make_cache(threshold=0.5)
+        cache.add(template.format(cached), "SELECT cached;")
+
+        assert cache.lookup(template.format(asked)) is None
+        assert cache.lookup(template.format(cached)) == "SELECT cached;"
+
+    def test_addresses_and_resolved_mints_must_match(self):
+        cache = make_cache(threshold=0.5)
+        cache.add("holders of EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", "SELECT usdc;")
+        cache.add("top bonk holders", "SELECT bonk;", mints=["bonk-mint"])
+
+        assert cache.lookup("holders of Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB") is None
+        assert cache.lookup("top wif holders", mints=["wif-mint"]) is None
+        assert cache.lookup("biggest bonk wallets", mints=["bonk-mint"]) == "SELECT bonk;"
+
+    def test_lru_eviction(self):
+        cache = make_cache(capacity=2)
+        cache.add("top BONK holders", "SELECT bonk;")
+        cache.add("top JUP holders", "SELECT jup;")
+
+        # Touch BONK so JUP becomes least recently used
+        assert cache.lookup("top BONK holders") == "SELECT bonk;"
+        cache.add("daily USDC volume", "SELECT usdc;")
+
+        assert len(cache) == 2
+        assert cache.evictions == 1
+        assert cache.lookup("top JUP holders") is None
+        assert cache.lookup("top BONK holders") == "SELECT bonk;"
+
+    def test_grows_past_initial_allocation(self):
+        cache = make_cache(capacity=3000)
+        for i in range(1500):
+            cache.add(f"question number {i}", f"SELECT {i};")
+
+        assert len(cache) == 1500
+        assert cache.lookup("question number 1234") == "SELECT 1234;"
+
+    def test_stats(self):
+        cache = make_cache()
+        cache.add("top BONK holders", "SELECT bonk;")
+        cache.lookup("top BONK holders")
+        cache.lookup("daily USDC volume")
+
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["lookup_ms_p99"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_eviction_during_offloaded_lookup(self):
+        """A row evicted and reused while the thread ranks it never answers with the new entry's SQL"""
+        cache = make_cache(capacity=2)
+        cache.add("top JUP holders", "SELECT jup;")
+        cache.add("top BONK holders", "SELECT bonk;")
+        ranked, resume = threading.Event(), threading.Event()
+        nearest = cache._nearest
+
+        def slow_nearest(*args):
+            rows = nearest(*args)
+            ranked.set()
+            resume.wait(5)
+            return rows
+
+        with patch("app.agent.semantic_cache._OFFLOAD_ROWS", 1), patch.object(cache, "_nearest", slow_nearest):
+            lookup = asyncio.create_task(cache.alookup("top JUP holders"))
+            await asyncio.to_thread(ranked.wait, 5)
+            cache.add("daily USDC transfer volume", "SELECT usdc;")  # Evicts JUP, reusing its row
+            for i in range(3000):
+                cache.add(f"question number {i}", f"SELECT {i};")  # Churn every row meanwhile
+            resume.set()
+            result = await lookup
+
+        assert result is None
+        assert cache.misses == 1 and cache.hits == 0
+
+    @pytest.mark.asyncio
+    async def test_offloaded_lookup_hit(self):
+        cache = make_cache()
+        cache.add("top BONK holders", "SELECT bonk;")
+
+        with patch("app.agent.semantic_cache._OFFLOAD_ROWS", 1):
+            assert await cache.alookup("biggest BONK wallets") == "SELECT bonk;"
+        assert cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_never_answers(self):
+        cache = make_cache(enabled=False)
+        cache.add("top BONK holders", "SELECT bonk;")
+
+        assert await cache.alookup("top BONK holders") is None
+
+
+class TestGenerateSQLSemanticCache:
+    """Test the semantic cache hook in generate_sql"""
+
+    @pytest.mark.asyncio
+    async def test_paraphrase_skips_llm(self):
+        cache = make_cache()
+
+        mock_response = MagicMock()
+        mock_response.content = "SELECT * FROM solana_utils.latest_balances;"
+
+        with patch('app.agent.nodes.semantic_cache', cache), patch('app.agent.nodes.llm') as mock_llm:
+            mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+
+            first = await generate_sql({"user_input": "biggest BONK holders"})
+            assert len(cache) == 0  # Added by the route once the whole run accepted it
+            cache.add_result("biggest BONK holders", "solana", first)
+            second = await generate_sql({"user_input": "top BONK wallets"})
+
+            mock_llm.ainvoke.assert_called_once()
+            assert second["sql_output"] == first["sql_output"]
+            assert second["sql_source"] == "semantic_cache"
+            assert second["error"] is None
+
+    @pytest.mark.asyncio
+    async def test_resolved_tokens_guard_the_lookup(self):
+        cache = make_cache(threshold=0.5)
+        bonk = {"chain": "solana", "symbol": "BONK", "name": "Bonk", "mint": "bonk-mint", "decimals": 5, "rank": 0}
+        wif = {**bonk, "symbol": "WIF", "mint": "wif-mint"}
+        cache.add_result("top bonk holders", "solana", {"sql_output": "SELECT bonk;", "sql_source": "llm", "tokens": [bonk]})
+
+        with patch('app.agent.nodes.semantic_cache', cache), patch('app.agent.nodes.llm') as mock_llm:
+            mock_llm.ainvoke = AsyncMock(return_value=MagicMock(content="SELECT 1;"))
+            wif_result = await generate_sql({"user_input": "top wif holders", "tokens": [wif]})
+            bonk_result = await generate_sql({"user_input": "biggest bonk wallets", "tokens": [bonk]})
+
+        assert wif_result["sql_source"] == "llm"
+        assert bonk_result["sql_output"] == "SELECT bonk;"
+
+
+class TestAddResult:
+    """Test that only SQL the whole agent run accepted is added"""
+
+    @pytest.mark.parametrize("chain, result", [
+        ("solana", {"sql_output": "SELECT 1;", "sql_source": "llm", "error": "Generated SQL failed validation: x"}),
+        ("solana", {"sql_output": "SELECT 1;", "sql_source": "llm", "validation_error": "Estimated scan of 9 TB"}),
+        ("solana", {"sql_output": "SELECT 1;", "sql_source": "semantic_cache"}),
+        ("solana", {"sql_output": "SELECT 1;"}),  # Response cache hit
+        ("solana", {"sql_output": None, "sql_source": "llm", "error": "LLM unavailable"}),
+        ("ethereum", {"sql_output": "SELECT 1;", "sql_source": "llm"}),
+    ])
+    def test_not_added(self, chain, result):
+        cache = make_cache()
+        cache.add_result("top BONK holders", chain, result)
+        assert len(cache) == 0
+
+    def test_disabled(self):
+        cache = make_cache(enabled=False)
+        cache.add_result("top BONK holders", "solana", {"sql_output": "SELECT 1;", "sql_source": "llm"})
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_route_adds_only_accepted_sql(self):
+        """A repaired run caches its final SQL; valid SQL the scan budget rejects is never cached"""
+        from app.main import app
+        from app.core.config import settings
+        from app.core.database import get_db
+        from app.core.singleflight import SingleFlight
+        from app.agent.workflow import build_agent
+
+        good = (
+            "SELECT address, SUM(token_balance_change) AS delta FROM solana.account_activity "
+            "WHERE block_time > now() - interval '1' day GROUP BY 1 LIMIT 10"
+        )
+        full_scan = (  # Passes validation (filtered on block_time) but is over the scan budget
+            "SELECT address, SUM(token_balance_change) FROM solana.account_activity WHERE block_time < now() GROUP BY 1"
+        )
+        db = AsyncMock()
+        db.add = MagicMock()
+
+        async def override_get_db():
+            yield db
+
+        async def ask(question, *answers):
+            llm = MagicMock()
+            llm.ainvoke = AsyncMock(side_effect=[MagicMock(content=sql) for sql in answers])
+            with patch("app.agent.nodes.llm", llm):
+                agent = build_agent()
+                with patch("app.api.routes.agent_app", agent), \
+                     patch("app.api.routes.response_cache", ResponseCache(fingerprint="t", enabled=False)), \
+                     patch("app.api.routes.inflight_generations", SingleFlight()):
+                    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                        return await client.post(
+                            "/api/v1/generate", json={"user_input": question, "chain": "solana", "session_id": "s"},
+                        )
+
+        cache = make_cache()
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch("app.agent.nodes.semantic_cache", cache), patch("app.api.routes.semantic_cache", cache), \
+                 patch.object(settings, "SCAN_BUDGET_ACTION", "reject"):
+                failed = await ask("BONK holder deltas", *[full_scan] * (settings.SQL_REPAIR_MAX_ATTEMPTS + 1))
+                assert failed.json()["error_message"].startswith("Generated SQL failed validation: Estimated scan")
+                assert len(cache) == 0
+
+                repaired = await ask("BONK holder deltas today", full_scan, good)
+                assert repaired.json()["error_message"] is None
+        finally:
+            app.dependency_overrides.clear()
+        assert len(cache) == 1
+        assert cache.lookup("BONK holder deltas today") == repaired.json()["sql_output"]
+
+
+class FakeLoadSession:
+    """Session stand-in for load_from_db: history rows, then the cache keys that exist"""
+
+    def __init__(self, rows, cached_keys):
+        self.rows = rows
+        self.cached_keys = cached_keys
+        self.history_served = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        result = MagicMock()
+        if "query_cache" in str(statement):
+            result.scalars.return_value.all.return_value = list(self.cached_keys)
+        else:
+            result.all.return_value = [] if self.history_served else self.rows
+            self.history_served = True
+        return result
+
+
+class TestLoadFromDb:
+    """Test the startup load only keeps answers made under the current prompt + model"""
+
+    def rows(self):
+        from datetime import datetime
+        import uuid
+
+        return [
+            MagicMock(user_input=text, sql_output=sql, created_at=datetime(2024, 1, 1), id=uuid.uuid4())
+            for text, sql in [("top BONK holders", "SELECT bonk;"), ("daily USDC volume", "SELECT usdc;")]
+        ]
+
+    @pytest.mark.asyncio
+    async def test_only_rows_answered_under_current_fingerprint(self):
+        rows = self.rows()
+        response_cache = ResponseCache(fingerprint="current")
+        session = FakeLoadSession(rows, {response_cache.make_key("top BONK holders", "solana")})
+        cache = make_cache()
+
+        loaded = await cache.load_from_db(lambda: session, batch_size=10, response_cache=response_cache)
+
+        assert loaded == 1
+        assert cache.lookup("top BONK holders") == "SELECT bonk;"
+        assert cache.lookup("daily USDC volume") is None  # Made by an older prompt or model
+
+    @pytest.mark.asyncio
+    async def test_rows_get_the_mints_lookups_use(self):
+        rows = self.rows()
+        response_cache = ResponseCache(fingerprint="current")
+        session = FakeLoadSession(rows, {response_cache.make_key(r.user_input, "solana") for r in rows})
+        cache = make_cache()
+        mints = {"top BONK holders": ["bonk-mint"]}
+
+        loaded = await cache.load_from_db(
+            lambda: session, response_cache=response_cache, resolve_mints=lambda text: mints.get(text, []),
+        )
+
+        assert loaded == 2
+        assert cache.lookup("top BONK holders") is None
+        assert cache.lookup("top BONK holders", mints=["bonk-mint"]) == "SELECT bonk;"
+        assert cache.lookup("daily USDC volume") == "SELECT usdc;"
+
+    @pytest.mark.asyncio
+    async def test_no_response_cache_loads_nothing(self):
+        session = FakeLoadSession(self.rows(), set())
+        cache = make_cache()
+
+        assert await cache.load_from_db(lambda: session, response_cache=ResponseCache("x", enabled=False)) == 0
+        assert len(cache) == 0
@@ -0,0 +1,91 @@
+"""
+Unit tests for single-flight request coalescing
+"""
+import asyncio
+import pytest
+from app.core.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test that concurrent identical calls share one execution"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_run_once(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"sql_output": "SELECT 1;"}
+
+        results = await asyncio.gather(*[flight.do("key", work) for _ in range(10)])
+
+        assert calls == 1
+        assert all(r == {"sql_output": "SELECT 1;"} for r in results)
+
+        stats = flight.stats()
+        assert stats["leaders"] == 1
+        assert stats["coalesced"] == 9
+        assert stats["coalesce_ratio"] == 0.9
+        assert stats["max_waiters"] == 9
+        assert stats["waiters"] == 0
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        flight = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        a, b = await asyncio.gather(flight.do("a", lambda: work(1)), flight.do("b", lambda: work(2)))
+
+        assert (a, b) == (1, 2)
+        assert flight.leaders == 2
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_coalesced(self):
+        """Completed calls are forgotten; the next caller runs again"""
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("key", work) == 1
+        assert await flight.do("key", work) == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_reaches_every_caller(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("rate limited")
+
+        results = await asyncio.gather(*[flight.do("key", work) for _ in range(3)], return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_leader_cancellation_does_not_cancel_waiters(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+
+        assert await waiter == "done"
@@ -0,0 +1,155 @@
+"""
+Unit tests for SSE streaming
+Tests on-the-fly fence stripping and the /generate/stream event sequence
+"""
+import json
+import random
+import pytest
+from typing import Optional, TypedDict
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, END
+from app.agent.streaming import FenceStripper, sse_event
+from app.agent.cache import ResponseCache
+
+
+def strip_batch(text):
+    """The clean-up generate_sql applies after the fact"""
+    return text.replace("```sql", "").replace("```", "").strip()
+
+
+def strip_streamed(text, max_chunk=4, seed=0):
+    rng = random.Random(seed)
+    stripper = FenceStripper()
+    out, i = "", 0
+    while i < len(text):
+        n = rng.randint(1, max_chunk)
+        out += stripper.feed(text[i:i + n])
+        i += n
+    return out + stripper.finish()
+
+
+class TestFenceStripper:
+    """Test incremental markdown fence removal"""
+
+    @pytest.mark.parametrize("text", [
+        "```sql\nSELECT 1;\n```",
+        "  \n SELECT * FROM solana.transactions;  \n ",
+        "```\nSELECT a,\n  b FROM x;```  ",
+        "SELECT 1 `` x;",
+        "```s",
+        "SELECT 1;\n```",
+        "````sql\nSELECT 1",   # "```sql" goes first, leaving "`"
+        "``````sql```",
+        "``\n```sqlx`",
+    ])
+    def test_matches_batch_cleanup(self, text):
+        for seed in range(50):
+            assert strip_streamed(text, seed=seed) == strip_batch(text)
+
+    def test_fence_heavy_inputs(self):
+        """Random mixes of fences, backticks and "sql" stream to exactly the batch clean-up"""
+        pieces = ["```sql", "```", "``", "`", "sql", "s", "ql", "\n", " ", "SELECT 1", "x"]
+        rng = random.Random(7)
+        for case in range(500):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 12)))
+            for seed in range(3):
+                assert strip_streamed(text, max_chunk=rng.randint(1, 8), seed=seed) == strip_batch(text), text
+
+    def test_releases_text_before_completion(self):
+        """SQL is emitted while the completion is still streaming"""
+        stripper = FenceStripper()
+        assert stripper.feed("```sql\n") == ""
+        assert stripper.feed("SELECT block_time ") == "SELECT block_time"
+        assert stripper.feed("FROM") == " FROM"
+
+    def test_holds_possible_fence(self):
+        stripper = FenceStripper()
+        assert stripper.feed("SELECT 1;\n`") == "SELECT 1;"
+        assert stripper.feed("``") == ""
+        assert stripper.finish() == ""
+
+    def test_sse_format(self):
+        assert sse_event("token", {"text": "SELECT"}) == 'event: token\ndata: {"text": "SELECT"}\n\n'
+
+
+class FakeState(TypedDict):
+    user_input: str
+    sql_output: Optional[str]
+    error: Optional[str]
+
+
+def make_agent(content):
+    """One-node graph whose chat model streams `content`"""
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content=content)]))
+
+    async def generator(state):
+        response = await llm.ainvoke([HumanMessage(content=state["user_input"])])
+        return {"sql_output": strip_batch(response.content), "error": None}
+
+    workflow = StateGraph(FakeState)
+    workflow.add_node("generator", generator)
+    workflow.set_entry_point("generator")
+    workflow.add_edge("generator", END)
+    return workflow.compile()
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class TestGenerateStreamEndpoint:
+    """Test /generate/stream with a fake model and a mocked DB session"""
+
+    @pytest.mark.asyncio
+    async def test_stream_events_and_persistence(self):
+        from app.main import app
+        from app.core.database import get_db
+
+        db = AsyncMock()
+        db.add = MagicMock()
+
+        async def override_get_db():
+            yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        agent = make_agent("```sql\nSELECT block_time FROM solana.transactions LIMIT 5;\n```")
+        try:
+            with patch('app.api.routes.agent_app', agent), \
+                 patch('app.api.routes.response_cache', ResponseCache(fingerprint="t", enabled=False)):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/generate/stream",
+                        json={"user_input": "recent txs", "chain": "solana", "session_id": "s-1"},
+                    )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = parse_events(response.text)
+        names = [name for name, _ in events]
+        assert names[0] == "start"
+        assert names[-1] == "done"
+        assert "token" in names
+
+        streamed = "".join(data["text"] for name, data in events if name == "token")
+        assert streamed == "SELECT block_time FROM solana.transactions LIMIT 5;"
+
+        done = events[-1][1]
+        assert done["id"] == events[0][1]["id"]
+        assert done["sql_output"] == streamed
+
+        # Row persisted once, after the stream
+        db.add.assert_called_once()
+        db.commit.assert_awaited()
+        saved = db.add.call_args[0][0]
+        assert saved.session_id == "s-1"
+        assert saved.sql_output == streamed
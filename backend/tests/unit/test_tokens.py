@@ -0,0 +1,240 @@
+"""
+Unit tests for the token registry
+Builds indexes in tmp_path: exact and prefix lookups over tens of thousands
+of tokens, deterministic mention resolution, the resolve_tokens node and
+the search endpoint
+"""
+import csv
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.agent.chains import chain_packs
+from app.agent.tokens import TokenIndex, TokenMatch, TokenRecord, build_token_index, load_token_source
+
+BONK = "DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263"
+WIF = "EKpQGSJtjMFqKZ9KQanSqYXRcF8fBopzLHYxdM65zcjm"
+FAKE_WIF = "FakeWif1111111111111111111111111111111111111"
+POPCAT = "7GCihgDB8fe6KNjn2MYtkzZcRjQy3t9GHdC8uHYmW2hr"
+BASE_DEGEN = "0x4ed4e862860bed51a9570b96d89af5e1b0efefed"
+
+TOKENS = [
+    TokenRecord("solana", "BONK", "Bonk", BONK, decimals=5, rank=0),
+    TokenRecord("solana", "WIF", "dogwifhat", WIF, decimals=6, rank=12, aliases=("dog wif hat",)),
+    TokenRecord("solana", "WIF", "Wif Copy", FAKE_WIF, decimals=9, rank=90_000),
+    TokenRecord("solana", "POPCAT", "Popcat", POPCAT, decimals=9, rank=5000),
+    TokenRecord("solana", "TOP", "Top Token", "Top1111111111111111111111111111111111111111", rank=3),
+    TokenRecord("base", "DEGEN", "Degen", BASE_DEGEN, decimals=18, rank=40),
+] + [
+    TokenRecord("solana", f"SYN{i}", f"Synthetic Token {i}", f"Mint{i:040d}", decimals=6, rank=1000 + i)
+    for i in range(20_000)
+]
+
+
+@pytest.fixture(scope="module")
+def index_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tokens") / "tokens.idx"
+    build_token_index(TOKENS, path)
+    return path
+
+
+@pytest.fixture
+def index(index_path):
+    index = TokenIndex(index_path, loose_rank=1000, max_matches=8)
+    yield index
+    index.close()
+
+
+class TestIndex:
+    """Test building and reading the index file"""
+
+    def test_counts(self, index_path, index):
+        counts = build_token_index(TOKENS, index_path.with_name("again.idx"))
+        assert counts["records"] == len(TOKENS)
+        assert index_path.with_name("again.idx").read_bytes() == index_path.read_bytes()  # Deterministic
+        assert "tokens" not in index.stats()  # Mapped on the first lookup
+        index.lookup("BONK")
+        assert index.stats()["tokens"] == len(TOKENS)
+        assert index.stats()["chains"] == ["base", "solana"]
+
+    def test_exact_lookup_by_symbol_name_alias(self, index):
+        assert [m.mint for m in index.lookup("bonk")] == [BONK]
+        assert index.lookup("$WIF", "solana")[0].mint == WIF  # Best rank first
+        assert [m.mint for m in index.lookup("WIF", "solana")] == [WIF, FAKE_WIF]
+        assert index.lookup("Dog  Wif Hat")[0].mint == WIF
+        assert index.lookup("Synthetic Token 19999")[0].symbol == "SYN19999"
+        assert index.lookup("nope") == []
+        assert index.lookup("DEGEN", "solana") == []
+
+    def test_record_fields(self, index):
+        match = index.lookup("degen", "base")[0]
+        assert match == TokenMatch("base", "DEGEN", "Degen", BASE_DEGEN, 18, 40, mention="degen")
+        assert match.to_spec().render() == f"- **DEGEN:** `{BASE_DEGEN}` (18 decimals)"
+
+    def test_prefix(self, index):
+        assert [m.symbol for m in index.prefix("syn1999", limit=3)] == ["SYN1999", "SYN19990", "SYN19991"]
+        assert [m.symbol for m in index.prefix("dog")] == ["WIF"]
+        assert index.prefix("d", chain="base")[0].symbol == "DEGEN"
+        assert index.prefix("zzz") == []
+
+    def test_prefix_ranks_the_whole_key_range(self, tmp_path):
+        usdc = TokenRecord("solana", "USDC", "USD Coin", "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", 6, rank=1)
+        junk = [TokenRecord("solana", f"US{i:08d}", f"US{i:08d}", f"Junk{i:040d}", rank=10 + i) for i in range(5000)]
+        path = tmp_path / "tokens.idx"
+        build_token_index(junk + [usdc], path)
+        index = TokenIndex(path)
+        assert [m.symbol for m in index.prefix("us", "solana", 5)] == ["USDC", *(f"US{i:08d}" for i in range(4))]
+        assert [m.symbol for m in index.prefix("us", "solana", 1)] == ["USDC"]
+        assert index.prefix("us", "base", 5) == []
+        index.close()
+
+    def test_missing_and_invalid_files(self, tmp_path):
+        assert not TokenIndex(tmp_path / "none.idx").available
+        (tmp_path / "bad.idx").write_bytes(b"x" * 256)
+        with pytest.raises(ValueError, match="not a version"):
+            TokenIndex(tmp_path / "bad.idx").lookup("BONK")
+
+    def test_workers_share_the_file(self, index_path):
+        first, second = TokenIndex(index_path), TokenIndex(index_path)
+        assert first.lookup("BONK") == second.lookup("BONK")
+        first.close()
+        assert second.lookup("wif")[0].mint == WIF
+
+
+class TestMentions:
+    """Test resolving the tokens a question mentions"""
+
+    def test_cashtags_and_capitals_match_any_rank(self, index):
+        found = index.find_mentions("Compare $POPCAT and SYN19999 holders", "solana")
+        assert [m.symbol for m in found] == ["POPCAT", "SYN19999"]
+        assert found[0].mention == "$POPCAT"
+
+    def test_lowercase_needs_a_top_rank(self, index):
+        assert [m.symbol for m in index.find_mentions("bonk and wif volume", "solana")] == ["BONK", "WIF"]
+        assert index.find_mentions("popcat holders", "solana") == []  # Rank 5000 > loose rank
+
+    def test_common_words_only_as_cashtags(self, index):
+        assert index.find_mentions("top 10 wallets by volume", "solana") == []
+        assert [m.symbol for m in index.find_mentions("$TOP holders", "solana")] == ["TOP"]
+
+    def test_trailing_punctuation(self, index):
+        assert [m.symbol for m in index.find_mentions("Top holders of POPCAT.", "solana")] == ["POPCAT"]
+        assert [m.symbol for m in index.find_mentions("Who bought $WIF- or BONK... today?", "solana")] == ["WIF", "BONK"]
+        assert index.find_mentions("holders of SYN1.5", "solana") == []  # Not SYN1
+
+    def test_multi_word_names(self, index):
+        found = index.find_mentions("dog wif hat buyers today", "solana")
+        assert [(m.mint, m.mention) for m in found] == [(WIF, "dog wif hat")]
+
+    def test_deterministic_and_chain_scoped(self, index):
+        assert index.find_mentions("WIF swaps", "solana")[0].mint == WIF
+        assert index.find_mentions("WIF swaps", "base") == []
+        assert [m.mint for m in index.find_mentions("DEGEN on base", "base")] == [BASE_DEGEN]
+
+    def test_deduplicated_and_capped(self, index_path):
+        index = TokenIndex(index_path, max_matches=2)
+        question = "BONK vs $BONK vs bonk vs WIF vs POPCAT"
+        assert [m.symbol for m in index.find_mentions(question, "solana")] == ["BONK", "WIF"]
+        assert index.stats()["resolved"] == 2
+        index.close()
+
+
+class TestSources:
+    """Test reading token lists"""
+
+    def test_csv(self, tmp_path):
+        path = tmp_path / "tokens.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["chain", "symbol", "name", "mint", "decimals", "rank", "aliases"])
+            writer.writerow(["Solana", "WIF", "dogwifhat", WIF, "6", "", "dog wif hat;wif hat"])
+            writer.writerow(["solana", "", "No symbol", "x", "", "", ""])
+        (record,) = load_token_source(path)
+        assert record == TokenRecord("solana", "WIF", "dogwifhat", WIF, 6, 1, ("dog wif hat", "wif hat"))
+
+    def test_jupiter_json(self, tmp_path):
+        path = tmp_path / "tokens.json"
+        path.write_text(json.dumps([
+            {"address": BONK, "symbol": "Bonk", "name": "Bonk", "decimals": 5},
+            {"address": WIF, "symbol": "$WIF", "name": "dogwifhat", "decimals": 6},
+        ]))
+        records = load_token_source(path, chain="solana")
+        assert [(r.mint, r.rank) for r in records] == [(BONK, 1), (WIF, 2)]
+        assert load_token_source(path) == []  # No chain to file them under
+
+
+class TestResolveNode:
+    """Test the pre-LLM node and the prompt it feeds"""
+
+    @pytest.mark.asyncio
+    async def test_known_tokens_first_then_registry(self, index):
+        from app.agent.nodes import resolve_tokens
+
+        with patch("app.agent.nodes.token_index", index):
+            result = await resolve_tokens({"user_input": "USDC paid for $POPCAT this week", "chain": "solana"})
+        usdc = next(t for t in chain_packs.get("solana").registry.tokens if t.symbol == "USDC")
+        assert [(t["symbol"], t["mint"]) for t in result["tokens"]] == [("USDC", usdc.mint), ("POPCAT", POPCAT)]
+
+    @pytest.mark.asyncio
+    async def test_known_token_wins_its_symbol(self, tmp_path):
+        from app.agent.nodes import resolve_tokens
+
+        path = tmp_path / "tokens.idx"
+        build_token_index([TokenRecord("solana", "BONK", "Bonk Copy", "Copy" + "1" * 40, rank=1)], path)
+        with patch("app.agent.nodes.token_index", TokenIndex(path)):
+            result = await resolve_tokens({"user_input": "BONK holders", "chain": "solana"})
+        assert [t["mint"] for t in result["tokens"]] == [BONK]
+
+    @pytest.mark.asyncio
+    async def test_no_index_falls_back(self, tmp_path):
+        from app.agent.nodes import resolve_tokens
+
+        with patch("app.agent.nodes.token_index", TokenIndex(tmp_path / "none.idx")):
+            assert await resolve_tokens({"user_input": "BONK holders", "chain": "solana"}) == {}
+        (tmp_path / "bad.idx").write_bytes(b"x" * 256)
+        with patch("app.agent.nodes.token_index", TokenIndex(tmp_path / "bad.idx")):
+            assert await resolve_tokens({"user_input": "BONK holders", "chain": "solana"}) == {}
+
+    @pytest.mark.asyncio
+    async def test_generator_injects_only_resolved_tokens(self):
+        from app.agent.nodes import generate_sql
+
+        popcat = TokenMatch("solana", "POPCAT", "Popcat", POPCAT, 9, 5000).to_dict()
+        with patch("app.agent.nodes.llm") as llm, patch("app.agent.nodes.semantic_cache") as cache:
+            llm.ainvoke = AsyncMock(return_value=MagicMock(content="SELECT 1;"))
+            cache.alookup = AsyncMock(return_value=None)
+            cache.enabled = False
+            await generate_sql({"user_input": "POPCAT holders", "chain": "solana", "tokens": [popcat]})
+        system = llm.ainvoke.call_args[0][0][0].content
+        assert f"- **POPCAT:** `{POPCAT}` (9 decimals)" in system
+        assert BONK not in system
+
+    def test_full_prompt_with_resolved_tokens(self):
+        pack = chain_packs.get("solana")
+        popcat = TokenMatch("solana", "POPCAT", "Popcat", POPCAT, 9, 5000).to_spec()
+        prompt, tokens = pack.system_prompt("POPCAT holders", retrieval=False, tokens=[popcat])
+        assert prompt.count("TABLE ") == pack.full_prompt.count("TABLE ")
+        assert POPCAT in prompt and BONK not in prompt
+        assert pack.system_prompt("POPCAT holders", retrieval=False) == (pack.full_prompt, pack.full_tokens)
+
+
+class TestSearchEndpoint:
+    """Test GET /tokens/search"""
+
+    @pytest.mark.asyncio
+    async def test_search(self, index):
+        from app.main import app
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            with patch("app.api.tokens.token_index", index):
+                response = await client.get("/api/v1/tokens/search", params={"q": "Syn1999", "limit": 2})
+                base = await client.get("/api/v1/tokens/search", params={"q": "deg", "chain": "base"})
+                bad_chain = await client.get("/api/v1/tokens/search", params={"q": "x", "chain": "dogechain"})
+            with patch("app.api.tokens.token_index", TokenIndex("/nonexistent/tokens.idx")):
+                missing = await client.get("/api/v1/tokens/search", params={"q": "bonk"})
+        assert [t["symbol"] for t in response.json()] == ["SYN1999", "SYN19990"]
+        assert base.json()[0] == {
+            "chain": "base", "symbol": "DEGEN", "name": "Degen", "mint": BASE_DEGEN, "decimals": 18, "rank": 40,
+        }
+        assert bad_chain.status_code == 422
+        assert missing.status_code == 503
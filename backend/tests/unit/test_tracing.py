@@ -0,0 +1,206 @@
+"""
+Unit tests for request-scoped tracing
+Tests sampling, span nesting, export, the middleware and the /generate stages
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import create_engine, text
+from app.agent.cache import ResponseCache
+from app.core.singleflight import SingleFlight
+from app.core.tracing import SpanExporter, Tracer, TracingMiddleware, _current, file_sink, trace_engine, tracer
+
+
+class ListSink:
+    def __init__(self):
+        self.spans = []
+
+    def __call__(self, spans):
+        self.spans.extend(spans)
+
+
+def make_tracer(sample_ratio=1.0):
+    sink = ListSink()
+    return Tracer(enabled=True, sample_ratio=sample_ratio, exporter=SpanExporter(sink)), sink
+
+
+class TestSampling:
+    def test_ratio(self):
+        assert all(Tracer(sample_ratio=1.0).start_trace().sampled for _ in range(100))
+        assert not any(Tracer(sample_ratio=0.0).start_trace().sampled for _ in range(100))
+        sampled = sum(Tracer(sample_ratio=0.25).start_trace().sampled for _ in range(4000))
+        assert 800 < sampled < 1200
+
+    def test_incoming_traceparent_wins(self):
+        parent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        span = Tracer(sample_ratio=0.0).start_trace(parent)
+        assert span.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+        assert span.parent_id == "00f067aa0ba902b7"
+        assert span.sampled
+
+        span = Tracer(sample_ratio=1.0).start_trace(parent[:-2] + "00")
+        assert not span.sampled
+
+    @pytest.mark.parametrize("header", ["", "garbage", "01-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"])
+    def test_invalid_traceparent_starts_new_trace(self, header):
+        span = Tracer().start_trace(header)
+        assert span.parent_id is None
+        assert len(span.trace_id) == 32
+
+
+class TestSpans:
+    def test_nesting_and_export(self):
+        t, sink = make_tracer()
+        root = t.start_trace()
+        token = _current.set(root)
+        try:
+            with t.span("outer") as outer:
+                with t.span("inner", key="v"):
+                    pass
+        finally:
+            _current.reset(token)
+        t.exporter.flush()
+
+        inner, outer_dict = sink.spans
+        assert inner["name"] == "inner" and inner["parent_span_id"] == outer.span_id
+        assert inner["attributes"] == {"key": "v"}
+        assert outer_dict["parent_span_id"] == root.span_id
+        assert {s["trace_id"] for s in sink.spans} == {root.trace_id}
+
+    def test_noop_outside_trace(self):
+        t, sink = make_tracer()
+        with t.span("orphan") as span:
+            assert span is None
+        t.exporter.flush()
+        assert sink.spans == []
+
+    def test_unsampled_trace_creates_no_children(self):
+        t, sink = make_tracer(sample_ratio=0.0)
+        token = _current.set(t.start_trace())
+        try:
+            with t.span("child") as span:
+                assert span is None
+        finally:
+            _current.reset(token)
+
+    def test_error_status(self):
+        t, sink = make_tracer()
+        token = _current.set(t.start_trace())
+        try:
+            with pytest.raises(ValueError):
+                with t.span("failing"):
+                    raise ValueError("boom")
+        finally:
+            _current.reset(token)
+        t.exporter.flush()
+        assert sink.spans[0]["status"] == "error"
+        assert sink.spans[0]["attributes"]["error.type"] == "ValueError"
+
+
+class TestExporter:
+    def test_bounded_queue_drops(self):
+        t, sink = make_tracer()
+        t.exporter.max_queue = 2
+        for _ in range(5):
+            t.end_span(t.start_trace())
+        assert t.exporter.stats()["dropped"] == 3
+        t.exporter.flush()
+        assert len(sink.spans) == 2
+
+    def test_sink_failure_counted(self):
+        def broken(spans):
+            raise OSError("collector down")
+
+        exporter = SpanExporter(broken)
+        t = Tracer(enabled=True, exporter=exporter)
+        t.end_span(t.start_trace())
+        exporter.flush()
+        assert exporter.stats()["failed"] == 1
+
+    def test_file_sink_and_thread(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        exporter = SpanExporter(file_sink(str(path)), flush_interval=0.01)
+        t = Tracer(enabled=True, exporter=exporter)
+        t.start()
+        t.end_span(t.start_trace(name="GET /x"))
+        t.shutdown()
+        lines = path.read_text().splitlines()
+        assert json.loads(lines[0])["name"] == "GET /x"
+
+    def test_statement_spans(self):
+        t, sink = make_tracer()
+        engine = create_engine("sqlite://")
+        trace_engine(engine, t)
+        token = _current.set(t.start_trace())
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        finally:
+            _current.reset(token)
+        t.exporter.flush()
+        assert [s["attributes"]["db.statement_group"] for s in sink.spans] == ["select"]
+
+
+class TestMiddleware:
+    @pytest.mark.asyncio
+    async def test_trace_header_and_route_name(self):
+        t, sink = make_tracer()
+        app = FastAPI()
+
+        async def auth():
+            with t.span("auth"):
+                return None
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int, _=Depends(auth)):
+            return {"id": item_id}
+
+        app.add_middleware(TracingMiddleware, tracer=t)
+        parent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/items/7", headers={"traceparent": parent})
+        t.exporter.flush()
+
+        assert response.headers["X-Trace-Id"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+        child, root = sink.spans
+        assert root["name"] == "GET /items/{item_id}"
+        assert root["attributes"]["http.status_code"] == 200
+        assert child["name"] == "auth" and child["parent_span_id"] == root["span_id"]
+
+    @pytest.mark.asyncio
+    async def test_generate_stages(self):
+        """Auth, cache lookup, agent graph and the history commit are separate spans"""
+        from app.main import app
+        from app.core.database import get_db
+
+        db = AsyncMock()
+        db.add = MagicMock()
+
+        async def override_get_db():
+            yield db
+
+        agent = MagicMock()
+        agent.ainvoke = AsyncMock(return_value={"sql_output": "SELECT 1;", "error": None})
+        sink = ListSink()
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch.object(tracer, "enabled", True), \
+                 patch.object(tracer, "exporter", SpanExporter(sink)), \
+                 patch.object(tracer, "_threshold", 1 << 64), \
+                 patch("app.api.routes.agent_app", agent), \
+                 patch("app.api.routes.response_cache", ResponseCache(fingerprint="t", enabled=False)), \
+                 patch("app.api.routes.inflight_generations", SingleFlight()):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/generate", json={"user_input": "q", "chain": "solana", "session_id": "s"}
+                    )
+                tracer.exporter.flush()
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        names = {span["name"] for span in sink.spans}
+        assert {"auth.resolve_user", "cache.lookup", "agent.graph", "db.save_query", "POST /api/v1/generate"} <= names
+        assert {span["trace_id"] for span in sink.spans} == {response.headers["X-Trace-Id"]}
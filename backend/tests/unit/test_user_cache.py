@@ -0,0 +1,135 @@
+"""
+Unit tests for cached JWT -> user resolution
+Tests token decoding, cache hits without DB round trips and invalidation
+"""
+import uuid
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.api.deps import decode_token_subject, get_current_user_optional, get_current_user_id_optional
+from app.core.security import create_access_token
+from app.core.user_cache import UserCache, user_cache
+from app.models.sql import User, UserQuery
+
+
+def make_db(user=None):
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = user
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+def make_user():
+    return User(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+
+class TestTokenSubject:
+    def test_issued_token_decodes(self):
+        """Tokens are verified with the key they are signed with (SECRET_KEY)"""
+        user_id = uuid.uuid4()
+        assert decode_token_subject(create_access_token(user_id)) == str(user_id)
+
+    @pytest.mark.parametrize("token", [None, "", "garbage", create_access_token("not-a-uuid")])
+    def test_invalid_tokens(self, token):
+        assert decode_token_subject(token) is None
+
+
+class TestUserResolution:
+    """Test the cached lookup used by every authenticated request"""
+
+    @pytest.mark.asyncio
+    async def test_second_request_skips_db(self):
+        user = make_user()
+        token = create_access_token(user.id)
+        db = make_db(user)
+
+        assert await get_current_user_optional(token, db) is user
+        assert await get_current_user_optional(token, db) is user
+
+        db.execute.assert_awaited_once()
+        assert user_cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_not_cached(self):
+        token = create_access_token(uuid.uuid4())
+        db = make_db(None)
+
+        assert await get_current_user_optional(token, db) is None
+        assert await get_current_user_optional(token, db) is None
+        assert db.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_guest_never_touches_db(self):
+        db = make_db()
+        assert await get_current_user_optional(None, db) is None
+        db.execute.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self):
+        user = make_user()
+        token = create_access_token(user.id)
+        db = make_db(user)
+
+        await get_current_user_optional(token, db)
+        user_cache.invalidate(user.id)
+        await get_current_user_optional(token, db)
+
+        assert db.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_claims_only_id(self):
+        user_id = uuid.uuid4()
+        db = make_db()
+        with patch("app.api.deps.settings.AUTH_TRUST_TOKEN_CLAIMS", True):
+            assert await get_current_user_id_optional(create_access_token(user_id), db) == user_id
+        db.execute.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_id_checks_user_exists_by_default(self):
+        db = make_db(None)
+        assert await get_current_user_id_optional(create_access_token(uuid.uuid4()), db) is None
+        db.execute.assert_awaited_once()
+
+
+class TestUserCache:
+    def test_bounded(self):
+        cache = UserCache(max_entries=2, ttl_seconds=60)
+        users = [make_user() for _ in range(3)]
+        for user in users:
+            cache.put(user)
+        assert cache.stats()["entries"] == 2
+
+    def test_disabled(self):
+        cache = UserCache(enabled=False)
+        user = make_user()
+        cache.put(user)
+        assert cache.get(str(user.id)) is None
+
+    def test_orm_update_and_delete_evict(self):
+        """Flushing a changed/deleted User evicts it (mapper events)"""
+        engine = create_engine("sqlite://")
+        User.__table__.create(engine)
+        UserQuery.__table__.create(engine)
+        with Session(engine) as session:
+            user = make_user()
+            session.add(user)
+            session.commit()
+
+            user_cache.put(user)
+            user.full_name = "Renamed"
+            session.commit()
+            assert user_cache.get(str(user.id)) is None
+
+            user_cache.put(user)
+            session.delete(user)
+            session.commit()
+            assert user_cache.get(str(user.id)) is None
@@ -0,0 +1,214 @@
+"""
+Unit tests for local SQL validation
+Tests the validator rules, the validator node and the self-repair loop in the graph
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END
+from app.agent.cache import ResponseCache
+from app.agent.nodes import route_after_validation, validate_generated_sql
+from app.agent.schema import SOLANA_SCHEMA
+from app.agent.rewrite import rewrite_sql
+from app.agent.validation import validate_sql
+from app.agent.workflow import build_agent
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from scripts.fake_llm_server import DEFAULT_SQL
+
+GOOD_SQL = (
+    "SELECT date_trunc('day', block_time) AS day, SUM(token_balance_change) AS volume FROM solana.account_activity "
+    "WHERE token_mint_address = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v' "
+    "AND block_time > now() - interval '7' day GROUP BY 1 ORDER BY 1"
+)
+NO_FILTER_SQL = "SELECT token_mint_address, SUM(token_balance_change) FROM solana.account_activity GROUP BY 1"
+
+
+class TestValidateSQL:
+    """Test the validator rules"""
+
+    def test_valid_queries(self):
+        for sql in (GOOD_SQL, DEFAULT_SQL, "SELECT address, sol_balance FROM solana_utils.latest_balances LIMIT 10"):
+            result = validate_sql(sql)
+            assert result.ok, result.message()
+
+    def test_tables_reported(self):
+        assert validate_sql(GOOD_SQL).tables == ("solana.account_activity",)
+
+    @pytest.mark.parametrize("sql", ["", "   ", None])
+    def test_empty(self, sql):
+        assert validate_sql(sql).errors == ("Empty SQL",)
+
+    def test_syntax_error(self):
+        result = validate_sql("SELECT FROM WHERE")
+        assert not result.ok
+        assert result.errors[0].startswith("Syntax error")
+
+    def test_single_statement(self):
+        result = validate_sql(GOOD_SQL + "; " + GOOD_SQL)
+        assert "exactly one SQL statement" in result.message()
+
+    @pytest.mark.parametrize("sql", [
+        "DELETE FROM solana.account_activity WHERE block_time > now()",
+        "DROP TABLE solana.transactions",
+        "INSERT INTO solana.transactions SELECT * FROM solana.transactions",
+    ])
+    def test_read_only(self, sql):
+        assert "Only SELECT queries are allowed" in validate_sql(sql).message()
+
+    def test_unknown_table(self):
+        result = validate_sql("SELECT * FROM ethereum.transactions WHERE block_time > now() - interval '1' day")
+        assert result.message().startswith("Unknown table ethereum.transactions")
+
+    def test_missing_time_filter(self):
+        result = validate_sql(NO_FILTER_SQL)
+        assert result.message().startswith("Missing time filter on solana.account_activity")
+
+    def test_filter_on_other_table_does_not_count(self):
+        sql = (
+            "SELECT t.token_balance_change FROM solana.account_activity t "
+            "JOIN solana.transactions x ON x.id = t.tx_id "
+            "WHERE x.block_time > now() - interval '1' day"
+        )
+        result = validate_sql(sql)
+        assert result.errors == (validate_sql(NO_FILTER_SQL).errors[0],)
+
+    def test_join_condition_counts(self):
+        sql = (
+            "SELECT t.token_balance_change FROM solana.account_activity t "
+            "JOIN solana.transactions x ON x.id = t.tx_id AND x.block_time > now() - interval '1' day "
+            "WHERE t.block_time >= now() - interval '1' day"
+        )
+        assert validate_sql(sql).ok
+
+    def test_filter_in_cte_and_outer_query(self):
+        inner = "WITH daily AS (SELECT block_time, token_balance_change FROM solana.account_activity WHERE block_time > now() - interval '30' day) SELECT * FROM daily"
+        outer = "SELECT * FROM (SELECT block_time, token_balance_change FROM solana.account_activity) t WHERE t.block_time > now() - interval '1' day"
+        assert validate_sql(inner).ok
+        assert validate_sql(outer).ok
+
+    def test_cte_without_filter(self):
+        sql = "WITH d AS (SELECT block_time FROM solana.account_activity) SELECT * FROM d"
+        assert not validate_sql(sql).ok
+
+    def test_schema_tables_known(self):
+        for name in SOLANA_SCHEMA.table_names:
+            assert SOLANA_SCHEMA.table(name) is not None
+
+
+class TestValidatorNode:
+    """Test the validator node and its routing"""
+
+    @pytest.mark.asyncio
+    async def test_valid(self):
+        result = await validate_generated_sql({"user_input": "q", "sql_output": GOOD_SQL, "error": None})
+        assert result["validation_error"] is None
+        assert result["scan_estimate"]["tables"][0]["table"] == "solana.account_activity"
+        assert route_after_validation({**result, "error": None}) == END
+
+    @pytest.mark.asyncio
+    async def test_invalid_requests_repair(self):
+        result = await validate_generated_sql({"user_input": "q", "sql_output": NO_FILTER_SQL, "error": None})
+        assert result["repairs"] == 1
+        assert "Missing time filter" in result["validation_error"]
+        assert route_after_validation(result) == "generator"
+
+    @pytest.mark.asyncio
+    async def test_repair_budget_exhausted(self):
+        state = {"user_input": "q", "sql_output": NO_FILTER_SQL, "error": None,
+                 "repairs": settings.SQL_REPAIR_MAX_ATTEMPTS}
+        result = await validate_generated_sql(state)
+        assert result["error"].startswith("Generated SQL failed validation: Missing time filter")
+        assert route_after_validation(result) == END
+
+    @pytest.mark.asyncio
+    async def test_generation_error_passes_through(self):
+        assert await validate_generated_sql({"user_input": "q", "sql_output": None, "error": "boom"}) == {}
+
+
+def fake_llm(*contents):
+    return GenericFakeChatModel(messages=iter([AIMessage(content=content) for content in contents]))
+
+
+class TestRepairLoop:
+    """Test the generator <-> validator loop in the compiled graph"""
+
+    @pytest.mark.asyncio
+    async def test_repairs_invalid_sql(self):
+        with patch("app.agent.nodes.llm") as mock_llm:
+            mock_llm.ainvoke = AsyncMock(side_effect=[AIMessage(content=NO_FILTER_SQL), AIMessage(content=GOOD_SQL)])
+            result = await build_agent().ainvoke({"user_input": "daily USDC volume"})
+
+        assert result["error"] is None
+        assert result["original_sql"] == GOOD_SQL
+        assert result["sql_output"] == rewrite_sql(GOOD_SQL).sql
+        assert result["repairs"] == 1
+        assert mock_llm.ainvoke.await_count == 2
+        # The second call saw the rejected SQL and the validator's errors
+        repair_messages = mock_llm.ainvoke.await_args_list[1].args[0]
+        assert repair_messages[-2].content == NO_FILTER_SQL
+        assert "Missing time filter" in repair_messages[-1].content
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        llm = fake_llm(*[NO_FILTER_SQL] * (settings.SQL_REPAIR_MAX_ATTEMPTS + 1))
+        with patch("app.agent.nodes.llm", llm):
+            result = await build_agent().ainvoke({"user_input": "daily USDC volume"})
+
+        assert result["error"].startswith("Generated SQL failed validation")
+        assert result["repairs"] == settings.SQL_REPAIR_MAX_ATTEMPTS
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        llm = fake_llm(NO_FILTER_SQL)
+        with patch("app.agent.nodes.llm", llm), patch.object(settings, "SQL_VALIDATION_ENABLED", False):
+            result = await build_agent().ainvoke({"user_input": "daily USDC volume"})
+        assert result["error"] is None
+        assert result["original_sql"] == NO_FILTER_SQL
+        assert "validation_error" not in result
+
+    @pytest.mark.asyncio
+    async def test_stream_reset_on_repair(self):
+        """Tokens of the rejected SQL are followed by a reset event"""
+        from app.main import app
+        from app.core.database import get_db
+
+        db = AsyncMock()
+        db.add = MagicMock()
+
+        async def override_get_db():
+            yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch("app.agent.nodes.llm", fake_llm(NO_FILTER_SQL, GOOD_SQL)):
+                agent = build_agent()
+                with patch("app.api.routes.agent_app", agent), \
+                     patch("app.api.routes.response_cache", ResponseCache(fingerprint="t", enabled=False)), \
+                     patch("app.api.routes.inflight_generations", SingleFlight()):
+                    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                        response = await client.post(
+                            "/api/v1/generate/stream",
+                            json={"user_input": "daily USDC volume", "chain": "solana", "session_id": "s"},
+                        )
+        finally:
+            app.dependency_overrides.clear()
+
+        events = [
+            (block.split("\n", 1)[0][len("event: "):], json.loads(block.split("\n", 1)[1][len("data: "):]))
+            for block in response.text.strip().split("\n\n")
+        ]
+        names = [name for name, _ in events]
+        assert names.count("reset") == 1
+        reset = names.index("reset")
+        assert "Missing time filter" in events[reset][1]["reason"]
+        before = "".join(data["text"] for name, data in events[:reset] if name == "token")
+        after = "".join(data["text"] for name, data in events[reset:] if name == "token")
+        assert before == NO_FILTER_SQL
+        assert after == GOOD_SQL
+        # The saved SQL is the rewritten one
+        assert events[-1][1]["sql_output"] == rewrite_sql(GOOD_SQL).sql
+        assert events[-1][1]["original_sql"] == GOOD_SQL
@@ -0,0 +1,216 @@
+"""
+Unit tests for write-behind persistence of history rows
+Tests batching, backpressure, retries, flush-on-stop and the /generate path
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.exc import IntegrityError
+from app.agent.cache import ResponseCache
+from app.core.singleflight import SingleFlight
+from app.core.write_behind import WriteBehindQueue
+from app.models.sql import UserQuery
+
+
+class FakeSessionFactory:
+    """async_session_factory stand-in recording every flush"""
+
+    def __init__(self, fail_times=0, delay=0.0, bad_inputs=()):
+        self.batches = []
+        self.commits = 0
+        self.fail_times = fail_times
+        self.delay = delay
+        self.bad_inputs = set(bad_inputs)  # Rows whose INSERT violates a constraint
+        self.attempts = 0
+
+    def __call__(self):
+        factory = self
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, statement, rows=None):
+                if factory.delay:
+                    await asyncio.sleep(factory.delay)
+                factory.attempts += 1
+                if factory.fail_times:
+                    factory.fail_times -= 1
+                    raise RuntimeError("connection refused")
+                if rows is not None and any(r["user_input"] in factory.bad_inputs for r in rows):
+                    raise IntegrityError("INSERT INTO userquery", {}, Exception("violates foreign key constraint"))
+                if rows is not None:
+                    factory.batches.append(rows)
+
+            async def commit(self):
+                factory.commits += 1
+
+        return Session()
+
+
+def make_row(i=0):
+    return UserQuery(user_input=f"q{i}", sql_output=f"SELECT {i};", chain="solana", session_id="s-1")
+
+
+class TestWriteBehindQueue:
+    """Test the background writer"""
+
+    @pytest.mark.asyncio
+    async def test_disabled_caller_writes(self):
+        writer = WriteBehindQueue(FakeSessionFactory(), UserQuery, enabled=False)
+        writer.start()
+        assert await writer.submit(make_row()) is False
+
+    @pytest.mark.asyncio
+    async def test_rows_are_batched(self):
+        factory = FakeSessionFactory()
+        writer = WriteBehindQueue(factory, UserQuery, batch_size=100, linger=0.01)
+        writer.start()
+
+        rows = [make_row(i) for i in range(25)]
+        for row in rows:
+            assert await writer.submit(row) is True
+        await asyncio.sleep(0.05)
+        await writer.stop()
+
+        written = [r for batch in factory.batches for r in batch]
+        assert [r["id"] for r in written] == [row.id for row in rows]
+        assert len(factory.batches) == 1  # One multi-row INSERT
+        assert writer.stats()["written"] == 25
+
+    @pytest.mark.asyncio
+    async def test_cache_entries_flushed_with_rows(self):
+        factory = FakeSessionFactory()
+        cache = ResponseCache(fingerprint="t")
+        cache.put_many = AsyncMock()
+        writer = WriteBehindQueue(factory, UserQuery, cache=cache, linger=0)
+        writer.start()
+
+        await writer.submit(make_row(1), ("k1", "solana", {"sql_output": "SELECT 1;"}))
+        await writer.submit(make_row(2))
+        await writer.stop()
+
+        entries = [e for call in cache.put_many.await_args_list for e in call.args[1]]
+        assert entries == [("k1", "solana", {"sql_output": "SELECT 1;"})]
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_pending(self):
+        factory = FakeSessionFactory(delay=0.05)
+        writer = WriteBehindQueue(factory, UserQuery, batch_size=2, linger=0)
+        writer.start()
+
+        for i in range(7):
+            await writer.submit(make_row(i))
+        await writer.stop()
+
+        assert sum(len(b) for b in factory.batches) == 7
+        assert writer.stats()["pending"] == 0
+        assert await writer.submit(make_row()) is False  # Stopped: caller writes
+
+    @pytest.mark.asyncio
+    async def test_backpressure_when_full(self):
+        """A slow database fills the bounded queue; the caller then writes inline"""
+        factory = FakeSessionFactory(delay=0.5)
+        writer = WriteBehindQueue(factory, UserQuery, max_rows=2, batch_size=1, linger=0, enqueue_timeout=0.01)
+        writer.start()
+
+        accepted = [await writer.submit(make_row(i)) for i in range(5)]
+
+        assert accepted.count(False) >= 1
+        assert writer.stats()["overflows"] == accepted.count(False)
+        assert writer.stats()["pending"] <= 2
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried(self):
+        factory = FakeSessionFactory(fail_times=2)
+        writer = WriteBehindQueue(factory, UserQuery, linger=0, max_retries=5, retry_max_delay=0)
+        writer.start()
+
+        await writer.submit(make_row())
+        for _ in range(20):
+            await asyncio.sleep(0)
+            if writer.written:
+                break
+
+        assert writer.written == 1
+        assert writer.dropped == 0
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        factory = FakeSessionFactory(fail_times=100)
+        writer = WriteBehindQueue(factory, UserQuery, linger=0, max_retries=2, retry_max_delay=0)
+
+        await writer._flush_with_retry([(make_row().model_dump(), None)], retries=2)
+
+        assert writer.dropped == 1
+        assert writer.written == 0
+
+    @pytest.mark.asyncio
+    async def test_bad_row_does_not_drop_the_batch(self):
+        """A constraint violation drops only the offending row, without retries"""
+        factory = FakeSessionFactory(bad_inputs={"q37"})
+        cache = ResponseCache(fingerprint="t")
+        cache.put_many = AsyncMock()
+        writer = WriteBehindQueue(factory, UserQuery, cache=cache, max_retries=5, retry_max_delay=0)
+        batch = [(make_row(i).model_dump(), (f"k{i}", "solana", {"sql_output": f"SELECT {i};"})) for i in range(100)]
+
+        await writer._flush_with_retry(batch, retries=5)
+
+        written = [r["user_input"] for b in factory.batches for r in b]
+        assert sorted(written) == sorted(f"q{i}" for i in range(100) if i != 37)
+        assert writer.written == 99
+        assert writer.dropped == writer.rejected == 1
+        assert factory.attempts <= 2 * 7 + 1  # Bisected down to the row, never retried
+        cached = {key for call in cache.put_many.await_args_list for key, _, _ in call.args[1]}
+        assert "k37" not in cached and len(cached) == 99
+
+
+class TestGenerateWriteBehind:
+    """Test /generate answering before the row is committed"""
+
+    @pytest.mark.asyncio
+    async def test_generate_queues_row(self):
+        from app.main import app
+        from app.core.database import get_db
+
+        db = AsyncMock()
+        db.add = MagicMock()
+
+        async def override_get_db():
+            yield db
+
+        factory = FakeSessionFactory()
+        writer = WriteBehindQueue(factory, UserQuery, linger=0)
+        writer.start()
+        agent = MagicMock()
+        agent.ainvoke = AsyncMock(return_value={"sql_output": "SELECT 1;", "error": None})
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch('app.api.routes.agent_app', agent), \
+                 patch('app.api.routes.response_cache', ResponseCache(fingerprint="t", enabled=False)), \
+                 patch('app.api.routes.inflight_generations', SingleFlight()), \
+                 patch('app.api.routes.history_writer', writer):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/generate",
+                        json={"user_input": "top holders", "session_id": "s-1"},
+                    )
+        finally:
+            app.dependency_overrides.clear()
+            await writer.stop()
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["sql_output"] == "SELECT 1;"
+        # Client-side id/timestamps; no commit on the request path
+        db.commit.assert_not_called()
+        written = factory.batches[0][0]
+        assert str(written["id"]) == data["id"]
+        assert written["session_id"] == "s-1"